@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Budget-Constrained Intervention Allocation for LAI-PrEP Bridge Decision Support Tool
+
+Allocates interventions to the patients of a cohort to maximize total
+expected bridge-period successes under a budget, with per-intervention unit
+costs and optional capacity limits (e.g. navigator slots, vouchers).
+
+A patient's expected success with an allocated set of interventions follows
+the tool's rules: the allocated candidates are selected in priority order
+with the mechanism-overlap penalty, the top 3 improvements are summed, scaled
+by the diminishing-returns factor and capped at the maximum success rate.
+
+Patients with the same recommendation key are interchangeable (the key fixes
+adjusted success and candidates), so the optimizer works on groups of
+identical patients rather than individual rows: a greedy heap ordered by
+marginal successes per unit cost allocates to as many patients of a group as
+budget and capacity allow, splitting the group into allocated and
+unallocated states. Gains for a state are computed only when the state is
+first created, which keeps a multi-million row cohort to a few thousand
+evaluations.
+"""
+
+import heapq
+import itertools
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from cohort_scoring import CohortScorer
+from intervention_ranking import COST_WEIGHTS, TOP_RECOMMENDATIONS
+from lai_prep_decision_tool_v2_1 import Configuration, ConfigurationError
+
+
+def resolve_unit_costs(
+    config: Configuration,
+    overrides: Optional[Dict[str, float]] = None
+) -> Dict[str, float]:
+    """
+    Unit cost per intervention
+
+    Costs default to COST_WEIGHTS by cost_level. Override keys may name a
+    cost level (re-pricing every intervention at that level) or an
+    intervention (taking precedence over its level).
+
+    Raises:
+        ConfigurationError: On unknown override keys or non-positive costs
+    """
+    overrides = dict(overrides or {})
+    interventions = config.config['interventions']
+    unknown = [key for key in overrides if key not in interventions and key not in COST_WEIGHTS]
+    if unknown:
+        raise ConfigurationError(f"Unknown interventions or cost levels in unit costs: {unknown}")
+
+    level_costs = {**COST_WEIGHTS, **{k: v for k, v in overrides.items() if k in COST_WEIGHTS}}
+    costs = {}
+    for key, int_config in interventions.items():
+        cost = overrides.get(key, level_costs.get(int_config.get('cost_level')))
+        if cost is None:
+            raise ConfigurationError(
+                f"No unit cost for {key} (cost_level {int_config.get('cost_level')!r})"
+            )
+        if cost <= 0:
+            raise ConfigurationError(f"Unit cost for {key} must be positive, got {cost}")
+        costs[key] = float(cost)
+    return costs
+
+
+class BudgetAllocator:
+    """Greedy budget allocation over groups of identical patients"""
+
+    def __init__(
+        self,
+        scorer: CohortScorer,
+        budget: float,
+        unit_costs: Optional[Dict[str, float]] = None,
+        capacities: Optional[Dict[str, int]] = None
+    ):
+        """
+        Args:
+            scorer: CohortScorer for the active configuration and method
+            budget: Total budget in unit-cost units
+            unit_costs: Cost per patient per intervention (default: from cost_level)
+            capacities: Maximum patients per intervention (unlimited if absent)
+        """
+        if budget < 0:
+            raise ValueError(f"Budget must be non-negative, got {budget}")
+
+        self.scorer = scorer
+        self.tool = scorer.tool
+        self.budget = float(budget)
+        self.unit_costs = unit_costs or resolve_unit_costs(self.tool.config)
+        self.capacities = dict(capacities or {})
+        unknown = [k for k in self.capacities if k not in self.unit_costs]
+        if unknown:
+            raise ConfigurationError(f"Unknown interventions in capacities: {unknown}")
+
+        self.group_counts: Dict[int, int] = {}
+        self.spent = 0.0
+        self.solved = False
+
+        # Per key: prioritized candidates and adjusted success
+        self._candidates: Dict[int, list] = {}
+        self._adjusted: Dict[int, float] = {}
+        self._values: Dict[Tuple[int, frozenset], float] = {}
+        # Per key: [allocated set, patients] after solve()
+        self.allocations: Dict[int, List[list]] = {}
+
+    # ------------------------------------------------------------------
+    # Pass 1: group patients
+    # ------------------------------------------------------------------
+
+    def add(self, records: np.ndarray) -> None:
+        """Count a chunk of encoded patients into recommendation-key groups"""
+        if len(records) == 0:
+            return
+        keys, first, counts = np.unique(
+            self.scorer.recommendation_keys(records), return_index=True, return_counts=True
+        )
+        adjusted = self.scorer.adjusted_success(records[first])
+        for key, count, success in zip(keys.tolist(), counts.tolist(), adjusted.tolist()):
+            self.group_counts[key] = self.group_counts.get(key, 0) + count
+            self._adjusted.setdefault(key, success)
+
+    # ------------------------------------------------------------------
+    # Value of an allocated set
+    # ------------------------------------------------------------------
+
+    def _key_candidates(self, key: int) -> list:
+        """Prioritized candidate recommendations for a key (cached)"""
+        candidates = self._candidates.get(key)
+        if candidates is None:
+            profile = self.scorer._key_profile(key)
+            candidates = self.tool._prioritize_candidates(
+                self.tool._generate_candidate_recommendations(profile)
+            )
+            self._candidates[key] = candidates
+        return candidates
+
+    def expected_success(self, key: int, allocated: frozenset) -> float:
+        """Expected success of a key's patients given allocated interventions (cached)"""
+        value = self._values.get((key, allocated))
+        if value is None:
+            value = self._expected_success(key, allocated)
+            self._values[(key, allocated)] = value
+        return value
+
+    def _expected_success(self, key: int, allocated: frozenset) -> float:
+        """Tool rules restricted to the allocated candidates"""
+        candidates = [c for c in self._key_candidates(key) if c.intervention in allocated]
+        selected = self.tool._select_with_mechanism_diversity(candidates)
+        gain = sum(rec.expected_improvement / 100 for rec in selected[:TOP_RECOMMENDATIONS])
+        return float(self.scorer.estimated_success(self._adjusted[key], gain))
+
+    # ------------------------------------------------------------------
+    # Greedy allocation
+    # ------------------------------------------------------------------
+
+    def solve(self) -> None:
+        """Allocate the budget greedily by marginal successes per unit cost"""
+        remaining_capacity = dict(self.capacities)
+        budget = self.budget
+        counter = itertools.count()
+
+        # States: id -> [key, allocated set, patients, expected success]
+        states: Dict[int, list] = {}
+        state_ids: Dict[Tuple[int, frozenset], int] = {}
+        heap = []
+
+        def add_state(key: int, allocated: frozenset, patients: int) -> None:
+            state_id = state_ids.get((key, allocated))
+            if state_id is not None:
+                states[state_id][2] += patients
+                return
+            state_id = len(states)
+            state_ids[(key, allocated)] = state_id
+            value = self.expected_success(key, allocated)
+            states[state_id] = [key, allocated, patients, value]
+
+            for candidate in self._key_candidates(key):
+                intervention = candidate.intervention
+                if intervention in allocated:
+                    continue
+                gain = self.expected_success(key, allocated | {intervention}) - value
+                if gain > 0:
+                    ratio = gain / self.unit_costs[intervention]
+                    heapq.heappush(heap, (-ratio, next(counter), state_id, intervention))
+
+        for key in sorted(self.group_counts):
+            add_state(key, frozenset(), self.group_counts[key])
+
+        while heap:
+            _, _, state_id, intervention = heapq.heappop(heap)
+            key, allocated, patients, _ = states[state_id]
+            cost = self.unit_costs[intervention]
+            if patients == 0 or cost > budget:
+                continue
+
+            limit = remaining_capacity.get(intervention)
+            quantity = min(patients, int(budget // cost))
+            if limit is not None:
+                quantity = min(quantity, limit)
+            if quantity == 0:
+                continue
+
+            states[state_id][2] -= quantity
+            budget -= quantity * cost
+            if limit is not None:
+                remaining_capacity[intervention] = limit - quantity
+            add_state(key, allocated | {intervention}, quantity)
+
+        self.spent = self.budget - budget
+        self.allocations = {}
+        for key, allocated, patients, _ in states.values():
+            if patients:
+                self.allocations.setdefault(key, []).append([allocated, patients])
+        for groups in self.allocations.values():
+            # Most-allocated sets go to the earliest rows of a group
+            groups.sort(key=lambda group: (-len(group[0]), sorted(group[0])))
+        self.solved = True
+
+    # ------------------------------------------------------------------
+    # Pass 2: per-patient output
+    # ------------------------------------------------------------------
+
+    def adjusted_success(self, key: int) -> float:
+        """Adjusted success (no interventions) of a key's patients"""
+        return self._adjusted[key]
+
+    def assign(self, chunks) -> Iterator[Tuple[int, np.ndarray, list, List[frozenset]]]:
+        """
+        Yield (offset, records, patient_ids, allocated sets) per chunk
+
+        Chunks must cover the same cohort, in the same order, as add().
+        """
+        if not self.solved:
+            raise RuntimeError("Call solve() before assign()")
+
+        pending = {key: [[allocated, n] for allocated, n in groups]
+                   for key, groups in self.allocations.items()}
+        for offset, records, patient_ids in chunks:
+            allocated_sets = []
+            for key in self.scorer.recommendation_keys(records).tolist():
+                groups = pending[key]
+                allocated_sets.append(groups[0][0])
+                groups[0][1] -= 1
+                if groups[0][1] == 0:
+                    groups.pop(0)
+            yield offset, records, patient_ids, allocated_sets
+
+    def summary(self) -> Dict:
+        """Budget use, expected successes and per-intervention/population totals"""
+        if not self.solved:
+            raise RuntimeError("Call solve() before summary()")
+
+        codec = self.scorer.codec
+        n_status, n_recent, n_setting, n_mask = self.scorer._key_radix
+        key_stride = n_status * n_recent * n_setting * n_mask
+
+        baseline = 0.0
+        allocated_total = 0.0
+        patients_allocated = 0
+        by_intervention = {
+            key: {"patients": 0, "cost": 0.0, "capacity": self.capacities.get(key)}
+            for key in self.unit_costs
+        }
+        by_population: Dict[str, Dict] = {}
+
+        for key, groups in self.allocations.items():
+            base_value = self.expected_success(key, frozenset())
+            population = by_population.setdefault(codec.populations[key // key_stride], {
+                "patients": 0, "patients_allocated": 0,
+                "baseline_expected_successes": 0.0, "expected_successes": 0.0,
+            })
+            for allocated, patients in groups:
+                value = self.expected_success(key, allocated)
+                baseline += base_value * patients
+                allocated_total += value * patients
+                population["patients"] += patients
+                population["baseline_expected_successes"] += base_value * patients
+                population["expected_successes"] += value * patients
+                if allocated:
+                    patients_allocated += patients
+                    population["patients_allocated"] += patients
+                for intervention in allocated:
+                    by_intervention[intervention]["patients"] += patients
+                    by_intervention[intervention]["cost"] += self.unit_costs[intervention] * patients
+
+        for entry in by_population.values():
+            for name in ("baseline_expected_successes", "expected_successes"):
+                entry[name] = round(entry[name], 4)
+        for entry in by_intervention.values():
+            entry["cost"] = round(entry["cost"], 4)
+
+        return {
+            "method": "logit" if self.scorer.use_logit else "linear",
+            "budget": self.budget,
+            "spent": round(self.spent, 4),
+            "patients": sum(self.group_counts.values()),
+            "patients_allocated": patients_allocated,
+            "baseline_expected_successes": round(baseline, 4),
+            "expected_successes": round(allocated_total, 4),
+            "successes_gained": round(allocated_total - baseline, 4),
+            "unit_costs": self.unit_costs,
+            "by_intervention": {k: v for k, v in by_intervention.items() if v["patients"]},
+            "by_population": by_population,
+        }
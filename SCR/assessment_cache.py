@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Persistent Assessment Cache for LAI-PrEP Bridge Decision Support Tool
+
+Stores finished assessment records in a local SQLite database so separate
+`cli.py assess` and `batch` runs, and their worker processes, reuse earlier
+work. Daily batches mostly re-score yesterday's patients.
+
+What is stored is the serialized record body (AssessmentSerializer output up
+to the metadata block) plus the batch summary fields, not the assessment
+object: decoding a stored BridgePeriodAssessment costs more than scoring the
+patient again, whereas a stored body is completed with the run's timestamp
+and written out as is. A hit therefore skips both scoring and serialization,
+and the output is byte-for-byte what an uncached run writes.
+
+Entries are keyed by SHA-256 of (code version, configuration content digest,
+calculation method, JSON backend, canonical profile), so a configuration
+change, the other method, a different encoder or edited scoring and
+serialization code never returns a stale record.
+
+Concurrency: the database runs in WAL mode, so any number of processes read
+while one writes; writers wait on each other (busy timeout) instead of
+failing. Lookups only read: the recency and hit/miss counts they produce are
+held in memory and written with the next put_many, every FLUSH_LOOKUPS
+lookups, or on close. Each process opens its own AssessmentCache.
+
+Size: when the stored records exceed max_bytes, the least recently used
+entries are evicted down to EVICT_TO of the limit.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from assessment_serializer import AssessmentSerializer
+from lai_prep_decision_tool_v2_1 import LAIPrEPDecisionTool, PatientProfile
+from shared_config import config_digest
+
+
+SCHEMA_VERSION = 1
+
+# Bump when stored records change meaning; code changes are picked up from the
+# source digest in code_version()
+CACHE_VERSION = 1
+
+# Modules whose source determines a stored record body and summary
+SOURCE_MODULES = (
+    'assessment_cache.py', 'assessment_serializer.py', 'batch_processing.py',
+    'cohort_scoring.py', 'compiled_config.py', 'patient_codec.py',
+    'lai_prep_decision_tool_v2_1.py',
+)
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+EVICT_TO = 0.9
+BUSY_TIMEOUT_SECONDS = 30.0
+
+# Lookups whose recency and counts may be pending before they are written
+FLUSH_LOOKUPS = 50_000
+
+# Keys per SQL statement (SQLite's default host parameter limit is 999)
+MAX_SQL_VARIABLES = 900
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    key BLOB PRIMARY KEY,
+    body BLOB NOT NULL,
+    summary TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS records_last_used ON records (last_used);
+CREATE TABLE IF NOT EXISTS stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO stats VALUES
+    ('entries', 0), ('bytes', 0), ('hits', 0), ('misses', 0), ('evictions', 0);
+"""
+
+# (record body, summary fields) of a cached assessment
+CachedRecord = Tuple[bytes, Dict]
+
+
+def profile_key(profile: PatientProfile) -> bytes:
+    """Canonical encoding of every profile field (barrier order is kept)"""
+    return json.dumps(vars(profile), sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def code_version() -> str:
+    """CACHE_VERSION plus a digest of the scoring and serialization sources"""
+    digest = hashlib.sha256()
+    here = Path(__file__).parent
+    for name in SOURCE_MODULES:
+        digest.update((here / name).read_bytes())
+    return f"{CACHE_VERSION}-{digest.hexdigest()[:16]}"
+
+
+def cache_namespace(tool: LAIPrEPDecisionTool, serializer: AssessmentSerializer) -> bytes:
+    """Key prefix for the code version, the tool's configuration and method, and the backend"""
+    method = 'logit' if tool.use_logit else 'linear'
+    return (
+        f"{code_version()}:{config_digest(tool.config)}:{method}:{serializer.backend.name}:"
+    ).encode('utf-8')
+
+
+def cache_key(namespace: bytes, profile: PatientProfile) -> bytes:
+    """Cache key of a profile under a namespace"""
+    return hashlib.sha256(namespace + profile_key(profile)).digest()
+
+
+class AssessmentCache:
+    """Disk-backed store of assessment records shared by processes on one machine"""
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Open (or create) a cache database
+
+        Args:
+            path: SQLite database file
+            max_bytes: Bound on the total size of stored records
+
+        Raises:
+            ValueError: If the file holds a cache with another schema version
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self._conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, SCHEMA_VERSION):
+            self._conn.close()
+            raise ValueError(
+                f"Assessment cache {path} has schema version {version} "
+                f"(expected {SCHEMA_VERSION}); delete it to start over"
+            )
+        self._conn.executescript(SCHEMA)
+        self._conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+        # Lookups not yet written: last use per hit key, hit and miss counts
+        self._used: Dict[bytes, int] = {}
+        self._lookups = {'hits': 0, 'misses': 0}
+
+    @contextmanager
+    def _transaction(self):
+        """Write transaction taking the write lock up front (no lock upgrades)"""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def _add_stats(self, **deltas: int) -> None:
+        """Adjust counters (inside a transaction)"""
+        self._conn.executemany(
+            "UPDATE stats SET value = value + ? WHERE name = ?",
+            [(delta, name) for name, delta in deltas.items() if delta]
+        )
+
+    def _stat(self, name: str) -> int:
+        return self._conn.execute("SELECT value FROM stats WHERE name = ?", (name,)).fetchone()[0]
+
+    def _write_lookups(self) -> None:
+        """Write pending recency and hit/miss counts (inside a transaction)"""
+        if self._used:
+            self._conn.executemany(
+                "UPDATE records SET last_used = ? WHERE key = ?",
+                [(used, key) for key, used in self._used.items()]
+            )
+        self._add_stats(**self._lookups)
+        self._used = {}
+        self._lookups = {'hits': 0, 'misses': 0}
+
+    def flush(self) -> None:
+        """Write pending recency and hit/miss counts now"""
+        if self._used or any(self._lookups.values()):
+            with self._transaction():
+                self._write_lookups()
+
+    def get_many(self, keys: Sequence[bytes]) -> List[Optional[CachedRecord]]:
+        """
+        Cached records for keys, marking hits as recently used
+
+        Reads only; the recency and counts are written later (see flush).
+
+        Args:
+            keys: Cache keys (see cache_key)
+
+        Returns:
+            (body, summary) per key, None where missing
+        """
+        found: Dict[bytes, tuple] = {}
+        unique = list(dict.fromkeys(keys))
+        for start in range(0, len(unique), MAX_SQL_VARIABLES):
+            batch = unique[start:start + MAX_SQL_VARIABLES]
+            for key, body, summary in self._conn.execute(
+                f"SELECT key, body, summary FROM records WHERE key IN ({','.join('?' * len(batch))})",
+                batch
+            ):
+                found[key] = (body, summary)
+
+        hits = sum(1 for key in keys if key in found)
+        now = time.time_ns()
+        self._used.update((key, now) for key in found)
+        self._lookups['hits'] += hits
+        self._lookups['misses'] += len(keys) - hits
+        if sum(self._lookups.values()) >= FLUSH_LOOKUPS:
+            self.flush()
+
+        decoded = {key: (body, json.loads(summary)) for key, (body, summary) in found.items()}
+        return [decoded.get(key) for key in keys]
+
+    def put_many(self, items: Iterable[Tuple[bytes, bytes, Dict]]) -> None:
+        """
+        Store records and pending lookups, then evict least recently used
+        entries if over max_bytes
+
+        Args:
+            items: (key, record body, summary fields)
+        """
+        now = time.time_ns()
+        rows = [
+            (key, body, json.dumps(summary, separators=(',', ':')))
+            for key, body, summary in items
+        ]
+        if not rows:
+            return
+
+        with self._transaction():
+            self._write_lookups()
+            added = added_bytes = 0
+            for key, body, summary in rows:
+                size = len(body) + len(summary)
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO records VALUES (?, ?, ?, ?, ?)",
+                    (key, body, summary, size, now)
+                )
+                if cursor.rowcount:
+                    added += 1
+                    added_bytes += size
+            self._add_stats(entries=added, bytes=added_bytes)
+            self._evict()
+
+    def _evict(self) -> None:
+        """Drop least recently used entries down to EVICT_TO of max_bytes (inside a transaction)"""
+        total = self._stat('bytes')
+        if total <= self.max_bytes:
+            return
+        excess = total - int(self.max_bytes * EVICT_TO)
+        victims = []
+        removed_bytes = 0
+        for key, size in self._conn.execute("SELECT key, size FROM records ORDER BY last_used"):
+            if removed_bytes >= excess:
+                break
+            victims.append((key,))
+            removed_bytes += size
+        self._conn.executemany("DELETE FROM records WHERE key = ?", victims)
+        self._add_stats(entries=-len(victims), bytes=-removed_bytes, evictions=len(victims))
+
+    def stats(self) -> Dict[str, int]:
+        """Entries, stored bytes, cumulative hits/misses/evictions and file size"""
+        stats = dict(self._conn.execute("SELECT name, value FROM stats").fetchall())
+        for name, count in self._lookups.items():
+            stats[name] += count
+        stats['max_bytes'] = self.max_bytes
+        stats['file_bytes'] = sum(
+            os.path.getsize(path) for path in (self.path, f"{self.path}-wal")
+            if os.path.exists(path)
+        )
+        return stats
+
+    def clear(self) -> int:
+        """Delete every entry and reset the counters; returns the number removed"""
+        self._used = {}
+        self._lookups = {'hits': 0, 'misses': 0}
+        with self._transaction():
+            removed = self._stat('entries')
+            self._conn.execute("DELETE FROM records")
+            self._conn.execute("UPDATE stats SET value = 0")
+        self._conn.execute("VACUUM")
+        return removed
+
+    def close(self) -> None:
+        """Write pending lookups and close the database connection"""
+        if self._conn is not None:
+            self.flush()
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Template-Based JSON Serialization for LAI-PrEP Bridge Period Assessments
+
+Produces the same document as BridgePeriodAssessment.to_json, written as
+compact UTF-8 bytes without building the intermediate nested dict. Static
+per-intervention, per-population and per-barrier fragments (names, evidence,
+cost and complexity) are encoded once when the serializer is built; only the
+patient-specific values are formatted per record.
+
+Output is byte-for-byte stable for identical inputs and timestamp. orjson is
+used for the dynamic nested sections when installed; the standard library
+encoder is used otherwise. Both emit compact UTF-8 (no ASCII escaping) and
+parse to identical objects.
+"""
+
+import json
+import math
+from datetime import datetime
+from typing import List, Optional
+
+from lai_prep_decision_tool_v2_1 import (
+    BridgePeriodAssessment,
+    Configuration,
+    PatientProfile
+)
+
+try:
+    import orjson
+except ImportError:  # Optional dependency
+    orjson = None
+
+
+TOOL_VERSION = "2.1.0"
+TARGET_BRIDGE_DAYS = 14
+
+_encode_str = json.encoder.encode_basestring
+
+
+class _StdlibBackend:
+    """Standard library JSON encoding (compact, UTF-8)"""
+    name = "json"
+
+    def __init__(self):
+        self._encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+    def dumps(self, obj) -> bytes:
+        return self._encoder.encode(obj).encode('utf-8')
+
+    def number(self, value) -> bytes:
+        if isinstance(value, float) and math.isfinite(value):
+            return float.__repr__(value).encode('ascii')
+        if isinstance(value, int) and not isinstance(value, bool):
+            return int.__repr__(value).encode('ascii')
+        return self.dumps(value)
+
+
+class _OrjsonBackend:
+    """orjson encoding (compact, UTF-8)"""
+    name = "orjson"
+
+    def __init__(self):
+        self._option = orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(self, obj) -> bytes:
+        return orjson.dumps(obj, option=self._option)
+
+    def number(self, value) -> bytes:
+        return orjson.dumps(value, option=self._option)
+
+
+def available_backends() -> List[str]:
+    """JSON backends usable in this environment"""
+    return ["orjson", "json"] if orjson is not None else ["json"]
+
+
+def _make_backend(backend: str):
+    """Resolve a backend name ('auto', 'orjson' or 'json')"""
+    if backend == "auto":
+        backend = available_backends()[0]
+    if backend == "orjson":
+        if orjson is None:
+            raise ImportError("orjson backend requested but orjson is not installed")
+        return _OrjsonBackend()
+    if backend == "json":
+        return _StdlibBackend()
+    raise ValueError(f"Unknown JSON backend: {backend}")
+
+
+class AssessmentSerializer:
+    """Writes BridgePeriodAssessment JSON records straight into byte buffers"""
+
+    def __init__(
+        self,
+        config: Configuration,
+        tool_version: str = TOOL_VERSION,
+        backend: str = "auto"
+    ):
+        """
+        Precompute static JSON fragments from configuration
+
+        Args:
+            config: Configuration the assessments were produced with
+            tool_version: Version written to the metadata block
+            backend: 'auto' (orjson if installed), 'orjson' or 'json'
+        """
+        self.backend = _make_backend(backend)
+        self.tool_version = tool_version
+
+        self._population_name = {}
+        self._evidence_base = {}
+        for key, pop in config.config['populations'].items():
+            self._population_name[key] = _encode_str(pop['name']).encode('utf-8')
+            self._evidence_base[key] = (
+                b'{"source":' + _encode_str(pop.get('evidence_source', '')).encode('utf-8') +
+                b',"level":' + _encode_str(pop.get('evidence_level', '')).encode('utf-8') + b'}'
+            )
+
+        self._barrier_name = {
+            key: _encode_str(barrier['name']).encode('utf-8')
+            for key, barrier in config.config['barriers'].items()
+        }
+
+        # Keyed on every static field so hand-built recommendations stay correct
+        self._intervention_fragments = {}
+        for key, intervention in config.config['interventions'].items():
+            self._intervention_fragment(
+                key,
+                intervention['name'],
+                intervention['evidence_level'],
+                intervention['cost_level'],
+                intervention['implementation_complexity']
+            )
+
+        self._metadata_prefix = (
+            b'"metadata":{"tool_version":' + _encode_str(tool_version).encode('utf-8') +
+            b',"timestamp":'
+        )
+        self._metadata_suffix = (
+            b',"config_version":' + _encode_str(tool_version).encode('utf-8') + b'}}'
+        )
+
+    def _intervention_fragment(self, key, name, evidence, cost, complexity) -> tuple:
+        """(head, evidence, tail) fragments for one intervention, cached"""
+        cache_key = (key, name, evidence, cost, complexity)
+        fragment = self._intervention_fragments.get(cache_key)
+        if fragment is None:
+            fragment = (
+                b'{"intervention":' + _encode_str(key).encode('utf-8') +
+                b',"intervention_name":' + _encode_str(name).encode('utf-8') +
+                b',"priority":',
+                b',"evidence":' + _encode_str(evidence).encode('utf-8') +
+                b',"mechanisms":',
+                b',"cost_level":' + _encode_str(cost).encode('utf-8') +
+                b',"implementation_complexity":' + _encode_str(complexity).encode('utf-8') +
+                b',"confidence_interval":{"lower":'
+            )
+            self._intervention_fragments[cache_key] = fragment
+        return fragment
+
+    def _str(self, value: str) -> bytes:
+        return _encode_str(value).encode('utf-8')
+
+    def _str_list(self, values: List[str]) -> bytes:
+        return b'[' + b','.join(_encode_str(v).encode('utf-8') for v in values) + b']'
+
+    def write(
+        self,
+        buffer: bytearray,
+        assessment: BridgePeriodAssessment,
+        profile: PatientProfile,
+        timestamp: str
+    ):
+        """
+        Append one assessment record to a byte buffer
+
+        Args:
+            buffer: Destination bytearray
+            assessment: Assessment to serialize
+            profile: PatientProfile the assessment was produced for
+            timestamp: ISO timestamp written to metadata
+        """
+        self.write_body(buffer, assessment, profile)
+        self.write_metadata(buffer, timestamp)
+
+    def write_body(
+        self,
+        buffer: bytearray,
+        assessment: BridgePeriodAssessment,
+        profile: PatientProfile
+    ):
+        """Append a record up to its metadata block (independent of the timestamp)"""
+        num = self.backend.number
+        out = buffer.extend
+
+        # Patient profile
+        out(b'{"patient_profile":{"population":')
+        out(self._str(profile.population))
+        out(b',"population_name":')
+        out(self._population_name.get(profile.population)
+            or self._str(assessment.population_info['name']))
+        out(b',"age":')
+        out(num(profile.age))
+        out(b',"prep_status":')
+        out(self._str(profile.current_prep_status))
+        out(b',"barriers":')
+        out(self._str_list(profile.barriers))
+        out(b',"barrier_names":[')
+        out(b','.join(
+            self._barrier_name.get(barrier) or self._str(detail['name'])
+            for barrier, detail in zip(profile.barriers[:5], assessment.barrier_details)
+        ))
+        out(b'],"healthcare_setting":')
+        out(self._str(profile.healthcare_setting))
+        out(b',"insurance_status":')
+        out(self._str(profile.insurance_status))
+
+        # Risk assessment
+        out(b'},"risk_assessment":{"level":')
+        out(self._str(assessment.attrition_risk))
+        out(b',"baseline_success":')
+        out(num(round(assessment.baseline_success_rate, 4)))
+        out(b',"adjusted_success":')
+        out(num(round(assessment.adjusted_success_rate, 4)))
+        out(b',"attrition_factors":')
+        out(self.backend.dumps(assessment.attrition_factors))
+        out(b',"evidence_base":')
+        evidence_base = self._evidence_base.get(profile.population)
+        if evidence_base is None:
+            evidence_base = self.backend.dumps({
+                "source": assessment.population_info.get('evidence_source', ''),
+                "level": assessment.population_info.get('evidence_level', '')
+            })
+        out(evidence_base)
+
+        # Recommendations
+        out(b'},"recommendations":[')
+        for i, rec in enumerate(assessment.recommended_interventions):
+            head, evidence, tail = self._intervention_fragment(
+                rec.intervention, rec.intervention_name, rec.evidence_level,
+                rec.cost_level, rec.implementation_complexity
+            )
+            if i:
+                out(b',')
+            out(head)
+            out(self._str(rec.priority))
+            out(b',"expected_improvement":')
+            out(num(round(rec.expected_improvement, 4)))
+            out(b',"rationale":')
+            out(self._str(rec.rationale))
+            out(evidence)
+            out(self._str_list(rec.mechanisms))
+            out(tail)
+            out(num(round(rec.confidence_interval[0], 4)))
+            out(b',"upper":')
+            out(num(round(rec.confidence_interval[1], 4)))
+            out(b'}}')
+
+        # Predictions
+        adjusted = assessment.adjusted_success_rate
+        estimated = assessment.estimated_success_with_interventions
+        out(b'],"predictions":{"without_interventions":')
+        out(num(round(adjusted, 4)))
+        out(b',"with_interventions":')
+        out(num(round(estimated, 4)))
+        out(b',"absolute_improvement":')
+        out(num(round(estimated - adjusted, 4)))
+        out(b',"relative_improvement_pct":')
+        out(num(round((estimated / adjusted - 1) * 100, 2) if adjusted > 0 else 0))
+
+        # Bridge period and metadata
+        out(b'},"bridge_period_estimate":{"minimum_days":')
+        out(num(assessment.estimated_bridge_duration_days[0]))
+        out(b',"maximum_days":')
+        out(num(assessment.estimated_bridge_duration_days[1]))
+        out(b',"target_days":')
+        out(num(TARGET_BRIDGE_DAYS))
+        out(b',"delay_factors":')
+        out(self._str_list(assessment.delay_factors))
+        out(b'},')
+
+    def write_metadata(self, buffer: bytearray, timestamp: str):
+        """Append the metadata block that completes a record body"""
+        buffer.extend(self._metadata_prefix)
+        buffer.extend(self._str(timestamp))
+        buffer.extend(self._metadata_suffix)
+
+    def dumps(
+        self,
+        assessment: BridgePeriodAssessment,
+        profile: PatientProfile,
+        timestamp: Optional[str] = None
+    ) -> bytes:
+        """Serialize one assessment (timestamp defaults to now)"""
+        if timestamp is None:
+            timestamp = datetime.now().isoformat()
+        buffer = bytearray()
+        self.write(buffer, assessment, profile, timestamp)
+        return bytes(buffer)
+
+    def dumps_body(self, assessment: BridgePeriodAssessment, profile: PatientProfile) -> bytes:
+        """Record body without metadata, for storing and completing later with finish()"""
+        buffer = bytearray()
+        self.write_body(buffer, assessment, profile)
+        return bytes(buffer)
+
+    def finish(self, body: bytes, timestamp: Optional[str] = None) -> bytes:
+        """Complete a record body (same bytes as dumps with this timestamp)"""
+        if timestamp is None:
+            timestamp = datetime.now().isoformat()
+        buffer = bytearray(body)
+        self.write_metadata(buffer, timestamp)
+        return bytes(buffer)
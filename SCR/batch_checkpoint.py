@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Checkpoint and Resume for LAI-PrEP Batch Runs
+
+A batch run records its progress in <output-dir>/batch_checkpoint.json every
+`checkpoint_rows` patients:
+
+- rows_done: patients whose results are final (the resume offset; for CSV
+  input these are valid rows, rejects are regenerated on resume)
+- summary_bytes: length of batch_summary.csv holding exactly those rows
+- aggregates: running totals for the summary statistics
+- settings: input file identity (with input options such as the as-of
+  date of a FHIR export), configuration digest, method, output format and
+  the metadata timestamp
+
+Results arrive in input order (run_batch), so every row before rows_done has
+its assessment file and summary row written. Checkpoints only ever record
+the state after a whole chunk: an interrupt or I/O error part way through
+record() checkpoints the previous chunk's rows, summary length and totals. A resumed run truncates the
+summary to summary_bytes and continues from rows_done with the recorded
+timestamp, so no summary row is duplicated and rewritten assessment files
+are byte-identical. The checkpoint is written to a temporary file, fsynced
+and renamed: one fsync per checkpoint. The summary file is flushed, not
+fsynced. If an operating system crash leaves it shorter than recorded,
+the resume is refused rather than producing a summary with rows missing.
+"""
+
+import csv
+import json
+import os
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from batch_processing import ChunkResult, SUMMARY_FIELDS
+
+
+CHECKPOINT_VERSION = 1
+CHECKPOINT_NAME = "batch_checkpoint.json"
+SUMMARY_NAME = "batch_summary.csv"
+DEFAULT_CHECKPOINT_ROWS = 50_000
+
+# Settings that must match for a run to be resumed
+RESUME_SETTINGS = ('input', 'input_size', 'input_mtime_ns', 'config_digest', 'method',
+                   'pretty', 'summary', 'shard', 'input_options')
+
+
+def shard_name(name: str, shard: Optional[Tuple[int, int]]) -> str:
+    """Per-shard variant of an output file name (batch_summary.0003-of-0010.csv)"""
+    if shard is None:
+        return name
+    stem, suffix = os.path.splitext(name)
+    index, count = shard
+    return f"{stem}.{index:04d}-of-{count:04d}{suffix}"
+
+
+def input_identity(path: str) -> Dict:
+    """Resolved path, size and modification time of an input file"""
+    stat = os.stat(path)
+    return {
+        'input': str(Path(path).resolve()),
+        'input_size': stat.st_size,
+        'input_mtime_ns': stat.st_mtime_ns,
+    }
+
+
+class BatchAggregates:
+    """Running totals behind the batch summary statistics"""
+
+    def __init__(self, data: Optional[Dict] = None):
+        data = data or {}
+        self.total = data.get('total', 0)
+        self.errors = data.get('errors', 0)
+        self.sums = {key: data.get('sums', {}).get(key, 0.0)
+                     for key in ('baseline_success', 'adjusted_success',
+                                 'estimated_success', 'improvement')}
+        self.risk_counts = Counter(data.get('risk_counts', {}))
+
+    def add(self, row: Dict) -> None:
+        """Count one summary row"""
+        self.total += 1
+        for key in self.sums:
+            self.sums[key] += row[key]
+        self.risk_counts[row['risk_level']] += 1
+
+    def update(self, other: 'BatchAggregates') -> None:
+        """Add the totals of another run (a shard of the same batch)"""
+        self.total += other.total
+        self.errors += other.errors
+        for key in self.sums:
+            self.sums[key] += other.sums[key]
+        self.risk_counts.update(other.risk_counts)
+
+    def mean(self, key: str) -> float:
+        """Average of a summed column"""
+        return self.sums[key] / self.total if self.total else 0.0
+
+    def to_dict(self) -> Dict:
+        return {'total': self.total, 'errors': self.errors, 'sums': self.sums,
+                'risk_counts': dict(self.risk_counts)}
+
+
+class ResumableBatch:
+    """Summary output, aggregates and checkpoints of one batch run"""
+
+    def __init__(
+        self,
+        output_dir: str,
+        settings: Dict,
+        resume: bool = False,
+        checkpoint_rows: int = DEFAULT_CHECKPOINT_ROWS,
+        shard: Optional[Tuple[int, int]] = None
+    ):
+        """
+        Start a run, or continue the one checkpointed in output_dir
+
+        Args:
+            output_dir: Batch output directory
+            settings: RESUME_SETTINGS values plus 'timestamp' (None to take the
+                checkpointed timestamp when resuming)
+            resume: Continue from the checkpoint instead of starting over
+            checkpoint_rows: Patients between checkpoints
+            shard: (index, count) of a sharded run; its summary and checkpoint
+                get per-shard names (see shard_name)
+
+        Raises:
+            ValueError: If resume is requested but there is no usable
+                checkpoint, or it belongs to a different run
+        """
+        self.output_path = Path(output_dir)
+        self.checkpoint_path = self.output_path / shard_name(CHECKPOINT_NAME, shard)
+        self.summary_path = self.output_path / shard_name(SUMMARY_NAME, shard)
+        self.checkpoint_rows = checkpoint_rows
+        self.settings = dict(settings)
+        self.rows_done = 0
+        self.aggregates = BatchAggregates()
+        summary_bytes = 0
+
+        if resume:
+            state = self._load()
+            recorded = state['settings']
+            changed = [key for key in RESUME_SETTINGS if recorded.get(key) != settings.get(key)]
+            if settings.get('timestamp') not in (None, recorded['timestamp']):
+                changed.append('timestamp')
+            if changed:
+                raise ValueError(
+                    f"Checkpoint in {output_dir} belongs to a different run "
+                    f"(changed: {', '.join(changed)}); start over without --resume"
+                )
+            self.settings = recorded
+            self.rows_done = state['rows_done']
+            self.aggregates = BatchAggregates(state['aggregates'])
+            summary_bytes = state['summary_bytes']
+        elif self.checkpoint_path.exists():
+            # A stale checkpoint must not describe this run's new summary file
+            self.checkpoint_path.unlink()
+
+        self._summary_file = None
+        self._summary_writer = None
+        if self.settings['summary']:
+            self._open_summary(summary_bytes)
+        self._commit()
+        self._last_checkpoint = self.rows_done
+
+    def _load(self) -> Dict:
+        """Checkpoint state, validated"""
+        try:
+            with open(self.checkpoint_path, 'r') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            raise ValueError(f"No checkpoint to resume in {self.output_path}")
+        except ValueError:
+            raise ValueError(f"Unreadable checkpoint {self.checkpoint_path}")
+        if state.get('checkpoint_version') != CHECKPOINT_VERSION:
+            raise ValueError(f"Checkpoint {self.checkpoint_path} has another format version")
+        return state
+
+    def _open_summary(self, summary_bytes: int) -> None:
+        """Open batch_summary.csv for appending after its checkpointed length"""
+        if summary_bytes:
+            if not self.summary_path.exists() or \
+                    self.summary_path.stat().st_size < summary_bytes:
+                raise ValueError(
+                    f"{self.summary_path} is shorter than checkpointed; start over without --resume"
+                )
+            self._summary_file = open(self.summary_path, 'r+', newline='')
+            self._summary_file.truncate(summary_bytes)
+            self._summary_file.seek(summary_bytes)
+            self._summary_writer = csv.DictWriter(self._summary_file, fieldnames=SUMMARY_FIELDS)
+        elif self.summary_path.exists():
+            self.summary_path.unlink()
+
+    def record(self, results: ChunkResult) -> None:
+        """Account for one chunk of results (in input order); checkpoint when due"""
+        for _, row, error in results:
+            if error is not None:
+                self.aggregates.errors += 1
+                continue
+            self.aggregates.add(row)
+            if self.settings['summary']:
+                if self._summary_writer is None:
+                    # Header with the first row, as when the summary was written at the end
+                    self._summary_file = open(self.summary_path, 'w', newline='')
+                    self._summary_writer = csv.DictWriter(self._summary_file,
+                                                          fieldnames=SUMMARY_FIELDS)
+                    self._summary_writer.writeheader()
+                self._summary_writer.writerow(row)
+        self.rows_done += len(results)
+        self._commit()
+        if self.rows_done - self._last_checkpoint >= self.checkpoint_rows:
+            self.checkpoint()
+
+    def _commit(self) -> None:
+        """Remember rows, summary length and totals after a whole chunk"""
+        summary_bytes = 0
+        if self._summary_file is not None:
+            self._summary_file.flush()
+            summary_bytes = self._summary_file.tell()
+        aggregates = self.aggregates.to_dict()
+        self._committed = {
+            'rows_done': self.rows_done,
+            'summary_bytes': summary_bytes,
+            'aggregates': dict(aggregates, sums=dict(aggregates['sums'])),
+        }
+
+    def checkpoint(self) -> None:
+        """Write the last whole-chunk state atomically (one fsync)"""
+        state = {
+            'checkpoint_version': CHECKPOINT_VERSION,
+            'settings': self.settings,
+            **self._committed,
+        }
+        tmp_path = self.checkpoint_path.with_name(f"{self.checkpoint_path.name}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
+        self._last_checkpoint = self._committed['rows_done']
+
+    def close(self) -> None:
+        """Close the summary file, keeping the checkpoint"""
+        if self._summary_file is not None:
+            self._summary_file.close()
+            self._summary_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        """On failure or interrupt, checkpoint the last whole chunk recorded"""
+        if exc_type is not None:
+            try:
+                self.checkpoint()
+            finally:
+                self.close()
+
+    def finish(self) -> None:
+        """Close the summary file and remove the checkpoint (completed run)"""
+        self.close()
+        if self.checkpoint_path.exists():
+            self.checkpoint_path.unlink()
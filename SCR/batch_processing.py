@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Batch Assessment Workers for LAI-PrEP Bridge Decision Support Tool
+
+Assesses batch patients chunk by chunk and writes one JSON file per patient.
+Each chunk goes through CohortScorer.assess_profiles (same results as
+assess_patient); a chunk containing an invalid patient is re-run patient by
+patient so only that patient is reported as an error.
+
+With more than one worker, the configuration and its compiled tables are
+published once to shared memory (shared_config.py). Worker processes attach
+at startup instead of re-reading the configuration file and check the block
+before every chunk, so a changed configuration stops the run instead of
+mixing results.
+
+With an assessment cache (assessment_cache.py), patients assessed by an
+earlier run under the same configuration are written from their stored
+record instead of being scored and serialized again.
+"""
+
+import itertools
+import json
+import multiprocessing
+from multiprocessing.util import Finalize
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from assessment_cache import DEFAULT_MAX_BYTES, AssessmentCache, cache_key, cache_namespace
+from assessment_serializer import AssessmentSerializer
+from cohort_file import default_patient_id
+from cohort_scoring import CohortScorer
+from lai_prep_decision_tool_v2_1 import (
+    BridgePeriodAssessment,
+    LAIPrEPDecisionTool,
+    PatientProfile
+)
+from shared_config import AttachedConfig, SharedConfig
+
+
+DEFAULT_BATCH_CHUNK_SIZE = 256
+
+# Columns of batch_summary.csv (_patient_columns then assessment_summary)
+SUMMARY_FIELDS = (
+    'patient_id', 'population', 'age', 'prep_status', 'barrier_count',
+    'risk_level', 'baseline_success', 'adjusted_success', 'estimated_success',
+    'improvement', 'top_intervention',
+)
+
+# (index, summary row or None, error message or None) per patient
+ChunkResult = List[Tuple[int, Optional[Dict], Optional[str]]]
+
+
+def assessment_summary(assessment: BridgePeriodAssessment) -> Dict:
+    """Assessment columns of batch_summary.csv"""
+    return {
+        'risk_level': assessment.attrition_risk,
+        'baseline_success': assessment.baseline_success_rate,
+        'adjusted_success': assessment.adjusted_success_rate,
+        'estimated_success': assessment.estimated_success_with_interventions,
+        'improvement': assessment.estimated_success_with_interventions -
+                       assessment.adjusted_success_rate,
+        'top_intervention': assessment.recommended_interventions[0].intervention_name
+                            if assessment.recommended_interventions else 'None'
+    }
+
+
+def _patient_columns(patient_id: str, patient_data: Dict) -> Dict:
+    """Patient columns of batch_summary.csv"""
+    return {
+        'patient_id': patient_id,
+        'population': patient_data['population'],
+        'age': patient_data['age'],
+        'prep_status': patient_data['current_prep_status'],
+        'barrier_count': len(patient_data['barriers']),
+    }
+
+
+def summary_row(patient_id: str, patient_data: Dict, assessment: BridgePeriodAssessment) -> Dict:
+    """Row of batch_summary.csv for one assessed patient"""
+    return {**_patient_columns(patient_id, patient_data), **assessment_summary(assessment)}
+
+
+def iter_batch_chunks(
+    patients: Iterable[Dict],
+    chunk_size: int = DEFAULT_BATCH_CHUNK_SIZE,
+    start: int = 0
+) -> Iterator[List[Tuple[int, Dict]]]:
+    """Group patient dictionaries into chunks of (index, data), numbering from start"""
+    numbered = enumerate(patients, start)
+    while True:
+        chunk = list(itertools.islice(numbered, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class BatchAssessor:
+    """Assesses chunks of batch patients and writes their JSON files"""
+
+    def __init__(
+        self,
+        tool: LAIPrEPDecisionTool,
+        output_dir: str,
+        pretty: bool = False,
+        timestamp: Optional[str] = None,
+        scorer: Optional[CohortScorer] = None,
+        cache: Optional[AssessmentCache] = None
+    ):
+        """
+        Args:
+            tool: Decision tool
+            output_dir: Directory for <patient_id>_assessment.json files
+            pretty: Indented JSON via to_json (default: compact serializer)
+            timestamp: Metadata timestamp written to every file
+            scorer: CohortScorer for the tool (built if None)
+            cache: Assessment cache to reuse and store records in (compact output only)
+        """
+        if cache is not None and pretty:
+            raise ValueError("The assessment cache stores compact records; use it without pretty")
+        self.tool = tool
+        self.output_path = Path(output_dir)
+        self.pretty = pretty
+        self.timestamp = timestamp
+        self.scorer = scorer if scorer is not None else CohortScorer(tool)
+        self.serializer = AssessmentSerializer(tool.config)
+        self.cache = cache
+        self._namespace = cache_namespace(tool, self.serializer) if cache is not None else None
+
+    def _profile(self, patient_data: Dict) -> PatientProfile:
+        """Profile from a patient dictionary (patient_id is not a profile field)"""
+        return PatientProfile.from_dict({
+            k: v for k, v in patient_data.items() if k != 'patient_id'
+        })
+
+    def _write(self, patient_id: str, profile: PatientProfile,
+               assessment: BridgePeriodAssessment) -> None:
+        """Write one patient's assessment JSON"""
+        output_file = self.output_path / f"{patient_id}_assessment.json"
+        if self.pretty:
+            json_output = assessment.to_json(profile, timestamp=self.timestamp)
+            with open(output_file, 'w') as f:
+                json.dump(json_output, f, indent=2)
+        else:
+            with open(output_file, 'wb') as f:
+                f.write(self.serializer.dumps(assessment, profile, self.timestamp))
+
+    def _finish(self, index: int, patient_data: Dict, profile: PatientProfile,
+                assessment: BridgePeriodAssessment) -> Dict:
+        """Write a patient's file and return its summary row"""
+        patient_id = patient_data.get('patient_id', default_patient_id(index))
+        self._write(patient_id, profile, assessment)
+        return summary_row(patient_id, patient_data, assessment)
+
+    def assess_chunk(self, chunk: List[Tuple[int, Dict]]) -> ChunkResult:
+        """Assess and write a chunk of (index, patient data)"""
+        if self.cache is not None:
+            return self._assess_chunk_cached(chunk)
+        try:
+            profiles = [self._profile(data) for _, data in chunk]
+            assessments = self.scorer.assess_profiles(profiles)
+        except Exception:
+            return [self._assess_one(index, data) for index, data in chunk]
+
+        results = []
+        for (index, data), profile, assessment in zip(chunk, profiles, assessments):
+            try:
+                results.append((index, self._finish(index, data, profile, assessment), None))
+            except Exception as e:
+                results.append((index, None, str(e)))
+        return results
+
+    def _assess_chunk_cached(self, chunk: List[Tuple[int, Dict]]) -> ChunkResult:
+        """assess_chunk scoring and serializing only patients missing from the cache"""
+        try:
+            profiles = [self._profile(data) for _, data in chunk]
+        except Exception:
+            return [self._assess_one(index, data) for index, data in chunk]
+
+        keys = [cache_key(self._namespace, profile) for profile in profiles]
+        records = self.cache.get_many(keys)
+        missing = [i for i, record in enumerate(records) if record is None]
+        results: List = [None] * len(chunk)
+        stored = []
+        if missing:
+            try:
+                assessments = self.scorer.assess_profiles([profiles[i] for i in missing])
+            except Exception:
+                for i in missing:
+                    results[i] = self._assess_one(*chunk[i])
+            else:
+                for i, assessment in zip(missing, assessments):
+                    records[i] = (
+                        self.serializer.dumps_body(assessment, profiles[i]),
+                        assessment_summary(assessment)
+                    )
+                    stored.append((keys[i], *records[i]))
+
+        for i, (index, data) in enumerate(chunk):
+            if results[i] is not None:
+                continue
+            body, summary = records[i]
+            try:
+                patient_id = data.get('patient_id', default_patient_id(index))
+                with open(self.output_path / f"{patient_id}_assessment.json", 'wb') as f:
+                    f.write(self.serializer.finish(body, self.timestamp))
+                results[i] = (index, {**_patient_columns(patient_id, data), **summary}, None)
+            except Exception as e:
+                results[i] = (index, None, str(e))
+
+        self.cache.put_many(stored)
+        return results
+
+    def _assess_one(self, index: int, patient_data: Dict) -> Tuple[int, Optional[Dict], Optional[str]]:
+        """Assess a single patient, capturing its error"""
+        try:
+            profile = self._profile(patient_data)
+            assessment = self.tool.assess_patient(profile)
+            return index, self._finish(index, patient_data, profile, assessment), None
+        except Exception as e:
+            return index, None, str(e)
+
+
+# Per-process worker state, set by _init_worker
+_worker: Optional[Tuple[AttachedConfig, BatchAssessor]] = None
+
+
+def _open_cache(cache_path: Optional[str], cache_max_bytes: int) -> Optional[AssessmentCache]:
+    """This process's connection to the assessment cache, if one is configured"""
+    return AssessmentCache(cache_path, cache_max_bytes) if cache_path else None
+
+
+def _init_worker(name: str, digest: str, use_logit: bool, output_dir: str,
+                 pretty: bool, timestamp: Optional[str], cache_path: Optional[str],
+                 cache_max_bytes: int) -> None:
+    """Attach to the shared configuration and build this worker's assessor"""
+    global _worker
+    attached = AttachedConfig(name, expected_digest=digest)
+    tool = LAIPrEPDecisionTool(config=attached.config, use_logit=use_logit)
+    scorer = CohortScorer(tool, tables=attached.tables)
+    cache = _open_cache(cache_path, cache_max_bytes)
+    if cache is not None:
+        # Written when the worker exits after pool.close()
+        Finalize(cache, cache.close, exitpriority=10)
+    _worker = (attached, BatchAssessor(tool, output_dir, pretty, timestamp, scorer, cache))
+
+
+def _run_chunk(chunk: List[Tuple[int, Dict]]) -> ChunkResult:
+    """Worker entry point: verify the configuration, then assess the chunk"""
+    attached, assessor = _worker
+    attached.check()
+    return assessor.assess_chunk(chunk)
+
+
+def run_batch(
+    tool: LAIPrEPDecisionTool,
+    patients: Iterable[Dict],
+    output_dir: str,
+    workers: int = 1,
+    pretty: bool = False,
+    timestamp: Optional[str] = None,
+    chunk_size: int = DEFAULT_BATCH_CHUNK_SIZE,
+    cache_path: Optional[str] = None,
+    cache_max_bytes: int = DEFAULT_MAX_BYTES,
+    start: int = 0
+) -> Iterator[ChunkResult]:
+    """
+    Assess batch patients, yielding per-chunk results in input order
+
+    Args:
+        tool: Decision tool (its configuration is what workers attach to)
+        patients: Patient dictionaries (typed, as from parse_csv_row)
+        output_dir: Existing directory for assessment files
+        workers: Worker processes (1 assesses in this process)
+        pretty: Indented JSON output
+        timestamp: Metadata timestamp for every file
+        chunk_size: Patients per unit of work
+        cache_path: Assessment cache database shared by all workers (none if None)
+        cache_max_bytes: Size bound for the assessment cache
+        start: Input index of the first patient (when resuming a run)
+
+    Yields:
+        Lists of (index, summary row or None, error or None)
+    """
+    chunks = iter_batch_chunks(patients, chunk_size, start)
+    if workers <= 1:
+        cache = _open_cache(cache_path, cache_max_bytes)
+        try:
+            assessor = BatchAssessor(tool, output_dir, pretty, timestamp,
+                                     tool._cohort_scorer(), cache)
+            for chunk in chunks:
+                yield assessor.assess_chunk(chunk)
+        finally:
+            if cache is not None:
+                cache.close()
+        return
+
+    with SharedConfig(tool.config, tool._cohort_scorer().tables) as shared:
+        with multiprocessing.Pool(
+            processes=workers,
+            initializer=_init_worker,
+            initargs=(shared.name, shared.digest, tool.use_logit, str(output_dir),
+                      pretty, timestamp, cache_path, cache_max_bytes)
+        ) as pool:
+            yield from pool.imap(_run_chunk, chunks)
+            # Let workers exit normally so they write their pending cache lookups
+            pool.close()
+            pool.join()
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Sharded Batch Runs for LAI-PrEP Bridge Decision Support Tool
+
+`batch --shard i/n` assesses only shard i (0-based) of n of the input, so a
+plain job array can spread one batch over many machines with no coordinator:
+
+- CSV input is cut into n byte ranges on safe line boundaries (newlines
+  outside quotes, see csv_reader.shard_range). Every shard computes the same
+  boundaries independently and counts the rows before its range, so default
+  patient ids and reject row numbers are those of a single-node run.
+- Encoded cohorts (.lpc/.npy) are cut into n record ranges.
+
+Every shard computes all n + 1 boundaries with the same rule and takes its
+own pair (shard_span), so the ranges tile the input.
+
+Shards may write to one shared output directory: assessment files are
+named by patient id, and the per-run files get per-shard names
+(batch_summary.0003-of-0010.csv, batch_checkpoint..., batch_rejects...).
+A finished shard writes batch_shard.0003-of-0010.json with its input span
+(range, first row and row count), settings, summary totals and reject
+counts.
+
+merge_shards checks that all n shards finished with the same settings and
+that their ranges tile the input with no gap or overlap, then concatenates the shard summaries and rejects in shard order into
+batch_summary.csv and batch_rejects.csv and adds up the totals. The result
+has the layout of a single-node run, and with a fixed --timestamp the same
+bytes.
+"""
+
+import json
+import os
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from batch_checkpoint import (
+    CHECKPOINT_NAME,
+    RESUME_SETTINGS,
+    SUMMARY_NAME,
+    BatchAggregates,
+    shard_name
+)
+from csv_reader import count_records, read_header, shard_range
+from input_validation import REJECTS_NAME
+
+
+MANIFEST_NAME = "batch_shard.json"
+
+# Settings every shard of one batch must share (the input file is compared
+# by size only: shards may see it under different paths or mtimes)
+SHARED_SETTINGS = tuple(
+    key for key in RESUME_SETTINGS if key not in ('input', 'input_mtime_ns', 'shard')
+)
+
+_SHARD_SUFFIX = re.compile(r'\.(\d+)-of-(\d+)$')
+
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """
+    Parse an 'i/n' shard spec
+
+    Raises:
+        ValueError: If the spec is malformed or i is not in 0..n-1
+    """
+    match = re.fullmatch(r'\s*(\d+)\s*/\s*(\d+)\s*', spec)
+    if not match:
+        raise ValueError(f"Shard must be given as i/n (e.g. 0/8), not {spec!r}")
+    index, count = int(match.group(1)), int(match.group(2))
+    if count < 1 or index >= count:
+        raise ValueError(f"Shard index must be 0 to n-1 (got {index}/{count})")
+    return index, count
+
+
+def record_range(n_records: int, shard: Tuple[int, int]) -> Tuple[int, int]:
+    """Row range [start, stop) of a shard of an encoded cohort"""
+    index, count = shard
+    return n_records * index // count, n_records * (index + 1) // count
+
+
+def shard_span(path: str, shard: Tuple[int, int], n_records: Optional[int] = None) -> Dict:
+    """
+    Input span of a shard
+
+    Args:
+        path: Batch input (CSV, or an encoded cohort when n_records is given)
+        shard: (index, count)
+        n_records: Records of an encoded cohort (None for CSV input)
+
+    Returns:
+        unit ('bytes' or 'records'), extent [start, stop] of the whole data
+        section, range [begin, end] of this shard, first_row (rows before
+        the range) and rows (rows in the range)
+    """
+    if n_records is not None:
+        begin, end = record_range(n_records, shard)
+        return {'unit': 'records', 'extent': [0, n_records], 'range': [begin, end],
+                'first_row': begin, 'rows': end - begin}
+    data_start = read_header(path)[1]
+    begin, end = shard_range(path, *shard, data_start)
+    return {
+        'unit': 'bytes',
+        'extent': [data_start, os.path.getsize(path)],
+        'range': [begin, end],
+        'first_row': count_records(path, data_start, begin),
+        'rows': count_records(path, begin, end),
+    }
+
+
+def write_manifest(
+    output_dir: str,
+    shard: Tuple[int, int],
+    span: Dict,
+    settings: Dict,
+    aggregates: BatchAggregates,
+    rejects: Optional[Dict] = None,
+    rejects_file: Optional[str] = None
+) -> Path:
+    """
+    Record a finished shard
+
+    Args:
+        output_dir: Batch output directory
+        shard: (index, count)
+        span: Input span of the shard (as from shard_span)
+        settings: Run settings (as checkpointed)
+        aggregates: Summary totals of the shard
+        rejects: Input validation report of the shard (CSV input)
+        rejects_file: The shard's rejects CSV, if one was written
+    """
+    output_path = Path(output_dir)
+    if rejects_file is not None:
+        rejects_path = Path(rejects_file).resolve()
+        # Relative when inside the output directory, so the directory can move
+        if rejects_path.parent == output_path.resolve():
+            rejects_file = rejects_path.name
+    manifest = {
+        'shard': list(shard),
+        'span': span,
+        'settings': settings,
+        'aggregates': aggregates.to_dict(),
+        'rows': rejects['rows'] if rejects else aggregates.total + aggregates.errors,
+        'rejected': rejects['rejected'] if rejects else 0,
+        'reasons': rejects['reasons'] if rejects else {},
+        'rejects_file': rejects_file,
+    }
+    path = output_path / shard_name(MANIFEST_NAME, shard)
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _shard_files(directory: Path, name: str) -> Dict[Tuple[int, int], Path]:
+    """Per-shard variants of an output file name present in directory"""
+    stem, suffix = os.path.splitext(name)
+    found = {}
+    for path in directory.glob(f"{stem}.*-of-*{suffix}"):
+        match = _SHARD_SUFFIX.search(path.name[:len(path.name) - len(suffix)])
+        if match:
+            found[int(match.group(1)), int(match.group(2))] = path
+    return found
+
+
+def _move_into(source: Path, destination: Path) -> int:
+    """Move the files of a shard's own output directory into the merged one"""
+    moved = 0
+    for path in source.iterdir():
+        if path.is_file():
+            os.replace(path, destination / path.name)
+            moved += 1
+    return moved
+
+
+def _concatenate(parts: List[Path], destination: Path) -> int:
+    """Write CSV parts as one file with the first part's header; returns data rows"""
+    rows = 0
+    tmp_path = destination.with_name(f"{destination.name}.tmp")
+    with open(tmp_path, 'wb') as out:
+        header_written = False
+        for part in parts:
+            with open(part, 'rb') as f:
+                header = f.readline()
+                if not header_written:
+                    out.write(header)
+                    header_written = True
+                for line in f:
+                    out.write(line)
+                    rows += 1
+    os.replace(tmp_path, destination)
+    return rows
+
+
+def _check_spans(states: List[Dict]) -> None:
+    """Raise ValueError unless the shard ranges tile the input in shard order"""
+    spans = [state.get('span') for state in states]
+    if any(span is None for span in spans):
+        raise ValueError("Shard manifests without an input span; rerun those shards")
+    first = spans[0]
+    position, row = first['extent'][0], 0
+    for index, span in enumerate(spans):
+        if (span['unit'], span['extent']) != (first['unit'], first['extent']):
+            raise ValueError(f"Shard {index} was cut from a different input extent")
+        begin, end = span['range']
+        if begin != position or end < begin:
+            raise ValueError(
+                f"Shard ranges do not tile the input: shard {index} covers {span['unit']} "
+                f"{begin}-{end}, expected to start at {position}"
+            )
+        if span['first_row'] != row:
+            raise ValueError(f"Shard {index} starts at row {span['first_row'] + 1}, "
+                             f"expected row {row + 1}")
+        position, row = end, row + span['rows']
+    if position != first['extent'][1]:
+        raise ValueError(f"Shard ranges end at {position}, before the end of the input "
+                         f"({first['extent'][1]})")
+
+
+def merge_shards(
+    output_dir: str,
+    shard_dirs: Iterable[str] = (),
+    rejects_path: Optional[str] = None,
+    keep_shard_files: bool = False
+) -> Dict:
+    """
+    Combine the shards of one batch into a single-node layout
+
+    Args:
+        output_dir: Output directory the shards wrote to (or to merge into)
+        shard_dirs: Per-shard output directories whose files are moved into
+            output_dir first (for shards that did not share a directory)
+        rejects_path: Merged rejects CSV (default: <output_dir>/batch_rejects.csv)
+        keep_shard_files: Leave the per-shard summaries, rejects and manifests
+
+    Returns:
+        shards, aggregates (BatchAggregates), rows, rejected, reasons,
+        summary_path and rejects_path (None where nothing was written)
+
+    Raises:
+        ValueError: If a shard is missing or unfinished, the shards belong
+            to different runs, or their ranges do not tile the input
+    """
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    for directory in shard_dirs:
+        if Path(directory).resolve() != output_path.resolve():
+            _move_into(Path(directory), output_path)
+
+    manifests = _shard_files(output_path, MANIFEST_NAME)
+    if not manifests:
+        raise ValueError(f"No shard manifests ({MANIFEST_NAME} variants) in {output_dir}")
+    counts = {count for _, count in manifests}
+    if len(counts) != 1:
+        raise ValueError(f"Shards of different splits in {output_dir}: n = {sorted(counts)}")
+    count = counts.pop()
+    shards = [(index, count) for index in range(count)]
+    unfinished = sorted(i for i, n in _shard_files(output_path, CHECKPOINT_NAME) if n == count)
+    if unfinished:
+        raise ValueError(f"Shards {unfinished} of {count} did not finish (checkpoint left)")
+    missing = [index for index, _ in shards if (index, count) not in manifests]
+    if missing:
+        raise ValueError(f"Missing shards {missing} of {count} in {output_dir}")
+
+    states = []
+    for shard in shards:
+        with open(manifests[shard], 'r') as f:
+            states.append(json.load(f))
+    reference = states[0]['settings']
+    for shard, state in zip(shards, states):
+        changed = [key for key in SHARED_SETTINGS
+                   if state['settings'].get(key) != reference.get(key)]
+        if changed:
+            raise ValueError(
+                f"Shard {shard[0]} belongs to a different run (changed: {', '.join(changed)})"
+            )
+
+    _check_spans(states)
+
+    aggregates = BatchAggregates()
+    reasons: Counter = Counter()
+    for state in states:
+        aggregates.update(BatchAggregates(state['aggregates']))
+        reasons.update(state['reasons'])
+
+    summary_parts = _shard_files(output_path, SUMMARY_NAME)
+    summary_path = None
+    if reference['summary'] and any(shard in summary_parts for shard in shards):
+        summary_path = output_path / SUMMARY_NAME
+        _concatenate([summary_parts[s] for s in shards if s in summary_parts], summary_path)
+
+    reject_parts = [
+        output_path / state['rejects_file'] for state in states if state['rejects_file']
+    ]
+    merged_rejects = None
+    if reject_parts:
+        merged_rejects = Path(rejects_path) if rejects_path else output_path / REJECTS_NAME
+        _concatenate(reject_parts, merged_rejects)
+
+    if not keep_shard_files:
+        for shard in shards:
+            for path in (summary_parts.get(shard), manifests[shard]):
+                if path is not None:
+                    path.unlink()
+        for part in reject_parts:
+            if part.resolve() != (merged_rejects.resolve() if merged_rejects else None):
+                part.unlink()
+
+    return {
+        'shards': count,
+        'aggregates': aggregates,
+        'rows': sum(state['rows'] for state in states),
+        'rejected': sum(state['rejected'] for state in states),
+        'reasons': dict(reasons.most_common()),
+        'summary_path': str(summary_path) if summary_path else None,
+        'rejects_path': str(merged_rejects) if merged_rejects else None,
+    }
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Longitudinal Bridge Cohort Projection for LAI-PrEP Bridge Decision Support Tool
+
+Projects day-by-day cohort curves through the bridge period (day 0 to
+maximum_bridge_duration_days), with and without the recommended
+interventions, as one array computation over patients x days per chunk.
+
+Each patient's attrition a (1 - adjusted success, or 1 - estimated success
+with interventions) becomes a constant daily hazard
+
+    h = 1 - (1 - a) ** (1 / D)
+
+where D is the midpoint of the patient's bridge-duration range. The bridge
+ends on a day T drawn uniformly from that range; the hazard applies until T.
+For each day t the engine reports the expected fraction of patients
+
+    retained(t)  = not lost to attrition by day t (in bridge or injected)
+    completed(t) = reached their injection by day t
+
+Curves are stratified the same way as the validation results JSON
+(population, PrEP status, risk level, barrier count, setting).
+"""
+
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from cohort_scoring import CohortScorer
+
+
+# Curve families accumulated per stratum
+CURVES = ('retained_without', 'retained_with', 'completed_without', 'completed_with')
+
+
+def daily_hazard(attrition: np.ndarray, min_days: np.ndarray, max_days: np.ndarray) -> np.ndarray:
+    """Constant daily hazard giving `attrition` over the bridge-duration midpoint"""
+    attrition = np.clip(attrition, 0.0, 1.0 - 1e-12)
+    midpoint = np.maximum((min_days.astype(float) + max_days) / 2, 1.0)
+    return -np.expm1(np.log1p(-attrition) / midpoint)
+
+
+def bridge_curves(
+    hazard: np.ndarray,
+    min_days: np.ndarray,
+    max_days: np.ndarray,
+    horizon: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Per-patient retained and completed curves
+
+    Args:
+        hazard: Daily hazard per patient
+        min_days, max_days: Bridge-duration range per patient (end day uniform on it)
+        horizon: Last projected day
+
+    Returns:
+        (retained, completed), each float64 (patients x horizon + 1)
+    """
+    days = np.arange(horizon + 1)
+    lo = min_days.astype(np.int64)[:, None]
+    hi = max_days.astype(np.int64)[:, None]
+    width = (hi - lo + 1).astype(float)
+
+    # q ** t, the probability of surviving the hazard for t days
+    survive = np.exp(days[None, :] * np.log1p(-hazard)[:, None])
+
+    # Sum of q ** T over bridge end days T <= t, and the count of end days still ahead
+    ends = (days[None, :] >= lo) & (days[None, :] <= hi)
+    completed_mass = np.cumsum(np.where(ends, survive, 0.0), axis=1)
+    ahead = np.clip(hi - np.maximum(days[None, :], lo - 1), 0, None)
+
+    completed = completed_mass / width
+    retained = (completed_mass + ahead * survive) / width
+    return retained, completed
+
+
+class BridgeProjection:
+    """Accumulates stratified bridge curves over a chunked cohort"""
+
+    def __init__(self, scorer: CohortScorer):
+        """
+        Args:
+            scorer: CohortScorer for the active configuration and method
+        """
+        self.scorer = scorer
+        self.codec = scorer.codec
+        tables = scorer.tables
+        config = tables.config.config
+        self.horizon = int(tables.maximum_bridge_duration)
+
+        # Strata: (family, labels); codes per patient come from _stratum_codes
+        self.strata: List[Tuple[str, List[str]]] = [
+            ('by_population', [config['populations'][p]['name'] for p in self.codec.populations]),
+            ('by_prep_status', list(self.codec.prep_statuses)),
+            ('by_risk_level', list(tables.risk_labels)),
+            ('by_barrier_count', [str(k) for k in range(tables.n_barriers + 1)]),
+            ('by_setting', [config['healthcare_settings'][s]['name'] for s in self.codec.settings]),
+        ]
+        self._offsets = np.cumsum([0] + [len(labels) for _, labels in self.strata])
+        n_rows = 1 + int(self._offsets[-1])  # Row 0 is the whole cohort
+
+        self.counts = np.zeros(n_rows, dtype=np.int64)
+        self.sums = {name: np.zeros((n_rows, self.horizon + 1)) for name in CURVES}
+
+    def _stratum_codes(self, records: np.ndarray, adjusted: np.ndarray) -> List[np.ndarray]:
+        """Stratum index per patient for each family"""
+        return [
+            records['population'].astype(np.int64),
+            records['prep_status'].astype(np.int64),
+            self.scorer.risk_index(adjusted).astype(np.int64),
+            self.scorer.barrier_count(records).astype(np.int64),
+            records['healthcare_setting'].astype(np.int64),
+        ]
+
+    def add(self, records: np.ndarray) -> None:
+        """Project and accumulate a chunk of encoded patients"""
+        n = len(records)
+        if n == 0:
+            return
+
+        scorer = self.scorer
+        adjusted = scorer.adjusted_success(records)
+        estimated = scorer.estimated_success(adjusted, scorer.intervention_gain(records))
+        min_days, max_days = scorer.bridge_duration(records)
+
+        # Curves depend only on (success without, success with, min, max):
+        # project each distinct profile once
+        profiles = np.stack([adjusted, estimated, min_days, max_days], axis=1)
+        unique, inverse = np.unique(profiles, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        u_min, u_max = unique[:, 2], unique[:, 3]
+
+        curves = {}
+        for suffix, column in (('without', 0), ('with', 1)):
+            hazard = daily_hazard(1 - unique[:, column], u_min, u_max)
+            retained, completed = bridge_curves(hazard, u_min, u_max, self.horizon)
+            curves[f'retained_{suffix}'] = retained
+            curves[f'completed_{suffix}'] = completed
+
+        # Patient counts per (stratum, profile) turn accumulation into one matmul per curve
+        n_rows = len(self.counts)
+        n_unique = len(unique)
+        cells = [inverse]  # Row 0, the whole cohort
+        for offset, codes in zip(self._offsets[:-1], self._stratum_codes(records, adjusted)):
+            cells.append((1 + offset + codes) * n_unique + inverse)
+        weights = np.bincount(
+            np.concatenate(cells), minlength=n_rows * n_unique
+        ).reshape(n_rows, n_unique).astype(float)
+
+        self.counts += weights.sum(axis=1).astype(np.int64)
+        for name in CURVES:
+            self.sums[name] += weights @ curves[name]
+
+    def _row(self, index: int) -> Dict:
+        """Mean curves for one stratum row"""
+        count = int(self.counts[index])
+        row = {"count": count}
+        for name in CURVES:
+            mean = self.sums[name][index] / count
+            row[name] = [round(float(v), 6) for v in mean]
+        row["projected_attrition_without"] = round(1 - row["retained_without"][-1], 6)
+        row["projected_attrition_with"] = round(1 - row["retained_with"][-1], 6)
+        return row
+
+    def to_dict(self) -> Dict:
+        """Projection report with overall and stratified curves"""
+        report = {
+            "method": "logit" if self.scorer.use_logit else "linear",
+            "days": list(range(self.horizon + 1)),
+            "total": int(self.counts[0]),
+            "overall": self._row(0) if self.counts[0] else None,
+        }
+        for (family, labels), offset in zip(self.strata, self._offsets[:-1]):
+            report[family] = {
+                label: self._row(1 + offset + k)
+                for k, label in enumerate(labels) if self.counts[1 + offset + k]
+            }
+        return report
+
+
+def project_cohort(scorer: CohortScorer, chunks: Iterable[tuple]) -> Dict:
+    """
+    Project bridge curves for a chunked cohort
+
+    Args:
+        scorer: CohortScorer for the active configuration and method
+        chunks: Iterable of (offset, records, patient_ids) chunks
+
+    Returns:
+        Projection report (see BridgeProjection.to_dict)
+    """
+    projection = BridgeProjection(scorer)
+    for _, records, _ in chunks:
+        projection.add(records)
+    return projection.to_dict()
@@ -5,6 +5,21 @@ Command-Line Interface for LAI-PrEP Bridge Period Decision Support Tool
 Usage:
     python cli.py assess --input patient.json --output results.json
     python cli.py batch --input patients.csv --output-dir results/
+    python cli.py batch --input patients.csv --output-dir results/ --shard 0/8
+    python cli.py batch --input fhir_export/ --output-dir results/
+    python cli.py merge --output-dir results/
+    python cli.py encode --input patients.csv --output cohort.lpc
+    python cli.py triage --input cohort.lpc --output worklist.csv --top 500
+    python cli.py what-if --input cohort.lpc --output what_if.json
+    python cli.py rank-interventions --input cohort.lpc --output ranking.json
+    python cli.py allocate --input cohort.lpc --output allocation.csv --budget 5000
+    python cli.py assign-navigators --input results/ --roster navigators.csv --output matches.csv
+    python cli.py simulate-clinics --input cohort.lpc --output clinic_load.json --days 365
+    python cli.py project --input cohort.lpc --output projection.json
+    python cli.py config-diff --old old.json --new new.json --input cohort.lpc --results old.npy -o new.npy
+    python cli.py cache stats --cache assessments.db
+    python cli.py simulate-validation -n 21200000 --output results.json --run-cache runs/
+    python cli.py compile-config --config lai_prep_config.json
     python cli.py validate --config lai_prep_config.json
 """
 
@@ -19,16 +34,38 @@ import click
 try:
     from lai_prep_decision_tool_v2_1 import (
         LAIPrEPDecisionTool,
-        PatientProfile,
+        Configuration,
         assess_patient_json,
         ConfigurationError
     )
+    from patient_codec import PatientCodec
+    from cohort_file import (
+        is_cohort_file, open_cohort, encode_csv, iter_cohort_chunks, cohort_length,
+        default_patient_id
+    )
+    from cohort_scoring import CohortScorer
+    from triage import triage_cohort, TRIAGE_KEYS
+    from counterfactual import what_if_cohort
+    from intervention_ranking import rank_interventions as rank_cohort_interventions
+    from allocation import BudgetAllocator, resolve_unit_costs
+    from clinic_simulation import SimulationParameters, simulate_clinics
+    from bridge_projection import project_cohort
+    from navigator_assignment import (
+        NavigatorAssignment, load_roster, load_languages, candidates_from_batch_dir
+    )
+    from batch_processing import run_batch
+    from config_diff import ConfigImpact, diff_configs, rescore_cohort
 except ImportError:
     print("Error: Could not import lai_prep_decision_tool_v2_1.py")
     print("Please ensure the file is in the same directory")
     sys.exit(1)
 
 
+def load_config(config_file):
+    """Configuration for a command, mapped from a current compile-config snapshot if any"""
+    return Configuration(config_file, use_snapshot=True)
+
+
 @click.group()
 @click.version_option(version='2.1.0')
 def cli():
@@ -56,9 +93,11 @@ def cli():
               help='Use logit-space calculations (more mathematically sound)')
 @click.option('--pretty', is_flag=True,
               help='Pretty-print JSON output')
+@click.option('--cache', 'cache_file', type=click.Path(dir_okay=False), default=None,
+              help='Assessment cache database reused across runs')
 @click.option('--verbose', '-v', is_flag=True,
               help='Verbose output')
-def assess(input_file, output_file, config_file, logit, pretty, verbose):
+def assess(input_file, output_file, config_file, logit, pretty, cache_file, verbose):
     """
     Assess a single patient from JSON input
     
@@ -88,11 +127,14 @@ def assess(input_file, output_file, config_file, logit, pretty, verbose):
         if verbose:
             click.echo(f"Running assessment (method: {'logit' if logit else 'linear'})...")
         
-        results = assess_patient_json(
-            patient_data, 
-            config_path=config_file,
-            use_logit=logit
-        )
+        if cache_file:
+            results = _assess_cached(patient_data, config_file, logit, cache_file, verbose)
+        else:
+            results = assess_patient_json(
+                patient_data, 
+                use_logit=logit,
+                config=load_config(config_file)
+            )
         
         # Save results
         with open(output_file, 'w') as f:
@@ -141,10 +183,69 @@ def assess(input_file, output_file, config_file, logit, pretty, verbose):
         sys.exit(1)
 
 
+def _assess_cached(patient_data, config_file, logit, cache_file, verbose):
+    """assess_patient_json through the assessment cache (same document)"""
+    from lai_prep_decision_tool_v2_1 import PatientProfile
+    from assessment_cache import AssessmentCache, cache_key, cache_namespace
+    from assessment_serializer import AssessmentSerializer
+    from batch_processing import assessment_summary
+    
+    tool = LAIPrEPDecisionTool(config=load_config(config_file), use_logit=logit)
+    profile = PatientProfile.from_dict(patient_data)
+    serializer = AssessmentSerializer(tool.config)
+    with AssessmentCache(cache_file) as cache:
+        key = cache_key(cache_namespace(tool, serializer), profile)
+        record = cache.get_many([key])[0]
+        if record is None:
+            assessment = tool.assess_patient(profile)
+            body = serializer.dumps_body(assessment, profile)
+            cache.put_many([(key, body, assessment_summary(assessment))])
+        else:
+            body = record[0]
+    if verbose:
+        click.echo(f"Cache: {'hit' if record is not None else 'miss'} ({cache_file})")
+    return json.loads(serializer.finish(body))
+
+
+def _echo_rejects(report, rejects_path):
+    """Report rejected batch rows by reason"""
+    if report['missing_columns']:
+        click.echo(f"⚠️  Missing required columns: {', '.join(report['missing_columns'])}",
+                   err=True)
+    if report['ignored_columns']:
+        click.echo(f"  Ignored columns: {', '.join(report['ignored_columns'])}")
+    if report['rejected']:
+        reasons = ', '.join(f"{code} {count}" for code, count in report['reasons'].items())
+        click.echo(f"⚠️  {report['rejected']} rows rejected ({reasons})", err=True)
+        click.echo(f"  Rejected rows saved to: {rejects_path}", err=True)
+
+
+def _echo_batch_statistics(totals):
+    """Print the aggregate statistics of a batch run (BatchAggregates)"""
+    click.echo("\n" + "=" * 60)
+    click.echo("BATCH SUMMARY STATISTICS")
+    click.echo("=" * 60)
+    
+    total = totals.total
+    click.echo(f"Total Patients: {total}")
+    click.echo(f"Average Baseline Success: {totals.mean('baseline_success'):.1%}")
+    click.echo(f"Average Adjusted Success: {totals.mean('adjusted_success'):.1%}")
+    click.echo(f"Average With Interventions: {totals.mean('estimated_success'):.1%}")
+    click.echo(f"Average Improvement: +{totals.mean('improvement'):.1%}")
+    
+    # Risk distribution
+    click.echo("\nRisk Level Distribution:")
+    for level, count in totals.risk_counts.most_common():
+        click.echo(f"  {level}: {count} ({count/total:.0%})")
+    
+    click.echo("=" * 60)
+
+
 @cli.command()
 @click.option('--input', '-i', 'input_file', required=True,
               type=click.Path(exists=True),
-              help='Input CSV file with patient data')
+              help='Input CSV file, encoded cohort (.lpc/.npy) or FHIR bulk export '
+                   '(directory, .ndjson file or manifest)')
 @click.option('--output-dir', '-o', 'output_dir', required=True,
               type=click.Path(),
               help='Output directory for assessment results')
@@ -156,9 +257,37 @@ def assess(input_file, output_file, config_file, logit, pretty, verbose):
               help='Use logit-space calculations')
 @click.option('--summary', is_flag=True,
               help='Generate summary CSV')
+@click.option('--pretty', is_flag=True,
+              help='Pretty-print JSON output (slower; default is compact)')
+@click.option('--timestamp', default=None,
+              help='Fixed metadata timestamp for reproducible output (default: run start)')
+@click.option('--workers', default=1, type=click.IntRange(min=1),
+              help='Worker processes sharing one in-memory configuration (default: 1)')
+@click.option('--cache', 'cache_file', type=click.Path(dir_okay=False), default=None,
+              help='Assessment cache database reused across runs (compact output only)')
+@click.option('--cache-max-mb', default=512, type=click.IntRange(min=1),
+              help='Size bound for the assessment cache in MB (default: 512)')
+@click.option('--resume', is_flag=True,
+              help='Continue an interrupted run from its checkpoint in the output directory')
+@click.option('--checkpoint-every', default=50000, type=click.IntRange(min=1),
+              help='Patients between progress checkpoints (default: 50000)')
+@click.option('--rejects', 'rejects_file', type=click.Path(dir_okay=False), default=None,
+              help='CSV for rejected input rows with reason codes '
+                   '(default: <output-dir>/batch_rejects.csv)')
+@click.option('--dry-run', is_flag=True,
+              help='Only validate the input and write a data-quality report')
+@click.option('--shard', 'shard_spec', default=None, metavar='I/N',
+              help='Process only shard I (0-based) of N of the input; combine with merge')
+@click.option('--as-of', 'as_of', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='FHIR input: date for ages and recent HIV tests (default: export date)')
+@click.option('--fhir-map', 'fhir_map', type=click.Path(exists=True, dir_okay=False),
+              default=None,
+              help='FHIR input: JSON code-mapping rules applied before the defaults')
 @click.option('--verbose', '-v', is_flag=True,
               help='Verbose output')
-def batch(input_file, output_dir, config_file, logit, summary, verbose):
+def batch(input_file, output_dir, config_file, logit, summary, pretty, timestamp, workers,
+          cache_file, cache_max_mb, resume, checkpoint_every, rejects_file, dry_run, shard_spec,
+          as_of, fhir_map, verbose):
     """
     Process multiple patients from CSV input
     
@@ -166,8 +295,32 @@ def batch(input_file, output_dir, config_file, logit, summary, verbose):
     population,age,current_prep_status,barriers,healthcare_setting,insurance_status
     PWID,35,naive,"HOUSING_INSTABILITY,TRANSPORTATION",COMMUNITY_HEALTH_CENTER,uninsured
     MSM,28,oral_prep,"SCHEDULING_CONFLICTS",LGBTQ_CENTER,insured
+    
+    Encoded cohort files produced by the encode command (.lpc) are read
+    through a memory map instead of being parsed.
+    
+    With --cache, patients already assessed by an earlier run under the same
+    configuration and method are written from the cache instead of re-scored.
+    
+    Progress is checkpointed in the output directory; --resume continues an
+    interrupted run where it stopped, with the same timestamp and without
+    duplicating summary rows.
+    
+    CSV rows are validated against the configuration before assessment;
+    invalid rows go to the rejects file with reason codes. --dry-run stops
+    after validation and writes data_quality.json.
+    
+    --shard I/N runs one of N independent jobs over the same input (for job
+    arrays); the merge command combines their outputs.
+    
+    A FHIR Bulk Data export (NDJSON Patient, Condition, Observation and
+    QuestionnaireResponse files) is joined by patient id and mapped to
+    profiles with code-mapping rules (--fhir-map adds site codes).
     """
     try:
+        if cache_file and pretty:
+            raise click.UsageError("--cache stores compact records and cannot be used with --pretty")
+        
         # Create output directory
         output_path = Path(output_dir)
         output_path.mkdir(parents=True, exist_ok=True)
@@ -176,117 +329,1182 @@ def batch(input_file, output_dir, config_file, logit, summary, verbose):
             click.echo(f"Output directory: {output_path}")
         
         # Initialize tool
-        tool = LAIPrEPDecisionTool(config_path=config_file, use_logit=logit)
+        tool = LAIPrEPDecisionTool(config=load_config(config_file), use_logit=logit)
+        codec = PatientCodec(tool.config)
+        
+        from batch_checkpoint import ResumableBatch, input_identity, shard_name
+        from input_validation import (
+            REJECTS_NAME, REPORT_NAME, ValidatedCSV, cohort_report, count_lines, preflight,
+            write_report
+        )
+        shard = None
+        if shard_spec:
+            from batch_shards import parse_shard
+            try:
+                shard = parse_shard(shard_spec)
+            except ValueError as e:
+                raise click.UsageError(str(e))
+        rejects_path = shard_name(rejects_file or str(output_path / REJECTS_NAME), shard)
+        
+        # FHIR bulk export: joined by patient id into validated profile rows
+        fhir_source = None
+        if not is_cohort_file(input_file):
+            from fhir_bulk import FHIRBulkSource, is_fhir_export, load_fhir_map
+            if is_fhir_export(input_file):
+                if shard is not None:
+                    raise click.UsageError("--shard is not supported for FHIR bulk export input")
+                fhir_source = FHIRBulkSource(input_file, codec, rejects_path,
+                                             mapping=load_fhir_map(fhir_map),
+                                             as_of=as_of.date() if as_of else None,
+                                             workers=workers)
+                if verbose:
+                    click.echo(f"FHIR export as of {fhir_source.as_of.isoformat()}")
+        
+        # Rows of this shard: a record range of a cohort file, or a byte range
+        # of a CSV (with the number of rows before it)
+        first_row, shard_rows, byte_range, span = 0, None, None, None
+        if shard is not None:
+            from batch_shards import shard_span
+            n_records = len(open_cohort(input_file, codec)) if is_cohort_file(input_file) else None
+            span = shard_span(input_file, shard, n_records)
+            first_row, shard_rows = span['first_row'], span['rows']
+            if span['unit'] == 'bytes':
+                byte_range = tuple(span['range'])
+            if verbose:
+                click.echo(f"Shard {shard[0]}/{shard[1]}: {shard_rows} rows "
+                           f"from row {first_row + 1}")
+        
+        if dry_run:
+            if verbose:
+                click.echo(f"Validating patients from: {input_file}")
+            if is_cohort_file(input_file):
+                cohort = open_cohort(input_file, codec)
+                stop = None if shard_rows is None else first_row + shard_rows
+                report = cohort_report(input_file, codec,
+                                       (records for _, records in
+                                        cohort.iter_chunks(start=first_row, stop=stop)))
+            elif fhir_source is not None:
+                from fhir_bulk import fhir_preflight
+                report = fhir_preflight(fhir_source)
+            else:
+                report = preflight(input_file, codec, rejects_path,
+                                   byte_range=byte_range, first_row=first_row)
+            report_path = output_path / shard_name(REPORT_NAME, shard)
+            write_report(report, str(report_path))
+            click.echo(f"✓ {report['valid']} of {report['rows']} rows valid")
+            _echo_rejects(report, rejects_path)
+            click.echo(f"✓ Data-quality report saved to: {report_path}")
+            return
+        
+        from shared_config import config_digest
+        if fhir_source is not None:
+            from fhir_bulk import export_identity
+            identity = export_identity(input_file)
+        else:
+            identity = input_identity(input_file)
+        settings = {
+            **identity,
+            'config_digest': config_digest(tool.config),
+            'method': 'logit' if logit else 'linear',
+            'pretty': pretty,
+            'summary': summary,
+            'shard': list(shard) if shard else None,
+            'input_options': fhir_source.options() if fhir_source is not None else None,
+            'timestamp': timestamp,
+        }
         
-        # Read CSV
+        # One timestamp per run keeps identical inputs byte-for-byte identical
+        # (a resumed run keeps the checkpointed one)
+        if timestamp is None and not resume:
+            from datetime import datetime
+            settings['timestamp'] = datetime.now().isoformat()
+        
+        try:
+            job = ResumableBatch(output_path, settings, resume=resume,
+                                 checkpoint_rows=checkpoint_every, shard=shard)
+        except ValueError as e:
+            raise click.UsageError(str(e))
+        if shard is not None:
+            # A stale manifest must not mark this shard finished before it is
+            from batch_shards import MANIFEST_NAME
+            (output_path / shard_name(MANIFEST_NAME, shard)).unlink(missing_ok=True)
+        timestamp = job.settings['timestamp']
+        start = job.rows_done
+        
+        # Read patients
         if verbose:
             click.echo(f"Reading patients from: {input_file}")
         
-        patients = []
-        with open(input_file, 'r') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                # Parse barriers (comma-separated string to list)
-                if 'barriers' in row and row['barriers']:
-                    row['barriers'] = [b.strip() for b in row['barriers'].split(',')]
-                else:
-                    row['barriers'] = []
-                
-                # Convert age to int
-                if 'age' in row:
-                    row['age'] = int(row['age'])
-                
-                # Convert boolean fields
-                for field in ['recent_hiv_test', 'transportation_access', 'childcare_needs']:
-                    if field in row:
-                        row[field] = row[field].lower() in ['true', '1', 'yes']
-                
-                patients.append(row)
-        
-        click.echo(f"Processing {len(patients)} patients...")
-        
-        # Process each patient
-        results_summary = []
-        
-        with click.progressbar(patients, label='Assessing patients') as bar:
-            for i, patient_data in enumerate(bar):
-                try:
-                    # Create profile and assess
-                    profile = PatientProfile.from_dict(patient_data)
-                    assessment = tool.assess_patient(profile)
-                    
-                    # Generate output filename
-                    patient_id = patient_data.get('patient_id', f'patient_{i+1:04d}')
-                    output_file = output_path / f"{patient_id}_assessment.json"
-                    
-                    # Save individual assessment
-                    json_output = assessment.to_json(profile)
-                    with open(output_file, 'w') as f:
-                        json.dump(json_output, f, indent=2)
-                    
-                    # Collect summary data
-                    results_summary.append({
-                        'patient_id': patient_id,
-                        'population': patient_data['population'],
-                        'age': patient_data['age'],
-                        'prep_status': patient_data['current_prep_status'],
-                        'barrier_count': len(patient_data['barriers']),
-                        'risk_level': assessment.attrition_risk,
-                        'baseline_success': assessment.baseline_success_rate,
-                        'adjusted_success': assessment.adjusted_success_rate,
-                        'estimated_success': assessment.estimated_success_with_interventions,
-                        'improvement': assessment.estimated_success_with_interventions - 
-                                      assessment.adjusted_success_rate,
-                        'top_intervention': assessment.recommended_interventions[0].intervention_name
-                                          if assessment.recommended_interventions else 'None'
-                    })
-                    
-                except Exception as e:
-                    click.echo(f"\n⚠️  Error processing patient {i+1}: {e}", err=True)
-                    continue
-        
-        click.echo(f"\n✓ Processed {len(results_summary)} patients successfully")
+        source = None
+        index_base = 0
+        if is_cohort_file(input_file):
+            # Memory-mapped encoded cohort: decoded lazily chunk by chunk
+            cohort = open_cohort(input_file, codec)
+            patient_count = len(cohort) if shard_rows is None else shard_rows
+            patients = cohort.iter_patient_dicts(start=first_row + start,
+                                                 stop=first_row + patient_count)
+            index_base = first_row
+        elif fhir_source is not None:
+            # Parsed into sorted runs first, so the patient count is known
+            source = fhir_source
+            source.prepare()
+            patient_count = source.patient_count
+            patients = source.patient_dicts(skip=start)
+        else:
+            # Validated in chunks; rejected rows never reach the assessor
+            source = ValidatedCSV(input_file, codec, rejects_path,
+                                  byte_range=byte_range, first_row=first_row)
+            patient_count = (max(count_lines(input_file) - 1, 0) if shard_rows is None
+                             else shard_rows)
+            patients = source.patient_dicts(skip=start)
+        
+        if start:
+            click.echo(f"Resuming after {start} of {patient_count} patients...")
+        else:
+            click.echo(f"Processing {patient_count} patients...")
+        
+        # Process in chunks (in this process, or fanned out to --workers processes)
+        if verbose and workers > 1:
+            click.echo(f"Workers: {workers} (shared-memory configuration)")
+        
+        with job, click.progressbar(length=patient_count - start,
+                                    label='Assessing patients') as bar:
+            for results in run_batch(tool, patients, output_path, workers=workers,
+                                     pretty=pretty, timestamp=timestamp,
+                                     cache_path=cache_file,
+                                     cache_max_bytes=cache_max_mb * 1024 * 1024,
+                                     start=index_base + start):
+                for i, row, error in results:
+                    if error is not None:
+                        click.echo(f"\n⚠️  Error processing patient {i+1}: {error}", err=True)
+                job.record(results)
+                bar.update(len(results))
+        job.finish()
+        
+        report = source.report() if source is not None else None
+        if report is not None:
+            _echo_rejects(report, rejects_path)
+        if shard is not None:
+            from batch_shards import write_manifest
+            write_manifest(output_path, shard, span, job.settings, job.aggregates, report,
+                           rejects_path if report and report['rejected'] else None)
+        
+        totals = job.aggregates
+        click.echo(f"\n✓ Processed {totals.total} patients successfully")
         click.echo(f"✓ Individual assessments saved to: {output_path}")
         
-        # Generate summary CSV if requested
-        if summary and results_summary:
-            summary_file = output_path / "batch_summary.csv"
-            
-            with open(summary_file, 'w', newline='') as f:
-                writer = csv.DictWriter(f, fieldnames=results_summary[0].keys())
+        # Summary CSV is written as rows complete
+        if summary and totals.total:
+            click.echo(f"✓ Summary saved to: {job.summary_path}")
+            _echo_batch_statistics(totals)
+        
+    except click.UsageError:
+        raise
+    except FileNotFoundError as e:
+        click.echo(f"❌ Error: File not found - {e}", err=True)
+        sys.exit(1)
+    except Exception as e:
+        click.echo(f"❌ Error: {e}", err=True)
+        if verbose:
+            import traceback
+            traceback.print_exc()
+        sys.exit(1)
+
+
+@cli.command()
+@click.option('--output-dir', '-o', required=True,
+              type=click.Path(file_okay=False),
+              help='Batch output directory the shards wrote to (or to merge into)')
+@click.argument('shard_dirs', nargs=-1, type=click.Path(exists=True, file_okay=False))
+@click.option('--rejects', 'rejects_file', type=click.Path(dir_okay=False), default=None,
+              help='Merged rejects CSV (default: <output-dir>/batch_rejects.csv)')
+@click.option('--keep-shard-files', is_flag=True,
+              help='Keep the per-shard summaries, rejects and manifests')
+@click.option('--verbose', '-v', is_flag=True,
+              help='Verbose output')
+def merge(output_dir, shard_dirs, rejects_file, keep_shard_files, verbose):
+    """
+    Combine the outputs of batch --shard runs
+    
+    Shards that wrote to one shared output directory are merged in place;
+    the files of per-shard directories given as arguments are moved into
+    the output directory first. All shards of the split must have finished
+    with the same configuration and options. The result has the layout of
+    a single-node run: assessment files, batch_summary.csv and
+    batch_rejects.csv in input order.
+    """
+    try:
+        from batch_shards import merge_shards
+        
+        try:
+            merged = merge_shards(output_dir, shard_dirs, rejects_file, keep_shard_files)
+        except ValueError as e:
+            raise click.UsageError(str(e))
+        
+        totals = merged['aggregates']
+        click.echo(f"✓ Merged {merged['shards']} shards: {totals.total} patients assessed "
+                   f"of {merged['rows']} input rows")
+        if merged['rejected']:
+            reasons = ', '.join(f"{code} {count}" for code, count in merged['reasons'].items())
+            click.echo(f"⚠️  {merged['rejected']} rows rejected ({reasons})", err=True)
+            click.echo(f"  Rejected rows saved to: {merged['rejects_path']}", err=True)
+        if totals.errors:
+            click.echo(f"⚠️  {totals.errors} patients failed assessment", err=True)
+        click.echo(f"✓ Individual assessments in: {output_dir}")
+        
+        if merged['summary_path']:
+            click.echo(f"✓ Summary saved to: {merged['summary_path']}")
+            _echo_batch_statistics(totals)
+        
+    except click.UsageError:
+        raise
+    except Exception as e:
+        click.echo(f"❌ Error: {e}", err=True)
+        if verbose:
+            import traceback
+            traceback.print_exc()
+        sys.exit(1)
+
+
+@cli.command()
+@click.option('--input', '-i', 'input_file', required=True,
+              type=click.Path(exists=True),
+              help='Input CSV file with patient data (batch format)')
+@click.option('--output', '-o', 'output_file', required=True,
+              type=click.Path(),
+              help='Output cohort file (.lpc)')
+@click.option('--config', '-c', 'config_file',
+              type=click.Path(exists=True),
+              default=None,
+              help='Configuration file')
+@click.option('--chunk-size', default=65536, show_default=True,
+              help='Rows encoded per chunk')
+@click.option('--id-width', default=32, show_default=True,
+              help='Bytes reserved per patient_id')
+@click.option('--workers', default=1, type=click.IntRange(min=1),
+              help='Worker processes parsing ranges of the CSV (default: 1)')
+@click.option('--verbose', '-v', is_flag=True,
+              help='Verbose output')
+def encode(input_file, output_file, config_file, chunk_size, id_width, workers, verbose):
+    """
+    Encode a patient CSV into a binary cohort file
+    
+    The .lpc output holds fixed-width records that batch reads through a
+    memory map, so repeated runs skip CSV parsing entirely. Files are tied
+    to the configuration's code maps; re-encode after adding populations,
+    barriers or settings.
+    """
+    try:
+        codec = PatientCodec(load_config(config_file))
+        
+        if verbose:
+            click.echo(f"Encoding {input_file} -> {output_file}")
+            click.echo(f"Record size: {codec.dtype.itemsize} bytes")
+        
+        count = encode_csv(input_file, output_file, codec,
+                           chunk_size=chunk_size, id_width=id_width, workers=workers)
+        
+        click.echo(f"✓ Encoded {count} patients")
+        click.echo(f"✓ Cohort saved to: {output_file}")
+        
+    except ConfigurationError as e:
+        click.echo(f"❌ Configuration Error: {e}", err=True)
+        sys.exit(1)
+    except Exception as e:
+        click.echo(f"❌ Error: {e}", err=True)
+        if verbose:
+            import traceback
+            traceback.print_exc()
+        sys.exit(1)
+
+
+@cli.command()
+@click.option('--input', '-i', 'input_file', required=True,
+              type=click.Path(exists=True),
+              help='Input CSV file or encoded cohort (.lpc/.npy)')
+@click.option('--output', '-o', 'output_file', required=True,
+              type=click.Path(),
+              help='Output worklist CSV')
+@click.option('--config', '-c', 'config_file',
+              type=click.Path(exists=True),
+              default=None,
+              help='Configuration file')
+@click.option('--logit', is_flag=True,
+              help='Use logit-space calculations')
+@click.option('--top', '-k', 'top_k', default=100, show_default=True,
+              help='Number of patients on the worklist')
+@click.option('--by', 'rank_by', type=click.Choice(TRIAGE_KEYS), default='attrition',
+              show_default=True,
+              help='Rank by attrition risk or by expected improvement')
+@click.option('--chunk-size', default=65536, show_default=True,
+              help='Patients scored per chunk')
+@click.option('--verbose', '-v', is_flag=True,
+              help='Verbose output')
+def triage(input_file, output_file, config_file, logit, top_k, rank_by, chunk_size, verbose):
+    """
+    Build an outreach worklist of the top-k patients
+    
+    Streams the cohort through the vectorized scorer and keeps a bounded
+    heap, so memory stays constant regardless of cohort size.
+    """
+    try:
+        tool = LAIPrEPDecisionTool(config=load_config(config_file), use_logit=logit)
+        scorer = CohortScorer(tool)
+        
+        if verbose:
+            click.echo(f"Ranking patients in {input_file} by {rank_by}")
+        
+        worklist = triage_cohort(
+            scorer,
+            iter_cohort_chunks(input_file, scorer.codec, chunk_size),
+            top_k,
+            by=rank_by
+        )
+        
+        with open(output_file, 'w', newline='') as f:
+            if worklist:
+                writer = csv.DictWriter(f, fieldnames=worklist[0].keys())
                 writer.writeheader()
-                writer.writerows(results_summary)
-            
-            click.echo(f"✓ Summary saved to: {summary_file}")
+                writer.writerows(worklist)
+        
+        click.echo(f"✓ Worklist of {len(worklist)} patients saved to: {output_file}")
+        
+        if verbose and worklist:
+            for row in worklist[:5]:
+                click.echo(f"  {row['rank']}. {row['patient_id']} "
+                          f"({row['population']}, {row['risk_level']}) "
+                          f"{rank_by}: {row[rank_by]:.1%}")
+        
+    except ConfigurationError as e:
+        click.echo(f"❌ Configuration Error: {e}", err=True)
+        sys.exit(1)
+    except Exception as e:
+        click.echo(f"❌ Error: {e}", err=True)
+        if verbose:
+            import traceback
+            traceback.print_exc()
+        sys.exit(1)
+
+
+@cli.command('what-if')
+@click.option('--input', '-i', 'input_file', required=True,
+              type=click.Path(exists=True),
+              help='Input CSV file or encoded cohort (.lpc/.npy)')
+@click.option('--output', '-o', 'output_file', required=True,
+              type=click.Path(),
+              help='Output JSON report')
+@click.option('--config', '-c', 'config_file',
+              type=click.Path(exists=True),
+              default=None,
+              help='Configuration file')
+@click.option('--logit', is_flag=True,
+              help='Use logit-space calculations')
+@click.option('--matrix', 'matrix_file', type=click.Path(), default=None,
+              help='Also write the patients x barriers effect matrix (.npy)')
+@click.option('--chunk-size', default=65536, show_default=True,
+              help='Patients analyzed per chunk')
+@click.option('--verbose', '-v', is_flag=True,
+              help='Verbose output')
+def what_if(input_file, output_file, config_file, logit, matrix_file, chunk_size, verbose):
+    """
+    Estimate the success gained by resolving each barrier
+    
+    For every patient and barrier, computes the adjusted success gained if
+    that single barrier were removed, and reports which barrier removal buys
+    the most success per population and healthcare setting.
+    """
+    try:
+        tool = LAIPrEPDecisionTool(config=load_config(config_file), use_logit=logit)
+        scorer = CohortScorer(tool)
+        
+        matrix = None
+        if matrix_file:
+            import numpy as np
+            matrix = np.lib.format.open_memmap(
+                matrix_file, mode='w+', dtype=np.float64,
+                shape=(cohort_length(input_file, scorer.codec), scorer.tables.n_barriers)
+            )
+        
+        if verbose:
+            click.echo(f"Analyzing barrier removal for {input_file}")
+        
+        report = what_if_cohort(
+            scorer,
+            iter_cohort_chunks(input_file, scorer.codec, chunk_size),
+            matrix
+        )
+        report['barrier_columns'] = list(scorer.codec.barriers)
+        
+        with open(output_file, 'w') as f:
+            json.dump(report, f, indent=2)
+        
+        if matrix is not None:
+            matrix.flush()
+            click.echo(f"✓ Effect matrix saved to: {matrix_file}")
+        click.echo(f"✓ What-if report for {report['overall']['patients']} patients "
+                  f"saved to: {output_file}")
+        
+        if verbose:
+            for pop_key, group in report['by_population'].items():
+                best = group['best_barrier_removal']
+                if best:
+                    gain = group['barriers'][best]['total_success_gain']
+                    click.echo(f"  • {pop_key}: remove {best} "
+                              f"(+{gain:.1f} expected successes)")
+        
+    except ConfigurationError as e:
+        click.echo(f"❌ Configuration Error: {e}", err=True)
+        sys.exit(1)
+    except Exception as e:
+        click.echo(f"❌ Error: {e}", err=True)
+        if verbose:
+            import traceback
+            traceback.print_exc()
+        sys.exit(1)
+
+
+@cli.command('rank-interventions')
+@click.option('--input', '-i', 'input_file', required=True,
+              type=click.Path(exists=True),
+              help='Input CSV file or encoded cohort (.lpc/.npy)')
+@click.option('--output', '-o', 'output_file', required=True,
+              type=click.Path(),
+              help='Output JSON report')
+@click.option('--config', '-c', 'config_file',
+              type=click.Path(exists=True),
+              default=None,
+              help='Configuration file')
+@click.option('--logit', is_flag=True,
+              help='Use logit-space calculations')
+@click.option('--chunk-size', default=65536, show_default=True,
+              help='Patients evaluated per chunk')
+@click.option('--verbose', '-v', is_flag=True,
+              help='Verbose output')
+def rank_interventions(input_file, output_file, config_file, logit, chunk_size, verbose):
+    """
+    Rank interventions by their value to a cohort
+    
+    Evaluates the cohort with each configured intervention disabled in turn
+    and forced on, reporting the change in expected successes, people
+    reached and success gained per cost level.
+    """
+    try:
+        tool = LAIPrEPDecisionTool(config=load_config(config_file), use_logit=logit)
+        scorer = CohortScorer(tool)
+        
+        if verbose:
+            click.echo(f"Ranking interventions for {input_file}")
+        
+        report = rank_cohort_interventions(
+            scorer, iter_cohort_chunks(input_file, scorer.codec, chunk_size)
+        )
+        
+        with open(output_file, 'w') as f:
+            json.dump(report, f, indent=2)
+        
+        click.echo(f"✓ Intervention ranking for {report['patients']} patients "
+                  f"saved to: {output_file}")
+        
+        if verbose:
+            for row in report['interventions'][:5]:
+                click.echo(f"  {row['rank']}. {row['name']} ({row['cost_level']} cost): "
+                          f"{-row['disabled']['expected_successes_change']:.1f} "
+                          f"successes at stake, {row['people_reached']} reached")
+        
+    except ConfigurationError as e:
+        click.echo(f"❌ Configuration Error: {e}", err=True)
+        sys.exit(1)
+    except Exception as e:
+        click.echo(f"❌ Error: {e}", err=True)
+        if verbose:
+            import traceback
+            traceback.print_exc()
+        sys.exit(1)
+
+
+@cli.command()
+@click.option('--input', '-i', 'input_file', required=True,
+              type=click.Path(exists=True),
+              help='Input CSV file or encoded cohort (.lpc/.npy)')
+@click.option('--output', '-o', 'output_file', required=True,
+              type=click.Path(),
+              help='Output per-patient allocation CSV')
+@click.option('--budget', '-b', required=True, type=float,
+              help='Total budget in unit-cost units')
+@click.option('--unit-costs', 'unit_costs_file', type=click.Path(exists=True), default=None,
+              help='JSON mapping interventions or cost levels to unit costs')
+@click.option('--capacity', 'capacity_file', type=click.Path(exists=True), default=None,
+              help='JSON mapping interventions to maximum patients')
+@click.option('--summary-output', 'summary_file', type=click.Path(), default=None,
+              help='Summary JSON (default: <output>_summary.json)')
+@click.option('--config', '-c', 'config_file',
+              type=click.Path(exists=True),
+              default=None,
+              help='Configuration file')
+@click.option('--logit', is_flag=True,
+              help='Use logit-space calculations')
+@click.option('--chunk-size', default=65536, show_default=True,
+              help='Patients processed per chunk')
+@click.option('--verbose', '-v', is_flag=True,
+              help='Verbose output')
+def allocate(input_file, output_file, budget, unit_costs_file, capacity_file, summary_file,
+             config_file, logit, chunk_size, verbose):
+    """
+    Allocate interventions to a cohort under a budget
+    
+    Maximizes total expected bridge-period successes subject to the budget
+    and per-intervention capacity limits, using the tool's overlap and
+    diminishing-returns rules. Reads the input twice (grouping, then output).
+    """
+    try:
+        tool = LAIPrEPDecisionTool(config=load_config(config_file), use_logit=logit)
+        scorer = CohortScorer(tool)
+        
+        overrides = None
+        if unit_costs_file:
+            with open(unit_costs_file, 'r') as f:
+                overrides = json.load(f)
+        capacities = None
+        if capacity_file:
+            with open(capacity_file, 'r') as f:
+                capacities = json.load(f)
+        
+        allocator = BudgetAllocator(
+            scorer, budget,
+            unit_costs=resolve_unit_costs(tool.config, overrides),
+            capacities=capacities
+        )
+        for _, records, _ in iter_cohort_chunks(input_file, scorer.codec, chunk_size):
+            allocator.add(records)
+        
+        if verbose:
+            click.echo(f"Allocating budget {budget:g} across "
+                      f"{len(allocator.group_counts)} patient groups")
+        allocator.solve()
+        
+        codec = scorer.codec
+        with open(output_file, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow([
+                'patient_id', 'population', 'healthcare_setting', 'interventions',
+                'cost', 'adjusted_success', 'expected_success'
+            ])
+            for offset, records, patient_ids, allocated_sets in allocator.assign(
+                    iter_cohort_chunks(input_file, codec, chunk_size)):
+                keys = scorer.recommendation_keys(records).tolist()
+                for i, (key, allocated) in enumerate(zip(keys, allocated_sets)):
+                    writer.writerow([
+                        patient_ids[i] or default_patient_id(offset + i),
+                        codec.populations[records['population'][i]],
+                        codec.settings[records['healthcare_setting'][i]],
+                        ';'.join(sorted(allocated)),
+                        round(sum((allocator.unit_costs[k] for k in allocated), 0.0), 4),
+                        round(allocator.adjusted_success(key), 4),
+                        round(allocator.expected_success(key, allocated), 4),
+                    ])
+        
+        summary = allocator.summary()
+        summary_file = summary_file or str(Path(output_file).with_suffix('')) + '_summary.json'
+        with open(summary_file, 'w') as f:
+            json.dump(summary, f, indent=2)
+        
+        click.echo(f"✓ Allocation for {summary['patients']} patients saved to: {output_file}")
+        click.echo(f"✓ Summary saved to: {summary_file}")
+        click.echo(f"  Spent {summary['spent']:g} of {budget:g}; "
+                  f"{summary['patients_allocated']} patients allocated; "
+                  f"+{summary['successes_gained']:.1f} expected successes")
+        
+    except ConfigurationError as e:
+        click.echo(f"❌ Configuration Error: {e}", err=True)
+        sys.exit(1)
+    except Exception as e:
+        click.echo(f"❌ Error: {e}", err=True)
+        if verbose:
+            import traceback
+            traceback.print_exc()
+        sys.exit(1)
+
+
+@cli.command('assign-navigators')
+@click.option('--input', '-i', 'input_dir', required=True,
+              type=click.Path(exists=True, file_okay=False),
+              help='Batch output directory (*_assessment.json)')
+@click.option('--roster', '-r', 'roster_file', required=True,
+              type=click.Path(exists=True),
+              help='Navigator roster CSV')
+@click.option('--output', '-o', 'output_file', required=True,
+              type=click.Path(),
+              help='Output assignment CSV')
+@click.option('--languages', 'languages_file', type=click.Path(exists=True), default=None,
+              help='CSV of patient_id,language')
+@click.option('--summary-output', 'summary_file', type=click.Path(), default=None,
+              help='Summary JSON (default: <output>_summary.json)')
+@click.option('--config', '-c', 'config_file',
+              type=click.Path(exists=True),
+              default=None,
+              help='Configuration file')
+@click.option('--verbose', '-v', is_flag=True,
+              help='Verbose output')
+def assign_navigators(input_dir, roster_file, output_file, languages_file, summary_file,
+                      config_file, verbose):
+    """
+    Match navigation patients to navigators within caseload caps
+    
+    Reads batch assessments, keeps patients recommended patient navigation,
+    peer navigation or harm reduction integration, and solves the
+    capacitated matching that maximizes total expected success gain.
+    """
+    try:
+        config = load_config(config_file)
+        navigators = load_roster(roster_file, config)
+        languages = load_languages(languages_file) if languages_file else None
+        
+        candidates = candidates_from_batch_dir(input_dir, languages)
+        if verbose:
+            click.echo(f"{len(candidates)} navigation candidates, "
+                      f"{len(navigators)} navigators")
+        
+        engine = NavigatorAssignment(config, navigators)
+        assigned = engine.solve(candidates)
+        by_id = {n.navigator_id: n for n in navigators}
+        
+        with open(output_file, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow([
+                'patient_id', 'population', 'healthcare_setting', 'language',
+                'program', 'navigator_id', 'expected_success_gain'
+            ])
+            for candidate, navigator_id in zip(candidates, assigned):
+                gain = 0.0
+                if navigator_id is not None:
+                    gain = engine.base_gain(candidate) * engine.effectiveness(
+                        candidate, by_id[navigator_id])
+                writer.writerow([
+                    candidate.patient_id, candidate.population,
+                    candidate.healthcare_setting, candidate.language or '',
+                    candidate.program, navigator_id or '', round(gain, 4)
+                ])
+        
+        summary = engine.summary(candidates, assigned)
+        summary_file = summary_file or str(Path(output_file).with_suffix('')) + '_summary.json'
+        with open(summary_file, 'w') as f:
+            json.dump(summary, f, indent=2)
+        
+        click.echo(f"✓ Assigned {summary['assigned']} of {summary['candidates']} patients "
+                  f"(capacity {summary['total_capacity']}) to: {output_file}")
+        click.echo(f"✓ Summary saved to: {summary_file}")
+        click.echo(f"  Expected success gain: +{summary['expected_success_gain']:.1f}")
+        
+    except ConfigurationError as e:
+        click.echo(f"❌ Configuration Error: {e}", err=True)
+        sys.exit(1)
+    except Exception as e:
+        click.echo(f"❌ Error: {e}", err=True)
+        if verbose:
+            import traceback
+            traceback.print_exc()
+        sys.exit(1)
+
+
+@cli.command('simulate-clinics')
+@click.option('--input', '-i', 'input_file', required=True,
+              type=click.Path(exists=True),
+              help='Input CSV file or encoded cohort (.lpc/.npy)')
+@click.option('--output', '-o', 'output_file', required=True,
+              type=click.Path(),
+              help='Output JSON report')
+@click.option('--days', default=365, show_default=True,
+              help='Simulated horizon in days')
+@click.option('--patients', '-n', default=None, type=int,
+              help='Arrivals to draw from the cohort with replacement (default: every patient once)')
+@click.option('--default-slots', default=20, show_default=True,
+              help='Injection appointment slots per setting per day')
+@click.option('--slots', 'slots_file', type=click.Path(exists=True), default=None,
+              help='JSON mapping healthcare settings to daily slots')
+@click.option('--seed', default=0, show_default=True,
+              help='Random seed')
+@click.option('--daily-csv', 'daily_file', type=click.Path(), default=None,
+              help='Also write the daily time series as CSV')
+@click.option('--config', '-c', 'config_file',
+              type=click.Path(exists=True),
+              default=None,
+              help='Configuration file')
+@click.option('--logit', is_flag=True,
+              help='Use logit-space calculations')
+@click.option('--verbose', '-v', is_flag=True,
+              help='Verbose output')
+def simulate_clinics_command(input_file, output_file, days, patients, default_slots, slots_file,
+                             seed, daily_file, config_file, logit, verbose):
+    """
+    Simulate clinic load during the bridge period
+    
+    Discrete-event simulation of arrivals, HIV test turnaround,
+    authorization delays, per-setting appointment slots and dropout,
+    reporting queue lengths, wait times and bridge completions over time.
+    """
+    try:
+        import numpy as np
+        
+        tool = LAIPrEPDecisionTool(config=load_config(config_file), use_logit=logit)
+        scorer = CohortScorer(tool)
+        
+        records = np.concatenate([
+            np.asarray(chunk) for _, chunk, _ in
+            iter_cohort_chunks(input_file, scorer.codec)
+        ] or [scorer.codec.empty(0)])
+        if patients is not None:
+            rng = np.random.default_rng(seed)
+            records = records[rng.integers(0, len(records), patients)]
+        
+        daily_slots = {}
+        if slots_file:
+            with open(slots_file, 'r') as f:
+                daily_slots = json.load(f)
+        
+        params = SimulationParameters(
+            days=days, default_daily_slots=default_slots,
+            daily_slots=daily_slots, seed=seed
+        )
+        if verbose:
+            click.echo(f"Simulating {len(records)} arrivals over {days} days")
+        
+        report = simulate_clinics(scorer, records, params)
+        
+        with open(output_file, 'w') as f:
+            json.dump(report, f, indent=2)
+        
+        if daily_file:
+            with open(daily_file, 'w', newline='') as f:
+                settings = list(scorer.codec.settings)
+                writer = csv.writer(f)
+                writer.writerow(['day', 'arrivals', 'completions', 'dropouts',
+                                 'awaiting_test', 'awaiting_authorization',
+                                 'queue_length'] + [f'queue_{s}' for s in settings])
+                for day in report['daily']:
+                    writer.writerow([
+                        day['day'], day['arrivals'], day['completions'], day['dropouts'],
+                        day['awaiting_test'], day['awaiting_authorization'],
+                        day['queue_length']
+                    ] + [day['queue_by_setting'][s] for s in settings])
+        
+        click.echo(f"✓ Clinic simulation saved to: {output_file}")
+        click.echo(f"  Completed: {report['completed']}  Dropped: {report['dropped']}  "
+                  f"In bridge at end: {report['in_bridge_at_end']}")
+        if report['wait_days']['mean'] is not None:
+            click.echo(f"  Appointment wait: mean {report['wait_days']['mean']:.1f} days, "
+                      f"p90 {report['wait_days']['p90']:.1f} days; "
+                      f"peak queue {report['peak_queue_length']}")
+        
+    except ConfigurationError as e:
+        click.echo(f"❌ Configuration Error: {e}", err=True)
+        sys.exit(1)
+    except Exception as e:
+        click.echo(f"❌ Error: {e}", err=True)
+        if verbose:
+            import traceback
+            traceback.print_exc()
+        sys.exit(1)
+
+
+@cli.command()
+@click.option('--input', '-i', 'input_file', required=True,
+              type=click.Path(exists=True),
+              help='Input CSV file or encoded cohort (.lpc/.npy)')
+@click.option('--output', '-o', 'output_file', required=True,
+              type=click.Path(),
+              help='Output JSON report')
+@click.option('--config', '-c', 'config_file',
+              type=click.Path(exists=True),
+              default=None,
+              help='Configuration file')
+@click.option('--logit', is_flag=True,
+              help='Use logit-space calculations')
+@click.option('--chunk-size', default=65536, show_default=True,
+              help='Patients projected per chunk')
+@click.option('--verbose', '-v', is_flag=True,
+              help='Verbose output')
+def project(input_file, output_file, config_file, logit, chunk_size, verbose):
+    """
+    Project day-by-day bridge curves for a cohort
+    
+    Reports the expected fraction of patients retained and injected on each
+    day of the bridge period, with and without recommended interventions,
+    overall and by population, PrEP status, risk level, barrier count and
+    setting.
+    """
+    try:
+        tool = LAIPrEPDecisionTool(config=load_config(config_file), use_logit=logit)
+        scorer = CohortScorer(tool)
+        
+        if verbose:
+            click.echo(f"Projecting bridge curves for {input_file}")
+        
+        report = project_cohort(scorer, iter_cohort_chunks(input_file, scorer.codec, chunk_size))
+        
+        with open(output_file, 'w') as f:
+            json.dump(report, f, indent=2)
+        
+        click.echo(f"✓ Bridge projection for {report['total']} patients "
+                  f"({len(report['days'])} days) saved to: {output_file}")
+        
+        if verbose and report['overall']:
+            overall = report['overall']
+            click.echo(f"  Projected attrition: {overall['projected_attrition_without']:.1%} "
+                      f"without interventions, {overall['projected_attrition_with']:.1%} with")
+        
+    except ConfigurationError as e:
+        click.echo(f"❌ Configuration Error: {e}", err=True)
+        sys.exit(1)
+    except Exception as e:
+        click.echo(f"❌ Error: {e}", err=True)
+        if verbose:
+            import traceback
+            traceback.print_exc()
+        sys.exit(1)
+
+
+@cli.command('config-diff')
+@click.option('--old', 'old_config', required=True,
+              type=click.Path(exists=True),
+              help='Configuration the stored results were produced with')
+@click.option('--new', 'new_config', required=True,
+              type=click.Path(exists=True),
+              help='Updated configuration')
+@click.option('--input', '-i', 'input_file',
+              type=click.Path(exists=True),
+              default=None,
+              help='Encoded cohort (.lpc/.npy) or CSV to update results for')
+@click.option('--results', 'results_file',
+              type=click.Path(exists=True),
+              default=None,
+              help='Stored results (.npy) for the cohort under --old (scored if omitted)')
+@click.option('--output', '-o', 'output_file',
+              type=click.Path(),
+              default=None,
+              help='Updated results (.npy); may be the --results file to update in place')
+@click.option('--report', 'report_file',
+              type=click.Path(),
+              default=None,
+              help='Delta report JSON')
+@click.option('--logit', is_flag=True,
+              help='Use logit-space calculations')
+@click.option('--chunk-size', default=65536, show_default=True,
+              help='Patients re-scored per chunk')
+@click.option('--verbose', '-v', is_flag=True,
+              help='Verbose output')
+def config_diff(old_config, new_config, input_file, results_file, output_file, report_file,
+                logit, chunk_size, verbose):
+    """
+    Compare two configurations and re-score only the affected strata
+    
+    Lists the populations, barriers, interventions, settings and parameters
+    that changed. With --input, rows whose scores a change can affect are
+    re-scored under --new and all other rows are copied from the stored
+    results, producing an updated result set and a delta report.
+    """
+    try:
+        old_tool = LAIPrEPDecisionTool(config=load_config(old_config), use_logit=logit)
+        new_tool = LAIPrEPDecisionTool(config=load_config(new_config), use_logit=logit)
+        diff = diff_configs(old_tool.config, new_tool.config)
+        
+        click.echo(f"Comparing {old_config} -> {new_config}")
+        if diff.is_empty:
+            click.echo("✓ Configurations are identical")
+        for section, changes in diff.entries.items():
+            for kind, keys in changes.items():
+                if keys:
+                    click.echo(f"  {section} {kind}: {', '.join(keys)}")
+        if diff.parameters:
+            click.echo(f"  algorithm_parameters changed: {', '.join(diff.parameters)}")
+        if diff.risk_categories:
+            click.echo("  risk_categories changed")
+        if diff.other_sections:
+            click.echo(f"  other sections changed (no score impact): "
+                      f"{', '.join(diff.other_sections)}")
+        
+        report = {'config_changes': diff.to_dict()}
+        
+        if input_file is not None:
+            if output_file is None:
+                raise click.UsageError("--output is required with --input")
+            import numpy as np
+            from cohort_scoring import RESULT_DTYPE
             
-            # Print aggregate statistics
-            click.echo("\n" + "=" * 60)
-            click.echo("BATCH SUMMARY STATISTICS")
-            click.echo("=" * 60)
+            impact = ConfigImpact(old_tool, new_tool)
+            chunks = lambda: iter_cohort_chunks(input_file, impact.new_scorer.codec, chunk_size)
+            in_place = (results_file is not None and
+                        Path(output_file).resolve() == Path(results_file).resolve())
             
-            total = len(results_summary)
-            avg_baseline = sum(r['baseline_success'] for r in results_summary) / total
-            avg_adjusted = sum(r['adjusted_success'] for r in results_summary) / total
-            avg_estimated = sum(r['estimated_success'] for r in results_summary) / total
-            avg_improvement = sum(r['improvement'] for r in results_summary) / total
+            if results_file is None:
+                click.echo("No stored results given; scoring the cohort under --old first")
+                stored = np.concatenate(
+                    [impact.old_scorer.score(records) for _, records, _ in chunks()]
+                    or [np.zeros(0, dtype=RESULT_DTYPE)]
+                )
+            else:
+                stored = np.load(results_file, mmap_mode='r+' if in_place else 'r')
             
-            click.echo(f"Total Patients: {total}")
-            click.echo(f"Average Baseline Success: {avg_baseline:.1%}")
-            click.echo(f"Average Adjusted Success: {avg_adjusted:.1%}")
-            click.echo(f"Average With Interventions: {avg_estimated:.1%}")
-            click.echo(f"Average Improvement: +{avg_improvement:.1%}")
+            out = stored if in_place else np.lib.format.open_memmap(
+                output_file, mode='w+', dtype=RESULT_DTYPE, shape=(len(stored),)
+            )
+            out, report = rescore_cohort(impact, chunks(), stored, out)
+            out.flush()
             
-            # Risk distribution
-            from collections import Counter
-            risk_counts = Counter(r['risk_level'] for r in results_summary)
-            click.echo("\nRisk Level Distribution:")
-            for level, count in risk_counts.most_common():
-                click.echo(f"  {level}: {count} ({count/total:.0%})")
+            total = report['total']
+            click.echo(f"✓ Re-scored {report['rescored']} of {total} patients "
+                      f"({report['rescored'] / total if total else 0:.1%}); "
+                      f"{report['changed']} results changed")
+            click.echo(f"✓ Updated results saved to: {output_file}")
             
-            click.echo("=" * 60)
+            if verbose:
+                for label, count in report['strata'].items():
+                    click.echo(f"  {label}: {count} patients")
+                for label, count in report['risk_transitions'].items():
+                    click.echo(f"  risk {label}: {count}")
         
-    except FileNotFoundError as e:
-        click.echo(f"❌ Error: File not found - {e}", err=True)
+        if report_file:
+            with open(report_file, 'w') as f:
+                json.dump(report, f, indent=2)
+            click.echo(f"✓ Delta report saved to: {report_file}")
+        
+    except click.UsageError:
+        raise
+    except ConfigurationError as e:
+        click.echo(f"❌ Configuration Error: {e}", err=True)
+        sys.exit(1)
+    except Exception as e:
+        click.echo(f"❌ Error: {e}", err=True)
+        if verbose:
+            import traceback
+            traceback.print_exc()
+        sys.exit(1)
+
+
+@cli.group()
+def cache():
+    """
+    Inspect or clear an assessment cache (see --cache on assess and batch)
+    """
+    pass
+
+
+@cache.command('stats')
+@click.option('--cache', 'cache_file', required=True,
+              type=click.Path(exists=True, dir_okay=False),
+              help='Assessment cache database')
+def cache_stats(cache_file):
+    """
+    Show entries, size and hit rate of an assessment cache
+    """
+    try:
+        from assessment_cache import AssessmentCache
+        with AssessmentCache(cache_file) as store:
+            stats = store.stats()
+        
+        lookups = stats['hits'] + stats['misses']
+        click.echo(f"Cache: {cache_file}")
+        click.echo(f"  Entries:   {stats['entries']}")
+        click.echo(f"  Stored:    {stats['bytes'] / 1e6:.1f} MB "
+                   f"(file {stats['file_bytes'] / 1e6:.1f} MB)")
+        click.echo(f"  Hits:      {stats['hits']}"
+                   + (f" ({stats['hits'] / lookups:.0%} of lookups)" if lookups else ""))
+        click.echo(f"  Misses:    {stats['misses']}")
+        click.echo(f"  Evictions: {stats['evictions']}")
+        
+    except Exception as e:
+        click.echo(f"❌ Error: {e}", err=True)
+        sys.exit(1)
+
+
+@cache.command('clear')
+@click.option('--cache', 'cache_file', required=True,
+              type=click.Path(exists=True, dir_okay=False),
+              help='Assessment cache database')
+def cache_clear(cache_file):
+    """
+    Remove every entry from an assessment cache
+    """
+    try:
+        from assessment_cache import AssessmentCache
+        with AssessmentCache(cache_file) as store:
+            removed = store.clear()
+        click.echo(f"✓ Removed {removed} cached assessments from {cache_file}")
+        
+    except Exception as e:
+        click.echo(f"❌ Error: {e}", err=True)
+        sys.exit(1)
+
+
+@cli.command('simulate-validation')
+@click.option('--patients', '-n', required=True, type=click.IntRange(min=1),
+              help='Synthetic cohort size')
+@click.option('--output', '-o', 'output_file', required=True,
+              type=click.Path(),
+              help='Output JSON report (Validation_progressive format)')
+@click.option('--spec', 'spec_file', type=click.Path(exists=True), default=None,
+              help='Cohort spec JSON (weights per section; defaults to the published mix)')
+@click.option('--seed', default=0, show_default=True,
+              help='Random seed')
+@click.option('--chunk-size', default=1_000_000, show_default=True,
+              type=click.IntRange(min=1),
+              help='Patients per chunk (cached partials are per chunk)')
+@click.option('--run-cache', 'cache_dir', type=click.Path(file_okay=False), default=None,
+              help='Run cache directory; finished chunks and reports are reused')
+@click.option('--config', '-c', 'config_file',
+              type=click.Path(exists=True),
+              default=None,
+              help='Configuration file')
+@click.option('--logit', is_flag=True,
+              help='Use logit-space calculations')
+@click.option('--verbose', '-v', is_flag=True,
+              help='Verbose output')
+def simulate_validation(patients, output_file, spec_file, seed, chunk_size, cache_dir,
+                        config_file, logit, verbose):
+    """
+    Score a synthetic cohort and write validation aggregates
+    
+    With --run-cache, a repeated run returns the stored report and a longer
+    run (e.g. 10M -> 21.2M) scores only the chunks not computed before.
+    """
+    try:
+        from validation_simulation import run_validation
+        from run_cache import RunCache
+        
+        tool = LAIPrEPDecisionTool(config=load_config(config_file), use_logit=logit)
+        spec = None
+        if spec_file:
+            with open(spec_file, 'r') as f:
+                spec = json.load(f)
+        cache = RunCache(cache_dir) if cache_dir else None
+        
+        def progress(chunk, n_chunks, reused):
+            if verbose:
+                click.echo(f"  Chunk {chunk}/{n_chunks}" + (" (cached)" if reused else ""))
+        
+        report, stats = run_validation(CohortScorer(tool), patients, spec=spec, seed=seed,
+                                       chunk_size=chunk_size, cache=cache, progress=progress)
+        
+        with open(output_file, 'w') as f:
+            json.dump(report, f, indent=2)
+        
+        click.echo(f"✓ Validation run for {report['total']} patients saved to: {output_file}")
+        if stats['cached_report']:
+            click.echo("  Report reused from the run cache")
+        elif cache is not None:
+            click.echo(f"  Chunks: {stats['computed']} computed, {stats['reused']} reused")
+        click.echo(f"  Average success: {report['avg_success_rate']:.1%}, "
+                   f"improvement: +{report['avg_improvement']:.1%}")
+        
+    except ConfigurationError as e:
+        click.echo(f"❌ Configuration Error: {e}", err=True)
+        sys.exit(1)
+    except Exception as e:
+        click.echo(f"❌ Error: {e}", err=True)
+        if verbose:
+            import traceback
+            traceback.print_exc()
+        sys.exit(1)
+
+
+@cli.group('run-cache')
+def run_cache_group():
+    """
+    Inspect or garbage-collect a run cache (see simulate-validation --run-cache)
+    """
+    pass
+
+
+@run_cache_group.command('stats')
+@click.option('--run-cache', 'cache_dir', required=True,
+              type=click.Path(exists=True, file_okay=False),
+              help='Run cache directory')
+def run_cache_stats(cache_dir):
+    """
+    Show entries and size of a run cache
+    """
+    try:
+        from run_cache import RunCache
+        stats = RunCache(cache_dir).stats()
+        click.echo(f"Run cache: {cache_dir}")
+        click.echo(f"  Chunk partials: {stats['chunk_entries']} "
+                   f"({stats['chunk_bytes'] / 1e6:.1f} MB)")
+        click.echo(f"  Run reports:    {stats['run_entries']} "
+                   f"({stats['run_bytes'] / 1e6:.1f} MB)")
+        
+    except Exception as e:
+        click.echo(f"❌ Error: {e}", err=True)
+        sys.exit(1)
+
+
+@run_cache_group.command('gc')
+@click.option('--run-cache', 'cache_dir', required=True,
+              type=click.Path(exists=True, file_okay=False),
+              help='Run cache directory')
+@click.option('--max-mb', type=click.FloatRange(min=0), default=None,
+              help='Evict least recently used entries down to this size')
+@click.option('--older-than-days', type=click.FloatRange(min=0), default=None,
+              help='Remove entries unused for this many days')
+@click.option('--stale', is_flag=True,
+              help='Remove entries computed by another code version')
+def run_cache_gc(cache_dir, max_mb, older_than_days, stale):
+    """
+    Remove unused entries and orphaned files from a run cache
+    """
+    try:
+        from run_cache import RunCache
+        from validation_simulation import code_version
+        
+        result = RunCache(cache_dir).gc(
+            max_bytes=int(max_mb * 1e6) if max_mb is not None else None,
+            older_than_days=older_than_days,
+            keep_code_versions=[code_version()] if stale else None
+        )
+        click.echo(f"✓ Removed {result['removed']} entries and {result['orphans']} orphaned "
+                   f"files ({result['freed_bytes'] / 1e6:.1f} MB)")
+        
+    except Exception as e:
+        click.echo(f"❌ Error: {e}", err=True)
+        sys.exit(1)
+
+
+@cli.command('compile-config')
+@click.option('--config', '-c', 'config_file', required=True,
+              type=click.Path(exists=True),
+              help='Configuration file to compile')
+@click.option('--output', '-o', 'output_file',
+              type=click.Path(),
+              help='Snapshot file (default: next to the configuration, .lpcfg)')
+@click.option('--verbose', '-v', is_flag=True,
+              help='Verbose output')
+def compile_config(config_file, output_file, verbose):
+    """
+    Validate a configuration and write a precompiled binary snapshot
+
+    Later runs that load the same, unmodified configuration file map the
+    snapshot instead of parsing, validating and compiling it.
+    """
+    try:
+        from validate_config import validate_file
+        from config_snapshot import write_snapshot
+        
+        result = validate_file(config_file)
+        for warning in result.warnings:
+            click.echo(f"⚠️  {warning}")
+        if not result.valid:
+            for error in result.errors:
+                click.echo(f"❌ {error}", err=True)
+            raise ConfigurationError(f"{config_file} failed validation; no snapshot written")
+        
+        config = Configuration(config_file, use_snapshot=False)
+        path = write_snapshot(config, output_file)
+        
+        click.echo(f"✓ Configuration valid ({len(result.warnings)} warning(s))")
+        click.echo(f"✓ Snapshot written to: {path}")
+        if verbose:
+            click.echo(f"  Source SHA-256: {result.digest}")
+        
+    except ConfigurationError as e:
+        click.echo(f"❌ Configuration Error: {e}", err=True)
         sys.exit(1)
     except Exception as e:
         click.echo(f"❌ Error: {e}", err=True)
@@ -311,7 +1529,7 @@ def validate(config_file, verbose):
         
         # Try to load configuration
         from lai_prep_decision_tool_v2_1 import Configuration
-        config = Configuration(config_file)
+        config = Configuration(config_file, use_snapshot=False)
         
         click.echo("✓ JSON syntax valid")
         click.echo(f"✓ Version: {config.config.get('version', 'Unknown')}")
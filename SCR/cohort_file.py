@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Memory-Mapped Binary Cohort Files for LAI-PrEP Bridge Decision Support Tool
+
+A .lpc cohort file stores PatientCodec records back to back after a small
+header, so batch runs can np.memmap a multi-gigabyte cohort instead of parsing
+CSV, and workers can share one page-cached copy sliced zero-copy by row range.
+
+Layout (little-endian):
+    8 bytes   magic b"LPCOHORT"
+    uint32    format version
+    uint32    header length in bytes
+    uint64    record count
+    header    UTF-8 JSON (record dtype, code maps, patient id width),
+              space-padded so records start on a 64-byte boundary
+    records   count x itemsize bytes
+
+Plain .npy files holding a codec-compatible structured array are accepted as
+input too (via np.load with mmap_mode='r'). They carry no code maps, so every
+code field is range-checked against the active configuration when opened.
+"""
+
+import json
+import os
+import struct
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from csv_reader import count_records, read_header
+from lai_prep_decision_tool_v2_1 import ConfigurationError
+from patient_codec import PatientCodec
+
+
+MAGIC = b"LPCOHORT"
+FORMAT_VERSION = 1
+PREAMBLE = struct.Struct("<8sIIQ")
+ALIGNMENT = 64
+
+COHORT_SUFFIXES = ('.lpc', '.npy')
+DEFAULT_ID_WIDTH = 32
+DEFAULT_CHUNK_SIZE = 65536
+
+# Record fields holding an index into a codec code map -> codec attribute
+CODE_FIELDS = (
+    ('population', 'populations'),
+    ('prep_status', 'prep_statuses'),
+    ('healthcare_setting', 'settings'),
+    ('insurance_status', 'insurance_statuses'),
+)
+
+
+def is_cohort_file(path: str) -> bool:
+    """True if path names a binary cohort file rather than CSV"""
+    return Path(path).suffix.lower() in COHORT_SUFFIXES
+
+
+def _code_maps(codec: PatientCodec) -> Dict[str, List[str]]:
+    """Code maps recorded in the header to detect configuration drift"""
+    return {
+        'populations': list(codec.populations),
+        'prep_statuses': list(codec.prep_statuses),
+        'healthcare_settings': list(codec.settings),
+        'insurance_statuses': list(codec.insurance_statuses),
+        'barriers': list(codec.barriers),
+    }
+
+
+def cohort_dtype(codec: PatientCodec, id_width: int = 0) -> np.dtype:
+    """On-disk record dtype: codec fields plus an optional fixed-width patient id"""
+    fields = [(name, codec.dtype.fields[name][0].str) for name in codec.dtype.names]
+    if id_width:
+        fields.append(('patient_id', f'S{id_width}'))
+    return np.dtype(fields)
+
+
+class CohortWriter:
+    """
+    Streams encoded records into a .lpc file, patching the count on close
+
+    Records go to <path>.tmp, renamed over path only on a successful close;
+    leaving the with-block through an exception deletes the temporary file,
+    so a failed encode never leaves a truncated but well-formed cohort.
+    """
+
+    def __init__(self, path: str, codec: PatientCodec, id_width: int = 0):
+        """
+        Open a cohort file for writing
+
+        Args:
+            path: Output .lpc path
+            codec: PatientCodec the records were encoded with
+            id_width: Bytes reserved per patient id (0 to omit ids)
+        """
+        self.path = path
+        self.codec = codec
+        self.id_width = id_width
+        self.dtype = cohort_dtype(codec, id_width)
+        self.count = 0
+
+        header = json.dumps({
+            'dtype': self.dtype.descr,
+            'code_maps': _code_maps(codec),
+            'id_width': id_width,
+        }).encode('utf-8')
+        padding = -(PREAMBLE.size + len(header)) % ALIGNMENT
+        self._header = header + b" " * padding
+
+        self._tmp_path = f"{path}.tmp"
+        self._file = open(self._tmp_path, 'wb')
+        self._file.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(self._header), 0))
+        self._file.write(self._header)
+
+    def write(self, records: np.ndarray, patient_ids: Optional[List[str]] = None):
+        """Append a chunk of codec records (and ids, if the file stores them)"""
+        chunk = np.zeros(len(records), dtype=self.dtype)
+        for name in self.codec.dtype.names:
+            chunk[name] = records[name]
+
+        if self.id_width:
+            if patient_ids is None:
+                raise ValueError("Cohort file stores patient ids; none were given")
+            encoded = [str(pid).encode('utf-8') for pid in patient_ids]
+            too_long = [pid for pid in encoded if len(pid) > self.id_width]
+            if too_long:
+                raise ValueError(
+                    f"Patient id longer than {self.id_width} bytes: {too_long[0]!r}"
+                )
+            chunk['patient_id'] = encoded
+
+        self._file.write(chunk.tobytes())
+        self.count += len(chunk)
+
+    def close(self):
+        """Patch the record count into the preamble and move the file into place"""
+        if self._file.closed:
+            return
+        self._file.seek(0)
+        self._file.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(self._header), self.count))
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        """Discard the records written so far (path is left untouched)"""
+        if self._file.closed:
+            return
+        self._file.close()
+        os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+
+
+class CohortFile:
+    """Read-only memory-mapped view of an encoded cohort"""
+
+    def __init__(self, path: str, codec: PatientCodec):
+        """
+        Map a .lpc or .npy cohort file
+
+        Args:
+            path: Cohort file path
+            codec: PatientCodec for the active configuration
+
+        Raises:
+            ConfigurationError: If the file was encoded with different code maps,
+                or (.npy) holds codes the configuration does not define
+        """
+        self.path = path
+        self.codec = codec
+
+        is_npy = Path(path).suffix.lower() == '.npy'
+        if is_npy:
+            self.records = np.load(path, mmap_mode='r')
+            self.id_width = 0
+        else:
+            self.records = self._map_lpc(path)
+
+        missing = [n for n in codec.dtype.names if n not in (self.records.dtype.names or ())]
+        if missing:
+            raise ConfigurationError(
+                f"Cohort file {path} is missing record fields: {missing}"
+            )
+        if is_npy:
+            self._check_codes()
+
+        self._profile_fields = list(codec.dtype.names)
+
+    def _check_codes(self) -> None:
+        """Range-check code fields and barrier masks against the codec, in chunks"""
+        n_barriers = len(self.codec.barriers)
+        step = DEFAULT_CHUNK_SIZE * 16
+        for start in range(0, len(self.records), step):
+            chunk = self.records[start:start + step]
+            for field, attribute in CODE_FIELDS:
+                values = chunk[field]
+                limit = len(getattr(self.codec, attribute))
+                bad = np.flatnonzero((values < 0) | (values >= limit))
+                if len(bad):
+                    raise ConfigurationError(
+                        f"Cohort file {self.path} row {start + int(bad[0])} has {field} code "
+                        f"{values[bad[0]]}, not defined in the configuration's {attribute}"
+                    )
+            masks = chunk['barriers'].astype(np.uint64)
+            if n_barriers < 64:
+                bad = np.flatnonzero(masks >> np.uint64(n_barriers))
+                if len(bad):
+                    raise ConfigurationError(
+                        f"Cohort file {self.path} row {start + int(bad[0])} has barrier bits "
+                        f"beyond the configuration's {n_barriers} barriers"
+                    )
+
+    def _map_lpc(self, path: str) -> np.memmap:
+        """Validate the .lpc header and memory-map its records"""
+        with open(path, 'rb') as f:
+            preamble = f.read(PREAMBLE.size)
+            if len(preamble) < PREAMBLE.size:
+                raise ConfigurationError(f"Truncated cohort file: {path}")
+            magic, version, header_len, count = PREAMBLE.unpack(preamble)
+            if magic != MAGIC:
+                raise ConfigurationError(f"Not a cohort file: {path}")
+            if version != FORMAT_VERSION:
+                raise ConfigurationError(
+                    f"Unsupported cohort file version {version} (expected {FORMAT_VERSION})"
+                )
+            header = json.loads(f.read(header_len).decode('utf-8'))
+
+        if header['code_maps'] != _code_maps(self.codec):
+            raise ConfigurationError(
+                f"Cohort file {path} was encoded with a different configuration; "
+                "re-run 'cli.py encode'"
+            )
+
+        self.id_width = header['id_width']
+        dtype = np.dtype([tuple(field) for field in header['dtype']])
+        if count == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(
+            path, dtype=dtype, mode='r',
+            offset=PREAMBLE.size + header_len, shape=(count,)
+        )
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @property
+    def has_patient_ids(self) -> bool:
+        """True if the file stores patient ids"""
+        return self.id_width > 0
+
+    def slice(self, start: int, stop: int) -> np.ndarray:
+        """Zero-copy view of codec fields for rows [start, stop)"""
+        return self.records[start:stop][self._profile_fields]
+
+    def patient_ids(self, start: int, stop: int) -> List[Optional[str]]:
+        """Patient ids for rows [start, stop), or None entries if not stored"""
+        if not self.has_patient_ids:
+            return [None] * (min(stop, len(self)) - start)
+        return [
+            pid.decode('utf-8') or None
+            for pid in self.records['patient_id'][start:stop].tolist()
+        ]
+
+    def iter_chunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                    start: int = 0, stop: Optional[int] = None) -> Iterator[tuple]:
+        """Yield (offset, records) views over a row range in chunks"""
+        stop = len(self) if stop is None else min(stop, len(self))
+        for offset in range(start, stop, chunk_size):
+            yield offset, self.slice(offset, min(offset + chunk_size, stop))
+
+    def iter_patient_dicts(self, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                           start: int = 0, stop: Optional[int] = None) -> Iterator[Dict]:
+        """Yield typed profile dictionaries (with patient_id when stored) for rows [start, stop)"""
+        for offset, records in self.iter_chunks(chunk_size, start, stop):
+            ids = self.patient_ids(offset, offset + len(records))
+            for pid, data in zip(ids, self.codec.to_dicts(records)):
+                if pid is not None:
+                    data['patient_id'] = pid
+                yield data
+
+
+def open_cohort(path: str, codec: PatientCodec) -> CohortFile:
+    """Memory-map an encoded cohort file"""
+    return CohortFile(path, codec)
+
+
+def encode_csv(
+    input_path: str,
+    output_path: str,
+    codec: PatientCodec,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    id_width: int = DEFAULT_ID_WIDTH,
+    workers: int = 1
+) -> int:
+    """
+    Encode a batch-format CSV into a .lpc cohort file
+
+    Args:
+        input_path: CSV with batch columns (patient_id optional)
+        output_path: Destination .lpc file
+        codec: PatientCodec for the active configuration
+        chunk_size: Rows encoded per chunk
+        id_width: Bytes reserved per patient id when the CSV has a patient_id column
+        workers: Worker processes parsing byte ranges of the CSV
+
+    Returns:
+        Number of records written
+
+    Raises:
+        ValueError: At the first row that fails input validation
+    """
+    from input_validation import iter_encoded_chunks  # imports this module
+
+    has_ids = 'patient_id' in read_header(input_path)[0]
+    with CohortWriter(output_path, codec, id_width if has_ids else 0) as writer:
+        for _, records, ids in iter_encoded_chunks(input_path, codec, chunk_size, workers):
+            writer.write(records, ids if has_ids else None)
+        return writer.count
+
+
+def iter_cohort_chunks(
+    path: str,
+    codec: PatientCodec,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    workers: int = 1
+) -> Iterator[tuple]:
+    """
+    Yield (offset, records, patient_ids) chunks from a CSV or cohort file
+
+    Cohort files are sliced from the memory map; CSV files are parsed
+    column-wise and encoded chunk by chunk (see input_validation.py), so
+    memory stays bounded by chunk_size either way. Patient ids are None
+    where the input does not provide them.
+
+    Args:
+        workers: Worker processes parsing a CSV input (cohort files ignore it)
+    """
+    if is_cohort_file(path):
+        cohort = open_cohort(path, codec)
+        for offset, records in cohort.iter_chunks(chunk_size):
+            yield offset, records, cohort.patient_ids(offset, offset + len(records))
+        return
+
+    from input_validation import iter_encoded_chunks  # imports this module
+    yield from iter_encoded_chunks(path, codec, chunk_size, workers)
+
+
+def default_patient_id(index: int) -> str:
+    """Patient id batch assigns when the input has none (0-based row index)"""
+    return f'patient_{index + 1:04d}'
+
+
+def cohort_length(path: str, codec: PatientCodec) -> int:
+    """Number of patients in a CSV or cohort file (CSV requires a counting pass)"""
+    if is_cohort_file(path):
+        return len(open_cohort(path, codec))
+    return count_records(path)
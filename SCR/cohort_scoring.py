@@ -0,0 +1,530 @@
+#!/usr/bin/env python3
+"""
+Vectorized Cohort Scoring for LAI-PrEP Bridge Decision Support Tool
+
+Scores encoded cohorts (PatientCodec records) with the same rules as
+LAIPrEPDecisionTool.assess_patient, one array operation per barrier instead
+of one Python call per patient:
+
+- adjusted success (linear or logit), including the best-case floor
+- attrition risk category
+- expected improvement from the top 3 recommendations
+- bridge duration range
+
+Recommendations depend only on population, PrEP status, recent HIV test,
+healthcare setting and barriers, so they are computed once per distinct
+combination and broadcast back to patients. For the intervention gain the
+barriers matter only through the ordered list of interventions they trigger
+(their signature), which collapses thousands of barrier masks into a few
+distinct recommendation lists.
+
+Barriers are applied in configuration order (the codec's canonical order).
+
+Caches are filled on first use and safe to share across threads: cached
+values are deterministic, so a racing duplicate computation is harmless, and
+the one cache that assigns ids takes a lock on misses only.
+"""
+
+import math
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from lai_prep_decision_tool_v2_1 import (
+    BridgePeriodAssessment,
+    ConfigurationError,
+    InterventionRecommendation,
+    LAIPrEPDecisionTool,
+    PatientProfile
+)
+from patient_codec import PatientCodec, FLAG_RECENT_HIV_TEST
+from compiled_config import CompiledConfig
+
+
+# Gain keys pack the recommendation inputs above the barrier signature id
+SIGNATURE_RADIX = 1 << 32
+
+# Configuration sections the compiled tables (and codec) are built from, and
+# the further sections recommendations read
+TABLE_SECTIONS = (
+    'populations', 'barriers', 'healthcare_settings', 'prep_statuses',
+    'insurance_statuses', 'algorithm_parameters', 'risk_categories'
+)
+RECOMMENDATION_SECTIONS = TABLE_SECTIONS + ('interventions',)
+
+# Per-patient results of a vectorized scoring pass
+RESULT_DTYPE = np.dtype([
+    ('adjusted_success', '<f8'),
+    ('estimated_success', '<f8'),
+    ('risk', 'u1'),
+    ('bridge_min_days', '<u2'),
+    ('bridge_max_days', '<u2'),
+])
+
+
+def _logit(p: np.ndarray) -> np.ndarray:
+    """Convert probability to log-odds (bounded to avoid infinity)"""
+    p = np.clip(p, 0.01, 0.99)
+    return np.log(p / (1 - p))
+
+
+def _inv_logit(x: np.ndarray) -> np.ndarray:
+    """Convert log-odds to probability"""
+    return 1 / (1 + np.exp(-x))
+
+
+def _copy_recommendation(rec: InterventionRecommendation) -> InterventionRecommendation:
+    """Independent copy of a cached recommendation (a few times faster than replace())"""
+    duplicate = object.__new__(InterventionRecommendation)
+    duplicate.__dict__.update(rec.__dict__)
+    duplicate.mechanisms = list(rec.mechanisms)
+    return duplicate
+
+
+def _copy_factors(factors: Dict) -> Dict:
+    """Independent copy of cached attrition factors (nested dicts are copied)"""
+    return {key: dict(value) if isinstance(value, dict) else value
+            for key, value in factors.items()}
+
+
+class CohortScorer:
+    """Vectorized bridge-period scoring over encoded cohorts"""
+
+    def __init__(
+        self,
+        tool: LAIPrEPDecisionTool,
+        tables: Optional[CompiledConfig] = None
+    ):
+        """
+        Initialize scorer
+
+        Args:
+            tool: Decision tool providing configuration, method and recommendation rules
+            tables: Compiled tables for the tool's configuration (built if None)
+        """
+        self.tool = tool
+        self.tables = tables if tables is not None else CompiledConfig(tool.config)
+        self.codec: PatientCodec = self.tables.codec
+        self.use_logit = tool.use_logit
+
+        # Recommendation results per recommendation key
+        self._recommendation_cache: Dict[int, List[InterventionRecommendation]] = {}
+
+        # Barrier signatures: ordered triggered interventions -> id, looked up
+        # per (population, mask) seen so far, with a representative mask per
+        # (population, id)
+        self._signature_ids: Dict[Tuple[str, ...], int] = {}
+        self._signature_lock = threading.Lock()
+        self._signature_cache: Dict[Tuple[int, int], int] = {}
+        self._signature_masks: Dict[Tuple[int, int], int] = {}
+        self._gain_cache: Dict[int, float] = {}
+        self._logit_success_table: Optional[List] = None
+
+        # Attrition factors (assessment explanation) per (population, barrier mask)
+        self._factors_cache: Dict[Tuple[int, int], Dict] = {}
+
+        codec = self.codec
+        self._key_radix = (
+            len(codec.prep_statuses), 2, len(codec.settings), 1 << self.tables.n_barriers
+        )
+        # Wide barrier masks push recommendation keys past int64
+        self._object_keys = len(codec.populations) * math.prod(self._key_radix) > 2**63 - 1
+
+    def successor(self, tool: LAIPrEPDecisionTool, changed_sections) -> 'CohortScorer':
+        """
+        Scorer for a reloaded tool, keeping what the changed sections cannot affect
+
+        Compiled tables survive unless a TABLE_SECTIONS section changed; the
+        recommendation, signature and gain caches also need RECOMMENDATION_SECTIONS
+        (and the calculation method) unchanged. Kept caches are shared, not copied.
+
+        Args:
+            tool: Tool built on the new configuration
+            changed_sections: Top-level configuration keys that differ
+        """
+        changed = set(changed_sections)
+        if changed & set(TABLE_SECTIONS):
+            return CohortScorer(tool)
+
+        scorer = CohortScorer(tool, tables=self.tables)
+        if tool.use_logit != self.use_logit or changed & set(RECOMMENDATION_SECTIONS):
+            return scorer
+        scorer._logit_success_table = self._logit_success_table
+        scorer._factors_cache = self._factors_cache
+        scorer._recommendation_cache = self._recommendation_cache
+        scorer._signature_ids = self._signature_ids
+        scorer._signature_lock = self._signature_lock
+        scorer._signature_cache = self._signature_cache
+        scorer._signature_masks = self._signature_masks
+        scorer._gain_cache = self._gain_cache
+        return scorer
+
+    # ------------------------------------------------------------------
+    # Barriers
+    # ------------------------------------------------------------------
+
+    def barrier_bits(self, records: np.ndarray) -> np.ndarray:
+        """Boolean matrix (patients x barriers) of barrier presence"""
+        mask = records['barriers'].astype(np.uint64)
+        shifts = np.arange(self.tables.n_barriers, dtype=np.uint64)
+        return ((mask[:, None] >> shifts) & np.uint64(1)).astype(bool)
+
+    def barrier_count(self, records: np.ndarray) -> np.ndarray:
+        """Number of barriers per patient"""
+        return self.barrier_bits(records).sum(axis=1)
+
+    # ------------------------------------------------------------------
+    # Adjusted success
+    # ------------------------------------------------------------------
+
+    def adjusted_success(self, records: np.ndarray) -> np.ndarray:
+        """
+        Adjusted success rate per patient, as assess_patient computes it
+
+        Args:
+            records: Structured array of PatientCodec records
+
+        Returns:
+            float64 array of adjusted success rates
+        """
+        bits = self.barrier_bits(records)
+        baseline = self.tables.baseline_attrition[records['population']]
+        count = bits.sum(axis=1)
+
+        if self.use_logit:
+            success = self.success_from_logit(
+                baseline, self.barrier_logit(bits, baseline), count
+            )
+        else:
+            success = self.success_from_linear(
+                baseline, self.barrier_impact_sum(bits), count
+            )
+
+        return self.apply_best_case_floor(records, success, count)
+
+    def barrier_impact_sum(self, bits: np.ndarray) -> np.ndarray:
+        """Linear path: summed barrier impacts, accumulated in barrier order"""
+        total = np.zeros(len(bits))
+        for j, impact in enumerate(self.tables.barrier_impact):
+            total += np.where(bits[:, j], impact, 0.0)
+        return total
+
+    def success_from_linear(self, baseline, impact_sum, count) -> np.ndarray:
+        """Linear path: success from summed impacts and barrier count"""
+        adjustment = impact_sum + self.tables.count_penalty[np.minimum(count, 3)]
+        attrition = np.minimum(self.tables.max_attrition_ceiling, baseline + adjustment)
+        return 1 - attrition
+
+    def barrier_logit(self, bits: np.ndarray, baseline: np.ndarray) -> np.ndarray:
+        """Logit path: log-odds after the sequential per-barrier shifts"""
+        base_logit = _logit(baseline)
+        for j in range(self.tables.n_barriers):
+            target = self.barrier_target_logit(baseline, j)
+            base_logit = base_logit + np.where(bits[:, j], target - base_logit, 0.0)
+        return base_logit
+
+    def barrier_target_logit(self, baseline: np.ndarray, j: int) -> np.ndarray:
+        """Logit path: log-odds a shift for barrier j moves the patient to"""
+        return _logit(np.minimum(0.99, baseline + self.tables.barrier_impact[j]))
+
+    def success_from_logit(self, baseline, base_logit, count) -> np.ndarray:
+        """Logit path: success from post-barrier log-odds and barrier count"""
+        penalty = self.tables.count_penalty[np.minimum(count, 3)]
+        count_shift = _logit(np.minimum(0.99, baseline + penalty)) - _logit(baseline)
+        base_logit = np.where(penalty > 0, base_logit + count_shift, base_logit)
+
+        attrition = np.clip(_inv_logit(base_logit), 0.05, 0.95)
+        return 1 - attrition
+
+    def apply_best_case_floor(self, records, success, count) -> np.ndarray:
+        """Oral PrEP + recent HIV test + no barriers is floored at best_case_success_floor"""
+        best_case = (
+            (records['prep_status'] == self.tables.oral_prep_code)
+            & ((records['flags'] & FLAG_RECENT_HIV_TEST) != 0)
+            & (count == 0)
+        )
+        return np.where(
+            best_case, np.maximum(success, self.tables.best_case_success_floor), success
+        )
+
+    def logit_success_table(self) -> List:
+        """
+        Logit path: success before the best-case floor, as nested lists indexed
+        [population][last barrier + 1 (0 for none)][min(barrier count, 3)] (cached)
+
+        Only the last barrier in configuration order sets the post-barrier
+        log-odds, so these few values cover every barrier mask.
+        """
+        if self._logit_success_table is None:
+            t = self.tables
+            baseline = t.baseline_attrition[:, None]
+            targets = np.concatenate(
+                [_logit(baseline)] +
+                [self.barrier_target_logit(baseline, j) for j in range(t.n_barriers)],
+                axis=1
+            )
+            count = np.arange(4)
+            self._logit_success_table = self.success_from_logit(
+                baseline[:, :, None], targets[:, :, None], count[None, None, :]
+            ).tolist()
+        return self._logit_success_table
+
+    def risk_index(self, adjusted_success: np.ndarray) -> np.ndarray:
+        """Risk category code (index into tables.risk_keys) per patient"""
+        return self.tables.risk_index(1 - adjusted_success)
+
+    # ------------------------------------------------------------------
+    # Recommendations
+    # ------------------------------------------------------------------
+
+    def recommendation_keys(self, records: np.ndarray) -> np.ndarray:
+        """
+        Integer key of the inputs recommendations depend on
+
+        Population, PrEP status, recent HIV test, setting and barrier mask.
+        Keys are int64 unless they cannot fit, in which case they are exact
+        Python ints in an object array.
+        """
+        n_status, n_recent, n_setting, n_mask = self._key_radix
+        key = records['population'].astype(np.int64)
+        key = key * n_status + records['prep_status']
+        key = key * n_recent + ((records['flags'] & FLAG_RECENT_HIV_TEST) != 0)
+        key = key * n_setting + records['healthcare_setting']
+        if self._object_keys:
+            keys = np.empty(len(records), dtype=object)
+            keys[:] = [k * n_mask + mask
+                       for k, mask in zip(key.tolist(), records['barriers'].tolist())]
+            return keys
+        return key * n_mask + records['barriers'].astype(np.int64)
+
+    def _key_profile(self, key: int):
+        """Representative PatientProfile for a recommendation key"""
+        n_status, n_recent, n_setting, n_mask = self._key_radix
+        key, mask = divmod(int(key), n_mask)
+        key, setting = divmod(key, n_setting)
+        key, recent = divmod(key, n_recent)
+        population, status = divmod(key, n_status)
+        flags = FLAG_RECENT_HIV_TEST if recent else 0
+        return self.codec.decode((population, status, setting, 0, mask, flags, 0))
+
+    def recommendations_for_key(self, key: int) -> List[InterventionRecommendation]:
+        """Recommendations for one key (cached; treat as read-only)"""
+        key = int(key)
+        recommendations = self._recommendation_cache.get(key)
+        if recommendations is None:
+            profile = self._key_profile(key)
+            recommendations = self.tool._generate_recommendations_with_mechanisms(profile)
+            self._recommendation_cache[key] = recommendations
+        return recommendations
+
+    def unique_keys(self, records: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(unique recommendation keys, inverse index per patient)"""
+        return np.unique(self.recommendation_keys(records), return_inverse=True)
+
+    def _signature(self, population: int, mask: int) -> int:
+        """Signature id for a population code and barrier mask"""
+        signature = self._signature_cache.get((population, mask))
+        if signature is None:
+            pop_key = self.codec.populations[population]
+            interventions = self.tool.config.config['interventions']
+
+            # Same traversal as the barrier loop of _generate_candidate_recommendations
+            triggered = []
+            for barrier in self.codec.barrier_list(mask):
+                for int_key, int_config in interventions.items():
+                    if (barrier in int_config.get('addresses_barriers', ())
+                            and int_key not in triggered
+                            and ('applicable_populations' not in int_config or
+                                 pop_key in int_config['applicable_populations'])):
+                        triggered.append(int_key)
+
+            with self._signature_lock:
+                signature = self._signature_ids.setdefault(
+                    tuple(triggered), len(self._signature_ids)
+                )
+                self._signature_masks.setdefault((population, signature), mask)
+                self._signature_cache[(population, mask)] = signature
+        return signature
+
+    def barrier_signatures(self, records: np.ndarray) -> np.ndarray:
+        """
+        Signature id per patient (ordered interventions their barriers trigger)
+
+        Looked up once per distinct barrier mask within each population and
+        broadcast back, so the cost follows the masks present, not 2**barriers.
+        """
+        populations, masks = records['population'], records['barriers']
+        ids = np.empty(len(records), dtype=np.int64)
+        for population in np.unique(populations).tolist():
+            rows = populations == population
+            unique_masks, inverse = np.unique(masks[rows], return_inverse=True)
+            signatures = np.array(
+                [self._signature(population, mask) for mask in unique_masks.tolist()],
+                dtype=np.int64
+            )
+            ids[rows] = signatures[inverse.reshape(-1)]
+        return ids
+
+    def gain_keys(self, records: np.ndarray) -> np.ndarray:
+        """Integer key of the inputs the intervention gain depends on"""
+        n_status, n_recent, n_setting, _ = self._key_radix
+        key = records['population'].astype(np.int64)
+        key = key * n_status + records['prep_status']
+        key = key * n_recent + ((records['flags'] & FLAG_RECENT_HIV_TEST) != 0)
+        key = key * n_setting + records['healthcare_setting']
+        return key * SIGNATURE_RADIX + self.barrier_signatures(records)
+
+    def _gain_for_key(self, key: int) -> float:
+        """Top-3 improvement for a gain key, via a representative barrier mask"""
+        gain = self._gain_cache.get(key)
+        if gain is None:
+            n_status, n_recent, n_setting, n_mask = self._key_radix
+            base, signature = divmod(key, SIGNATURE_RADIX)
+            population = base // (n_status * n_recent * n_setting)
+            mask = self._signature_masks[(population, signature)]
+            recommendations = self.recommendations_for_key(base * n_mask + mask)
+            gain = sum(rec.expected_improvement / 100 for rec in recommendations[:3])
+            self._gain_cache[key] = gain
+        return gain
+
+    def intervention_gain(self, records: np.ndarray) -> np.ndarray:
+        """
+        Summed improvement (as a fraction) of each patient's top 3 recommendations
+
+        Computed once per distinct gain key and broadcast back.
+        """
+        keys, inverse = np.unique(self.gain_keys(records), return_inverse=True)
+        gains = np.array([self._gain_for_key(k) for k in keys.tolist()], dtype=float)
+        return gains[inverse.reshape(-1)] if len(keys) else np.zeros(len(records))
+
+    def estimated_success(self, adjusted_success: np.ndarray, gain: np.ndarray) -> np.ndarray:
+        """Success with interventions, after diminishing returns and the success cap"""
+        return np.minimum(
+            self.tables.max_success_rate,
+            adjusted_success + gain * self.tables.diminishing_returns_factor
+        )
+
+    # ------------------------------------------------------------------
+    # Bridge duration
+    # ------------------------------------------------------------------
+
+    def bridge_duration(self, records: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(minimum_days, maximum_days) per patient"""
+        t = self.tables
+        oral = records['prep_status'] == t.oral_prep_code
+        recent = (records['flags'] & FLAG_RECENT_HIV_TEST) != 0
+
+        ranges = np.where(
+            (oral & recent)[:, None], t.bridge_oral_recent,
+            np.where(
+                oral[:, None], t.bridge_oral_no_recent,
+                np.where(recent[:, None], t.bridge_naive_recent, t.bridge_naive_no_recent)
+            )
+        )
+        min_days = ranges[:, 0]
+        max_days = np.where(
+            ~oral & (self.barrier_count(records) > 2), t.maximum_bridge_duration, ranges[:, 1]
+        )
+        return min_days, max_days
+
+    # ------------------------------------------------------------------
+    # Full pass
+    # ------------------------------------------------------------------
+
+    def assess_profiles(self, profiles: List[PatientProfile]) -> List[BridgePeriodAssessment]:
+        """
+        Full assessments for a chunk of profiles, identical to assess_patient
+
+        Profiles that encode with barriers already in configuration order are
+        scored with the array kernels; any other profile (reordered or
+        duplicate barriers, values the codec cannot encode) goes through
+        assess_patient.
+        """
+        tool = self.tool
+        codec = self.codec
+        assessments: List[Optional[BridgePeriodAssessment]] = [None] * len(profiles)
+        rows, positions = [], []
+        for i, profile in enumerate(profiles):
+            try:
+                row = codec._profile_tuple(profile)
+            except (ConfigurationError, ValueError, TypeError):
+                row = None
+            if row is None or codec.barrier_list(row[4]) != list(profile.barriers):
+                assessments[i] = tool.assess_patient(profile)
+                continue
+            rows.append(row)
+            positions.append(i)
+
+        if rows:
+            records = np.array(rows, dtype=codec.dtype)
+            adjusted = self.adjusted_success(records).tolist()
+            keys = self.recommendation_keys(records).tolist()
+            min_days, max_days = self.bridge_duration(records)
+            gains = [self._gain_for_recommendations(key) for key in keys]
+            estimated = self.estimated_success(np.array(adjusted), np.array(gains)).tolist()
+
+            for k, i in enumerate(positions):
+                profile = profiles[i]
+                pop_config = tool.config.get_population_config(profile.population)
+                # Fresh copies: callers may edit their assessment's factors and recommendations
+                attrition_factors = _copy_factors(
+                    self._attrition_factors(rows[k][0], rows[k][4], profile, pop_config)
+                )
+                recommendations = [
+                    _copy_recommendation(rec) for rec in self.recommendations_for_key(keys[k])
+                ]
+                assessments[i] = tool._build_assessment(
+                    profile,
+                    pop_config,
+                    adjusted[k],
+                    attrition_factors,
+                    recommendations,
+                    estimated[k],
+                    (int(min_days[k]), int(max_days[k]))
+                )
+        return assessments
+
+    def _attrition_factors(self, population: int, mask: int, profile: PatientProfile,
+                           pop_config: Dict) -> Dict:
+        """
+        Attrition factors for a population and barrier mask (cached; treat as read-only)
+
+        They depend on nothing else, so the scalar calculation runs once per
+        pair; profile must have that population and the mask's barriers in
+        configuration order.
+        """
+        factors = self._factors_cache.get((population, mask))
+        if factors is None:
+            _, factors = self.tool._calculate_adjusted_success(
+                profile, pop_config['baseline_attrition']
+            )
+            self._factors_cache[(population, mask)] = factors
+        return factors
+
+    def _gain_for_recommendations(self, key: int) -> float:
+        """Top-3 improvement of a recommendation key's recommendations"""
+        return sum(rec.expected_improvement / 100 for rec in self.recommendations_for_key(key)[:3])
+
+    def score(self, records: np.ndarray) -> np.ndarray:
+        """
+        Score a chunk of encoded patients
+
+        Args:
+            records: Structured array of PatientCodec records
+
+        Returns:
+            Structured array with RESULT_DTYPE, one row per patient
+        """
+        results = np.zeros(len(records), dtype=RESULT_DTYPE)
+        if len(records) == 0:
+            return results
+
+        adjusted = self.adjusted_success(records)
+        results['adjusted_success'] = adjusted
+        results['estimated_success'] = self.estimated_success(
+            adjusted, self.intervention_gain(records)
+        )
+        results['risk'] = self.risk_index(adjusted)
+        results['bridge_min_days'], results['bridge_max_days'] = self.bridge_duration(records)
+        return results
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Compiled Configuration Tables for LAI-PrEP Bridge Decision Support Tool
+
+Flattens the configuration sections the scoring path reads per patient into
+dense NumPy arrays indexed by PatientCodec codes, so cohort-scale operations
+never touch the nested JSON dictionaries.
+
+The arrays (listed in CompiledConfig.ARRAYS) can also be supplied ready-made,
+e.g. attached zero-copy from shared memory (see shared_config.py) or mapped
+from a compiled snapshot file (see config_snapshot.py); scalars
+and labels are always read from the configuration.
+"""
+
+from typing import Dict, Optional
+
+import numpy as np
+
+from lai_prep_decision_tool_v2_1 import Configuration, compile_risk_thresholds
+from patient_codec import PatientCodec
+
+
+class CompiledConfig:
+    """Dense lookup tables compiled from a Configuration"""
+
+    # Array tables, in the order they are laid out when shared
+    ARRAYS = (
+        'baseline_attrition',
+        'barrier_impact',
+        'count_penalty',
+        'bridge_oral_recent',
+        'bridge_oral_no_recent',
+        'bridge_naive_recent',
+        'bridge_naive_no_recent',
+        'risk_edges',
+        'risk_lookup',
+    )
+
+    # Configuration sections the array tables are compiled from
+    ARRAY_SECTIONS = ('populations', 'barriers', 'algorithm_parameters', 'risk_categories')
+
+    def __init__(
+        self,
+        config: Configuration,
+        codec: Optional[PatientCodec] = None,
+        arrays: Optional[Dict[str, np.ndarray]] = None
+    ):
+        """
+        Compile lookup tables
+
+        Args:
+            config: Loaded Configuration
+            codec: PatientCodec built from the same configuration (created if None)
+            arrays: Precompiled array tables for this configuration (taken from a
+                snapshot-backed config, or compiled, if None)
+        """
+        self.config = config
+        self.codec = codec if codec is not None else PatientCodec(config)
+        params = config.get_algorithm_params()
+
+        if arrays is None:
+            arrays = config.compiled_arrays
+        if arrays is None:
+            arrays = self.compile_arrays(config)
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self.n_barriers = len(self.barrier_impact)
+
+        # Scalar algorithm parameters
+        self.max_attrition_ceiling = params['max_attrition_ceiling']
+        self.best_case_success_floor = params.get('best_case_success_floor', 0.85)
+        self.max_success_rate = params['max_success_rate_with_interventions']
+        self.diminishing_returns_factor = params['intervention_diminishing_returns_factor']
+        self.maximum_bridge_duration = params['maximum_bridge_duration_days']
+
+        # Risk category keys and labels, indexed by risk_lookup codes
+        risk_categories = config.get_risk_categories()
+        self.risk_keys = tuple(risk_categories)
+        self.risk_labels = tuple(info['label'] for info in risk_categories.values())
+
+        # Codes the scoring rules branch on
+        self.oral_prep_code = self.codec.prep_status_code('oral_prep')
+
+    @staticmethod
+    def compile_arrays(config: Configuration) -> Dict[str, np.ndarray]:
+        """Array tables (CompiledConfig.ARRAYS) for a configuration"""
+        params = config.get_algorithm_params()
+        arrays = {}
+
+        # Population and barrier tables, indexed by codec code / bit position
+        arrays['baseline_attrition'] = np.array([
+            pop['baseline_attrition'] for pop in config.config['populations'].values()
+        ], dtype=float)
+        arrays['barrier_impact'] = np.array([
+            barrier['impact'] for barrier in config.config['barriers'].values()
+        ], dtype=float)
+
+        # Barrier count penalty indexed by min(count, 3); zero barriers add nothing
+        counts = params['barrier_count_adjustment_factor']
+        arrays['count_penalty'] = np.array([
+            0.0, counts['1_barrier'], counts['2_barriers'], counts['3_plus_barriers']
+        ], dtype=float)
+
+        # Bridge duration ranges as (min, max) rows
+        arrays['bridge_oral_recent'] = np.array(params['bridge_duration_oral_prep_recent_test'])
+        arrays['bridge_oral_no_recent'] = np.array(
+            params['bridge_duration_oral_prep_no_recent_test']
+        )
+        arrays['bridge_naive_recent'] = np.array(params['bridge_duration_naive_recent_test'])
+        arrays['bridge_naive_no_recent'] = np.array(
+            params['bridge_duration_naive_no_recent_test']
+        )
+
+        # Risk categories: sorted edges plus per-interval category code
+        risk_categories = config.get_risk_categories()
+        risk_keys = tuple(risk_categories)
+        edges, lookup = compile_risk_thresholds(risk_categories)
+        arrays['risk_edges'] = np.array(edges, dtype=float)
+        arrays['risk_lookup'] = np.array(
+            [risk_keys.index(key) for key in lookup], dtype=np.uint8
+        )
+        return arrays
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """Array tables by name, in ARRAYS order"""
+        return {name: getattr(self, name) for name in self.ARRAYS}
+
+    def risk_index(self, attrition: np.ndarray) -> np.ndarray:
+        """Risk category code (index into risk_keys) per attrition rate"""
+        return self.risk_lookup[np.searchsorted(self.risk_edges, attrition, side='right')]
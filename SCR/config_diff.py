@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Configuration Change Impact Analysis for LAI-PrEP Bridge Decision Support Tool
+
+Compares two configuration versions, works out which cohort strata the
+changes can affect, and re-scores only those rows of a stored encoded cohort
+against its stored results (CohortScorer.score output, RESULT_DTYPE).
+
+A patient's scores depend only on population, PrEP status, recent HIV test,
+healthcare setting and barrier mask, so each change maps to a row predicate:
+
+- population / barrier / setting entry   -> rows with that code or barrier bit
+- intervention entry                     -> rows whose recommendation key gets
+                                            a different recommendation list
+- barrier_count_adjustment_factor.<n>    -> rows with that barrier count
+- best_case_success_floor                -> oral PrEP + recent test + no barriers
+- bridge_duration_* / maximum_bridge_... -> the matching bridge-duration strata
+- any other algorithm parameter          -> every row
+- risk_categories                        -> risk re-derived from stored success
+- other sections (version, guidance...)  -> no rows
+
+Adding, removing or reordering codec entries changes the cohort's code maps;
+such a change cannot reuse an encoded cohort and is rejected.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from lai_prep_decision_tool_v2_1 import Configuration, ConfigurationError, LAIPrEPDecisionTool
+from cohort_scoring import RESULT_DTYPE
+from patient_codec import PatientCodec, FLAG_RECENT_HIV_TEST
+
+
+# Sections compared entry by entry
+ENTRY_SECTIONS = ('populations', 'barriers', 'interventions', 'healthcare_settings')
+
+# Sections holding codec code maps (any key change makes a cohort unusable)
+CODE_MAP_SECTIONS = PatientCodec.SECTIONS
+
+# Result fields compared in the delta report
+RESULT_FIELDS = RESULT_DTYPE.names
+
+
+def _entry_changes(old: Dict, new: Dict) -> Dict[str, List[str]]:
+    """Added, removed and changed keys between two sections"""
+    return {
+        'added': [key for key in new if key not in old],
+        'removed': [key for key in old if key not in new],
+        'changed': [key for key in old if key in new and old[key] != new[key]],
+    }
+
+
+@dataclass
+class ConfigDiff:
+    """What changed between two configuration versions"""
+    entries: Dict[str, Dict[str, List[str]]]
+    parameters: List[str]
+    risk_categories: bool
+    other_sections: List[str]
+    structural: bool
+
+    @property
+    def is_empty(self) -> bool:
+        """True if the versions are identical"""
+        return not (
+            any(any(changes.values()) for changes in self.entries.values())
+            or self.parameters or self.risk_categories or self.other_sections
+        )
+
+    @property
+    def affects_scores(self) -> bool:
+        """True if any patient's scores can change"""
+        return (
+            any(any(changes.values()) for changes in self.entries.values())
+            or bool(self.parameters) or self.risk_categories
+        )
+
+    def to_dict(self) -> Dict:
+        """Convert to dictionary for JSON export"""
+        return {
+            'entries': self.entries,
+            'parameters': self.parameters,
+            'risk_categories': self.risk_categories,
+            'other_sections': self.other_sections,
+            'structural': self.structural,
+        }
+
+
+def diff_configs(old: Configuration, new: Configuration) -> ConfigDiff:
+    """
+    Compare two configurations
+
+    Args:
+        old: Configuration the stored results were produced with
+        new: Updated configuration
+
+    Returns:
+        ConfigDiff
+    """
+    old_data, new_data = old.config, new.config
+    entries = {
+        section: _entry_changes(old_data.get(section, {}), new_data.get(section, {}))
+        for section in ENTRY_SECTIONS
+    }
+
+    old_params = old.get_algorithm_params()
+    new_params = new.get_algorithm_params()
+    parameters = []
+    for key in list(old_params) + [k for k in new_params if k not in old_params]:
+        old_value, new_value = old_params.get(key), new_params.get(key)
+        if old_value == new_value:
+            continue
+        if isinstance(old_value, dict) and isinstance(new_value, dict):
+            parameters.extend(
+                f"{key}.{sub}" for sub in list(old_value) +
+                [s for s in new_value if s not in old_value]
+                if old_value.get(sub) != new_value.get(sub)
+            )
+        else:
+            parameters.append(key)
+
+    known = set(ENTRY_SECTIONS) | {'algorithm_parameters', 'risk_categories'}
+    other_sections = [
+        key for key in list(old_data) + [k for k in new_data if k not in old_data]
+        if key not in known and old_data.get(key) != new_data.get(key)
+    ]
+
+    structural = any(
+        list(old_data.get(section, ())) != list(new_data.get(section, ()))
+        for section in CODE_MAP_SECTIONS
+    )
+
+    return ConfigDiff(
+        entries=entries,
+        parameters=parameters,
+        risk_categories=old.get_risk_categories() != new.get_risk_categories(),
+        other_sections=other_sections,
+        structural=structural
+    )
+
+
+class ConfigImpact:
+    """Row predicates for the cohort strata a configuration change affects"""
+
+    def __init__(self, old_tool: LAIPrEPDecisionTool, new_tool: LAIPrEPDecisionTool):
+        """
+        Args:
+            old_tool: Tool for the configuration the stored results came from
+            new_tool: Tool for the updated configuration (same calculation method)
+
+        Raises:
+            ConfigurationError: On a structural change or differing methods
+        """
+        if old_tool.use_logit != new_tool.use_logit:
+            raise ConfigurationError("Both versions must use the same calculation method")
+        self.diff = diff_configs(old_tool.config, new_tool.config)
+        if self.diff.structural:
+            raise ConfigurationError(
+                "Populations, barriers, settings or statuses were added, removed or "
+                "reordered; re-encode the cohort and re-run the full batch"
+            )
+        self.old_scorer = old_tool._cohort_scorer()
+        self.new_scorer = new_tool._cohort_scorer()
+        self._recommendations_changed: Dict[int, bool] = {}
+
+    def _key_changed(self, key: int) -> bool:
+        """Whether a recommendation key's recommendations differ (cached)"""
+        changed = self._recommendations_changed.get(key)
+        if changed is None:
+            old = [rec.to_dict() for rec in self.old_scorer.recommendations_for_key(key)]
+            new = [rec.to_dict() for rec in self.new_scorer.recommendations_for_key(key)]
+            changed = self._recommendations_changed[key] = old != new
+        return changed
+
+    def strata(self, records: np.ndarray) -> List[Tuple[str, np.ndarray]]:
+        """
+        Affected rows per change
+
+        Args:
+            records: Structured array of PatientCodec records
+
+        Returns:
+            List of (change label, boolean row mask)
+        """
+        scorer = self.new_scorer
+        codec = scorer.codec
+        entries = self.diff.entries
+        strata = []
+
+        for key in entries['populations']['changed']:
+            strata.append((f"population {key}",
+                           records['population'] == codec.population_code(key)))
+        if entries['barriers']['changed']:
+            bits = scorer.barrier_bits(records)
+            for key in entries['barriers']['changed']:
+                strata.append((f"barrier {key}", bits[:, codec.barriers.index(key)]))
+        for key in entries['healthcare_settings']['changed']:
+            strata.append((f"healthcare setting {key}",
+                           records['healthcare_setting'] == codec.setting_code(key)))
+        if any(entries['interventions'].values()):
+            keys = scorer.recommendation_keys(records)
+            unique, inverse = np.unique(keys, return_inverse=True)
+            changed = np.array([self._key_changed(k) for k in unique.tolist()], dtype=bool)
+            strata.append(("interventions", changed[inverse]))
+
+        if self.diff.parameters:
+            oral = records['prep_status'] == scorer.tables.oral_prep_code
+            recent = (records['flags'] & FLAG_RECENT_HIV_TEST) != 0
+            count = scorer.barrier_count(records)
+            predicates = {
+                'barrier_count_adjustment_factor.1_barrier': count == 1,
+                'barrier_count_adjustment_factor.2_barriers': count == 2,
+                'barrier_count_adjustment_factor.3_plus_barriers': count >= 3,
+                'best_case_success_floor': oral & recent & (count == 0),
+                'bridge_duration_oral_prep_recent_test': oral & recent,
+                'bridge_duration_oral_prep_no_recent_test': oral & ~recent,
+                'bridge_duration_naive_recent_test': ~oral & recent,
+                'bridge_duration_naive_no_recent_test': ~oral & ~recent,
+                'maximum_bridge_duration_days': ~oral & (count > 2),
+            }
+            everyone = np.ones(len(records), dtype=bool)
+            for key in self.diff.parameters:
+                strata.append((f"parameter {key}", predicates.get(key, everyone)))
+        return strata
+
+    def affected(self, records: np.ndarray) -> np.ndarray:
+        """Rows whose scores must be recomputed"""
+        mask = np.zeros(len(records), dtype=bool)
+        for _, rows in self.strata(records):
+            mask |= rows
+        return mask
+
+
+def _risk_transitions(old: np.ndarray, new: np.ndarray, keys: Tuple[str, ...],
+                      counts: Dict[str, int]) -> None:
+    """Accumulate 'OLD->NEW' risk category transitions"""
+    moved = old != new
+    if not moved.any():
+        return
+    pairs, n = np.unique(
+        np.stack([old[moved], new[moved]], axis=1), axis=0, return_counts=True
+    )
+    for (a, b), count in zip(pairs.tolist(), n.tolist()):
+        label = f"{keys[a]}->{keys[b]}"
+        counts[label] = counts.get(label, 0) + count
+
+
+def rescore_cohort(
+    impact: ConfigImpact,
+    chunks: Iterable[tuple],
+    stored: np.ndarray,
+    out: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, Dict]:
+    """
+    Update stored results for a configuration change
+
+    Args:
+        impact: ConfigImpact for the two versions
+        chunks: (offset, records, patient_ids) chunks, as from iter_cohort_chunks
+        stored: Stored results (RESULT_DTYPE, one row per patient, old config)
+        out: Array to write updated results into (new array if None; may be stored)
+
+    Returns:
+        (updated results, delta report)
+    """
+    if stored.dtype != RESULT_DTYPE:
+        raise ValueError(f"Stored results have dtype {stored.dtype}, expected {RESULT_DTYPE}")
+    if out is None:
+        out = np.empty(len(stored), dtype=RESULT_DTYPE)
+
+    scorer = impact.new_scorer
+    risk_keys = scorer.tables.risk_keys
+    strata_counts: Dict[str, int] = {}
+    field_counts = {name: 0 for name in RESULT_FIELDS}
+    transitions: Dict[str, int] = {}
+    sums = {'adjusted_success': 0.0, 'estimated_success': 0.0}
+    total = rescored = changed = 0
+
+    for offset, records, _ in chunks:
+        stop = offset + len(records)
+        if stop > len(stored):
+            raise ValueError("Stored results have fewer rows than the cohort")
+        old = np.asarray(stored[offset:stop])
+        new = old.copy()
+
+        mask = np.zeros(len(records), dtype=bool)
+        for label, rows in impact.strata(records):
+            strata_counts[label] = strata_counts.get(label, 0) + int(rows.sum())
+            mask |= rows
+        if mask.any():
+            new[mask] = scorer.score(records[mask])
+        if impact.diff.risk_categories:
+            new['risk'] = scorer.risk_index(new['adjusted_success'])
+
+        differs = np.zeros(len(records), dtype=bool)
+        for name in RESULT_FIELDS:
+            field_differs = new[name] != old[name]
+            field_counts[name] += int(field_differs.sum())
+            differs |= field_differs
+        for name in sums:
+            sums[name] += float((new[name] - old[name]).sum())
+        _risk_transitions(old['risk'], new['risk'], risk_keys, transitions)
+
+        out[offset:stop] = new
+        total += len(records)
+        rescored += int(mask.sum())
+        changed += int(differs.sum())
+
+    if total != len(stored):
+        raise ValueError(
+            f"Stored results have {len(stored)} rows but the cohort has {total}"
+        )
+
+    report = {
+        'config_changes': impact.diff.to_dict(),
+        'total': total,
+        'rescored': rescored,
+        'changed': changed,
+        'strata': strata_counts,
+        'changed_fields': field_counts,
+        'mean_delta': {name: (value / total if total else 0.0) for name, value in sums.items()},
+        'risk_transitions': transitions,
+    }
+    return out, report
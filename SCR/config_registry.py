@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Multi-Tenant Configuration Registry for LAI-PrEP Bridge Decision Support Tool
+
+Serves many named configurations (e.g. one per clinic site) from one process.
+Site variants of lai_prep_config.json usually differ in a few healthcare
+settings or intervention parameters, so the registry interns configuration
+content instead of storing each tenant's copy:
+
+- Every section and every entry within a section (one population, one
+  intervention, ...) is frozen once and identified by a content digest.
+  Digests are Merkle-style (a section's digest hashes its entries' digests),
+  and key order is part of the content since it defines codec codes.
+  Tenants with equal content hold the same frozen objects.
+- Compiled array tables are shared by every tenant with the same
+  CompiledConfig.ARRAY_SECTIONS, codecs by the same code maps (the keys of
+  PatientCodec.SECTIONS), and whole tools (with their scorer caches) by
+  identical configurations.
+
+derive() applies a site overlay to a registered tenant and only re-freezes
+and re-hashes the overridden entries, so memory and load time grow with the
+size of the differences rather than the number of tenants.
+"""
+
+import hashlib
+import json
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from lai_prep_decision_tool_v2_1 import (
+    Configuration,
+    ConfigurationError,
+    FrozenDict,
+    LAIPrEPDecisionTool,
+    freeze,
+    thaw
+)
+from patient_codec import PatientCodec
+from compiled_config import CompiledConfig
+from cohort_scoring import CohortScorer
+
+
+# Levels interned as separate objects: configuration -> section -> entry
+INTERN_DEPTH = 2
+
+
+def _leaf_digest(value) -> bytes:
+    """Content digest of a JSON value interned as a whole"""
+    return hashlib.sha256(
+        json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    ).digest()
+
+
+class ConfigRegistry:
+    """Named decision tools sharing configuration content and compiled tables"""
+
+    def __init__(self, use_logit: bool = False):
+        """
+        Args:
+            use_logit: Calculation method for every tenant's tool
+        """
+        self.use_logit = use_logit
+        self._tenants: Dict[str, LAIPrEPDecisionTool] = {}
+        self._pool: Dict[bytes, object] = {}     # digest -> frozen object
+        self._digests: Dict[int, bytes] = {}     # id(pooled object) -> digest
+        self._arrays: Dict[Tuple, Dict[str, np.ndarray]] = {}
+        self._codecs: Dict[Tuple, PatientCodec] = {}
+        self._tools: Dict[bytes, LAIPrEPDecisionTool] = {}
+
+    # ------------------------------------------------------------------
+    # Interning
+    # ------------------------------------------------------------------
+
+    def _pooled(self, digest: bytes, make):
+        """Existing object for a digest, or the newly made one"""
+        obj = self._pool.get(digest)
+        if obj is None:
+            obj = self._pool[digest] = make()
+            self._digests[id(obj)] = digest
+        return obj
+
+    def _intern(self, value, depth: int = INTERN_DEPTH) -> Tuple[object, bytes]:
+        """(shared frozen object, digest) for a JSON value"""
+        digest = self._digests.get(id(value))
+        if digest is not None and self._pool.get(digest) is value:
+            return value, digest
+
+        if depth > 0 and isinstance(value, dict):
+            items = [(key, self._intern(item, depth - 1)) for key, item in value.items()]
+            h = hashlib.sha256(b'{')
+            for key, (_, item_digest) in items:
+                h.update(json.dumps(key).encode('utf-8'))
+                h.update(item_digest)
+            digest = h.digest()
+            obj = self._pooled(
+                digest, lambda: FrozenDict((key, item) for key, (item, _) in items)
+            )
+        else:
+            digest = _leaf_digest(value)
+            obj = self._pooled(digest, lambda: freeze(value))
+        return obj, digest
+
+    def _merge(self, base, overrides: Dict, depth: int):
+        """Overlay overrides on a frozen value, reusing untouched children"""
+        merged = dict(base)
+        for key, value in overrides.items():
+            if value is None:
+                merged.pop(key, None)
+            elif isinstance(value, dict) and isinstance(merged.get(key), dict):
+                merged[key] = (
+                    self._merge(merged[key], value, depth - 1) if depth > 0
+                    else self._overlay(thaw(merged[key]), value)
+                )
+            else:
+                merged[key] = value
+        return merged
+
+    @classmethod
+    def _overlay(cls, base: Dict, overrides: Dict) -> Dict:
+        """Deep-merge overrides into an editable dict (None removes a key)"""
+        for key, value in overrides.items():
+            if value is None:
+                base.pop(key, None)
+            elif isinstance(value, dict) and isinstance(base.get(key), dict):
+                cls._overlay(base[key], value)
+            else:
+                base[key] = value
+        return base
+
+    # ------------------------------------------------------------------
+    # Tenants
+    # ------------------------------------------------------------------
+
+    def _section_key(self, config: Dict, sections: Tuple[str, ...]) -> Tuple:
+        """Digests of the given sections (None when absent)"""
+        return tuple(
+            self._digests[id(config[s])] if s in config else None for s in sections
+        )
+
+    @staticmethod
+    def _codec_key(config: Dict) -> Tuple:
+        """Code maps a codec would build (section keys or values, in order)"""
+        return tuple(tuple(config.get(s, ())) for s in PatientCodec.SECTIONS)
+
+    def _install(self, name: str, data: Dict, config_path: Optional[str]) -> LAIPrEPDecisionTool:
+        """Intern a configuration and attach the tenant to its (possibly shared) tool"""
+        root, digest = self._intern(data)
+        tool = self._tools.get(digest)
+        if tool is None:
+            try:
+                config = Configuration.from_dict(root, config_path=config_path)
+            except ConfigurationError:
+                self._prune()
+                raise
+
+            array_key = self._section_key(root, CompiledConfig.ARRAY_SECTIONS)
+            arrays = self._arrays.get(array_key)
+            if arrays is None:
+                arrays = CompiledConfig.compile_arrays(config)
+                for array in arrays.values():
+                    array.flags.writeable = False
+                self._arrays[array_key] = arrays
+
+            codec_key = self._codec_key(root)
+            codec = self._codecs.get(codec_key)
+            if codec is None:
+                codec = self._codecs[codec_key] = PatientCodec(config)
+
+            tool = LAIPrEPDecisionTool(config=config, use_logit=self.use_logit)
+            tool._scorer = CohortScorer(tool, CompiledConfig(config, codec=codec, arrays=arrays))
+            self._tools[digest] = tool
+
+        replaced = name in self._tenants
+        self._tenants[name] = tool
+        if replaced:
+            self._prune()
+        return tool
+
+    def register(
+        self,
+        name: str,
+        source: Union[str, Dict, Configuration]
+    ) -> LAIPrEPDecisionTool:
+        """
+        Register (or replace) a tenant
+
+        Args:
+            name: Tenant name
+            source: Configuration file path, parsed configuration, or Configuration
+
+        Returns:
+            The tenant's tool
+
+        Raises:
+            ConfigurationError: If the configuration is invalid
+        """
+        if isinstance(source, Configuration):
+            return self._install(name, source.config, source.config_path)
+        if isinstance(source, dict):
+            return self._install(name, source, None)
+        return self._install(name, Configuration(source).config, source)
+
+    def derive(self, name: str, base: str, overrides: Dict) -> LAIPrEPDecisionTool:
+        """
+        Register a tenant as a registered tenant's configuration plus an overlay
+
+        Args:
+            name: New tenant name
+            base: Registered tenant the overlay applies to
+            overrides: Nested dictionary deep-merged onto the base (None removes a key)
+
+        Returns:
+            The tenant's tool
+        """
+        base_config = self.config(base)
+        merged = self._merge(base_config.config, overrides, INTERN_DEPTH - 1)
+        return self._install(name, merged, base_config.config_path)
+
+    def tool(self, name: str) -> LAIPrEPDecisionTool:
+        """Decision tool for a tenant"""
+        if name not in self._tenants:
+            raise ConfigurationError(f"Unknown tenant: {name}")
+        return self._tenants[name]
+
+    def config(self, name: str) -> Configuration:
+        """Read-only configuration of a tenant"""
+        return self.tool(name).config
+
+    def names(self) -> List[str]:
+        """Registered tenant names, in registration order"""
+        return list(self._tenants)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tenants
+
+    def __len__(self) -> int:
+        return len(self._tenants)
+
+    def remove(self, name: str) -> None:
+        """Unregister a tenant, releasing content no other tenant uses"""
+        if name not in self._tenants:
+            raise ConfigurationError(f"Unknown tenant: {name}")
+        del self._tenants[name]
+        self._prune()
+
+    def _prune(self) -> None:
+        """Drop pooled objects, tables and tools no tenant references"""
+        live_tools = {id(tool) for tool in self._tenants.values()}
+        self._tools = {d: t for d, t in self._tools.items() if id(t) in live_tools}
+
+        live = set()
+        array_keys, codec_keys = set(), set()
+
+        def mark(obj, depth):
+            live.add(self._digests[id(obj)])
+            if depth > 0 and isinstance(obj, dict):
+                for item in obj.values():
+                    mark(item, depth - 1)
+
+        for digest, tool in self._tools.items():
+            root = tool.config.config
+            mark(root, INTERN_DEPTH)
+            array_keys.add(self._section_key(root, CompiledConfig.ARRAY_SECTIONS))
+            codec_keys.add(self._codec_key(root))
+
+        self._pool = {d: obj for d, obj in self._pool.items() if d in live}
+        self._digests = {id(obj): d for d, obj in self._pool.items()}
+        self._arrays = {k: v for k, v in self._arrays.items() if k in array_keys}
+        self._codecs = {k: v for k, v in self._codecs.items() if k in codec_keys}
+
+    def stats(self) -> Dict[str, int]:
+        """Counts of tenants and of the distinct objects they share"""
+        return {
+            'tenants': len(self._tenants),
+            'configurations': len(self._tools),
+            'interned_objects': len(self._pool),
+            'compiled_array_sets': len(self._arrays),
+            'codecs': len(self._codecs),
+        }
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Configuration Hot Reload for LAI-PrEP Bridge Decision Support Tool
+
+Lets a long-running service pick up edits to lai_prep_config.json without a
+restart. A ConfigWatcher polls the file's mtime and size (and hashes the
+content only when they change); on a real change it parses, validates with
+ConfigValidator and builds a new LAIPrEPDecisionTool with its compiled
+tables, all off the request path, then swaps the active tool in a single
+attribute assignment.
+
+Request handlers read watcher.tool once per request and use that tool to the
+end: in-flight assessments finish on the snapshot they started with, and
+reading the active tool never waits on a reload. A change that fails to
+parse or validate leaves the active tool in place.
+
+Caches are invalidated per section (CohortScorer.successor): an edit that
+only touches interventions keeps the compiled tables, and an edit outside the
+scoring sections (version, clinical_guidance, ...) keeps every cache.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import Callable, Optional, Set
+
+from lai_prep_decision_tool_v2_1 import (
+    BridgePeriodAssessment,
+    Configuration,
+    ConfigurationError,
+    LAIPrEPDecisionTool,
+    PatientProfile
+)
+from validate_config import ConfigValidator
+
+
+DEFAULT_POLL_INTERVAL = 2.0  # seconds
+
+
+def changed_sections(old: Configuration, new: Configuration) -> Set[str]:
+    """Top-level configuration keys whose content differs"""
+    old_data, new_data = old.config, new.config
+    return {
+        key for key in set(old_data) | set(new_data)
+        if old_data.get(key) != new_data.get(key)
+    }
+
+
+class ConfigWatcher:
+    """Active decision tool for a configuration file, reloaded when the file changes"""
+
+    def __init__(
+        self,
+        config_path: str,
+        use_logit: bool = False,
+        interval: float = DEFAULT_POLL_INTERVAL,
+        on_reload: Optional[Callable[[LAIPrEPDecisionTool, Set[str]], None]] = None,
+        on_error: Optional[Callable[[Exception], None]] = None
+    ):
+        """
+        Load the configuration (synchronously, so a bad initial file fails here)
+
+        Args:
+            config_path: Configuration JSON file to watch
+            use_logit: Calculation method for every tool built
+            interval: Seconds between polls once start() is called
+            on_reload: Called with the new tool and the changed sections after a swap
+            on_error: Called with the error when a changed file is rejected
+
+        Raises:
+            ConfigurationError: If the initial configuration is invalid
+        """
+        self.config_path = config_path
+        self.use_logit = use_logit
+        self.interval = interval
+        self.on_reload = on_reload
+        self.on_error = on_error
+
+        self.generation = 0
+        self.last_error: Optional[Exception] = None
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        stat, content = self._read()
+        self._stat = stat
+        self._digest = hashlib.sha256(content).hexdigest()
+        self.tool = self._build(content)
+
+    @property
+    def digest(self) -> str:
+        """SHA-256 of the file content the active tool was built from"""
+        return self._digest
+
+    def assess_patient(self, profile: PatientProfile) -> BridgePeriodAssessment:
+        """Assess on the active tool (the whole call uses one snapshot)"""
+        return self.tool.assess_patient(profile)
+
+    def _read(self):
+        """(stat key, content) of the configuration file"""
+        with open(self.config_path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            content = f.read()
+        return (stat.st_mtime_ns, stat.st_size), content
+
+    def _build(self, content: bytes, previous: Optional[LAIPrEPDecisionTool] = None):
+        """Parse, validate and compile a new tool (raises ConfigurationError)"""
+        try:
+            data = json.loads(content.decode('utf-8'))
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise ConfigurationError(f"Invalid JSON in config file: {e}")
+
+        validator = ConfigValidator(self.config_path, config=data)
+        if not validator.validate(report=False):
+            raise ConfigurationError(
+                f"Configuration failed validation: {'; '.join(validator.errors)}"
+            )
+
+        tool = LAIPrEPDecisionTool(
+            config=Configuration.from_dict(data, config_path=self.config_path),
+            use_logit=self.use_logit
+        )
+        if previous is None:
+            tool._cohort_scorer()
+        else:
+            # Installed before the tool is published, so no lock is needed
+            sections = changed_sections(previous.config, tool.config)
+            tool._scorer = previous._cohort_scorer().successor(tool, sections)
+        return tool
+
+    def poll(self) -> bool:
+        """
+        Reload if the file changed
+
+        Returns:
+            bool: True if a new tool was swapped in
+        """
+        with self._reload_lock:
+            try:
+                stat, content = self._read()
+            except OSError as e:
+                # Mid-replace or briefly missing: keep the active tool, retry next poll
+                self._reject(ConfigurationError(f"Cannot read config file: {e}"))
+                return False
+            if stat == self._stat:
+                return False
+            self._stat = stat
+
+            digest = hashlib.sha256(content).hexdigest()
+            if digest == self._digest:
+                return False
+
+            previous = self.tool
+            try:
+                tool = self._build(content, previous)
+            except Exception as e:
+                self._reject(e)
+                return False
+
+            self._digest = digest
+            self.tool = tool
+            self.generation += 1
+            self.last_error = None
+
+        if self.on_reload is not None:
+            self.on_reload(tool, changed_sections(previous.config, tool.config))
+        return True
+
+    def _reject(self, error: Exception) -> None:
+        """Record a rejected change"""
+        self.last_error = error
+        if self.on_error is not None:
+            self.on_error(error)
+
+    def start(self) -> 'ConfigWatcher':
+        """Poll in a background daemon thread"""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name='lai-prep-config-watcher', daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        """Background loop (callback errors never stop polling)"""
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                self._reject(e)
+
+    def stop(self) -> None:
+        """Stop background polling"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Precompiled Configuration Snapshots for LAI-PrEP Bridge Decision Support Tool
+
+`cli.py compile-config` validates lai_prep_config.json and writes a binary
+snapshot next to it (lai_prep_config.lpcfg). Configuration(path,
+use_snapshot=True), as the CLI commands open it, maps a snapshot read-only
+when it was compiled from the current file, so short-lived invocations skip
+validation and table building: the configuration arrives frozen, and
+CompiledConfig uses the mapped arrays instead of compiling them.
+
+Layout (little-endian), sharing the array layout of shared_config.py:
+    8 bytes   magic b"LPCFGSNP"
+    uint32    snapshot version
+    uint32    reserved (0)
+    32 bytes  SHA-256 digest of the configuration
+    uint64    source file mtime (ns) when compiled
+    uint64    source file size when compiled
+    uint64    index length in bytes
+    uint64    configuration length in bytes
+    index     UTF-8 JSON: code_maps (PatientCodec.SECTIONS -> values in code
+              order, for readers without the JSON) and arrays
+              (name -> [dtype, shape, offset])
+    config    UTF-8 JSON configuration
+    arrays    CompiledConfig.ARRAYS, each on a 64-byte boundary
+
+A snapshot is used only if the source file's mtime and size still match the
+values recorded in it; otherwise Configuration reads the JSON as before.
+Bump SNAPSHOT_VERSION whenever the compiled tables change meaning.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from lai_prep_decision_tool_v2_1 import Configuration, ConfigurationError, FrozenDict
+from compiled_config import CompiledConfig
+from patient_codec import PatientCodec
+from shared_config import array_layout, config_bytes, map_arrays, write_arrays
+
+
+MAGIC = b"LPCFGSNP"
+SNAPSHOT_VERSION = 1
+PREAMBLE = struct.Struct("<8sII32sQQQQ")
+SNAPSHOT_SUFFIX = ".lpcfg"
+
+
+def snapshot_path(config_path: str) -> str:
+    """Snapshot file belonging to a configuration file"""
+    return str(Path(config_path).with_suffix(SNAPSHOT_SUFFIX))
+
+
+def code_maps(codec: PatientCodec) -> Dict[str, list]:
+    """Codec code maps (PatientCodec.SECTIONS -> values in code order)"""
+    values = (codec.populations, codec.prep_statuses, codec.settings,
+              codec.insurance_statuses, codec.barriers)
+    return {section: list(codes) for section, codes in zip(PatientCodec.SECTIONS, values)}
+
+
+def _frozen_array(values: list) -> tuple:
+    """freeze() of a decoded JSON array whose objects are already frozen"""
+    return tuple([_frozen_array(v) if v.__class__ is list else v for v in values])
+
+
+def _frozen_object(pairs) -> FrozenDict:
+    """JSON object hook producing freeze() output while decoding (no second pass)"""
+    return FrozenDict([(k, _frozen_array(v) if v.__class__ is list else v) for k, v in pairs])
+
+
+def write_snapshot(
+    config: Configuration,
+    path: Optional[str] = None,
+    tables: Optional[CompiledConfig] = None
+) -> str:
+    """
+    Write a binary snapshot of a configuration and its compiled tables
+
+    Args:
+        config: Configuration loaded from a file (config_path must be set)
+        path: Snapshot file (next to the configuration file if None)
+        tables: Compiled tables for the configuration (compiled if None)
+
+    Returns:
+        Path of the written snapshot
+    """
+    if config.config_path is None:
+        raise ConfigurationError("Only configurations loaded from a file can be snapshotted")
+    path = path or snapshot_path(config.config_path)
+    stat = os.stat(config.config_path)
+
+    tables = tables if tables is not None else CompiledConfig(config)
+    arrays = tables.arrays()
+    payload = config_bytes(config)
+    digest = hashlib.sha256(payload).digest()
+
+    # Code maps go first in the index; array_layout sizes the arrays entry
+    maps = json.dumps(code_maps(tables.codec))
+    prefix = PREAMBLE.size + len('{"code_maps":,"arrays":}') + len(maps) + len(payload)
+    array_index, array_index_bytes, size = array_layout(arrays, prefix)
+    index_bytes = (
+        '{"code_maps":' + maps + ',"arrays":' + array_index_bytes.decode('utf-8') + '}'
+    ).encode('utf-8')
+
+    buf = bytearray(size)
+    PREAMBLE.pack_into(
+        buf, 0, MAGIC, SNAPSHOT_VERSION, 0, digest,
+        stat.st_mtime_ns, stat.st_size, len(index_bytes), len(payload)
+    )
+    start = PREAMBLE.size
+    buf[start:start + len(index_bytes)] = index_bytes
+    start += len(index_bytes)
+    buf[start:start + len(payload)] = payload
+    write_arrays(memoryview(buf), arrays, array_index)
+
+    # Atomic replace: readers see the old snapshot or the new one, never half
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(buf)
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_snapshot(
+    path: str,
+    source_path: Optional[str] = None
+) -> Tuple[FrozenDict, Dict[str, np.ndarray]]:
+    """
+    Map a snapshot read-only
+
+    Args:
+        path: Snapshot file
+        source_path: Configuration file the snapshot must be current for
+            (not checked if None)
+
+    Returns:
+        (frozen configuration data, read-only array tables)
+
+    Raises:
+        ConfigurationError: If the file is not a usable snapshot or is stale
+    """
+    try:
+        with open(path, 'rb') as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError) as e:
+        raise ConfigurationError(f"Cannot read config snapshot: {e}")
+
+    if len(buf) < PREAMBLE.size:
+        raise ConfigurationError(f"Not a config snapshot: {path}")
+    magic, version, _, digest, mtime_ns, size, index_len, config_len = \
+        PREAMBLE.unpack_from(buf)
+    if magic != MAGIC:
+        raise ConfigurationError(f"Not a config snapshot: {path}")
+    if version != SNAPSHOT_VERSION:
+        raise ConfigurationError(
+            f"Unsupported config snapshot version {version} (expected {SNAPSHOT_VERSION})"
+        )
+    if source_path is not None:
+        stat = os.stat(source_path)
+        if (stat.st_mtime_ns, stat.st_size) != (mtime_ns, size):
+            raise ConfigurationError(f"Config snapshot {path} is stale for {source_path}")
+
+    start = PREAMBLE.size
+    payload = buf[start + index_len:start + index_len + config_len]
+    if hashlib.sha256(payload).digest() != digest:
+        raise ConfigurationError(f"Config snapshot {path} is corrupt")
+    try:
+        index = json.loads(buf[start:start + index_len].decode('utf-8'))
+        if list(index['arrays']) != list(CompiledConfig.ARRAYS):
+            raise ConfigurationError(f"Config snapshot {path} was compiled by another version")
+        data = json.loads(payload.decode('utf-8'), object_pairs_hook=_frozen_object)
+        arrays = map_arrays(buf, index['arrays'])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ConfigurationError(f"Config snapshot {path} is corrupt: {e}")
+    return data, arrays
+
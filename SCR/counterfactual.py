@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Counterfactual Barrier-Removal Analysis for LAI-PrEP Bridge Decision Support Tool
+
+For every patient and every barrier they report, computes how much the
+adjusted success rate improves if that single barrier is resolved, as a
+patients x barriers marginal-effect matrix, then aggregates to "which barrier
+removal buys the most success" per population and healthcare setting.
+
+The structure of both calculation methods is exploited instead of re-running
+assess_patient once per barrier:
+- Linear: impacts are additive, so removing barrier j subtracts its impact
+  and steps the barrier-count penalty down one level.
+- Logit: the sequential shifts leave the patient at the log-odds of the last
+  barrier applied, so removing any other barrier only changes the count
+  penalty, while removing the last one falls back to the previous barrier.
+"""
+
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+from cohort_scoring import CohortScorer, _logit
+
+
+def barrier_removal_effects(scorer: CohortScorer, records: np.ndarray) -> np.ndarray:
+    """
+    Marginal effect of resolving each single barrier
+
+    Args:
+        scorer: CohortScorer for the active configuration and method
+        records: Structured array of PatientCodec records
+
+    Returns:
+        float64 array (patients x barriers) of adjusted success gained when
+        that barrier is removed; 0 where the patient does not have the barrier
+    """
+    tables = scorer.tables
+    n_barriers = tables.n_barriers
+    effects = np.zeros((len(records), n_barriers))
+    if len(records) == 0:
+        return effects
+
+    bits = scorer.barrier_bits(records)
+    population = records['population']
+    baseline = tables.baseline_attrition[population]
+    count = bits.sum(axis=1)
+    current = scorer.adjusted_success(records)
+
+    if scorer.use_logit:
+        barrier_logit = scorer.barrier_logit(bits, baseline)
+
+        # Log-odds each barrier moves a population to (populations x barriers)
+        targets = np.stack([
+            scorer.barrier_target_logit(tables.baseline_attrition, j)
+            for j in range(n_barriers)
+        ], axis=1)
+
+        # Last and second-to-last barrier in application order (-1 if none)
+        last = _highest_bit(bits)
+        remaining = bits.copy()
+        has_last = last >= 0
+        remaining[np.flatnonzero(has_last), last[has_last]] = False
+        previous = _highest_bit(remaining)
+    else:
+        impact_sum = scorer.barrier_impact_sum(bits)
+
+    for j in range(n_barriers):
+        rows = np.flatnonzero(bits[:, j])
+        if len(rows) == 0:
+            continue
+
+        row_baseline = baseline[rows]
+        new_count = count[rows] - 1
+
+        if scorer.use_logit:
+            fallback = np.where(
+                previous[rows] >= 0,
+                targets[population[rows], np.maximum(previous[rows], 0)],
+                _logit(row_baseline)
+            )
+            new_logit = np.where(last[rows] == j, fallback, barrier_logit[rows])
+            success = scorer.success_from_logit(row_baseline, new_logit, new_count)
+        else:
+            success = scorer.success_from_linear(
+                row_baseline, impact_sum[rows] - tables.barrier_impact[j], new_count
+            )
+
+        success = scorer.apply_best_case_floor(records[rows], success, new_count)
+        effects[rows, j] = success - current[rows]
+
+    return effects
+
+
+def _highest_bit(bits: np.ndarray) -> np.ndarray:
+    """Index of the last True column per row, -1 for rows with none"""
+    n_columns = bits.shape[1]
+    last = n_columns - 1 - np.argmax(bits[:, ::-1], axis=1)
+    return np.where(bits.any(axis=1), last, -1)
+
+
+class WhatIfSummary:
+    """Accumulates barrier-removal effects by population and setting"""
+
+    def __init__(self, scorer: CohortScorer):
+        """
+        Args:
+            scorer: CohortScorer whose codec defines the strata
+        """
+        self.codec = scorer.codec
+        self.scorer = scorer
+        n_strata = len(self.codec.populations) * len(self.codec.settings)
+        n_barriers = scorer.tables.n_barriers
+
+        self.patients = np.zeros(n_strata, dtype=np.int64)
+        self.with_barrier = np.zeros((n_strata, n_barriers), dtype=np.int64)
+        self.total_gain = np.zeros((n_strata, n_barriers))
+
+    def add(self, records: np.ndarray, effects: np.ndarray) -> None:
+        """Add a chunk of records and their effect matrix"""
+        n_strata = len(self.patients)
+        stratum = (
+            records['population'].astype(np.int64) * len(self.codec.settings)
+            + records['healthcare_setting']
+        )
+        bits = self.scorer.barrier_bits(records)
+
+        self.patients += np.bincount(stratum, minlength=n_strata)
+        for j in range(effects.shape[1]):
+            self.with_barrier[:, j] += np.bincount(
+                stratum, weights=bits[:, j], minlength=n_strata
+            ).astype(np.int64)
+            self.total_gain[:, j] += np.bincount(
+                stratum, weights=effects[:, j], minlength=n_strata
+            )
+
+    def _group(self, selector: np.ndarray) -> Dict:
+        """Report for the strata selected by a boolean mask"""
+        patients = int(self.patients[selector].sum())
+        with_barrier = self.with_barrier[selector].sum(axis=0)
+        total_gain = self.total_gain[selector].sum(axis=0)
+
+        barriers = {}
+        for j, barrier in enumerate(self.codec.barriers):
+            if with_barrier[j] == 0:
+                continue
+            barriers[barrier] = {
+                "patients_with_barrier": int(with_barrier[j]),
+                "total_success_gain": round(float(total_gain[j]), 4),
+                "mean_success_gain": round(float(total_gain[j] / with_barrier[j]), 4),
+            }
+
+        best = max(barriers, key=lambda b: barriers[b]['total_success_gain'], default=None)
+        return {
+            "patients": patients,
+            "best_barrier_removal": best,
+            "barriers": dict(sorted(
+                barriers.items(), key=lambda item: -item[1]['total_success_gain']
+            )),
+        }
+
+    def to_dict(self, method: str) -> Dict:
+        """Aggregated report: overall, per population, per setting and per pair"""
+        n_settings = len(self.codec.settings)
+        population = np.arange(len(self.patients)) // n_settings
+        setting = np.arange(len(self.patients)) % n_settings
+
+        report = {
+            "method": method,
+            "metric": "adjusted_success gain from resolving one barrier",
+            "overall": self._group(np.ones(len(self.patients), dtype=bool)),
+            "by_population": {},
+            "by_setting": {},
+            "by_population_setting": {},
+        }
+        for p, pop_key in enumerate(self.codec.populations):
+            if self.patients[population == p].sum():
+                report["by_population"][pop_key] = self._group(population == p)
+        for k, setting_key in enumerate(self.codec.settings):
+            if self.patients[setting == k].sum():
+                report["by_setting"][setting_key] = self._group(setting == k)
+        for index in np.flatnonzero(self.patients):
+            pop_key = self.codec.populations[population[index]]
+            setting_key = self.codec.settings[setting[index]]
+            selector = np.arange(len(self.patients)) == index
+            report["by_population_setting"][f"{pop_key}|{setting_key}"] = self._group(selector)
+        return report
+
+
+def what_if_cohort(
+    scorer: CohortScorer,
+    chunks: Iterable[tuple],
+    matrix: Optional[np.ndarray] = None
+) -> Dict:
+    """
+    Run the barrier-removal analysis over a chunked cohort
+
+    Args:
+        scorer: CohortScorer for the active configuration and method
+        chunks: Iterable of (offset, records, patient_ids) chunks
+        matrix: Optional (patients x barriers) array (e.g. an np.memmap) that
+            receives the full marginal-effect matrix
+
+    Returns:
+        Aggregated report (see WhatIfSummary.to_dict)
+    """
+    summary = WhatIfSummary(scorer)
+    for offset, records, _ in chunks:
+        effects = barrier_removal_effects(scorer, records)
+        summary.add(records, effects)
+        if matrix is not None:
+            matrix[offset:offset + len(records)] = effects
+
+    return summary.to_dict("logit" if scorer.use_logit else "linear")
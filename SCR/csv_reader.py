@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Chunked Column Reader for LAI-PrEP Batch CSV Input
+
+Reads batch CSV files in large byte blocks and hands them on column-wise, so
+the consumers (input_validation.py) can map each column to codes in bulk
+instead of building a dictionary per row:
+
+- Blocks are split with two bulk string operations, one replace and one
+  split, after a NumPy check that every line has the header's number of
+  fields. Quoted cells such as barrier lists are unquoted in bulk first:
+  the block is split at its quotes and the commas of every other piece are
+  swapped for a stand-in, restored per column afterwards. CRLF line endings
+  are normalized.
+- Blocks the bulk path cannot take exactly (doubled quotes, quoted line
+  breaks, malformed or blank rows) go through csv.reader.
+
+Blocks and parallel byte ranges end on safe line boundaries: a newline
+outside quotes, found by tracking quote parity. Doubled quotes ("") inside a
+quoted field count twice, so the parity stays correct.
+
+Blank lines are skipped, as csv.DictReader does.
+"""
+
+import csv
+import io
+import os
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+DEFAULT_BLOCK_BYTES = 8 << 20
+
+NEWLINE, COMMA, QUOTE = ord('\n'), ord(','), ord('"')
+
+# Stand-ins while a block is split in bulk: commas inside quoted cells, and
+# the separator used to join cells for bulk replacement (ASCII unit and
+# record separators, which batch files do not contain)
+QUOTED_COMMA = b'\x1f'
+CELL_SEPARATOR = b'\x1e'
+
+_SEPARATORS = np.zeros(256, dtype=bool)
+_SEPARATORS[[COMMA, NEWLINE]] = True
+
+
+@dataclass
+class RawColumns:
+    """Cells of a run of CSV rows, column by column"""
+    columns: List[Sequence[str]]  # One sequence of cells per header column
+    size: int  # Number of rows
+    malformed: Optional[np.ndarray] = None  # Rows with the wrong number of cells
+    rows: Optional[List[List[str]]] = None  # Original rows (kept when some are malformed)
+
+    def row(self, k: int) -> List[str]:
+        """Cells of row k as read"""
+        if self.rows is not None:
+            return self.rows[k]
+        return [column[k] for column in self.columns]
+
+    def slice(self, start: int, stop: int) -> 'RawColumns':
+        """Rows start to stop"""
+        return RawColumns(
+            columns=[column[start:stop] for column in self.columns],
+            size=min(stop, self.size) - start,
+            malformed=None if self.malformed is None else self.malformed[start:stop],
+            rows=None if self.rows is None else self.rows[start:stop],
+        )
+
+
+def columns_from_rows(rows: List[List[str]], width: int) -> RawColumns:
+    """Column view of parsed rows; short or long rows are marked malformed and padded"""
+    n = len(rows)
+    malformed = np.fromiter(map(len, rows), dtype=np.int64, count=n) != width
+    raw_rows = None
+    if malformed.any():
+        raw_rows = rows
+        rows = [row if len(row) == width else (row + [''] * width)[:width] for row in rows]
+    else:
+        malformed = None
+    columns = list(zip(*rows)) if n else [() for _ in range(width)]
+    return RawColumns(columns=columns, size=n, malformed=malformed, rows=raw_rows)
+
+
+def _flatten(block: bytes) -> Optional[bytes]:
+    """
+    The block with LF line endings and without quotes, commas inside quoted
+    cells replaced by QUOTED_COMMA; None if it needs csv.reader (doubled
+    quotes, quoted line breaks, quotes inside a cell, stray carriage returns)
+    """
+    if b'\r' in block:
+        block = block.replace(b'\r\n', b'\n')
+        if b'\r' in block:
+            return None
+    if QUOTED_COMMA in block or CELL_SEPARATOR in block:
+        return None
+    if b'"' not in block:
+        return block
+    data = np.frombuffer(block, dtype=np.uint8)
+    quotes = np.flatnonzero(data == QUOTE)
+    if len(quotes) % 2:
+        return None
+    # Quotes must enclose whole cells: each opens after a separator and closes
+    # before one (data[-1] is the block's final newline, so a quote at 0 passes)
+    if not (_SEPARATORS[data[quotes[0::2] - 1]].all() and
+            _SEPARATORS[data[quotes[1::2] + 1]].all()):
+        return None
+    parts = block.split(b'"')
+    quoted = CELL_SEPARATOR.join(parts[1::2])
+    if b'\n' in quoted:
+        return None
+    parts[1::2] = quoted.replace(b',', QUOTED_COMMA).split(CELL_SEPARATOR)
+    return b''.join(parts)
+
+
+def _restore_commas(cells: List[str]) -> List[str]:
+    """Put back the commas of quoted cells"""
+    separator = CELL_SEPARATOR.decode()
+    return separator.join(cells).replace(QUOTED_COMMA.decode(), ',').split(separator)
+
+
+def parse_block(block: bytes, width: int) -> RawColumns:
+    """
+    Parse a block of whole CSV lines (ending with a newline) into columns
+
+    Args:
+        block: UTF-8 bytes starting and ending on line boundaries
+        width: Number of header columns
+    """
+    flat = _flatten(block) if width > 1 else None
+    if flat is not None:
+        data = np.frombuffer(flat, dtype=np.uint8)
+        newlines = np.flatnonzero(data == NEWLINE)
+        commas = np.flatnonzero(data == COMMA)
+        per_line = np.diff(np.searchsorted(commas, newlines), prepend=0)
+        if len(newlines) and (per_line == width - 1).all():
+            # Every line has `width` cells: one split yields them row-major
+            cells = flat[:-1].decode('utf-8').replace('\n', ',').split(',')
+            columns = [cells[j::width] for j in range(width)]
+            stand_ins = np.flatnonzero(data == QUOTED_COMMA[0])
+            if len(stand_ins):
+                # Column of each stand-in: commas before it on its own line
+                line_starts = np.concatenate(([0], newlines + 1))[
+                    np.searchsorted(newlines, stand_ins)]
+                positions = (np.searchsorted(commas, stand_ins) -
+                             np.searchsorted(commas, line_starts))
+                for j in np.unique(positions).tolist():
+                    columns[j] = _restore_commas(columns[j])
+            return RawColumns(columns=columns, size=len(newlines))
+    text = block.decode('utf-8')
+    rows = [row for row in csv.reader(io.StringIO(text, newline='')) if row]
+    return columns_from_rows(rows, width)
+
+
+def read_header(path: str) -> Tuple[List[str], int]:
+    """Header row of a CSV file and the byte offset of the first data row"""
+    with open(path, 'rb') as f:
+        block = f.read(DEFAULT_BLOCK_BYTES)
+        buffer = b''
+        while block:
+            buffer += block
+            end = _last_safe_newline(buffer, first=True)
+            if end:
+                header = next(csv.reader(io.StringIO(buffer[:end].decode('utf-8'),
+                                                     newline='')), [])
+                return header, end
+            block = f.read(DEFAULT_BLOCK_BYTES)
+    header = next(csv.reader(io.StringIO(buffer.decode('utf-8'), newline='')), [])
+    return header, len(buffer)
+
+
+def _last_safe_newline(buffer: bytes, first: bool = False) -> int:
+    """
+    Length of the longest (or, with first, shortest) prefix of buffer that
+    ends with a newline outside quotes; 0 if there is none. The buffer must
+    start on a line boundary.
+    """
+    if first:
+        quotes = 0
+        position = 0
+        while True:
+            newline = buffer.find(b'\n', position)
+            if newline < 0:
+                return 0
+            quotes += buffer.count(b'"', position, newline)
+            position = newline + 1
+            if quotes % 2 == 0:
+                return position
+    end = buffer.rfind(b'\n')
+    if end < 0:
+        return 0
+    quotes = buffer.count(b'"', 0, end)
+    while quotes % 2:
+        previous = buffer.rfind(b'\n', 0, end)
+        if previous < 0:
+            return 0
+        quotes -= buffer.count(b'"', previous, end)
+        end = previous
+    return end + 1
+
+
+def iter_blocks(
+    path: str,
+    start: int,
+    stop: Optional[int] = None,
+    block_bytes: int = DEFAULT_BLOCK_BYTES
+) -> Iterator[bytes]:
+    """
+    Blocks of whole lines from the byte range start-stop
+
+    start (and stop, when given) must lie on safe line boundaries, as
+    returned by read_header and split_ranges. The last block gets a newline
+    if the file does not end with one.
+    """
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = (os.path.getsize(path) if stop is None else stop) - start
+        carry = b''
+        while remaining > 0:
+            block = f.read(min(block_bytes, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            carry += block
+            end = _last_safe_newline(carry)
+            if end:
+                yield carry[:end]
+                carry = carry[end:]
+        if carry:
+            yield carry if carry.endswith(b'\n') else carry + b'\n'
+
+
+def _safe_boundaries(path: str, targets: List[int], start: int,
+                     block_bytes: int = DEFAULT_BLOCK_BYTES) -> List[int]:
+    """
+    First safe line boundary at or after each target offset (targets sorted)
+
+    One sequential pass from start counts quotes, so a newline inside a
+    quoted cell is never taken as a boundary. Targets past the last newline
+    map to the end of the file.
+    """
+    size = os.path.getsize(path)
+    bounds = []
+    pending = iter(targets)
+    target = next(pending, None)
+    quotes = 0
+    with open(path, 'rb') as f:
+        f.seek(start)
+        offset = start
+        while target is not None:
+            block = f.read(block_bytes)
+            if not block:
+                break
+            position = 0
+            while target is not None:
+                if bounds and target <= bounds[-1]:
+                    # No safe boundary between this target and the previous one
+                    bounds.append(bounds[-1])
+                    target = next(pending, None)
+                    continue
+                search = max(target - offset, position)
+                newline = block.find(b'\n', search) if search < len(block) else -1
+                if newline < 0:
+                    break
+                quotes += block.count(b'"', position, newline)
+                position = newline + 1
+                if quotes % 2 == 0:
+                    bounds.append(offset + position)
+                    target = next(pending, None)
+            quotes += block.count(b'"', position)
+            offset += len(block)
+    return bounds + [size] * (len(targets) - len(bounds))
+
+
+def split_ranges(path: str, parts: int, start: int,
+                 block_bytes: int = DEFAULT_BLOCK_BYTES) -> List[Tuple[int, int]]:
+    """
+    Split the data rows (from byte start) into about `parts` non-empty byte
+    ranges of similar size, each beginning and ending on a safe line boundary
+    """
+    size = os.path.getsize(path)
+    targets = [start + (size - start) * i // parts for i in range(1, parts)]
+    bounds = [start]
+    for bound in _safe_boundaries(path, targets, start, block_bytes) + [size]:
+        if bound > bounds[-1]:
+            bounds.append(bound)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def shard_range(path: str, index: int, count: int, start: int,
+                block_bytes: int = DEFAULT_BLOCK_BYTES) -> Tuple[int, int]:
+    """
+    Byte range of shard index (0-based) of count over the data rows from start
+
+    Every process computes all count + 1 boundaries in one pass with the
+    same rule and takes its own pair, so the shards of one file tile the
+    data rows and cover each row exactly once. A shard may be empty when
+    the file has fewer lines than shards.
+    """
+    size = os.path.getsize(path)
+    targets = [start + (size - start) * k // count for k in range(1, count)]
+    bounds = [start] + _safe_boundaries(path, targets, start, block_bytes) + [size]
+    return bounds[index], bounds[index + 1]
+
+
+def iter_raw_chunks(
+    path: str,
+    width: int,
+    start: int,
+    stop: Optional[int] = None,
+    chunk_size: int = 65536,
+    block_bytes: int = DEFAULT_BLOCK_BYTES
+) -> Iterator[RawColumns]:
+    """Column chunks of at most chunk_size rows from the byte range start-stop"""
+    for block in iter_blocks(path, start, stop, block_bytes):
+        raw = parse_block(block, width)
+        if raw.size <= chunk_size:
+            if raw.size:
+                yield raw
+            continue
+        for offset in range(0, raw.size, chunk_size):
+            yield raw.slice(offset, offset + chunk_size)
+
+
+def count_records(
+    path: str,
+    start: Optional[int] = None,
+    stop: Optional[int] = None,
+    block_bytes: int = DEFAULT_BLOCK_BYTES
+) -> int:
+    """
+    Number of data rows in a CSV file, or in the byte range start-stop
+    (safe line boundaries); blank lines are not counted
+    """
+    if start is None:
+        start = read_header(path)[1]
+    count = 0
+    for block in iter_blocks(path, start, stop, block_bytes):
+        flat = _flatten(block)
+        if flat is None:
+            count += sum(1 for row in csv.reader(io.StringIO(block.decode('utf-8'), newline=''))
+                         if row)
+            continue
+        newlines = np.frombuffer(flat, dtype=np.uint8) == NEWLINE
+        blank = int(newlines[0]) + int((newlines[1:] & newlines[:-1]).sum())
+        count += int(newlines.sum()) - blank
+    return count
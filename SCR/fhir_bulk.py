@@ -0,0 +1,731 @@
+#!/usr/bin/env python3
+"""
+FHIR Bulk Data Input for LAI-PrEP Bridge Decision Support Tool
+
+Reads the NDJSON files of a FHIR Bulk Data $export (Patient, Condition,
+Observation and QuestionnaireResponse resources) as batch input, in three
+passes with bounded memory:
+
+1. Parse: files are cut into byte ranges on line boundaries (gzip files are
+   read whole) and parsed by worker processes. Each resource is reduced to
+   a few short facts keyed by patient id (demographics, matched rule, HIV
+   test date); resources no rule matches leave nothing. Workers sort their facts in
+   runs of at most `run_facts` and spill them to temporary files.
+2. Join: the sorted runs are merged (heapq.merge, in passes of at most
+   MERGE_FAN_IN files), so all facts of one patient arrive together. Memory
+   depends on the run size, not on the size of the export.
+3. Map: each patient's facts become a profile row through the code-mapping
+   rules (DEFAULT_FHIR_MAP, extended by a JSON map file). The rows are
+   validated by InputValidator like CSV rows, so rejects, the data-quality
+   report and encoded chunks work as for CSV input.
+
+Patients come out sorted by id, so a run is reproducible and can be resumed.
+Ages and the recent HIV test flag are computed at the `as_of` date: the
+export's transactionTime when read from a manifest, otherwise the date the
+newest NDJSON file was written.
+"""
+
+import copy
+import csv
+import gzip
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import re
+import tempfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from csv_reader import DEFAULT_BLOCK_BYTES
+from input_validation import (
+    DEFAULT_RANGE_BYTES,
+    DEFAULT_VALIDATION_CHUNK_SIZE,
+    PROFILE_COLUMNS,
+    REJECT_COLUMNS,
+    InputValidator,
+    ValidatedChunk
+)
+from patient_codec import BOOLEAN_FIELDS, DEFAULT_FLAGS, DEFAULT_INSURANCE, DEFAULT_SETTING, PatientCodec
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:  # Optional dependency
+    _loads = json.loads
+
+
+LOINC = 'http://loinc.org'
+SNOMED = 'http://snomed.info/sct'
+ICD10CM = 'http://hl7.org/fhir/sid/icd-10-cm'
+
+RESOURCE_TYPES = ('Patient', 'Condition', 'Observation', 'QuestionnaireResponse')
+FHIR_SUFFIXES = ('.ndjson', '.ndjson.gz')
+
+# Profile rows handed to InputValidator
+FHIR_COLUMNS = ('patient_id',) + PROFILE_COLUMNS
+
+# Facts held in memory per worker before a sorted run is spilled
+DEFAULT_RUN_FACTS = 500_000
+
+# Run files merged at once
+MERGE_FAN_IN = 256
+
+# Condition clinical statuses that apply a rule's inactive_value instead
+INACTIVE_CONDITION = ('inactive', 'remission', 'resolved')
+
+# Resource statuses (and Condition verification statuses) that are ignored
+IGNORED_STATUSES = ('entered-in-error', 'cancelled', 'refuted')
+
+SINGLE_FIELDS = {
+    'population': 'populations',
+    'current_prep_status': 'prep_statuses',
+    'healthcare_setting': 'settings',
+    'insurance_status': 'insurance_statuses',
+}
+FLAG_FIELDS = ('transportation_access', 'childcare_needs')
+RULE_FIELDS = tuple(SINGLE_FIELDS) + FLAG_FIELDS + ('barriers', 'recent_hiv_test')
+
+_YES = [f'{LOINC}|LA33-6', 'true']
+
+# Rules apply in order: for single-valued fields the first matching rule wins.
+# Codes are 'system|code' or a bare code (any system); a trailing * matches a
+# prefix. Dots are ignored, so Z33.1 and Z331 are the same ICD-10 code.
+DEFAULT_FHIR_MAP = {
+    'defaults': {
+        'population': 'GENERAL',
+        'current_prep_status': 'naive',
+        'healthcare_setting': DEFAULT_SETTING,
+        'insurance_status': DEFAULT_INSURANCE,
+    },
+    'recent_test_days': 7,
+    'rules': [
+        {'resource': 'Condition', 'field': 'population', 'value': 'PREGNANT_LACTATING',
+         'codes': [f'{ICD10CM}|Z33*', f'{ICD10CM}|Z34*', f'{ICD10CM}|Z39.1',
+                   f'{SNOMED}|77386006']},
+        {'resource': 'Condition', 'field': 'population', 'value': 'PWID',
+         'codes': [f'{ICD10CM}|F11*']},
+        {'resource': 'Observation', 'field': 'population', 'value': 'TRANSGENDER_WOMEN',
+         'codes': [f'{LOINC}|76691-5'], 'answers': [f'{SNOMED}|407376001']},
+        {'resource': 'Patient', 'field': 'population', 'value': 'ADOLESCENT', 'max_age': 24},
+        {'resource': 'Observation', 'field': 'population', 'value': 'MSM', 'gender': 'male',
+         'codes': [f'{LOINC}|76690-7'], 'answers': [f'{SNOMED}|38628009', f'{SNOMED}|42035005']},
+        {'resource': 'Patient', 'field': 'population', 'value': 'CISGENDER_WOMEN',
+         'gender': 'female'},
+        {'resource': 'Condition', 'field': 'current_prep_status', 'value': 'oral_prep',
+         'inactive_value': 'discontinued_oral', 'codes': [f'{ICD10CM}|Z29.81']},
+        {'resource': 'Observation', 'field': 'recent_hiv_test',
+         'codes': [f'{LOINC}|75622-1', f'{LOINC}|56888-1', f'{LOINC}|7917-8',
+                   f'{LOINC}|68961-2', f'{LOINC}|25835-0']},
+        {'resource': 'Condition', 'field': 'barriers', 'value': 'SUBSTANCE_USE',
+         'codes': [f'{ICD10CM}|F1*']},
+        {'resource': 'Condition', 'field': 'barriers', 'value': 'HOUSING_INSTABILITY',
+         'codes': [f'{ICD10CM}|Z59.0*', f'{ICD10CM}|Z59.1', f'{ICD10CM}|Z59.81*']},
+        {'resource': ['Observation', 'QuestionnaireResponse'], 'field': 'barriers',
+         'value': 'HOUSING_INSTABILITY', 'codes': [f'{LOINC}|93033-9'], 'answers': _YES},
+        {'resource': 'Condition', 'field': 'barriers', 'value': 'TRANSPORTATION',
+         'codes': [f'{ICD10CM}|Z59.82']},
+        {'resource': ['Observation', 'QuestionnaireResponse'], 'field': 'barriers',
+         'value': 'TRANSPORTATION', 'codes': [f'{LOINC}|93030-5'],
+         'answers': [f'{LOINC}|LA30133-9', f'{LOINC}|LA30134-7'] + _YES},
+        {'resource': 'Condition', 'field': 'transportation_access', 'value': False,
+         'codes': [f'{ICD10CM}|Z59.82']},
+        {'resource': ['Observation', 'QuestionnaireResponse'], 'field': 'transportation_access',
+         'value': False, 'codes': [f'{LOINC}|93030-5'],
+         'answers': [f'{LOINC}|LA30133-9', f'{LOINC}|LA30134-7'] + _YES},
+        {'resource': 'Condition', 'field': 'barriers', 'value': 'LEGAL_CONCERNS',
+         'codes': [f'{ICD10CM}|Z65.3']},
+    ],
+}
+
+_PATIENT_REFERENCE = re.compile(r'(?:^|/)Patient/([^/]+)')
+
+
+def _normalize(code: str) -> str:
+    """Matching form of a code (dots removed, upper case)"""
+    return code.strip().replace('.', '').upper()
+
+
+def _split_token(token: str) -> Tuple[str, str]:
+    """(system, normalized code) of a 'system|code' or bare code"""
+    system, _, code = token.rpartition('|')
+    return system, _normalize(code)
+
+
+def load_fhir_map(path: Optional[str] = None) -> Dict:
+    """
+    Code-mapping rules: DEFAULT_FHIR_MAP, extended by a JSON map file
+
+    The file may set 'defaults' and 'recent_test_days', and list 'rules'
+    that apply before the default rules (all default rules are dropped
+    if it sets "replace_rules": true).
+    """
+    mapping = copy.deepcopy(DEFAULT_FHIR_MAP)
+    if path is None:
+        return mapping
+    with open(path, 'r') as f:
+        custom = json.load(f)
+    mapping['defaults'].update(custom.get('defaults', {}))
+    mapping['recent_test_days'] = custom.get('recent_test_days', mapping['recent_test_days'])
+    rules = custom.get('rules', [])
+    mapping['rules'] = rules if custom.get('replace_rules') else rules + mapping['rules']
+    return mapping
+
+
+class FHIRMapping:
+    """Compiled code-mapping rules"""
+
+    def __init__(self, mapping: Dict, codec: Optional[PatientCodec] = None):
+        """
+        Args:
+            mapping: Mapping as from load_fhir_map
+            codec: Codec whose code maps rule values are checked against
+
+        Raises:
+            ValueError: If a rule names an unknown resource, field or value
+        """
+        self.mapping = mapping
+        self.rules = mapping['rules']
+        self.defaults = mapping['defaults']
+        self.recent_test_days = mapping['recent_test_days']
+        # resource -> normalized code -> [(system, rule)], and prefix rules
+        self._exact: Dict[str, Dict[str, List[Tuple[str, int]]]] = {t: {} for t in RESOURCE_TYPES}
+        self._prefix: Dict[str, List[Tuple[str, str, int]]] = {t: [] for t in RESOURCE_TYPES}
+        self._answers: List[Optional[set]] = []
+        self.patient_rules: List[int] = []
+
+        for index, rule in enumerate(self.rules):
+            self._check(index, rule, codec)
+            resources = rule['resource']
+            resources = [resources] if isinstance(resources, str) else resources
+            self._answers.append(
+                {_split_token(a) for a in rule['answers']} if rule.get('answers') else None
+            )
+            if resources == ['Patient']:
+                self.patient_rules.append(index)
+                continue
+            for token in rule.get('codes', []):
+                system, code = _split_token(token)
+                for resource in resources:
+                    if code.endswith('*'):
+                        self._prefix[resource].append((system, code[:-1], index))
+                    else:
+                        self._exact[resource].setdefault(code, []).append((system, index))
+
+    def _check(self, index: int, rule: Dict, codec: Optional[PatientCodec]) -> None:
+        """Validate one rule"""
+        resources = rule.get('resource')
+        resources = [resources] if isinstance(resources, str) else resources or []
+        field = rule.get('field')
+        if not resources or any(r not in RESOURCE_TYPES for r in resources):
+            raise ValueError(f"FHIR map rule {index}: resource must be one of {RESOURCE_TYPES}")
+        if field not in RULE_FIELDS:
+            raise ValueError(f"FHIR map rule {index}: unknown field {field!r}")
+        if resources != ['Patient'] and not rule.get('codes'):
+            raise ValueError(f"FHIR map rule {index}: codes are required for {resources}")
+        if field != 'recent_hiv_test' and 'value' not in rule:
+            raise ValueError(f"FHIR map rule {index}: value is required for {field}")
+        if codec is None:
+            return
+        allowed = (getattr(codec, SINGLE_FIELDS[field]) if field in SINGLE_FIELDS else
+                   codec.barriers if field == 'barriers' else None)
+        for key in ('value', 'inactive_value'):
+            if key in rule and allowed is not None and rule[key] not in allowed:
+                raise ValueError(f"FHIR map rule {index}: unknown {field} {rule[key]!r}")
+
+    def match(self, resource: str, codings: Iterable[Tuple[str, str]], linked: bool = False) -> List[int]:
+        """
+        Rules whose codes match
+
+        Args:
+            resource: Resource type
+            codings: (system, normalized code) pairs
+            linked: Codes are QuestionnaireResponse linkIds (systems ignored)
+        """
+        exact, prefixes = self._exact[resource], self._prefix[resource]
+        matched = []
+        for system, code in codings:
+            for rule_system, index in exact.get(code, ()):
+                if linked or rule_system in ('', system):
+                    matched.append(index)
+            for rule_system, prefix, index in prefixes:
+                if code.startswith(prefix) and (linked or rule_system in ('', system)):
+                    matched.append(index)
+        return matched
+
+    def answered(self, index: int, answers: List[Tuple[str, str]]) -> bool:
+        """True if a rule needs no answer or one of answers matches"""
+        expected = self._answers[index]
+        if expected is None:
+            return True
+        return any((system, code) in expected or ('', code) in expected
+                   for system, code in answers)
+
+    def digest(self) -> str:
+        """Content digest of the rules (recorded with a batch run's settings)"""
+        text = json.dumps(self.mapping, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(text.encode()).hexdigest()
+
+
+def is_fhir_export(path: str) -> bool:
+    """True if path names a bulk export: a directory, an NDJSON file or a manifest"""
+    name = Path(path).name.lower()
+    return Path(path).is_dir() or name.endswith(FHIR_SUFFIXES) or name.endswith('.json')
+
+
+def export_files(path: str) -> Tuple[List[str], Optional[str]]:
+    """
+    NDJSON files of a bulk export and its transactionTime (if known)
+
+    Args:
+        path: Directory of .ndjson(.gz) files, one such file, or a saved
+            $export status response (manifest) whose output files were
+            downloaded next to it
+    """
+    source = Path(path)
+    if source.is_dir():
+        files = sorted(str(p) for p in source.iterdir()
+                       if p.is_file() and p.name.lower().endswith(FHIR_SUFFIXES))
+        return files, None
+    if source.name.lower().endswith(FHIR_SUFFIXES):
+        return [str(source)], None
+    with open(source, 'r') as f:
+        manifest = json.load(f)
+    if 'output' not in manifest:
+        raise ValueError(f"{path} is not a bulk export manifest (no 'output' list)")
+    files = []
+    for entry in manifest['output']:
+        if entry.get('type') not in RESOURCE_TYPES:
+            continue
+        url = entry['url']
+        local = url[len('file://'):] if url.startswith('file://') else url.rsplit('/', 1)[-1]
+        files.append(str(source.parent / local))
+    return files, manifest.get('transactionTime')
+
+
+def export_identity(path: str) -> Dict:
+    """input_identity for a bulk export: total size and newest modification of its files"""
+    files, _ = export_files(path)
+    stats = [os.stat(f) for f in files]
+    return {
+        'input': str(Path(path).resolve()),
+        'input_size': sum(s.st_size for s in stats),
+        'input_mtime_ns': max((s.st_mtime_ns for s in stats), default=0),
+    }
+
+
+def export_date(path: str) -> date:
+    """Default as_of date: transactionTime, else the day the newest file was written (UTC)"""
+    files, transaction_time = export_files(path)
+    if transaction_time:
+        return date.fromisoformat(transaction_time[:10])
+    newest = max((os.stat(f).st_mtime for f in files), default=0)
+    return datetime.fromtimestamp(newest, timezone.utc).date()
+
+
+def _line_ranges(path: str, range_bytes: int) -> List[Tuple[int, int]]:
+    """Byte ranges of about range_bytes ending on line boundaries (one range for gzip)"""
+    size = os.path.getsize(path)
+    if path.lower().endswith('.gz'):
+        return [(0, size)]
+    ranges, start = [], 0
+    with open(path, 'rb') as f:
+        while start < size:
+            stop = start + range_bytes
+            if stop >= size:
+                stop = size
+            else:
+                f.seek(stop)
+                f.readline()
+                stop = f.tell()
+            ranges.append((start, stop))
+            start = stop
+    return ranges
+
+
+def _iter_lines(path: str, start: int, stop: int) -> Iterator[bytes]:
+    """Lines of a byte range (the whole file for gzip)"""
+    if path.lower().endswith('.gz'):
+        with gzip.open(path, 'rb') as f:
+            yield from f
+        return
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining, tail = stop - start, b''
+        while remaining > 0:
+            block = f.read(min(DEFAULT_BLOCK_BYTES, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            lines = (tail + block).split(b'\n')
+            tail = lines.pop()
+            yield from lines
+        if tail:
+            yield tail
+
+
+def _codings(concept) -> List[Tuple[str, str]]:
+    """(system, normalized code) pairs of a CodeableConcept or Coding"""
+    if not isinstance(concept, dict):
+        return []
+    codings = concept.get('coding', [concept] if 'code' in concept else [])
+    return [(c.get('system', ''), _normalize(c['code'])) for c in codings if c.get('code')]
+
+
+def _value_codings(holder: Dict) -> List[Tuple[str, str]]:
+    """Answer codes of an Observation value or a QuestionnaireResponse answer"""
+    if 'valueBoolean' in holder:
+        return [('', 'TRUE' if holder['valueBoolean'] else 'FALSE')]
+    return _codings(holder.get('valueCodeableConcept') or holder.get('valueCoding'))
+
+
+def _effective_date(observation: Dict) -> str:
+    """ISO date an observation was made ('' if unknown or partial)"""
+    when = (observation.get('effectiveDateTime') or observation.get('effectiveInstant')
+            or (observation.get('effectivePeriod') or {}).get('start')
+            or observation.get('issued') or '')
+    return when[:10] if len(when) >= 10 else ''
+
+
+def _subject(resource: Dict) -> Optional[str]:
+    """Patient id a resource refers to (None for unresolvable references)"""
+    match = _PATIENT_REFERENCE.search((resource.get('subject') or {}).get('reference', ''))
+    return match.group(1) if match else None
+
+
+def _items(items: List[Dict]) -> Iterator[Dict]:
+    """QuestionnaireResponse items, including nested ones"""
+    for item in items:
+        yield item
+        yield from _items(item.get('item', []))
+        for answer in item.get('answer', []):
+            yield from _items(answer.get('item', []))
+
+
+def resource_facts(resource: Dict, rules: FHIRMapping) -> Tuple[Optional[str], List[str]]:
+    """
+    Facts one resource contributes to its patient
+
+    Returns:
+        (patient id, facts) with facts as tab-separated text:
+        'P gender birthDate deceased', 'R rule active' or 'T date'
+    """
+    kind = resource.get('resourceType')
+    if kind == 'Patient':
+        deceased = resource.get('deceasedBoolean') or bool(resource.get('deceasedDateTime'))
+        return resource.get('id'), [
+            f"P\t{resource.get('gender', '')}\t{resource.get('birthDate', '')}\t{int(bool(deceased))}"
+        ]
+    if kind not in RESOURCE_TYPES or resource.get('status') in IGNORED_STATUSES:
+        return None, []
+    facts = []
+    if kind == 'Condition':
+        verification = {code.lower() for _, code in _codings(resource.get('verificationStatus'))}
+        if verification.intersection(IGNORED_STATUSES):
+            return None, []
+        clinical = {code.lower() for _, code in _codings(resource.get('clinicalStatus'))}
+        active = not clinical.intersection(INACTIVE_CONDITION)
+        for index in rules.match(kind, _codings(resource.get('code'))):
+            if active or 'inactive_value' in rules.rules[index]:
+                facts.append(f"R\t{index:04d}\t{'A' if active else 'I'}")
+    elif kind == 'Observation':
+        answers = _value_codings(resource)
+        for index in rules.match(kind, _codings(resource.get('code'))):
+            if rules.rules[index]['field'] == 'recent_hiv_test':
+                when = _effective_date(resource)
+                if when:
+                    facts.append(f"T\t{when}")
+            elif rules.answered(index, answers):
+                facts.append(f"R\t{index:04d}\tA")
+    else:
+        for item in _items(resource.get('item', [])):
+            link = _normalize(item.get('linkId', ''))
+            links = {('', link), ('', link.rsplit('/', 1)[-1])}
+            answers = [a for answer in item.get('answer', []) for a in _value_codings(answer)]
+            for index in rules.match(kind, links, linked=True):
+                if rules.answered(index, answers):
+                    facts.append(f"R\t{index:04d}\tA")
+    return (_subject(resource) if facts else None), facts
+
+
+def _spill(facts: List[str], tmp_dir: str) -> str:
+    """Write facts as one sorted run file"""
+    facts.sort()
+    with tempfile.NamedTemporaryFile('w', dir=tmp_dir, suffix='.run', delete=False,
+                                     encoding='utf-8') as f:
+        f.writelines(facts)
+        return f.name
+
+
+def _parse_range(args: Tuple) -> Tuple[List[str], Dict[str, int]]:
+    """Worker task: facts of one byte range as sorted run files, and line counts"""
+    path, start, stop, mapping, tmp_dir, run_facts = args
+    rules = FHIRMapping(mapping)
+    counts: Counter = Counter()
+    facts: List[str] = []
+    runs = []
+    for line in _iter_lines(path, start, stop):
+        if not line.strip():
+            continue
+        counts['lines'] += 1
+        try:
+            resource = _loads(line)
+        except ValueError:
+            raise ValueError(f"Invalid NDJSON line in {path}: {line[:80]!r}")
+        kind = resource.get('resourceType', '')
+        counts[kind] += 1
+        patient_id, found = resource_facts(resource, rules)
+        if kind == 'Patient' and found[0].endswith('\t1'):
+            counts['deceased'] += 1
+        if found and patient_id is None:
+            counts['unresolved_references'] += 1
+            continue
+        facts.extend(f"{patient_id}\t{fact}\n" for fact in found)
+        if len(facts) >= run_facts:
+            runs.append(_spill(facts, tmp_dir))
+            facts = []
+    if facts:
+        runs.append(_spill(facts, tmp_dir))
+    return runs, dict(counts)
+
+
+def _merge_files(paths: List[str], tmp_dir: str) -> str:
+    """Merge sorted run files into one"""
+    with ExitStack() as stack:
+        files = [stack.enter_context(open(p, 'r', encoding='utf-8')) for p in paths]
+        with tempfile.NamedTemporaryFile('w', dir=tmp_dir, suffix='.run', delete=False,
+                                         encoding='utf-8') as out:
+            out.writelines(heapq.merge(*files))
+    for p in paths:
+        os.remove(p)
+    return out.name
+
+
+def _age(birth_date: str, as_of: date) -> str:
+    """Age cell at as_of ('' if unknown; unparsable dates are passed on to be rejected)"""
+    if not birth_date:
+        return ''
+    try:
+        parts = [int(p) for p in birth_date[:10].split('-')]
+    except ValueError:
+        return birth_date
+    year, month, day = (parts + [1, 1])[:3]
+    return str(as_of.year - year - ((as_of.month, as_of.day) < (month, day)))
+
+
+class FHIRBulkSource:
+    """Batch patients joined from a FHIR Bulk Data export"""
+
+    def __init__(
+        self,
+        path: str,
+        codec: PatientCodec,
+        rejects_path: Optional[str] = None,
+        mapping: Optional[Dict] = None,
+        as_of: Optional[date] = None,
+        chunk_size: int = DEFAULT_VALIDATION_CHUNK_SIZE,
+        workers: int = 1,
+        tmp_dir: Optional[str] = None,
+        run_facts: int = DEFAULT_RUN_FACTS,
+        range_bytes: int = DEFAULT_RANGE_BYTES
+    ):
+        """
+        Args:
+            path: Export directory, NDJSON file or manifest (see export_files)
+            codec: PatientCodec of the configuration
+            rejects_path: CSV for rejected patients (row_number, reject_reasons, then
+                FHIR_COLUMNS); created only if a patient is rejected
+            mapping: Code-mapping rules (default: DEFAULT_FHIR_MAP)
+            as_of: Date for ages and recent HIV tests (default: export_date)
+            chunk_size: Patients validated per chunk
+            workers: Processes parsing files in parallel
+            tmp_dir: Directory for sorted runs (default: the system temporary directory)
+            run_facts: Facts per sorted run (bounds each worker's memory)
+            range_bytes: Approximate bytes of NDJSON per parse task
+        """
+        self.path = path
+        self.codec = codec
+        self.rejects_path = rejects_path
+        self.rules = FHIRMapping(mapping or load_fhir_map(), codec)
+        self.as_of = as_of or export_date(path)
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.tmp_dir = tmp_dir
+        self.run_facts = run_facts
+        self.range_bytes = range_bytes
+        self.validator = InputValidator(codec, list(FHIR_COLUMNS))
+        self.counts: Counter = Counter()
+        self.orphans = 0
+        self._sort_dir: Optional[tempfile.TemporaryDirectory] = None
+        self._runs: Optional[List[str]] = None
+
+    def options(self) -> Dict:
+        """Settings that change the profiles (recorded with the batch checkpoint)"""
+        return {'as_of': self.as_of.isoformat(), 'fhir_map': self.rules.digest()}
+
+    @property
+    def patient_count(self) -> int:
+        """Living patients in the export (after prepare)"""
+        return self.counts['Patient'] - self.counts['deceased']
+
+    def prepare(self) -> None:
+        """Parse every file into sorted runs (the first pass)"""
+        if self._runs is not None:
+            return
+        self._sort_dir = tempfile.TemporaryDirectory(prefix='fhir_sort_', dir=self.tmp_dir)
+        files, _ = export_files(self.path)
+        jobs = [(path, start, stop, self.rules.mapping, self._sort_dir.name, self.run_facts)
+                for path in files for start, stop in _line_ranges(path, self.range_bytes)]
+        self.counts = Counter()
+        self._runs = []
+        with ExitStack() as stack:
+            if self.workers <= 1 or len(jobs) <= 1:
+                results = map(_parse_range, jobs)
+            else:
+                pool = stack.enter_context(ProcessPoolExecutor(max_workers=self.workers))
+                results = pool.map(_parse_range, jobs)
+            for runs, counts in results:
+                self._runs += runs
+                self.counts.update(counts)
+
+    def _joined(self) -> Iterator[Tuple[str, List[List[str]]]]:
+        """(patient id, facts) in id order, merging the sorted runs"""
+        runs = self._runs
+        while len(runs) > MERGE_FAN_IN:
+            runs = [_merge_files(runs[i:i + MERGE_FAN_IN], self._sort_dir.name)
+                    for i in range(0, len(runs), MERGE_FAN_IN)]
+        self._runs = runs
+        with ExitStack() as stack:
+            files = [stack.enter_context(open(p, 'r', encoding='utf-8')) for p in runs]
+            lines = (line.rstrip('\n').split('\t') for line in heapq.merge(*files))
+            for patient_id, facts in itertools.groupby(lines, key=lambda parts: parts[0]):
+                yield patient_id, [parts[1:] for parts in facts]
+
+    def profile_row(self, patient_id: str, facts: List[List[str]]) -> Optional[List[str]]:
+        """Profile row (FHIR_COLUMNS) of one patient, None without a living Patient resource"""
+        patient = next((fact for fact in facts if fact[0] == 'P'), None)
+        if patient is None:
+            self.orphans += 1
+            return None
+        _, gender, birth_date, deceased = patient
+        if deceased == '1':
+            return None
+        age = _age(birth_date, self.as_of)
+        hits = {}
+        recent_test = False
+        for fact in facts:
+            if fact[0] == 'R':
+                index = int(fact[1])
+                hits[index] = hits.get(index, False) or fact[2] == 'A'
+            elif fact[0] == 'T':
+                try:
+                    days = (self.as_of - date.fromisoformat(fact[1])).days
+                except ValueError:
+                    continue
+                recent_test = recent_test or 0 <= days <= self.rules.recent_test_days
+        for index in self.rules.patient_rules:
+            hits[index] = True
+
+        values = dict(self.rules.defaults)
+        chosen = set()
+        barriers: List[str] = []
+        flags = {name: bool(DEFAULT_FLAGS & bit) for name, bit in BOOLEAN_FIELDS.items()}
+        for index in sorted(hits):
+            rule = self.rules.rules[index]
+            if 'gender' in rule and rule['gender'] != gender:
+                continue
+            if 'min_age' in rule or 'max_age' in rule:
+                if not age.lstrip('-').isdigit():
+                    continue
+                if not rule.get('min_age', 0) <= int(age) <= rule.get('max_age', int(age)):
+                    continue
+            value = rule['value'] if hits[index] else rule['inactive_value']
+            field = rule['field']
+            if field == 'barriers':
+                if value not in barriers:
+                    barriers.append(value)
+            elif field in FLAG_FIELDS:
+                flags[field] = bool(value)
+            elif field not in chosen:
+                values[field] = value
+                chosen.add(field)
+        flags['recent_hiv_test'] = recent_test
+        row = {
+            'patient_id': patient_id,
+            'age': age,
+            'barriers': ','.join(barriers),
+            **values,
+            **{name: 'true' if flag else 'false' for name, flag in flags.items()},
+        }
+        return [str(row[column]) for column in FHIR_COLUMNS]
+
+    def chunks(self) -> Iterator[ValidatedChunk]:
+        """Join, map and validate the export, yielding chunks and writing rejects"""
+        self.prepare()
+        self.orphans = 0
+        self.validator = InputValidator(self.codec, list(FHIR_COLUMNS))
+        if self.rejects_path is not None and os.path.exists(self.rejects_path):
+            os.remove(self.rejects_path)
+        rejects_file = writer = None
+        try:
+            rows = (row for patient_id, facts in self._joined()
+                    for row in [self.profile_row(patient_id, facts)] if row is not None)
+            start = 0
+            while True:
+                block = list(itertools.islice(rows, self.chunk_size))
+                if not block:
+                    return
+                chunk = self.validator.validate(block, start)
+                start += len(block)
+                if chunk.rejects and self.rejects_path is not None:
+                    if writer is None:
+                        rejects_file = open(self.rejects_path, 'w', newline='')
+                        writer = csv.writer(rejects_file)
+                        writer.writerow(REJECT_COLUMNS + FHIR_COLUMNS)
+                    for index, reasons, row in chunk.rejects:
+                        writer.writerow([index + 1, ';'.join(reasons)] + row)
+                yield chunk
+        finally:
+            if rejects_file is not None:
+                rejects_file.close()
+            self.close()
+
+    def close(self) -> None:
+        """Remove the sorted runs (a later pass parses the files again)"""
+        if self._sort_dir is not None:
+            self._sort_dir.cleanup()
+        self._sort_dir = self._runs = None
+
+    def patient_dicts(self, skip: int = 0) -> Iterator[Dict]:
+        """Typed dictionaries of valid patients, after skipping the first `skip`"""
+        for chunk in self.chunks():
+            if skip >= len(chunk):
+                skip -= len(chunk)
+                continue
+            yield from chunk.patient_dicts(skip)
+            skip = 0
+
+    def report(self) -> Dict:
+        """Data-quality report (after iterating)"""
+        return {
+            'input': self.path,
+            'as_of': self.as_of.isoformat(),
+            'lines': self.counts['lines'],
+            'resources': {kind: self.counts[kind] for kind in RESOURCE_TYPES if self.counts[kind]},
+            'deceased': self.counts['deceased'],
+            'orphans': self.orphans,
+            'unresolved_references': self.counts['unresolved_references'],
+            **self.validator.report(),
+        }
+
+
+def fhir_preflight(source: FHIRBulkSource) -> Dict:
+    """Map and validate a bulk export without assessing it; returns the report"""
+    for _ in source.chunks():
+        pass
+    return source.report()
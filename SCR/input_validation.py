@@ -0,0 +1,675 @@
+#!/usr/bin/env python3
+"""
+Batch Input Pre-Validation for LAI-PrEP Bridge Decision Support Tool
+
+Checks batch CSV input chunk by chunk before any patient is assessed. The
+file is read column-wise in large blocks (csv_reader.py). Each
+distinct cell value (token) of a column is resolved once against the
+configuration code maps and cached across chunks; a chunk's column is then
+mapped to codes in bulk and checked with array comparisons. Rows
+that fail are written to a rejects file with machine-readable reason codes;
+clean rows are passed on encoded (PatientCodec records) together with their
+typed profile dictionaries.
+
+Columns other than patient_id and the PatientProfile fields are ignored
+(PatientProfile.from_dict would otherwise fail on every row). The
+data-quality report counts rows, rejects per reason, unknown values, ignored
+and missing columns, and the distributions of the clean rows.
+
+iter_encoded_chunks is the strict form used by encode, score and the other
+cohort commands: it stops at the first invalid row, and can split the file
+across worker processes on safe line boundaries.
+"""
+
+import csv
+import itertools
+import json
+import os
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from cohort_file import default_patient_id
+from csv_reader import (
+    RawColumns,
+    columns_from_rows,
+    iter_raw_chunks,
+    read_header,
+    split_ranges
+)
+from patient_codec import (
+    BOOLEAN_FIELDS,
+    DEFAULT_FLAGS,
+    DEFAULT_INSURANCE,
+    DEFAULT_SETTING,
+    MAX_AGE,
+    TRUE_STRINGS,
+    PatientCodec
+)
+
+
+DEFAULT_VALIDATION_CHUNK_SIZE = 65536
+
+# Approximate bytes of CSV per worker task in iter_encoded_chunks
+DEFAULT_RANGE_BYTES = 32 << 20
+
+FALSE_STRINGS = ('false', '0', 'no', '')
+
+REQUIRED_COLUMNS = ('population', 'age', 'current_prep_status')
+PROFILE_COLUMNS = REQUIRED_COLUMNS + (
+    'barriers', 'healthcare_setting', 'insurance_status'
+) + tuple(BOOLEAN_FIELDS)
+
+# Reject reason codes
+MALFORMED_ROW = 'MALFORMED_ROW'
+MISSING_POPULATION = 'MISSING_POPULATION'
+UNKNOWN_POPULATION = 'UNKNOWN_POPULATION'
+MISSING_AGE = 'MISSING_AGE'
+INVALID_AGE = 'INVALID_AGE'
+AGE_OUT_OF_RANGE = 'AGE_OUT_OF_RANGE'
+MISSING_PREP_STATUS = 'MISSING_PREP_STATUS'
+UNKNOWN_PREP_STATUS = 'UNKNOWN_PREP_STATUS'
+UNKNOWN_BARRIER = 'UNKNOWN_BARRIER'
+UNKNOWN_SETTING = 'UNKNOWN_SETTING'
+UNKNOWN_INSURANCE = 'UNKNOWN_INSURANCE'
+INVALID_BOOLEAN = 'INVALID_BOOLEAN'
+
+# Categorical column -> (codec attribute, missing reason, unknown reason, default)
+CATEGORICAL_COLUMNS = {
+    'population': ('populations', MISSING_POPULATION, UNKNOWN_POPULATION, None),
+    'current_prep_status': ('prep_statuses', MISSING_PREP_STATUS, UNKNOWN_PREP_STATUS, None),
+    'healthcare_setting': ('settings', None, UNKNOWN_SETTING, DEFAULT_SETTING),
+    'insurance_status': ('insurance_statuses', None, UNKNOWN_INSURANCE, DEFAULT_INSURANCE),
+}
+
+# Record field per categorical column
+RECORD_FIELDS = {
+    'population': 'population',
+    'current_prep_status': 'prep_status',
+    'healthcare_setting': 'healthcare_setting',
+    'insurance_status': 'insurance_status',
+}
+
+# Distinct tokens kept per lookup cache before it is reset
+MAX_CACHED_TOKENS = 100_000
+
+# Lookup result for a token not yet in the cache (never a valid code)
+UNSEEN = -99
+
+# Unknown values listed per column in the report
+MAX_REPORTED_VALUES = 20
+
+REJECT_COLUMNS = ('row_number', 'reject_reasons')
+
+# Default file names in the batch output directory
+REJECTS_NAME = "batch_rejects.csv"
+REPORT_NAME = "data_quality.json"
+
+
+@dataclass
+class ValidatedChunk:
+    """Clean rows of one input chunk, and its rejects"""
+    indices: np.ndarray  # Input row index of each clean row
+    records: np.ndarray  # Encoded clean rows
+    patient_ids: List[str]  # Id per clean row (default ids filled in)
+    barrier_lists: List[Tuple[str, ...]]  # Barriers per clean row, in input order
+    codec: PatientCodec
+    rejects: List[Tuple[int, List[str], List[str]]] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def patient_dicts(self, start: int = 0) -> List[Dict]:
+        """Typed profile dictionaries (with patient_id) for clean rows from start"""
+        codec = self.codec
+        dicts = []
+        for k, (population, status, setting, insurance, _, flags, age) in \
+                enumerate(self.records[start:].tolist(), start):
+            data = {
+                'patient_id': self.patient_ids[k],
+                'population': codec.populations[population],
+                'age': age,
+                'current_prep_status': codec.prep_statuses[status],
+                'barriers': list(self.barrier_lists[k]),
+                'healthcare_setting': codec.settings[setting],
+                'insurance_status': codec.insurance_statuses[insurance],
+            }
+            for name, bit in BOOLEAN_FIELDS.items():
+                data[name] = bool(flags & bit)
+            dicts.append(data)
+        return dicts
+
+
+class InputValidator:
+    """Validates chunks of raw CSV rows against a codec's code maps"""
+
+    def __init__(self, codec: PatientCodec, header: List[str]):
+        """
+        Args:
+            codec: PatientCodec of the configuration
+            header: CSV header row
+        """
+        self.codec = codec
+        self.header = list(header)
+        self.columns = {name: i for i, name in enumerate(self.header)}
+        self.missing_columns = [c for c in REQUIRED_COLUMNS if c not in self.columns]
+        self.ignored_columns = [
+            c for c in self.header if c != 'patient_id' and c not in PROFILE_COLUMNS
+        ]
+
+        # Per-token lookups, shared by all chunks
+        self._codes = {
+            column: {value: i for i, value in enumerate(getattr(codec, attribute))}
+            for column, (attribute, _, _, _) in CATEGORICAL_COLUMNS.items()
+        }
+        self._values = {
+            column: getattr(codec, attribute)
+            for column, (attribute, _, _, _) in CATEGORICAL_COLUMNS.items()
+        }
+        self._token_codes: Dict[str, Dict[str, int]] = {column: {} for column in CATEGORICAL_COLUMNS}
+        self._age_tokens: Dict[str, int] = {}
+        self._boolean_tokens: Dict[str, int] = {}
+        # Barrier cells -> index of (mask or -1, barriers in input order, unknown barriers)
+        self._barrier_tokens: Dict[str, int] = {}
+        self._barrier_entries: List[Tuple[int, Tuple[str, ...], List[str]]] = []
+
+        # Report tallies
+        self.rows = 0
+        self.valid = 0
+        self.reasons: Counter = Counter()
+        self.unknown_values: Dict[str, Counter] = {}
+        self.distributions = {column: np.zeros(len(self._values[column]), dtype=np.int64)
+                              for column in CATEGORICAL_COLUMNS}
+        self.barrier_counts = np.zeros(len(codec.barriers), dtype=np.int64)
+        self.barrier_count_hist = np.zeros(len(codec.barriers) + 1, dtype=np.int64)
+        self.age_sum = 0
+        self.age_min: Optional[int] = None
+        self.age_max: Optional[int] = None
+
+    def _column(self, columns: List[Tuple[str, ...]], name: str) -> Optional[Tuple[str, ...]]:
+        """Raw values of a column (None if the column is absent)"""
+        position = self.columns.get(name)
+        return None if position is None else columns[position]
+
+    @staticmethod
+    def _lookup(values: Sequence[str], cache: Dict[str, int], resolve: Callable[[str], int]) -> np.ndarray:
+        """Codes for values: mapped in bulk through the cache; new tokens are resolved once"""
+        if len(cache) > MAX_CACHED_TOKENS:
+            cache.clear()
+        codes = np.fromiter(map(cache.get, values, itertools.repeat(UNSEEN)),
+                            dtype=np.int64, count=len(values))
+        missed = np.flatnonzero(codes == UNSEEN)
+        if len(missed):
+            tokens = [values[k] for k in missed.tolist()]
+            for token in set(tokens).difference(cache):
+                cache[token] = resolve(token)
+            codes[missed] = np.fromiter(map(cache.__getitem__, tokens), dtype=np.int64,
+                                        count=len(tokens))
+        return codes
+
+    def _unknown(self, column: str, values: Tuple[str, ...], bad: np.ndarray) -> None:
+        """Tally the unknown values of a column"""
+        if bad.any():
+            tally = self.unknown_values.setdefault(column, Counter())
+            tally.update(values[k].strip() for k in np.flatnonzero(bad).tolist())
+
+    def _resolve_category(self, column: str, token: str) -> int:
+        """Code of a categorical cell: -1 if unknown, -2 if empty"""
+        token = token.strip()
+        if not token:
+            return -2
+        return self._codes[column].get(token, -1)
+
+    def _resolve_barriers(self, token: str) -> int:
+        """Index of a barriers cell's entry in _barrier_entries"""
+        text = token.strip()
+        barriers = tuple(b.strip() for b in text.split(',')) if text else ()
+        unknown = [b for b in barriers if b not in self.codec._barrier_bits]
+        mask = -1 if unknown else self.codec.barrier_mask(barriers)
+        self._barrier_entries.append((mask, barriers, unknown))
+        return len(self._barrier_entries) - 1
+
+    @staticmethod
+    def _resolve_age(token: str) -> int:
+        """Age of a cell: the integer, -1 if not an integer, -2 if out of range, -3 if empty"""
+        if not token.strip():
+            return -3
+        try:
+            age = int(token)
+        except ValueError:
+            return -1
+        return age if 0 <= age <= MAX_AGE else -2
+
+    @staticmethod
+    def _resolve_boolean(token: str) -> int:
+        """1 for true, 0 for false, -1 for anything else"""
+        token = token.strip().lower()
+        if token in TRUE_STRINGS:
+            return 1
+        return 0 if token in FALSE_STRINGS else -1
+
+    def validate(self, rows: List[List[str]], start: int) -> ValidatedChunk:
+        """
+        Validate one chunk of raw rows
+
+        Args:
+            rows: CSV rows (lists of strings) without the header
+            start: Input index of the first row
+
+        Returns:
+            ValidatedChunk with the clean rows encoded and the rejects
+        """
+        return self.validate_columns(columns_from_rows(rows, len(self.header)), start)
+
+    def validate_columns(self, raw: RawColumns, start: int, profiles: bool = True) -> ValidatedChunk:
+        """
+        Validate one chunk of raw cells, column by column
+
+        Args:
+            raw: Cells of the chunk (as from csv_reader)
+            start: Input index of the first row
+            profiles: Also collect patient ids and barrier lists (needed for
+                patient_dicts, not for the encoded records)
+
+        Returns:
+            ValidatedChunk with the clean rows encoded and the rejects
+        """
+        n = raw.size
+        columns = raw.columns
+        malformed = raw.malformed if raw.malformed is not None else np.zeros(n, dtype=bool)
+        reasons: Dict[str, np.ndarray] = {MALFORMED_ROW: malformed}
+        records = self.codec.empty(n)
+
+        for column, (_, missing_reason, unknown_reason, default) in CATEGORICAL_COLUMNS.items():
+            values = self._column(columns, column)
+            if values is None:
+                if default is None:
+                    reasons[missing_reason] = np.ones(n, dtype=bool)
+                else:
+                    records[RECORD_FIELDS[column]] = self._codes[column][default]
+                continue
+            codes = self._lookup(values, self._token_codes[column],
+                                 lambda token, c=column: self._resolve_category(c, token))
+            if missing_reason is not None:
+                reasons[missing_reason] = codes == -2
+                bad = codes == -1
+            else:
+                bad = codes < 0
+            reasons[unknown_reason] = bad
+            self._unknown(column, values, bad)
+            records[RECORD_FIELDS[column]] = np.maximum(codes, 0)
+
+        ages = self._column(columns, 'age')
+        if ages is None:
+            reasons[MISSING_AGE] = np.ones(n, dtype=bool)
+        else:
+            age = self._lookup(ages, self._age_tokens, self._resolve_age)
+            reasons[MISSING_AGE] = age == -3
+            reasons[INVALID_AGE] = age == -1
+            reasons[AGE_OUT_OF_RANGE] = age == -2
+            records['age'] = np.maximum(age, 0)
+
+        cells = self._column(columns, 'barriers')
+        if cells is None:
+            entries = np.zeros(n, dtype=np.int64)
+            barrier_entries = [(0, (), [])]
+        else:
+            if len(self._barrier_tokens) > MAX_CACHED_TOKENS:
+                self._barrier_tokens.clear()
+                self._barrier_entries.clear()
+            entries = self._lookup(cells, self._barrier_tokens, self._resolve_barriers)
+            barrier_entries = self._barrier_entries
+            masks = np.array([entry[0] for entry in barrier_entries], dtype=np.int64)[entries]
+            reasons[UNKNOWN_BARRIER] = bad = masks < 0
+            records['barriers'] = np.maximum(masks, 0)
+            if bad.any():
+                tally = self.unknown_values.setdefault('barriers', Counter())
+                for k in entries[bad].tolist():
+                    tally.update(barrier_entries[k][2])
+
+        flags = np.full(n, DEFAULT_FLAGS, dtype=np.uint8)
+        invalid_boolean = np.zeros(n, dtype=bool)
+        for name, bit in BOOLEAN_FIELDS.items():
+            values = self._column(columns, name)
+            if values is None:
+                continue
+            value = self._lookup(values, self._boolean_tokens, self._resolve_boolean)
+            invalid_boolean |= value < 0
+            flags = np.where(value == 1, flags | np.uint8(bit), flags & np.uint8(~bit & 0xFF))
+        reasons[INVALID_BOOLEAN] = invalid_boolean
+        records['flags'] = flags
+
+        rejected = np.zeros(n, dtype=bool)
+        for mask in reasons.values():
+            rejected |= mask
+        clean = np.flatnonzero(~rejected)
+
+        patient_ids, barrier_lists = [], []
+        if profiles:
+            ids = self._column(columns, 'patient_id')
+            patient_ids = [
+                (ids[k] if ids is not None and ids[k] else default_patient_id(start + k))
+                for k in clean.tolist()
+            ]
+            entry_list = entries.tolist()
+            barrier_lists = [barrier_entries[entry_list[k]][1] for k in clean.tolist()]
+
+        rejects = []
+        for k in np.flatnonzero(rejected).tolist():
+            codes = [reason for reason, mask in reasons.items() if mask[k]]
+            self.reasons.update(codes)
+            rejects.append((start + k, codes, raw.row(k)))
+
+        chunk = ValidatedChunk(
+            indices=start + clean,
+            records=records[clean],
+            patient_ids=patient_ids,
+            barrier_lists=barrier_lists,
+            codec=self.codec,
+            rejects=rejects,
+        )
+        self.rows += n
+        self.tally(chunk.records)
+        return chunk
+
+    def tally(self, records: np.ndarray) -> None:
+        """Add clean encoded rows to the report distributions"""
+        if not len(records):
+            return
+        self.valid += len(records)
+        for column, field_name in RECORD_FIELDS.items():
+            self.distributions[column] += np.bincount(
+                records[field_name], minlength=len(self.distributions[column])
+            )
+        masks = records['barriers'].astype(np.uint64)
+        bits = (masks[:, None] >> np.arange(len(self.codec.barriers), dtype=np.uint64)) & 1
+        self.barrier_counts += bits.sum(axis=0).astype(np.int64)
+        self.barrier_count_hist += np.bincount(
+            bits.sum(axis=1).astype(np.int64), minlength=len(self.barrier_count_hist)
+        )
+        ages = records['age']
+        self.age_sum += int(ages.sum(dtype=np.int64))
+        low, high = int(ages.min()), int(ages.max())
+        self.age_min = low if self.age_min is None else min(self.age_min, low)
+        self.age_max = high if self.age_max is None else max(self.age_max, high)
+
+    def report(self) -> Dict:
+        """Data-quality report of everything validated so far"""
+        return {
+            'rows': self.rows,
+            'valid': self.valid,
+            'rejected': self.rows - self.valid,
+            'reasons': dict(self.reasons.most_common()),
+            'missing_columns': self.missing_columns,
+            'ignored_columns': self.ignored_columns,
+            'unknown_values': {
+                column: dict(tally.most_common(MAX_REPORTED_VALUES))
+                for column, tally in self.unknown_values.items() if tally
+            },
+            'distributions': {
+                **{
+                    column: {
+                        value: int(count)
+                        for value, count in zip(self._values[column], counts) if count
+                    }
+                    for column, counts in self.distributions.items()
+                },
+                'barriers': {
+                    barrier: int(count)
+                    for barrier, count in zip(self.codec.barriers, self.barrier_counts) if count
+                },
+                'barrier_count': {
+                    str(k): int(count) for k, count in enumerate(self.barrier_count_hist) if count
+                },
+            },
+            'age': {
+                'min': self.age_min,
+                'max': self.age_max,
+                'mean': self.age_sum / self.valid if self.valid else None,
+            },
+        }
+
+
+class ValidatedCSV:
+    """Batch CSV input read in chunks through an InputValidator"""
+
+    def __init__(
+        self,
+        path: str,
+        codec: PatientCodec,
+        rejects_path: Optional[str] = None,
+        chunk_size: int = DEFAULT_VALIDATION_CHUNK_SIZE,
+        byte_range: Optional[Tuple[int, int]] = None,
+        first_row: int = 0
+    ):
+        """
+        Args:
+            path: Batch CSV file (with header)
+            codec: PatientCodec of the configuration
+            rejects_path: CSV for rejected rows (row_number, reject_reasons, then the
+                input columns); created only if a row is rejected
+            chunk_size: Rows validated per chunk
+            byte_range: Only read the data rows in this byte range (safe line
+                boundaries, as from csv_reader.shard_range)
+            first_row: Input index of the first row in byte_range (for row
+                numbers and default patient ids)
+        """
+        self.path = path
+        self.codec = codec
+        self.rejects_path = rejects_path
+        self.chunk_size = chunk_size
+        self.byte_range = byte_range
+        self.first_row = first_row
+        self.validator: Optional[InputValidator] = None
+
+    def chunks(self) -> Iterator[ValidatedChunk]:
+        """Validate the whole file, yielding chunks and writing rejects as they occur"""
+        rejects_file = writer = None
+        if self.rejects_path is not None and os.path.exists(self.rejects_path):
+            os.remove(self.rejects_path)
+        try:
+            header, data_start = read_header(self.path)
+            self.validator = InputValidator(self.codec, header)
+            begin, end = self.byte_range or (data_start, None)
+            start = self.first_row
+            for raw in iter_raw_chunks(self.path, len(header), begin, end,
+                                       chunk_size=self.chunk_size):
+                chunk = self.validator.validate_columns(raw, start)
+                start += raw.size
+                if chunk.rejects and self.rejects_path is not None:
+                    if writer is None:
+                        rejects_file = open(self.rejects_path, 'w', newline='')
+                        writer = csv.writer(rejects_file)
+                        writer.writerow(REJECT_COLUMNS + tuple(header))
+                    for index, reasons, row in chunk.rejects:
+                        writer.writerow([index + 1, ';'.join(reasons)] + row)
+                yield chunk
+        finally:
+            if rejects_file is not None:
+                rejects_file.close()
+
+    def patient_dicts(self, skip: int = 0) -> Iterator[Dict]:
+        """Typed dictionaries of clean rows, after skipping the first `skip` clean rows"""
+        for chunk in self.chunks():
+            if skip >= len(chunk):
+                skip -= len(chunk)
+                continue
+            yield from chunk.patient_dicts(skip)
+            skip = 0
+
+    def report(self) -> Dict:
+        """Data-quality report (after iterating)"""
+        report = self.validator.report() if self.validator is not None else InputValidator(
+            self.codec, []).report()
+        return {'input': self.path, **report}
+
+
+def count_lines(path: str, block_size: int = 1 << 20) -> int:
+    """Number of lines in a file (newline count, plus an unterminated last line)"""
+    lines = 0
+    last = b'\n'
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            lines += block.count(b'\n')
+            last = block[-1:]
+    return lines + (last != b'\n')
+
+
+def _encode_range(
+    path: str,
+    codec: PatientCodec,
+    header: List[str],
+    start: int,
+    stop: Optional[int],
+    chunk_size: int
+) -> Iterator[Tuple[int, Optional[np.ndarray], List[Optional[str]], Optional[Tuple]]]:
+    """
+    Encode the rows of one byte range chunk by chunk
+
+    Yields (rows, records, patient_ids, reject) per chunk; a chunk with an
+    invalid row yields only its first reject (index within the chunk) and
+    ends the range.
+    """
+    validator = InputValidator(codec, header)
+    id_position = validator.columns.get('patient_id')
+    for raw in iter_raw_chunks(path, len(header), start, stop, chunk_size):
+        chunk = validator.validate_columns(raw, 0, profiles=False)
+        if chunk.rejects:
+            yield raw.size, None, [], chunk.rejects[0]
+            return
+        ids = list(raw.columns[id_position]) if id_position is not None else [None] * raw.size
+        yield raw.size, chunk.records, ids, None
+
+
+def _encode_range_job(args: Tuple) -> List[Tuple]:
+    """Worker entry point: all chunks of one byte range"""
+    return list(_encode_range(*args))
+
+
+def iter_encoded_chunks(
+    path: str,
+    codec: PatientCodec,
+    chunk_size: int = DEFAULT_VALIDATION_CHUNK_SIZE,
+    workers: int = 1,
+    range_bytes: int = DEFAULT_RANGE_BYTES
+) -> Iterator[Tuple[int, np.ndarray, List[Optional[str]]]]:
+    """
+    Yield (offset, records, patient_ids) chunks of a batch CSV, parsed
+    column-wise straight into PatientCodec records
+
+    With workers > 1 the data rows are split into byte ranges of about
+    range_bytes on safe line boundaries and encoded by worker processes;
+    chunks are still yielded in input order, and at most two ranges per
+    worker are in flight.
+
+    Args:
+        path: Batch CSV file (with header)
+        codec: PatientCodec of the configuration
+        chunk_size: Rows per chunk
+        workers: Worker processes (1 encodes in this process)
+        range_bytes: Approximate bytes per worker task
+
+    Raises:
+        ValueError: At the first row that fails validation (no chunk from
+            that row on is yielded)
+    """
+    header, start = read_header(path)
+    if workers <= 1:
+        ranges = [_encode_range(path, codec, header, start, None, chunk_size)]
+        yield from _offset_chunks(path, ranges, chunk_size)
+        return
+
+    parts = max(workers, -(-(os.path.getsize(path) - start) // range_bytes))
+    jobs = iter(
+        (path, codec, header, begin, end, chunk_size)
+        for begin, end in split_ranges(path, parts, start)
+    )
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque(pool.submit(_encode_range_job, job)
+                        for job in itertools.islice(jobs, 2 * workers))
+
+        def results():
+            while pending:
+                pieces = pending.popleft().result()
+                job = next(jobs, None)
+                if job is not None:
+                    pending.append(pool.submit(_encode_range_job, job))
+                yield pieces
+
+        try:
+            yield from _offset_chunks(path, results(), chunk_size)
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def _offset_chunks(
+    path: str,
+    ranges,
+    chunk_size: int
+) -> Iterator[Tuple[int, np.ndarray, List[Optional[str]]]]:
+    """Rebatch the encoded pieces of consecutive ranges into chunk_size chunks; raise at the first reject"""
+    offset = 0
+    records_buffer: List[np.ndarray] = []
+    ids_buffer: List[Optional[str]] = []
+    for pieces in ranges:
+        for rows, records, ids, reject in pieces:
+            if reject is not None:
+                index, reasons, row = reject
+                raise ValueError(
+                    f"Invalid row {offset + len(ids_buffer) + index + 1} in {path} "
+                    f"({', '.join(reasons)}): {','.join(row)}"
+                )
+            records_buffer.append(records)
+            ids_buffer.extend(ids)
+            if len(ids_buffer) >= chunk_size:
+                merged = np.concatenate(records_buffer)
+                end = len(merged) - len(merged) % chunk_size
+                for begin in range(0, end, chunk_size):
+                    yield offset, merged[begin:begin + chunk_size], ids_buffer[begin:begin + chunk_size]
+                    offset += chunk_size
+                records_buffer = [merged[end:]]
+                ids_buffer = ids_buffer[end:]
+    if ids_buffer:
+        yield offset, np.concatenate(records_buffer), ids_buffer
+
+
+def cohort_report(path: str, codec: PatientCodec, records_chunks) -> Dict:
+    """Data-quality report for an encoded cohort (every row is valid by construction)"""
+    validator = InputValidator(codec, list(PROFILE_COLUMNS))
+    for records in records_chunks:
+        validator.rows += len(records)
+        validator.tally(records)
+    return {'input': path, **validator.report()}
+
+
+def preflight(
+    path: str,
+    codec: PatientCodec,
+    rejects_path: Optional[str] = None,
+    chunk_size: int = DEFAULT_VALIDATION_CHUNK_SIZE,
+    byte_range: Optional[Tuple[int, int]] = None,
+    first_row: int = 0
+) -> Dict:
+    """
+    Validate a batch CSV (or one byte range of it) without assessing it
+
+    Returns:
+        Data-quality report (see InputValidator.report)
+    """
+    source = ValidatedCSV(path, codec, rejects_path, chunk_size, byte_range, first_row)
+    for _ in source.chunks():
+        pass
+    return source.report()
+
+
+def write_report(report: Dict, path: str) -> None:
+    """Write a data-quality report as JSON"""
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
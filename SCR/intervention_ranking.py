@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Program-Level Intervention Value Ranking for LAI-PrEP Bridge Decision Support Tool
+
+Evaluates a cohort with each configured intervention disabled in turn and
+with each one forced on, and reports the population-level change in expected
+successes (summed estimated_success_with_interventions), people reached and
+success gained per cost level.
+
+Candidate recommendations are generated once per distinct recommendation key
+and re-selected per scenario; only the mechanism-diversity selection runs
+again, never the full assessment:
+- disabled: the intervention is dropped from the candidate list
+- forced on: the intervention is placed first (created as a Critical
+  recommendation if the patient's rules did not produce it), for populations
+  listed in its applicable_populations
+
+A patient is "reached" by an intervention when it is among the top 3
+recommendations, the ones that count toward estimated success.
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from cohort_scoring import CohortScorer
+from lai_prep_decision_tool_v2_1 import InterventionRecommendation, PatientProfile
+
+
+# Recommendations that count toward estimated success
+TOP_RECOMMENDATIONS = 3
+
+# Relative cost of one unit of each configured cost_level
+COST_WEIGHTS = {'low': 1, 'medium': 2, 'high': 3}
+
+
+def _gain(selected: List[InterventionRecommendation]) -> float:
+    """Summed improvement (as a fraction) of the top recommendations"""
+    return sum(rec.expected_improvement / 100 for rec in selected[:TOP_RECOMMENDATIONS])
+
+
+class InterventionRanking:
+    """Accumulates expected successes per scenario over a chunked cohort"""
+
+    def __init__(self, scorer: CohortScorer):
+        """
+        Args:
+            scorer: CohortScorer for the active configuration and method
+        """
+        self.scorer = scorer
+        self.tool = scorer.tool
+        self.interventions = list(self.tool.config.config['interventions'])
+        m = len(self.interventions)
+
+        # Scenario columns: 0 baseline, 1..m disabled, m+1..2m forced on
+        self.n_scenarios = 2 * m + 1
+        self.patients = 0
+        self.expected_successes = np.zeros(self.n_scenarios)
+        self.baseline_reach = np.zeros(m, dtype=np.int64)
+        self.forced_reach = np.zeros(m, dtype=np.int64)
+
+        # Per recommendation key: (scenario gains, baseline reach, forced reach)
+        self._key_cache: Dict[int, tuple] = {}
+
+    def _forced_candidates(
+        self,
+        profile: PatientProfile,
+        candidates: List[InterventionRecommendation],
+        intervention: str
+    ) -> Optional[List[InterventionRecommendation]]:
+        """Candidate list with the intervention first, or None if not applicable"""
+        int_config = self.tool.config.get_intervention_config(intervention)
+        if ('applicable_populations' in int_config and
+                profile.population not in int_config['applicable_populations']):
+            return None
+
+        forced = next((c for c in candidates if c.intervention == intervention), None)
+        if forced is None:
+            forced = self.tool._create_recommendation(
+                intervention,
+                priority="Critical",
+                rationale="Delivered program-wide.",
+                mechanisms=self.tool._determine_mechanisms(intervention)
+            )
+        return [forced] + [c for c in candidates if c.intervention != intervention]
+
+    def _evaluate_key(self, key: int) -> tuple:
+        """Scenario gains and reach for one recommendation key"""
+        tool = self.tool
+        m = len(self.interventions)
+        profile = self.scorer._key_profile(key)
+        candidates = tool._prioritize_candidates(tool._generate_candidate_recommendations(profile))
+
+        baseline = tool._select_with_mechanism_diversity(candidates)
+        baseline_gain = _gain(baseline)
+        selected = {rec.intervention for rec in baseline}
+        top = {rec.intervention for rec in baseline[:TOP_RECOMMENDATIONS]}
+
+        gains = np.full(self.n_scenarios, baseline_gain)
+        baseline_reach = np.zeros(m, dtype=bool)
+        forced_reach = np.zeros(m, dtype=bool)
+
+        for i, intervention in enumerate(self.interventions):
+            baseline_reach[i] = intervention in top
+
+            # Selection walks the candidates in order, so dropping one it
+            # never reached leaves the result unchanged
+            if intervention in selected:
+                remaining = [c for c in candidates if c.intervention != intervention]
+                gains[1 + i] = _gain(tool._select_with_mechanism_diversity(remaining))
+
+            forced = self._forced_candidates(profile, candidates, intervention)
+            if forced is not None:
+                gains[1 + m + i] = _gain(tool._select_with_mechanism_diversity(forced))
+                forced_reach[i] = True
+            else:
+                forced_reach[i] = baseline_reach[i]
+
+        return gains, baseline_reach, forced_reach
+
+    def add(self, records: np.ndarray) -> None:
+        """Add a chunk of encoded patients"""
+        if len(records) == 0:
+            return
+
+        keys, inverse = self.scorer.unique_keys(records)
+        inverse = inverse.reshape(-1)
+        tables = []
+        for key in keys.tolist():
+            entry = self._key_cache.get(key)
+            if entry is None:
+                entry = self._evaluate_key(key)
+                self._key_cache[key] = entry
+            tables.append(entry)
+
+        gains = np.stack([entry[0] for entry in tables])
+        baseline_reach = np.stack([entry[1] for entry in tables])
+        forced_reach = np.stack([entry[2] for entry in tables])
+
+        adjusted = self.scorer.adjusted_success(records)
+        estimated = self.scorer.estimated_success(adjusted[:, None], gains[inverse])
+
+        self.patients += len(records)
+        self.expected_successes += estimated.sum(axis=0)
+        self.baseline_reach += np.bincount(inverse, minlength=len(keys)) @ baseline_reach
+        self.forced_reach += np.bincount(inverse, minlength=len(keys)) @ forced_reach
+
+    def to_dict(self) -> Dict:
+        """Ranking report, most valuable current program first"""
+        m = len(self.interventions)
+        baseline = self.expected_successes[0]
+        rows = []
+        by_cost_level: Dict[str, Dict] = {}
+
+        for i, intervention in enumerate(self.interventions):
+            int_config = self.tool.config.get_intervention_config(intervention)
+            cost_level = int_config.get('cost_level')
+            weight = COST_WEIGHTS.get(cost_level)
+
+            disabled_change = self.expected_successes[1 + i] - baseline
+            forced_change = self.expected_successes[1 + m + i] - baseline
+            reached = int(self.baseline_reach[i])
+            forced_reached = int(self.forced_reach[i])
+
+            rows.append({
+                "intervention": intervention,
+                "name": int_config['name'],
+                "cost_level": cost_level,
+                "people_reached": reached,
+                "disabled": {
+                    "expected_successes_change": round(float(disabled_change), 4),
+                    "success_per_cost_level": (
+                        round(float(-disabled_change / weight), 4) if weight else None
+                    ),
+                },
+                "forced_on": {
+                    "expected_successes_change": round(float(forced_change), 4),
+                    "people_reached": forced_reached,
+                    "additional_people_reached": forced_reached - reached,
+                    "success_per_cost_level": (
+                        round(float(forced_change / weight), 4) if weight else None
+                    ),
+                },
+            })
+
+            level = by_cost_level.setdefault(cost_level, {
+                "interventions": 0,
+                "people_reached": 0,
+                "disabled_expected_successes_change": 0.0,
+                "forced_on_expected_successes_change": 0.0,
+            })
+            level["interventions"] += 1
+            level["people_reached"] += reached
+            level["disabled_expected_successes_change"] += float(disabled_change)
+            level["forced_on_expected_successes_change"] += float(forced_change)
+
+        for level in by_cost_level.values():
+            for name in ("disabled_expected_successes_change",
+                         "forced_on_expected_successes_change"):
+                level[name] = round(level[name], 4)
+
+        rows.sort(key=lambda row: (row["disabled"]["expected_successes_change"],
+                                   -row["forced_on"]["expected_successes_change"]))
+        for rank, row in enumerate(rows, 1):
+            row["rank"] = rank
+
+        return {
+            "method": "logit" if self.scorer.use_logit else "linear",
+            "patients": self.patients,
+            "baseline_expected_successes": round(float(baseline), 4),
+            "interventions": rows,
+            "by_cost_level": by_cost_level,
+        }
+
+
+def rank_interventions(scorer: CohortScorer, chunks) -> Dict:
+    """
+    Rank configured interventions by their value to a chunked cohort
+
+    Args:
+        scorer: CohortScorer for the active configuration and method
+        chunks: Iterable of (offset, records, patient_ids) chunks
+
+    Returns:
+        Ranking report (see InterventionRanking.to_dict)
+    """
+    ranking = InterventionRanking(scorer)
+    for _, records, _ in chunks:
+        ranking.add(records)
+    return ranking.to_dict()
@@ -10,11 +10,18 @@ New Features in v2.1:
 - Confidence intervals for estimates
 - Logit-space calculations (optional)
 - CLI support via importable functions
+
+Thread safety: a tool holds a read-only snapshot of its configuration and
+keeps no per-call state, so one instance can serve concurrent requests
+without locks.
 """
 
+import bisect
 import json
 import os
-from dataclasses import dataclass, field, asdict
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict, replace
 from datetime import datetime
 from pathlib import Path
 from typing import List, Dict, Tuple, Optional
@@ -27,23 +34,83 @@ class ConfigurationError(Exception):
     pass
 
 
+class FrozenDict(dict):
+    """Read-only dict; still a dict for JSON encoders and isinstance checks"""
+    
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("Configuration snapshot is read-only")
+    
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+    
+    def __copy__(self):
+        return dict(self)
+    
+    def __deepcopy__(self, memo):
+        # Deep copies are ordinary, editable configuration dicts
+        return thaw(self)
+    
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+
+def freeze(value):
+    """Read-only copy of a JSON value (dicts -> FrozenDict, lists -> tuples)"""
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value):
+    """Editable copy of a (possibly frozen) JSON value"""
+    if isinstance(value, dict):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [thaw(item) for item in value]
+    return value
+
+
 class Configuration:
     """Manages tool configuration from JSON file"""
     
-    def __init__(self, config_path: Optional[str] = None):
+    def __init__(self, config_path: Optional[str] = None, use_snapshot: bool = False):
         """
         Initialize configuration from JSON file
         
         Args:
             config_path: Path to configuration JSON file. If None, looks in default locations.
+            use_snapshot: Load a current compiled snapshot of the file if one exists
+                (see config_snapshot.py); the configuration is then read-only.
+                Off by default so library callers always get an editable dict
         """
         if config_path is None:
             config_path = self._find_config_file()
         
         self.config_path = config_path
+        self.compiled_arrays = None
+        if use_snapshot and self._load_snapshot():
+            return
         self.config = self._load_config()
         self._validate_config()
-        
+
+    @classmethod
+    def from_dict(cls, data: Dict, config_path: Optional[str] = None) -> 'Configuration':
+        """
+        Build a configuration from already-parsed JSON data
+
+        Args:
+            data: Configuration dictionary
+            config_path: Source path, if any (informational)
+        """
+        config = object.__new__(cls)
+        config.config_path = config_path
+        config.config = data
+        config.compiled_arrays = None
+        config._validate_config()
+        return config
+
     def _find_config_file(self) -> str:
         """Find configuration file in standard locations"""
         search_paths = [
@@ -62,6 +129,18 @@ class Configuration:
             f"Configuration file not found. Searched: {search_paths}"
         )
     
+    def _load_snapshot(self) -> bool:
+        """Load config and compiled tables from a current snapshot, if there is one"""
+        from config_snapshot import read_snapshot, snapshot_path  # Imports this module
+        path = snapshot_path(self.config_path)
+        if not os.path.exists(path):
+            return False
+        try:
+            self.config, self.compiled_arrays = read_snapshot(path, self.config_path)
+        except ConfigurationError:
+            return False
+        return True
+    
     def _load_config(self) -> Dict:
         """Load configuration from JSON file"""
         try:
@@ -120,6 +199,51 @@ class Configuration:
     def get_clinical_guidance(self) -> Dict:
         """Get clinical guidance messages"""
         return self.config.get('clinical_guidance', {})
+    
+    @property
+    def frozen(self) -> bool:
+        """Whether this is a read-only snapshot"""
+        return isinstance(self.config, FrozenDict)
+    
+    def snapshot(self) -> 'Configuration':
+        """Read-only deep copy, safe to share across threads (self if already frozen)"""
+        if self.frozen:
+            return self
+        snapshot = object.__new__(Configuration)
+        snapshot.config_path = self.config_path
+        snapshot.config = freeze(self.config)
+        snapshot.compiled_arrays = None
+        return snapshot
+
+
+def compile_risk_thresholds(risk_categories: Dict) -> Tuple[List[float], List[str]]:
+    """
+    Compile risk categories into sorted edges for binary search
+    
+    The category for an attrition rate x is lookup[bisect_right(edges, x)].
+    Each interval between consecutive edges is resolved once with the
+    original first-match scan (threshold_min <= x < threshold_max, falling
+    back to VERY_HIGH), so results are identical for any threshold layout,
+    including gaps and overlaps.
+    
+    Returns:
+        (edges, lookup) where lookup has len(edges) + 1 category keys
+    """
+    def scan(rate):
+        for category_name, category_info in risk_categories.items():
+            threshold_min = category_info.get('threshold_min', 0)
+            threshold_max = category_info.get('threshold_max', 1.0)
+            if threshold_min <= rate < threshold_max:
+                return category_name
+        return 'VERY_HIGH'
+    
+    edges = sorted({
+        float(info.get(bound, default))
+        for info in risk_categories.values()
+        for bound, default in (('threshold_min', 0), ('threshold_max', 1.0))
+    })
+    lookup = [scan(edges[0] - 1.0)] + [scan(edge) for edge in edges]
+    return edges, lookup
 
 
 @dataclass
@@ -182,8 +306,21 @@ class BridgePeriodAssessment:
     attrition_factors: Dict = field(default_factory=dict)  # NEW: Explanation
     delay_factors: List[str] = field(default_factory=list)  # NEW: Bridge delays
     
-    def to_json(self, profile: PatientProfile, tool_version: str = "2.1.0") -> Dict:
-        """Export assessment as machine-readable JSON"""
+    def to_json(
+        self,
+        profile: PatientProfile,
+        tool_version: str = "2.1.0",
+        timestamp: Optional[str] = None
+    ) -> Dict:
+        """
+        Export assessment as machine-readable JSON
+        
+        Args:
+            profile: PatientProfile the assessment was produced for
+            tool_version: Version written to the metadata block
+            timestamp: ISO timestamp for metadata (default: now). Pass a fixed
+                value for reproducible output.
+        """
         return {
             "patient_profile": {
                 "population": profile.population,
@@ -243,7 +380,7 @@ class BridgePeriodAssessment:
             },
             "metadata": {
                 "tool_version": tool_version,
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": timestamp if timestamp is not None else datetime.now().isoformat(),
                 "config_version": tool_version
             }
         }
@@ -254,25 +391,46 @@ class LAIPrEPDecisionTool:
     
     # Mechanism categories for diversity scoring
     MECHANISM_CATEGORIES = {
-        'eliminate_bridge': ['ORAL_TO_INJECTABLE', 'SAME_DAY_SWITCHING'],
-        'compress_bridge': ['ACCELERATED_TESTING', 'EXPEDITED_AUTHORIZATION'],
-        'navigate_bridge': ['PATIENT_NAVIGATION', 'PEER_NAVIGATION', 'TEXT_MESSAGE_NAVIGATION'],
-        'remove_barriers': ['TRANSPORTATION_SUPPORT', 'CHILDCARE_SUPPORT', 'MOBILE_DELIVERY'],
-        'system_level': ['HARM_REDUCTION_INTEGRATION', 'BUNDLED_PAYMENT', 'TELEHEALTH_COUNSELING']
+        'eliminate_bridge': ('ORAL_TO_INJECTABLE', 'SAME_DAY_SWITCHING'),
+        'compress_bridge': ('ACCELERATED_TESTING', 'EXPEDITED_AUTHORIZATION'),
+        'navigate_bridge': ('PATIENT_NAVIGATION', 'PEER_NAVIGATION', 'TEXT_MESSAGE_NAVIGATION'),
+        'remove_barriers': ('TRANSPORTATION_SUPPORT', 'CHILDCARE_SUPPORT', 'MOBILE_DELIVERY'),
+        'system_level': ('HARM_REDUCTION_INTEGRATION', 'BUNDLED_PAYMENT', 'TELEHEALTH_COUNSELING')
     }
     
-    def __init__(self, config_path: Optional[str] = None, use_logit: bool = False):
+    def __init__(
+        self,
+        config_path: Optional[str] = None,
+        use_logit: bool = False,
+        config: Optional[Configuration] = None
+    ):
         """
         Initialize decision tool with configuration
         
         Args:
             config_path: Path to configuration JSON file
             use_logit: Whether to use logit-space calculations (more mathematically sound)
+            config: Already-loaded Configuration (takes precedence over config_path)
         """
-        self.config = Configuration(config_path)
+        # Read-only snapshot: later edits to a Configuration never reach a live tool
+        self.config = (config if config is not None else Configuration(config_path)).snapshot()
         self.params = self.config.get_algorithm_params()
         self.risk_categories = self.config.get_risk_categories()
         self.use_logit = use_logit
+        
+        # Risk thresholds sorted once for binary search
+        self.risk_category_keys = tuple(self.risk_categories)
+        edges, lookup = compile_risk_thresholds(self.risk_categories)
+        self._risk_edges = tuple(edges)
+        self._risk_lookup = tuple(self.risk_category_keys.index(key) for key in lookup)
+        self._risk_edges_array = np.array(self._risk_edges)
+        self._risk_lookup_array = np.array(self._risk_lookup, dtype=np.uint8)
+        self._risk_edges_array.flags.writeable = False
+        self._risk_lookup_array.flags.writeable = False
+        
+        # Vectorized scorer for assess_many, built on first use
+        self._scorer = None
+        self._scorer_lock = threading.Lock()
     
     def assess_patient(self, profile: PatientProfile) -> BridgePeriodAssessment:
         """
@@ -289,16 +447,9 @@ class LAIPrEPDecisionTool:
         baseline_attrition = pop_config['baseline_attrition']
         
         # Calculate adjusted success rate
-        if self.use_logit:
-            adjusted_success_rate, attrition_factors = self._calculate_adjusted_success_logit(
-                profile, baseline_attrition
-            )
-        else:
-            adjusted_success_rate, attrition_factors = self._calculate_adjusted_success_linear(
-                profile, baseline_attrition
-            )
-        
-        baseline_success_rate = 1 - baseline_attrition
+        adjusted_success_rate, attrition_factors = self._calculate_adjusted_success(
+            profile, baseline_attrition
+        )
         
         # Best-case success floor: oral PrEP + recent HIV test + no barriers
         # Ensures zero-barrier best-case scenarios reflect real-world high success when the bridge can be eliminated
@@ -310,9 +461,6 @@ class LAIPrEPDecisionTool:
             best_case_floor = self.params.get('best_case_success_floor', 0.85)
             adjusted_success_rate = max(adjusted_success_rate, best_case_floor)
         
-        # Determine attrition risk category
-        attrition_risk, risk_category = self._categorize_risk(1 - adjusted_success_rate)
-        
         # Generate intervention recommendations with mechanism diversity
         recommendations = self._generate_recommendations_with_mechanisms(profile)
         
@@ -331,15 +479,36 @@ class LAIPrEPDecisionTool:
             )
         )
         
-        # Estimate bridge duration
-        bridge_duration = self._estimate_bridge_duration(profile)
+        return self._build_assessment(
+            profile,
+            pop_config,
+            adjusted_success_rate,
+            attrition_factors,
+            recommendations,
+            estimated_success,
+            self._estimate_bridge_duration(profile)
+        )
+    
+    def _build_assessment(
+        self,
+        profile: PatientProfile,
+        pop_config: Dict,
+        adjusted_success_rate: float,
+        attrition_factors: Dict,
+        recommendations: List[InterventionRecommendation],
+        estimated_success: float,
+        bridge_duration: Tuple[int, int]
+    ) -> BridgePeriodAssessment:
+        """Assemble an assessment from its computed parts (risk and explanations added here)"""
+        # Determine attrition risk category
+        attrition_risk, risk_category = self._categorize_risk(1 - adjusted_success_rate)
         
         # Identify delay factors
         delay_factors = self._identify_delay_factors(profile)
         
         # Generate clinical notes
         clinical_notes = self._generate_clinical_notes(
-            profile, 1 - adjusted_success_rate, pop_config
+            profile, 1 - adjusted_success_rate, pop_config, risk_category
         )
         
         # Get barrier details
@@ -348,7 +517,7 @@ class LAIPrEPDecisionTool:
         ]
         
         return BridgePeriodAssessment(
-            baseline_success_rate=baseline_success_rate,
+            baseline_success_rate=1 - pop_config['baseline_attrition'],
             adjusted_success_rate=adjusted_success_rate,
             attrition_risk=attrition_risk,
             attrition_risk_category=risk_category,
@@ -363,6 +532,60 @@ class LAIPrEPDecisionTool:
             delay_factors=delay_factors
         )
     
+    def assess_many(
+        self,
+        profiles: List[PatientProfile],
+        max_workers: Optional[int] = None,
+        chunk_size: int = 1024
+    ) -> List[BridgePeriodAssessment]:
+        """
+        Assess many patients on a thread pool
+        
+        Profiles are split into chunks; each chunk's success rates,
+        intervention gain and bridge duration come from the vectorized
+        CohortScorer kernels (recommendations computed once per distinct
+        profile key), and only the explanation fields are built per patient.
+        Results are identical to assess_patient, in input order.
+        
+        Args:
+            profiles: PatientProfiles to assess
+            max_workers: Thread count (ThreadPoolExecutor default if None)
+            chunk_size: Profiles per chunk
+            
+        Returns:
+            BridgePeriodAssessment per profile
+        """
+        if chunk_size < 1:
+            raise ValueError(f"chunk_size must be positive, got {chunk_size}")
+        profiles = list(profiles)
+        scorer = self._cohort_scorer()
+        chunks = [profiles[i:i + chunk_size] for i in range(0, len(profiles), chunk_size)]
+        if len(chunks) <= 1:
+            return [a for chunk in chunks for a in scorer.assess_profiles(chunk)]
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return [a for chunk in pool.map(scorer.assess_profiles, chunks) for a in chunk]
+    
+    def _cohort_scorer(self):
+        """Shared CohortScorer for this tool (created once, lock taken only then)"""
+        scorer = self._scorer
+        if scorer is None:
+            with self._scorer_lock:
+                if self._scorer is None:
+                    from cohort_scoring import CohortScorer  # Imports this module
+                    self._scorer = CohortScorer(self)
+                scorer = self._scorer
+        return scorer
+    
+    def _calculate_adjusted_success(
+        self,
+        profile: PatientProfile,
+        baseline_attrition: float
+    ) -> Tuple[float, Dict]:
+        """Adjusted success (before the best-case floor) and its explanation, per method"""
+        if self.use_logit:
+            return self._calculate_adjusted_success_logit(profile, baseline_attrition)
+        return self._calculate_adjusted_success_linear(profile, baseline_attrition)
+    
     def _calculate_adjusted_success_linear(
         self, 
         profile: PatientProfile, 
@@ -471,15 +694,24 @@ class LAIPrEPDecisionTool:
     
     def _categorize_risk(self, attrition_rate: float) -> Tuple[str, Dict]:
         """Categorize attrition risk level using configuration"""
-        for category_name, category_info in self.risk_categories.items():
-            threshold_min = category_info.get('threshold_min', 0)
-            threshold_max = category_info.get('threshold_max', 1.0)
-            
-            if threshold_min <= attrition_rate < threshold_max:
-                return category_info['label'], category_info
+        index = self._risk_lookup[bisect.bisect_right(self._risk_edges, attrition_rate)]
+        category_info = self.risk_categories[self.risk_category_keys[index]]
+        return category_info['label'], category_info
+    
+    def categorize_risk_many(self, attrition_rates) -> np.ndarray:
+        """
+        Categorize many attrition rates at once
         
-        # Default to VERY_HIGH if no match
-        return self.risk_categories['VERY_HIGH']['label'], self.risk_categories['VERY_HIGH']
+        Args:
+            attrition_rates: Array-like of attrition rates
+            
+        Returns:
+            uint8 array of indices into risk_category_keys
+        """
+        positions = np.searchsorted(
+            self._risk_edges_array, np.asarray(attrition_rates, dtype=float), side='right'
+        )
+        return self._risk_lookup_array[positions]
     
     def _generate_recommendations_with_mechanisms(
         self, 
@@ -494,18 +726,35 @@ class LAIPrEPDecisionTool:
         # Generate all candidate recommendations
         candidates = self._generate_candidate_recommendations(profile)
         
-        # Sort by priority and expected improvement
+        return self._select_with_mechanism_diversity(self._prioritize_candidates(candidates))
+    
+    def _prioritize_candidates(
+        self,
+        candidates: List[InterventionRecommendation]
+    ) -> List[InterventionRecommendation]:
+        """Sort candidates by priority and expected improvement (stable)"""
         priority_order = {"Critical": 0, "High": 1, "Moderate": 2}
-        candidates.sort(
+        return sorted(
+            candidates,
             key=lambda x: (priority_order.get(x.priority, 3), -x.expected_improvement)
         )
+    
+    def _select_with_mechanism_diversity(
+        self,
+        candidates: List[InterventionRecommendation],
+        limit: int = 5
+    ) -> List[InterventionRecommendation]:
+        """
+        Select prioritized candidates, penalizing overlapping mechanisms
         
-        # Select recommendations with mechanism diversity
+        Candidates are not modified; penalized selections are copies, so one
+        candidate list can be re-selected under different scenarios.
+        """
         selected = []
         used_mechanisms = set()
         
         for candidate in candidates:
-            if len(selected) >= 5:  # Limit to top 5 recommendations
+            if len(selected) >= limit:  # Limit to top 5 recommendations
                 break
             
             # Calculate mechanism overlap
@@ -514,12 +763,18 @@ class LAIPrEPDecisionTool:
             # Apply overlap penalty (10% reduction per overlapping mechanism)
             if overlap_count > 0:
                 original_improvement = candidate.expected_improvement
-                candidate.expected_improvement *= (0.9 ** overlap_count)
+                rationale = candidate.rationale
                 
                 # Add note about penalty
-                if candidate.rationale:
-                    candidate.rationale += f" (Note: {overlap_count} mechanism overlap, " \
-                                          f"adjusted from {original_improvement:.1f}%)"
+                if rationale:
+                    rationale += f" (Note: {overlap_count} mechanism overlap, " \
+                                 f"adjusted from {original_improvement:.1f}%)"
+                
+                candidate = replace(
+                    candidate,
+                    expected_improvement=original_improvement * (0.9 ** overlap_count),
+                    rationale=rationale
+                )
             
             selected.append(candidate)
             used_mechanisms.update(candidate.mechanisms)
@@ -753,14 +1008,16 @@ class LAIPrEPDecisionTool:
         self,
         profile: PatientProfile,
         attrition_rate: float,
-        pop_config: Dict
+        pop_config: Dict,
+        risk_category: Optional[Dict] = None
     ) -> List[str]:
         """Generate clinical guidance notes"""
         notes = []
         guidance = self.config.get_clinical_guidance()
         
         # Risk level note
-        _, risk_category = self._categorize_risk(attrition_rate)
+        if risk_category is None:
+            _, risk_category = self._categorize_risk(attrition_rate)
         notes.append(
             f"{risk_category['icon']} {risk_category['label'].upper()}: "
             f"{risk_category['clinical_action']} ({attrition_rate:.0%} attrition risk)"
@@ -906,7 +1163,8 @@ class LAIPrEPDecisionTool:
 def assess_patient_json(
     patient_data: Dict, 
     config_path: Optional[str] = None,
-    use_logit: bool = False
+    use_logit: bool = False,
+    config: Optional[Configuration] = None
 ) -> Dict:
     """
     Assess a patient and return JSON results (for CLI/API use)
@@ -915,11 +1173,12 @@ def assess_patient_json(
         patient_data: Dictionary with patient profile data
         config_path: Optional path to configuration file
         use_logit: Whether to use logit-space calculations
+        config: Already-loaded Configuration (takes precedence over config_path)
         
     Returns:
         Dictionary with assessment results
     """
-    tool = LAIPrEPDecisionTool(config_path=config_path, use_logit=use_logit)
+    tool = LAIPrEPDecisionTool(config_path=config_path, use_logit=use_logit, config=config)
     profile = PatientProfile.from_dict(patient_data)
     assessment = tool.assess_patient(profile)
     return assessment.to_json(profile, tool_version="2.1.0")
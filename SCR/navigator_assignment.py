@@ -0,0 +1,489 @@
+#!/usr/bin/env python3
+"""
+Navigator-to-Patient Assignment for LAI-PrEP Bridge Decision Support Tool
+
+Matches patients recommended a navigation program (patient navigation, peer
+navigation, harm reduction integration) to a finite pool of navigators, each
+with setting, population and language affinities and a weekly caseload cap,
+maximizing the total expected success gain.
+
+Expected gain of a match:
+    gain = improvement / 100 x diminishing_returns_factor x effectiveness
+where improvement is the program's expected_improvement from the patient's
+batch assessment and effectiveness is 1, raised by POPULATION_MATCH_BONUS
+when the navigator specializes in the patient's population and scaled by
+LANGUAGE_MISMATCH_FACTOR when both languages are known and differ. A
+navigator is eligible only for programs it delivers and settings it covers.
+
+The capacitated matching is solved exactly as a min-cost flow
+(source -> patient groups -> navigator groups -> sink) by the primal-dual
+method (Dijkstra with potentials, then blocking flows over the zero reduced
+cost subgraph), stopping when no augmenting path adds gain. Patients with
+identical attributes and gain, and navigators with identical affinities, are
+merged into single nodes, so tens of thousands of patients reduce to a graph
+of a few thousand nodes solved in seconds.
+"""
+
+import csv
+import heapq
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from lai_prep_decision_tool_v2_1 import Configuration, ConfigurationError
+
+
+NAVIGATION_INTERVENTIONS = (
+    'PATIENT_NAVIGATION', 'PEER_NAVIGATION', 'HARM_REDUCTION_INTEGRATION'
+)
+
+# Planning weights for navigator affinity
+POPULATION_MATCH_BONUS = 0.25
+LANGUAGE_MISMATCH_FACTOR = 0.5
+
+# Gains are integer micro-units inside the flow solver
+COST_SCALE = 1_000_000
+
+
+@dataclass
+class Navigator:
+    """Navigator roster entry (empty affinity lists mean "any")"""
+    navigator_id: str
+    weekly_capacity: int
+    settings: List[str] = field(default_factory=list)
+    populations: List[str] = field(default_factory=list)
+    languages: List[str] = field(default_factory=list)
+    programs: List[str] = field(default_factory=lambda: list(NAVIGATION_INTERVENTIONS))
+
+    def affinity_key(self) -> tuple:
+        """Navigators with equal keys are interchangeable"""
+        return (
+            frozenset(self.settings), frozenset(self.populations),
+            frozenset(self.languages), frozenset(self.programs)
+        )
+
+
+@dataclass
+class NavigationCandidate:
+    """Patient who was recommended a navigation program"""
+    patient_id: str
+    population: str
+    healthcare_setting: str
+    program: str
+    improvement: float  # Percentage points, as in the assessment
+    language: Optional[str] = None
+
+
+def _split_list(value: Optional[str]) -> List[str]:
+    """Parse a comma-separated roster field"""
+    return [item.strip() for item in (value or '').split(',') if item.strip()]
+
+
+def load_roster(path: str, config: Configuration) -> List[Navigator]:
+    """
+    Load a navigator roster CSV
+
+    Columns: navigator_id, weekly_capacity, and optional comma-separated
+    settings, populations, languages and programs.
+
+    Raises:
+        ConfigurationError: On unknown settings, populations or programs
+    """
+    navigators = []
+    with open(path, 'r', newline='') as f:
+        for row in csv.DictReader(f):
+            programs = _split_list(row.get('programs')) or list(NAVIGATION_INTERVENTIONS)
+            navigator = Navigator(
+                navigator_id=row['navigator_id'],
+                weekly_capacity=int(row['weekly_capacity']),
+                settings=_split_list(row.get('settings')),
+                populations=_split_list(row.get('populations')),
+                languages=[lang.lower() for lang in _split_list(row.get('languages'))],
+                programs=programs,
+            )
+
+            checks = (
+                ('settings', navigator.settings, config.config['healthcare_settings']),
+                ('populations', navigator.populations, config.config['populations']),
+                ('programs', navigator.programs, NAVIGATION_INTERVENTIONS),
+            )
+            for name, values, known in checks:
+                unknown = [v for v in values if v not in known]
+                if unknown:
+                    raise ConfigurationError(
+                        f"Navigator {navigator.navigator_id}: unknown {name} {unknown}"
+                    )
+            if navigator.weekly_capacity < 0:
+                raise ConfigurationError(
+                    f"Navigator {navigator.navigator_id}: negative weekly_capacity"
+                )
+            navigators.append(navigator)
+    return navigators
+
+
+def load_languages(path: str) -> Dict[str, str]:
+    """Load patient_id -> language from a CSV with those two columns"""
+    with open(path, 'r', newline='') as f:
+        return {
+            row['patient_id']: row['language'].strip().lower()
+            for row in csv.DictReader(f) if row.get('language', '').strip()
+        }
+
+
+def candidates_from_assessment(
+    patient_id: str,
+    assessment: Dict,
+    language: Optional[str] = None
+) -> Optional[NavigationCandidate]:
+    """Navigation candidate from an assessment JSON dict (None if none recommended)"""
+    recommendations = [
+        rec for rec in assessment.get('recommendations', [])
+        if rec['intervention'] in NAVIGATION_INTERVENTIONS
+    ]
+    if not recommendations:
+        return None
+
+    best = max(recommendations, key=lambda rec: rec['expected_improvement'])
+    profile = assessment['patient_profile']
+    return NavigationCandidate(
+        patient_id=patient_id,
+        population=profile['population'],
+        healthcare_setting=profile['healthcare_setting'],
+        program=best['intervention'],
+        improvement=best['expected_improvement'],
+        language=language,
+    )
+
+
+def candidates_from_batch_dir(
+    output_dir: str,
+    languages: Optional[Dict[str, str]] = None
+) -> List[NavigationCandidate]:
+    """Navigation candidates from a batch output directory (*_assessment.json)"""
+    languages = languages or {}
+    candidates = []
+    for path in sorted(Path(output_dir).glob('*_assessment.json')):
+        patient_id = path.name[:-len('_assessment.json')]
+        with open(path, 'rb') as f:
+            assessment = json.loads(f.read())
+        candidate = candidates_from_assessment(
+            patient_id, assessment, languages.get(patient_id)
+        )
+        if candidate is not None:
+            candidates.append(candidate)
+    return candidates
+
+
+class MinCostFlow:
+    """Primal-dual min-cost flow with integer costs"""
+
+    def __init__(self, n_nodes: int):
+        self.n = n_nodes
+        self.graph: List[List[list]] = [[] for _ in range(n_nodes)]  # [to, cap, cost, rev]
+
+    def add_edge(self, u: int, v: int, cap: int, cost: int) -> list:
+        """Add edge u -> v; returns the forward edge (its cap is the remaining capacity)"""
+        forward = [v, cap, cost, len(self.graph[v])]
+        backward = [u, 0, -cost, len(self.graph[u])]
+        self.graph[u].append(forward)
+        self.graph[v].append(backward)
+        return forward
+
+    def _initial_potentials(self, source: int) -> List[int]:
+        """Shortest distances by Bellman-Ford (edges may be negative, no cycles)"""
+        potential = [0] * self.n
+        reached = [False] * self.n
+        reached[source] = True
+        for _ in range(self.n):
+            changed = False
+            for u in range(self.n):
+                if not reached[u]:
+                    continue
+                for v, cap, cost, _ in self.graph[u]:
+                    if cap > 0 and (not reached[v] or potential[u] + cost < potential[v]):
+                        potential[v] = potential[u] + cost
+                        reached[v] = True
+                        changed = True
+            if not changed:
+                break
+        return potential
+
+    def min_cost_flow(self, source: int, sink: int) -> Tuple[int, int]:
+        """
+        Push flow while augmenting paths have negative cost
+
+        Primal-dual: each Dijkstra pass updates the potentials, then blocking
+        flows saturate every shortest path of that length before the next
+        pass, so the number of passes is the number of distinct path costs
+        rather than the number of augmentations.
+
+        Returns:
+            (flow, cost) of the minimum-cost flow of any amount
+        """
+        potential = self._initial_potentials(source)
+        flow = cost = 0
+
+        while True:
+            dist = self._dijkstra(source, sink, potential)
+            if dist[sink] is None:
+                break
+
+            # Keeps reduced costs non-negative for the next search
+            limit = dist[sink]
+            for v in range(self.n):
+                d = dist[v]
+                potential[v] += limit if d is None or d > limit else d
+
+            path_cost = potential[sink] - potential[source]
+            if path_cost >= 0:
+                break
+
+            while True:
+                level = self._admissible_levels(source, potential)
+                if level[sink] < 0:
+                    break
+                cursor = [0] * self.n
+                while True:
+                    pushed = self._augment(source, sink, potential, level, cursor)
+                    if not pushed:
+                        break
+                    flow += pushed
+                    cost += pushed * path_cost
+
+        return flow, cost
+
+    def _dijkstra(self, source: int, sink: int, potential: List[int]) -> List[Optional[int]]:
+        """Reduced-cost distances from source (None if unreached), stopping at sink"""
+        dist: List[Optional[int]] = [None] * self.n
+        dist[source] = 0
+        done = [False] * self.n
+        heap = [(0, source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if done[u]:
+                continue
+            done[u] = True
+            if u == sink:
+                break
+            pu = potential[u]
+            for v, cap, edge_cost, _ in self.graph[u]:
+                if cap <= 0 or done[v]:
+                    continue
+                nd = d + edge_cost + pu - potential[v]
+                if dist[v] is None or nd < dist[v]:
+                    dist[v] = nd
+                    heapq.heappush(heap, (nd, v))
+        return dist
+
+    def _admissible_levels(self, source: int, potential: List[int]) -> List[int]:
+        """BFS levels over residual edges with zero reduced cost (-1 if unreached)"""
+        level = [-1] * self.n
+        level[source] = 0
+        queue = [source]
+        for u in queue:
+            pu = potential[u]
+            for v, cap, edge_cost, _ in self.graph[u]:
+                if cap > 0 and level[v] < 0 and edge_cost + pu == potential[v]:
+                    level[v] = level[u] + 1
+                    queue.append(v)
+        return level
+
+    def _augment(self, source, sink, potential, level, cursor) -> int:
+        """Push one augmenting path along the admissible level graph (0 if none)"""
+        path = []
+        u = source
+        while True:
+            if u == sink:
+                push = min(self.graph[x][i][1] for x, i in path)
+                for x, i in path:
+                    edge = self.graph[x][i]
+                    edge[1] -= push
+                    self.graph[edge[0]][edge[3]][1] += push
+                return push
+
+            edges = self.graph[u]
+            while cursor[u] < len(edges):
+                v, cap, edge_cost, _ = edges[cursor[u]]
+                if (cap > 0 and level[v] == level[u] + 1
+                        and edge_cost + potential[u] == potential[v]):
+                    break
+                cursor[u] += 1
+
+            if cursor[u] < len(edges):
+                path.append((u, cursor[u]))
+                u = edges[cursor[u]][0]
+            elif u == source:
+                return 0
+            else:
+                # Dead end: retreat and skip the edge that led here
+                level[u] = -1
+                u, _ = path.pop()
+                cursor[u] += 1
+
+
+class NavigatorAssignment:
+    """Capacitated matching of navigation candidates to navigators"""
+
+    def __init__(
+        self,
+        config: Configuration,
+        navigators: List[Navigator],
+        population_match_bonus: float = POPULATION_MATCH_BONUS,
+        language_mismatch_factor: float = LANGUAGE_MISMATCH_FACTOR
+    ):
+        """
+        Args:
+            config: Configuration (for the diminishing-returns factor)
+            navigators: Navigator roster
+            population_match_bonus: Effectiveness bonus for a population specialist
+            language_mismatch_factor: Effectiveness multiplier when languages differ
+
+        Raises:
+            ValueError: If two navigators share a navigator_id
+        """
+        seen = set()
+        for navigator in navigators:
+            if navigator.navigator_id in seen:
+                raise ValueError(f"Duplicate navigator_id in roster: {navigator.navigator_id}")
+            seen.add(navigator.navigator_id)
+        self.navigators = navigators
+        self.diminishing_returns_factor = (
+            config.get_algorithm_params()['intervention_diminishing_returns_factor']
+        )
+        self.population_match_bonus = population_match_bonus
+        self.language_mismatch_factor = language_mismatch_factor
+
+    def effectiveness(self, candidate: NavigationCandidate, navigator: Navigator) -> float:
+        """Effectiveness multiplier of a navigator for a patient (0 if ineligible)"""
+        if candidate.program not in navigator.programs:
+            return 0.0
+        if navigator.settings and candidate.healthcare_setting not in navigator.settings:
+            return 0.0
+
+        effectiveness = 1.0
+        if candidate.population in navigator.populations:
+            effectiveness += self.population_match_bonus
+        if (candidate.language and navigator.languages
+                and candidate.language not in navigator.languages):
+            effectiveness *= self.language_mismatch_factor
+        return effectiveness
+
+    def base_gain(self, candidate: NavigationCandidate) -> float:
+        """Expected success gain of the program before navigator affinity"""
+        return candidate.improvement / 100 * self.diminishing_returns_factor
+
+    def solve(self, candidates: List[NavigationCandidate]) -> List[Optional[str]]:
+        """
+        Assign navigators
+
+        Returns:
+            navigator_id (or None) per candidate, in input order
+        """
+        # Merge interchangeable patients and navigators
+        patient_groups: Dict[tuple, List[int]] = {}
+        for index, c in enumerate(candidates):
+            key = (c.population, c.healthcare_setting, c.program, c.language, c.improvement)
+            patient_groups.setdefault(key, []).append(index)
+        navigator_groups: Dict[tuple, List[Navigator]] = {}
+        for navigator in self.navigators:
+            if navigator.weekly_capacity > 0:
+                navigator_groups.setdefault(navigator.affinity_key(), []).append(navigator)
+
+        group_list = list(patient_groups.values())
+        type_list = list(navigator_groups.values())
+        source = 0
+        sink = 1 + len(group_list) + len(type_list)
+        network = MinCostFlow(sink + 1)
+
+        for g, members in enumerate(group_list):
+            network.add_edge(source, 1 + g, len(members), 0)
+        for t, navigators in enumerate(type_list):
+            capacity = sum(n.weekly_capacity for n in navigators)
+            network.add_edge(1 + len(group_list) + t, sink, capacity, 0)
+
+        match_edges = []
+        for g, members in enumerate(group_list):
+            representative = candidates[members[0]]
+            base = self.base_gain(representative)
+            for t, navigators in enumerate(type_list):
+                gain = base * self.effectiveness(representative, navigators[0])
+                scaled = int(round(gain * COST_SCALE))
+                if scaled > 0:
+                    edge = network.add_edge(1 + g, 1 + len(group_list) + t, len(members), -scaled)
+                    match_edges.append((g, t, len(members), edge))
+
+        network.min_cost_flow(source, sink)
+
+        # Hand out flow: patients in input order, navigators in roster order
+        assigned: List[Optional[str]] = [None] * len(candidates)
+        remaining = [[n.weekly_capacity for n in navigators] for navigators in type_list]
+        next_patient = [0] * len(group_list)
+        for g, t, capacity, edge in match_edges:
+            flow = capacity - edge[1]
+            members = group_list[g]
+            navigators = type_list[t]
+            slot = 0
+            for _ in range(flow):
+                while remaining[t][slot] == 0:
+                    slot += 1
+                remaining[t][slot] -= 1
+                assigned[members[next_patient[g]]] = navigators[slot].navigator_id
+                next_patient[g] += 1
+
+        return assigned
+
+    def summary(
+        self,
+        candidates: List[NavigationCandidate],
+        assigned: List[Optional[str]]
+    ) -> Dict:
+        """Totals and per-navigator caseloads"""
+        by_id = {n.navigator_id: n for n in self.navigators}
+        caseloads = {
+            n.navigator_id: {"assigned": 0, "weekly_capacity": n.weekly_capacity,
+                             "expected_success_gain": 0.0}
+            for n in self.navigators
+        }
+        total_gain = 0.0
+        by_program: Dict[str, Dict[str, int]] = {}
+
+        for candidate, navigator_id in zip(candidates, assigned):
+            program = by_program.setdefault(candidate.program, {"candidates": 0, "assigned": 0})
+            program["candidates"] += 1
+            if navigator_id is None:
+                continue
+            gain = self.base_gain(candidate) * self.effectiveness(candidate, by_id[navigator_id])
+            total_gain += gain
+            program["assigned"] += 1
+            caseloads[navigator_id]["assigned"] += 1
+            caseloads[navigator_id]["expected_success_gain"] += gain
+
+        for entry in caseloads.values():
+            entry["expected_success_gain"] = round(entry["expected_success_gain"], 4)
+
+        return {
+            "candidates": len(candidates),
+            "assigned": sum(1 for a in assigned if a is not None),
+            "total_capacity": sum(n.weekly_capacity for n in self.navigators),
+            "expected_success_gain": round(total_gain, 4),
+            "by_program": by_program,
+            "navigators": caseloads,
+        }
+
+
+def assign_navigators(
+    config: Configuration,
+    candidates: Iterable[NavigationCandidate],
+    navigators: List[Navigator]
+) -> Tuple[List[NavigationCandidate], List[Optional[str]], Dict]:
+    """
+    Solve the assignment with default affinity weights
+
+    Returns:
+        (candidates, navigator_id or None per candidate, summary)
+    """
+    candidates = list(candidates)
+    engine = NavigatorAssignment(config, navigators)
+    assigned = engine.solve(candidates)
+    return candidates, assigned, engine.summary(candidates, assigned)
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Compact Binary Patient Encoding for LAI-PrEP Bridge Decision Support Tool
+
+Maps PatientProfile to and from a fixed-width record:
+- population, PrEP status, healthcare setting and insurance as uint8 codes
+- barriers as a little-endian bitmask (uint16, widened for larger configs)
+- boolean flags packed into a single byte
+- age as uint8
+
+Codes follow the key order of the configuration file, so two codecs built
+from the same configuration always agree. Barriers decode in configuration
+order, which is the canonical form used by the fast paths.
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from lai_prep_decision_tool_v2_1 import Configuration, ConfigurationError, PatientProfile
+
+
+# Categorical values the configuration does not enumerate itself
+PREP_STATUSES = ("naive", "oral_prep", "discontinued_oral")
+INSURANCE_STATUSES = ("insured", "uninsured", "underinsured", "parental")
+
+# Bit positions within the packed flags byte
+FLAG_RECENT_HIV_TEST = 0x01
+FLAG_TRANSPORTATION_ACCESS = 0x02
+FLAG_CHILDCARE_NEEDS = 0x04
+
+BOOLEAN_FIELDS = {
+    'recent_hiv_test': FLAG_RECENT_HIV_TEST,
+    'transportation_access': FLAG_TRANSPORTATION_ACCESS,
+    'childcare_needs': FLAG_CHILDCARE_NEEDS,
+}
+
+TRUE_STRINGS = ('true', '1', 'yes')
+
+# Profile defaults, mirrored from PatientProfile
+DEFAULT_FLAGS = FLAG_TRANSPORTATION_ACCESS
+DEFAULT_SETTING = "COMMUNITY_HEALTH_CENTER"
+DEFAULT_INSURANCE = "insured"
+
+MAX_AGE = 255
+
+
+def barrier_mask_dtype(n_barriers: int) -> str:
+    """Smallest little-endian unsigned type holding one bit per barrier"""
+    for bits, dtype in ((16, '<u2'), (32, '<u4'), (64, '<u8')):
+        if n_barriers <= bits:
+            return dtype
+    raise ConfigurationError(
+        f"Too many barriers for bitmask encoding: {n_barriers} (max 64)"
+    )
+
+
+def record_dtype(n_barriers: int) -> np.dtype:
+    """Fixed-width record layout for a configuration with n_barriers barriers"""
+    return np.dtype([
+        ('population', 'u1'),
+        ('prep_status', 'u1'),
+        ('healthcare_setting', 'u1'),
+        ('insurance_status', 'u1'),
+        ('barriers', barrier_mask_dtype(n_barriers)),
+        ('flags', 'u1'),
+        ('age', 'u1'),
+    ])
+
+
+def parse_csv_row(row: Dict) -> Dict:
+    """
+    Convert a raw CSV row (all strings) into PatientProfile field types
+
+    Barriers are a comma-separated string, age an integer and boolean fields
+    accept true/1/yes (case-insensitive). Other columns pass through unchanged.
+    """
+    data = dict(row)
+
+    # Parse barriers (comma-separated string to list)
+    if data.get('barriers'):
+        data['barriers'] = [b.strip() for b in data['barriers'].split(',')]
+    else:
+        data['barriers'] = []
+
+    # Convert age to int
+    if 'age' in data:
+        data['age'] = int(data['age'])
+
+    # Convert boolean fields
+    for field_name in BOOLEAN_FIELDS:
+        if field_name in data:
+            data[field_name] = data[field_name].lower() in TRUE_STRINGS
+
+    return data
+
+
+class PatientCodec:
+    """Encodes patient profiles as fixed-width records using config code maps"""
+
+    # Configuration sections the code maps are built from
+    SECTIONS = (
+        'populations', 'prep_statuses', 'healthcare_settings', 'insurance_statuses', 'barriers'
+    )
+
+    def __init__(self, config: Optional[Configuration] = None):
+        """
+        Build code maps from configuration
+
+        Args:
+            config: Loaded Configuration. If None, the default configuration is loaded.
+        """
+        if config is None:
+            config = Configuration()
+
+        self.populations = tuple(config.config['populations'])
+        self.prep_statuses = tuple(config.config.get('prep_statuses', PREP_STATUSES))
+        self.settings = tuple(config.config['healthcare_settings'])
+        self.insurance_statuses = tuple(
+            config.config.get('insurance_statuses', INSURANCE_STATUSES)
+        )
+        self.barriers = tuple(config.config['barriers'])
+
+        for label, values in (
+            ('populations', self.populations),
+            ('prep statuses', self.prep_statuses),
+            ('healthcare settings', self.settings),
+            ('insurance statuses', self.insurance_statuses),
+        ):
+            if len(values) > 256:
+                raise ConfigurationError(
+                    f"Too many {label} for uint8 encoding: {len(values)}"
+                )
+
+        self.dtype = record_dtype(len(self.barriers))
+
+        self._population_codes = {k: i for i, k in enumerate(self.populations)}
+        self._prep_status_codes = {k: i for i, k in enumerate(self.prep_statuses)}
+        self._setting_codes = {k: i for i, k in enumerate(self.settings)}
+        self._insurance_codes = {k: i for i, k in enumerate(self.insurance_statuses)}
+        self._barrier_bits = {k: 1 << i for i, k in enumerate(self.barriers)}
+
+    # ------------------------------------------------------------------
+    # Field-level codes
+    # ------------------------------------------------------------------
+
+    def population_code(self, population: str) -> int:
+        """uint8 code for a population key"""
+        try:
+            return self._population_codes[population]
+        except KeyError:
+            raise ConfigurationError(f"Unknown population: {population}")
+
+    def prep_status_code(self, status: str) -> int:
+        """uint8 code for a PrEP status"""
+        try:
+            return self._prep_status_codes[status]
+        except KeyError:
+            raise ConfigurationError(f"Unknown PrEP status: {status}")
+
+    def setting_code(self, setting: str) -> int:
+        """uint8 code for a healthcare setting key"""
+        try:
+            return self._setting_codes[setting]
+        except KeyError:
+            raise ConfigurationError(f"Unknown setting: {setting}")
+
+    def insurance_code(self, insurance: str) -> int:
+        """uint8 code for an insurance status"""
+        try:
+            return self._insurance_codes[insurance]
+        except KeyError:
+            raise ConfigurationError(f"Unknown insurance status: {insurance}")
+
+    def barrier_mask(self, barriers: Iterable[str]) -> int:
+        """Bitmask for a list of barrier keys (duplicates collapse)"""
+        mask = 0
+        for barrier in barriers:
+            try:
+                mask |= self._barrier_bits[barrier]
+            except KeyError:
+                raise ConfigurationError(f"Unknown barrier: {barrier}")
+        return mask
+
+    def barrier_list(self, mask: int) -> List[str]:
+        """Barrier keys set in a bitmask, in configuration order"""
+        return [b for i, b in enumerate(self.barriers) if mask >> i & 1]
+
+    # ------------------------------------------------------------------
+    # Single records
+    # ------------------------------------------------------------------
+
+    def _encode_fields(
+        self,
+        population: str,
+        age: int,
+        prep_status: str,
+        barriers: Iterable[str],
+        setting: str,
+        insurance: str,
+        flags: int
+    ) -> tuple:
+        """Encode already-typed profile fields as a record tuple"""
+        age = int(age)
+        if not 0 <= age <= MAX_AGE:
+            raise ValueError(f"Age out of encodable range 0-{MAX_AGE}: {age}")
+
+        return (
+            self.population_code(population),
+            self.prep_status_code(prep_status),
+            self.setting_code(setting),
+            self.insurance_code(insurance),
+            self.barrier_mask(barriers),
+            flags,
+            age,
+        )
+
+    def encode(self, profile: PatientProfile) -> np.void:
+        """Encode a PatientProfile as a single fixed-width record"""
+        return np.array([self._profile_tuple(profile)], dtype=self.dtype)[0]
+
+    def _profile_tuple(self, profile: PatientProfile) -> tuple:
+        """Record tuple for a PatientProfile"""
+        flags = 0
+        if profile.recent_hiv_test:
+            flags |= FLAG_RECENT_HIV_TEST
+        if profile.transportation_access:
+            flags |= FLAG_TRANSPORTATION_ACCESS
+        if profile.childcare_needs:
+            flags |= FLAG_CHILDCARE_NEEDS
+
+        return self._encode_fields(
+            profile.population,
+            profile.age,
+            profile.current_prep_status,
+            profile.barriers,
+            profile.healthcare_setting,
+            profile.insurance_status,
+            flags
+        )
+
+    def _dict_tuple(self, data: Dict) -> tuple:
+        """Record tuple for a typed profile dictionary (unknown keys ignored)"""
+        flags = DEFAULT_FLAGS
+        for field_name, bit in BOOLEAN_FIELDS.items():
+            if field_name in data:
+                if data[field_name]:
+                    flags |= bit
+                else:
+                    flags &= ~bit
+
+        return self._encode_fields(
+            data['population'],
+            data['age'],
+            data['current_prep_status'],
+            data.get('barriers', []),
+            data.get('healthcare_setting', DEFAULT_SETTING),
+            data.get('insurance_status', DEFAULT_INSURANCE),
+            flags
+        )
+
+    def decode(self, record) -> PatientProfile:
+        """Decode a single record (np.void or tuple) into a PatientProfile"""
+        population, status, setting, insurance, mask, flags, age = (
+            record.tolist() if isinstance(record, np.void) else tuple(record)
+        )
+        return self._make_profile(population, status, setting, insurance, mask, flags, age)
+
+    def _make_profile(self, population, status, setting, insurance, mask, flags, age):
+        """Build a PatientProfile from integer record fields"""
+        return PatientProfile(
+            population=self.populations[population],
+            age=age,
+            current_prep_status=self.prep_statuses[status],
+            barriers=self.barrier_list(mask),
+            healthcare_setting=self.settings[setting],
+            insurance_status=self.insurance_statuses[insurance],
+            recent_hiv_test=bool(flags & FLAG_RECENT_HIV_TEST),
+            transportation_access=bool(flags & FLAG_TRANSPORTATION_ACCESS),
+            childcare_needs=bool(flags & FLAG_CHILDCARE_NEEDS)
+        )
+
+    # ------------------------------------------------------------------
+    # Bulk conversion
+    # ------------------------------------------------------------------
+
+    def empty(self, n: int = 0) -> np.ndarray:
+        """Zero-filled structured array of n records"""
+        return np.zeros(n, dtype=self.dtype)
+
+    def encode_many(self, profiles: Iterable[PatientProfile]) -> np.ndarray:
+        """Encode PatientProfiles into a structured array"""
+        return np.array([self._profile_tuple(p) for p in profiles], dtype=self.dtype)
+
+    def decode_many(self, records: np.ndarray) -> List[PatientProfile]:
+        """Decode a structured array into PatientProfiles"""
+        return [self._make_profile(*row) for row in records.tolist()]
+
+    def from_dicts(self, rows: Iterable[Dict]) -> np.ndarray:
+        """Encode typed profile dictionaries (as accepted by PatientProfile.from_dict)"""
+        return np.array([self._dict_tuple(row) for row in rows], dtype=self.dtype)
+
+    def to_dicts(self, records: np.ndarray) -> List[Dict]:
+        """Decode a structured array into typed profile dictionaries"""
+        return [p.to_dict() for p in self.decode_many(records)]
+
+    def from_csv_rows(self, rows: Iterable[Dict]) -> np.ndarray:
+        """Encode raw CSV rows (string values, as produced by csv.DictReader)"""
+        return self.from_dicts(parse_csv_row(row) for row in rows)
+
+    def to_csv_rows(self, records: np.ndarray) -> List[Dict]:
+        """Decode a structured array into CSV-ready rows (batch input format)"""
+        rows = []
+        for data in self.to_dicts(records):
+            data['barriers'] = ','.join(data['barriers'])
+            data['age'] = str(data['age'])
+            for field_name in BOOLEAN_FIELDS:
+                data[field_name] = 'true' if data[field_name] else 'false'
+            rows.append(data)
+        return rows
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Incremental Patient Sessions for LAI-PrEP Bridge Decision Support Tool
+
+A PatientSession holds one patient's encoded profile and current assessment
+through the bridge period, and applies status updates as deltas:
+
+- add_barrier / resolve_barrier
+- record_hiv_test
+- start_oral_prep
+
+Each delta refreshes only the results that depend on the changed input:
+
+- barriers: adjusted success (impact sum over the current mask in
+  configuration order, or the last-applied barrier's log-odds in logit
+  mode), recommendations, bridge duration
+- HIV test / PrEP status: best-case floor, recommendations, bridge duration
+
+Risk and estimated success follow from those. Recommendations come from the
+CohortScorer's per-key cache, so sessions sharing a scorer compute each
+distinct recommendation list once. The full BridgePeriodAssessment (factors,
+clinical notes, delay factors) is only built when asked for.
+
+Every applied delta is appended to a compact event log (timestamp, event,
+barrier code, resulting risk) for audit.
+"""
+
+import bisect
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from cohort_scoring import CohortScorer, _copy_recommendation
+from lai_prep_decision_tool_v2_1 import (
+    BridgePeriodAssessment,
+    InterventionRecommendation,
+    PatientProfile
+)
+from patient_codec import FLAG_RECENT_HIV_TEST
+
+
+# Event codes in the audit log
+ADD_BARRIER, RESOLVE_BARRIER, RECORD_HIV_TEST, START_ORAL_PREP = range(4)
+EVENT_NAMES = ('add_barrier', 'resolve_barrier', 'record_hiv_test', 'start_oral_prep')
+
+# One audit log entry; barrier is -1 for events without one
+EVENT_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('event', 'u1'),
+    ('barrier', '<i2'),
+    ('risk', 'u1'),
+])
+
+
+class PatientSession:
+    """One patient's bridge-period state, updated incrementally"""
+
+    def __init__(
+        self,
+        scorer: CohortScorer,
+        profile: PatientProfile,
+        patient_id: Optional[str] = None
+    ):
+        """
+        Open a session with a full assessment of the starting profile
+
+        Args:
+            scorer: CohortScorer for the active configuration and method
+                (share one across sessions to share recommendation results)
+            profile: Starting PatientProfile
+            patient_id: Optional identifier carried into to_dict()
+        """
+        self.scorer = scorer
+        self.tool = scorer.tool
+        self.tables = scorer.tables
+        self.codec = scorer.codec
+        self.patient_id = patient_id
+
+        (self._population, self._status, self._setting, self._insurance,
+         self._mask, self._flags, self._age) = self.codec.encode(profile).tolist()
+        self._baseline = float(self.tables.baseline_attrition[self._population])
+        self._count_penalty = self.tables.count_penalty.tolist()
+        self._barrier_impact = self.tables.barrier_impact.tolist()
+
+        self._log: List[Tuple[float, int, int, int]] = []
+        self._assessment: Optional[BridgePeriodAssessment] = None
+
+        self._count = bin(self._mask).count('1')
+        self._update_barrier_success()
+        self._update_status()
+
+    @classmethod
+    def from_record(
+        cls,
+        scorer: CohortScorer,
+        record,
+        patient_id: Optional[str] = None
+    ) -> 'PatientSession':
+        """Open a session from an encoded PatientCodec record"""
+        return cls(scorer, scorer.codec.decode(record), patient_id)
+
+    # ------------------------------------------------------------------
+    # Incremental updates
+    # ------------------------------------------------------------------
+
+    def _update_barrier_success(self) -> None:
+        """Adjusted success before the best-case floor (barrier inputs changed)"""
+        if self.scorer.use_logit:
+            self._raw_success = self.scorer.logit_success_table()[self._population][
+                self._mask.bit_length()][min(self._count, 3)]
+        else:
+            # Summed afresh in configuration order, as assess_patient does: a
+            # running total updated by add/subtract drifts in the last bits
+            tables = self.tables
+            impact_sum = sum(
+                impact for j, impact in enumerate(self._barrier_impact) if self._mask >> j & 1
+            )
+            adjustment = impact_sum + self._count_penalty[min(self._count, 3)]
+            self._raw_success = 1 - min(
+                tables.max_attrition_ceiling, self._baseline + adjustment
+            )
+
+    def _update_status(self) -> None:
+        """Floor, risk, recommendations, estimated success and bridge duration"""
+        tables = self.tables
+        tool = self.tool
+        oral = self._status == tables.oral_prep_code
+        recent = bool(self._flags & FLAG_RECENT_HIV_TEST)
+
+        success = self._raw_success
+        if oral and recent and self._count == 0:
+            success = max(success, tables.best_case_success_floor)
+        self.adjusted_success = success
+
+        self.risk_index = tool._risk_lookup[
+            bisect.bisect_right(tool._risk_edges, 1 - success)
+        ]
+
+        n_status, n_recent, n_setting, n_mask = self.scorer._key_radix
+        key = self._population
+        key = key * n_status + self._status
+        key = key * n_recent + recent
+        key = key * n_setting + self._setting
+        key = key * n_mask + self._mask
+        self._recommendations = self.scorer.recommendations_for_key(key)
+
+        gain = sum(rec.expected_improvement / 100 for rec in self._recommendations[:3])
+        self.estimated_success = min(
+            tables.max_success_rate, success + gain * tables.diminishing_returns_factor
+        )
+
+        if oral:
+            ranges = tables.bridge_oral_recent if recent else tables.bridge_oral_no_recent
+            self.bridge_duration = (int(ranges[0]), int(ranges[1]))
+        else:
+            ranges = tables.bridge_naive_recent if recent else tables.bridge_naive_no_recent
+            max_days = tables.maximum_bridge_duration if self._count > 2 else ranges[1]
+            self.bridge_duration = (int(ranges[0]), int(max_days))
+
+        self._assessment = None
+
+    def _record(self, event: int, barrier: int, timestamp: Optional[float]) -> None:
+        """Append an applied delta to the audit log"""
+        when = time.time() if timestamp is None else timestamp
+        self._log.append((when, event, barrier, self.risk_index))
+
+    def _barrier_bit(self, barrier: str) -> int:
+        """Bit position of a barrier key (ConfigurationError if unknown)"""
+        return self.codec.barrier_mask([barrier]).bit_length() - 1
+
+    def add_barrier(self, barrier: str, timestamp: Optional[float] = None) -> bool:
+        """
+        Add a barrier
+
+        Args:
+            barrier: Barrier key from config
+            timestamp: Event time (epoch seconds, default now)
+
+        Returns:
+            True if the barrier was added, False if already present
+        """
+        j = self._barrier_bit(barrier)
+        if self._mask >> j & 1:
+            return False
+        self._mask |= 1 << j
+        self._count += 1
+        self._update_barrier_success()
+        self._update_status()
+        self._record(ADD_BARRIER, j, timestamp)
+        return True
+
+    def resolve_barrier(self, barrier: str, timestamp: Optional[float] = None) -> bool:
+        """
+        Resolve (remove) a barrier
+
+        Returns:
+            True if the barrier was removed, False if not present
+        """
+        j = self._barrier_bit(barrier)
+        if not self._mask >> j & 1:
+            return False
+        self._mask &= ~(1 << j)
+        self._count -= 1
+        self._update_barrier_success()
+        self._update_status()
+        self._record(RESOLVE_BARRIER, j, timestamp)
+        return True
+
+    def record_hiv_test(self, timestamp: Optional[float] = None) -> bool:
+        """
+        Record a recent HIV test
+
+        Returns:
+            True if the flag changed, False if a recent test was already recorded
+        """
+        if self._flags & FLAG_RECENT_HIV_TEST:
+            return False
+        self._flags |= FLAG_RECENT_HIV_TEST
+        self._update_status()
+        self._record(RECORD_HIV_TEST, -1, timestamp)
+        return True
+
+    def start_oral_prep(self, timestamp: Optional[float] = None) -> bool:
+        """
+        Record that the patient started oral PrEP
+
+        Returns:
+            True if the status changed, False if already on oral PrEP
+        """
+        if self._status == self.tables.oral_prep_code:
+            return False
+        self._status = self.tables.oral_prep_code
+        self._update_status()
+        self._record(START_ORAL_PREP, -1, timestamp)
+        return True
+
+    # ------------------------------------------------------------------
+    # Current state
+    # ------------------------------------------------------------------
+
+    @property
+    def record(self) -> np.void:
+        """Current encoded profile"""
+        return np.array([(
+            self._population, self._status, self._setting, self._insurance,
+            self._mask, self._flags, self._age
+        )], dtype=self.codec.dtype)[0]
+
+    @property
+    def profile(self) -> PatientProfile:
+        """Current profile (barriers in configuration order)"""
+        return self.codec._make_profile(
+            self._population, self._status, self._setting, self._insurance,
+            self._mask, self._flags, self._age
+        )
+
+    @property
+    def barriers(self) -> List[str]:
+        """Current barrier keys in configuration order"""
+        return self.codec.barrier_list(self._mask)
+
+    @property
+    def attrition_risk(self) -> str:
+        """Current attrition risk label"""
+        return self.tables.risk_labels[self.risk_index]
+
+    @property
+    def recommendations(self) -> List[InterventionRecommendation]:
+        """Current recommendations (shared with the scorer cache; treat as read-only)"""
+        return self._recommendations
+
+    def assessment(self) -> BridgePeriodAssessment:
+        """
+        Full assessment of the current profile, as assess_patient returns it
+
+        Built on first request after a change; explanation fields
+        (attrition factors, clinical notes, delay factors) are only computed here.
+        Its recommendations are copies, so editing them leaves the scorer cache
+        and other sessions untouched.
+        """
+        if self._assessment is not None:
+            return self._assessment
+
+        tool = self.tool
+        profile = self.profile
+        pop_config = tool.config.get_population_config(profile.population)
+        _, attrition_factors = tool._calculate_adjusted_success(profile, self._baseline)
+
+        self._assessment = tool._build_assessment(
+            profile,
+            pop_config,
+            self.adjusted_success,
+            attrition_factors,
+            [_copy_recommendation(rec) for rec in self._recommendations],
+            self.estimated_success,
+            self.bridge_duration
+        )
+        return self._assessment
+
+    # ------------------------------------------------------------------
+    # Audit log
+    # ------------------------------------------------------------------
+
+    def event_log(self) -> np.ndarray:
+        """Applied deltas as a structured array with EVENT_DTYPE"""
+        return np.array(self._log, dtype=EVENT_DTYPE)
+
+    def events(self) -> List[Dict]:
+        """Applied deltas with decoded names and ISO timestamps"""
+        return [
+            {
+                "timestamp": datetime.fromtimestamp(when).isoformat(),
+                "event": EVENT_NAMES[event],
+                "barrier": self.codec.barriers[barrier] if barrier >= 0 else None,
+                "risk": self.tables.risk_labels[risk],
+            }
+            for when, event, barrier, risk in self._log
+        ]
+
+    def to_dict(self) -> Dict:
+        """Current state summary with the audit log"""
+        return {
+            "patient_id": self.patient_id,
+            "barriers": self.barriers,
+            "prep_status": self.codec.prep_statuses[self._status],
+            "recent_hiv_test": bool(self._flags & FLAG_RECENT_HIV_TEST),
+            "adjusted_success": round(self.adjusted_success, 4),
+            "estimated_success": round(self.estimated_success, 4),
+            "attrition_risk": self.attrition_risk,
+            "recommendations": [rec.intervention for rec in self._recommendations],
+            "bridge_duration_days": list(self.bridge_duration),
+            "events": self.events(),
+        }
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Content-Addressed Run Cache for LAI-PrEP Bridge Decision Support Tool
+
+Stores the outputs of long simulation runs (see validation_simulation.py) in
+a directory so repeated and extended runs reuse finished work:
+
+    <directory>/manifest.json        entry key -> file, kind, size, times, meta
+    <directory>/objects/ab/<key>.*   one file per entry, named by its key
+
+Entries are either per-chunk partials (NumPy .npz arrays) or finished run
+reports (JSON). Keys are SHA-256 digests of everything the content depends
+on, so an entry is never updated in place: a changed input is a new key, and
+the old entry simply stops being used until garbage collection removes it.
+
+Object files and the manifest are written to a temporary name and renamed,
+so an interrupted run leaves every finished chunk usable. The cache is meant
+for one writer at a time; a second process writing concurrently may lose
+manifest entries (their object files are then removed by gc as orphans).
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+
+MANIFEST_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+OBJECTS_DIR = "objects"
+
+CHUNK, RUN = "chunk", "run"
+SUFFIXES = {CHUNK: ".npz", RUN: ".json"}
+
+
+def content_key(*parts) -> str:
+    """Hex SHA-256 key of JSON-serializable parts (dict keys sorted)"""
+    payload = json.dumps(parts, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class RunCache:
+    """Directory of content-addressed chunk partials and run reports"""
+
+    def __init__(self, directory: str):
+        """
+        Open (or create) a run cache directory
+
+        Args:
+            directory: Cache directory; a missing or unreadable manifest starts empty
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = self.directory / MANIFEST_NAME
+        self.entries: Dict[str, Dict] = {}
+        try:
+            with open(self.manifest_path, 'r') as f:
+                data = json.load(f)
+            if data.get('manifest_version') == MANIFEST_VERSION:
+                self.entries = data.get('entries', {})
+        except (OSError, ValueError, AttributeError):
+            pass
+
+    def _object_path(self, key: str, kind: str) -> Path:
+        return self.directory / OBJECTS_DIR / key[:2] / f"{key}{SUFFIXES[kind]}"
+
+    def _lookup(self, key: str, kind: str) -> Optional[Path]:
+        """Object file of a live entry, marking it used; None if missing"""
+        entry = self.entries.get(key)
+        if entry is None or entry['kind'] != kind:
+            return None
+        path = self.directory / entry['file']
+        if not path.exists():
+            del self.entries[key]
+            return None
+        entry['last_used'] = time.time()
+        return path
+
+    def _store(self, key: str, kind: str, write, meta: Dict) -> None:
+        """Write an object atomically, record it and save the manifest"""
+        path = self._object_path(key, kind)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.tmp")
+        with open(tmp_path, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+        now = time.time()
+        self.entries[key] = {
+            'kind': kind,
+            'file': path.relative_to(self.directory).as_posix(),
+            'bytes': path.stat().st_size,
+            'created': now,
+            'last_used': now,
+            'meta': meta,
+        }
+        self.save()
+
+    def get_chunk(self, key: str) -> Optional[Dict[str, np.ndarray]]:
+        """Arrays of a cached chunk partial, or None"""
+        path = self._lookup(key, CHUNK)
+        if path is None:
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                return {name: data[name] for name in data.files}
+        except (OSError, ValueError):
+            del self.entries[key]
+            return None
+
+    def put_chunk(self, key: str, arrays: Dict[str, np.ndarray], meta: Dict) -> None:
+        """Store a chunk partial"""
+        self._store(key, CHUNK, lambda f: np.savez(f, **arrays), meta)
+
+    def get_run(self, key: str) -> Optional[Dict]:
+        """A cached run report, or None"""
+        path = self._lookup(key, RUN)
+        if path is None:
+            return None
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            del self.entries[key]
+            return None
+
+    def put_run(self, key: str, report: Dict, meta: Dict) -> None:
+        """Store a run report"""
+        payload = json.dumps(report, indent=2).encode('utf-8')
+        self._store(key, RUN, lambda f: f.write(payload), meta)
+
+    def save(self) -> None:
+        """Write the manifest atomically"""
+        tmp_path = self.manifest_path.with_name(f"{MANIFEST_NAME}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump({'manifest_version': MANIFEST_VERSION, 'entries': self.entries}, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def stats(self) -> Dict[str, int]:
+        """Entry and byte counts per kind"""
+        stats = {'entries': len(self.entries), 'bytes': 0}
+        for kind in SUFFIXES:
+            entries = [e for e in self.entries.values() if e['kind'] == kind]
+            stats[f'{kind}_entries'] = len(entries)
+            stats[f'{kind}_bytes'] = sum(e['bytes'] for e in entries)
+            stats['bytes'] += stats[f'{kind}_bytes']
+        return stats
+
+    def gc(
+        self,
+        max_bytes: Optional[int] = None,
+        older_than_days: Optional[float] = None,
+        keep_code_versions: Optional[Iterable[str]] = None
+    ) -> Dict[str, int]:
+        """
+        Remove entries and orphaned files
+
+        Files without a manifest entry (interrupted writes, lost entries) and
+        entries whose file is gone are always cleaned up.
+
+        Args:
+            max_bytes: Evict least recently used entries until the total fits
+            older_than_days: Remove entries unused for longer than this
+            keep_code_versions: Remove entries recorded under any other code version
+
+        Returns:
+            Counts of removed entries, orphan files and freed bytes
+        """
+        removed = set()
+        now = time.time()
+        keep = set(keep_code_versions) if keep_code_versions is not None else None
+        for key, entry in self.entries.items():
+            if not (self.directory / entry['file']).exists():
+                removed.add(key)
+            elif older_than_days is not None and \
+                    now - entry['last_used'] > older_than_days * 86400:
+                removed.add(key)
+            elif keep is not None and entry['meta'].get('code_version') not in keep:
+                removed.add(key)
+
+        if max_bytes is not None:
+            live = sorted(
+                (entry['last_used'], key) for key, entry in self.entries.items()
+                if key not in removed
+            )
+            total = sum(self.entries[key]['bytes'] for _, key in live)
+            for _, key in live:
+                if total <= max_bytes:
+                    break
+                removed.add(key)
+                total -= self.entries[key]['bytes']
+
+        freed = 0
+        for key in removed:
+            path = self.directory / self.entries.pop(key)['file']
+            if path.exists():
+                freed += path.stat().st_size
+                path.unlink()
+
+        orphans = 0
+        live_files = {entry['file'] for entry in self.entries.values()}
+        objects = self.directory / OBJECTS_DIR
+        if objects.exists():
+            for path in objects.rglob('*'):
+                if path.is_file() and \
+                        path.relative_to(self.directory).as_posix() not in live_files:
+                    freed += path.stat().st_size
+                    path.unlink()
+                    orphans += 1
+
+        self.save()
+        return {'removed': len(removed), 'orphans': orphans, 'freed_bytes': freed}
@@ -5,6 +5,7 @@ Usage:
   python run_tests.py            # run unit/edge-case tests
   python run_tests.py --all      # run tests and configuration validation
   python run_tests.py --quiet    # minimal pytest output
+  python run_tests.py --all --configs sites/ --validation-cache .validation_cache.json
 
 This is useful after upgrading to a new version to quickly check for regressions.
 """
@@ -18,6 +19,10 @@ def main(argv: list[str] | None = None) -> int:
     parser = argparse.ArgumentParser(description="Run LAI-PrEP Bridge Tool tests")
     parser.add_argument("--all", action="store_true", help="Run tests and config validation")
     parser.add_argument("--quiet", action="store_true", help="Minimize pytest output")
+    parser.add_argument("--configs", nargs="+", default=None,
+                        help="With --all: config files or directories to validate")
+    parser.add_argument("--validation-cache", default=None,
+                        help="With --configs: cache file so unchanged configs are skipped")
     args = parser.parse_args(argv)
 
     # Ensure pytest is available
@@ -29,35 +34,43 @@ def main(argv: list[str] | None = None) -> int:
         return 1
 
     repo_root = Path(__file__).parent
-    test_file = repo_root / "test_edge_cases.py"
-    if not test_file.exists():
-        print(f"Could not find test file: {test_file}")
+    test_files = sorted(str(p) for p in repo_root.glob("test_*.py"))
+    if not test_files:
+        print(f"Could not find test files in: {repo_root}")
         return 1
 
-    pytest_args = [str(test_file), "-v", "--tb=short"]
+    pytest_args = test_files + ["-v", "--tb=short"]
     if args.quiet:
-        pytest_args = [str(test_file), "-q"]
+        pytest_args = test_files + ["-q"]
 
     print("==> Running test suite\n")
     result_code = pytest.main(pytest_args)
 
     if args.all:
         print("\n==> Running configuration validation\n")
-        validate_script = repo_root / "validate_config.py"
-        if validate_script.exists():
-            # Run validate_config as a module for portability
-            try:
-                import runpy
-                runpy.run_path(str(validate_script), run_name="__main__")
-            except SystemExit as se:
-                # Some scripts may call sys.exit; treat non-zero as failure
-                if int(se.code or 0) != 0:
-                    result_code = result_code or int(se.code)
-            except Exception as e:
-                print(f"Validation script failed: {e}")
-                result_code = result_code or 1
-        else:
+        try:
+            from validate_config import ConfigValidator, validate_paths
+        except ImportError:
             print("No validate_config.py found; skipping validation.")
+        else:
+            if args.configs:
+                # Site configs: parallel, cached library mode with cross-config checks
+                report = validate_paths(args.configs, cache_path=args.validation_cache)
+                report.print_summary()
+                valid = report.valid
+            else:
+                config_path = next(
+                    (p for p in (repo_root / "lai_prep_config.json",
+                                 repo_root.parent / "lai_prep_config.json") if p.exists()),
+                    None
+                )
+                if config_path is None:
+                    print("No lai_prep_config.json found; skipping validation.")
+                    valid = True
+                else:
+                    valid = ConfigValidator(str(config_path)).validate()
+            if not valid:
+                result_code = result_code or 1
 
     if result_code == 0:
         print("\n✅ All checks passed.")
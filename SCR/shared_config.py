@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Shared-Memory Compiled Configuration for LAI-PrEP Bridge Decision Support Tool
+
+Publishes a configuration and its compiled lookup tables into one
+multiprocessing.shared_memory block, so worker processes attach to it
+instead of re-reading lai_prep_config.json and rebuilding the tables.
+
+Layout (little-endian):
+    8 bytes   magic b"LPSHMCFG"
+    uint32    layout version
+    uint32    state (0 live, 1 retired)
+    32 bytes  SHA-256 digest of the configuration
+    uint64    index length in bytes
+    uint64    configuration length in bytes
+    index     UTF-8 JSON: array name -> [dtype, shape, offset]
+    config    UTF-8 JSON configuration
+    arrays    CompiledConfig.ARRAYS, each on a 64-byte boundary
+
+Workers are expected to be multiprocessing children of the publisher: they
+share its resource tracker, so the block lives until the publisher closes it.
+
+Workers map the arrays read-only and zero-copy. A publisher retires its block
+when the configuration changes; workers call check() before each unit of
+work, which compares the state and digest in the header with the digest
+they attached to and raises ConfigurationError if they differ.
+"""
+
+import hashlib
+import json
+import struct
+from multiprocessing import shared_memory
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from compiled_config import CompiledConfig
+from lai_prep_decision_tool_v2_1 import Configuration, ConfigurationError, thaw
+
+
+MAGIC = b"LPSHMCFG"
+LAYOUT_VERSION = 1
+PREAMBLE = struct.Struct("<8sII32sQQ")
+ALIGNMENT = 64
+
+STATE_LIVE, STATE_RETIRED = 0, 1
+STATE_OFFSET = 12  # Byte offset of the state field within the preamble
+
+
+def _align(offset: int) -> int:
+    """Round up to the next ALIGNMENT boundary"""
+    return offset + (-offset % ALIGNMENT)
+
+
+def array_layout(arrays: Dict[str, np.ndarray], prefix_size: int) -> Tuple[Dict, bytes, int]:
+    """
+    Place arrays after a fixed prefix and a JSON index of their positions
+
+    Args:
+        arrays: Arrays to lay out, in order
+        prefix_size: Bytes before the arrays, excluding the index itself
+
+    Returns:
+        (index of name -> [dtype, shape, offset], encoded index, total size)
+    """
+    # Index offsets depend on the index length, so size it first with placeholders
+    index = {key: [value.dtype.str, list(value.shape), 0] for key, value in arrays.items()}
+    index_bytes = json.dumps(index).encode('utf-8')
+    for _ in range(2):
+        offset = _align(prefix_size + len(index_bytes))
+        for key, value in arrays.items():
+            index[key][2] = offset
+            offset = _align(offset + value.nbytes)
+        index_bytes = json.dumps(index).encode('utf-8')
+    return index, index_bytes, offset
+
+
+def write_arrays(buf, arrays: Dict[str, np.ndarray], index: Dict) -> None:
+    """Copy arrays into a writable buffer at their index offsets"""
+    for key, value in arrays.items():
+        data = np.ascontiguousarray(value).tobytes()
+        buf[index[key][2]:index[key][2] + len(data)] = data
+
+
+def map_arrays(buf, index: Dict) -> Dict[str, np.ndarray]:
+    """Read-only, zero-copy array views over a buffer laid out by array_layout"""
+    arrays = {}
+    for key, (dtype, shape, offset) in index.items():
+        array = np.ndarray(tuple(shape), dtype=np.dtype(dtype), buffer=buf, offset=offset)
+        array.flags.writeable = False
+        arrays[key] = array
+    return arrays
+
+
+def config_bytes(config: Configuration) -> bytes:
+    """Compact JSON encoding of a configuration (key order kept: it defines codec codes)"""
+    return json.dumps(
+        thaw(config.config), separators=(',', ':'), ensure_ascii=False
+    ).encode('utf-8')
+
+
+def config_digest(config: Configuration) -> str:
+    """Hex SHA-256 digest identifying a configuration's content"""
+    return hashlib.sha256(config_bytes(config)).hexdigest()
+
+
+class SharedConfig:
+    """Owner of a published configuration block (create in the parent process)"""
+
+    def __init__(
+        self,
+        config: Configuration,
+        tables: Optional[CompiledConfig] = None,
+        name: Optional[str] = None
+    ):
+        """
+        Publish a configuration and its compiled tables
+
+        Args:
+            config: Configuration to publish
+            tables: Compiled tables for it (compiled if None)
+            name: Shared memory block name (generated if None)
+        """
+        arrays = (tables if tables is not None else CompiledConfig(config)).arrays()
+        payload = config_bytes(config)
+        digest = hashlib.sha256(payload).digest()
+
+        index, index_bytes, size = array_layout(arrays, PREAMBLE.size + len(payload))
+
+        self._shm = shared_memory.SharedMemory(name=name, create=True, size=max(size, 1))
+        buf = self._shm.buf
+        buf[:PREAMBLE.size] = PREAMBLE.pack(
+            MAGIC, LAYOUT_VERSION, STATE_LIVE, digest, len(index_bytes), len(payload)
+        )
+        start = PREAMBLE.size
+        buf[start:start + len(index_bytes)] = index_bytes
+        start += len(index_bytes)
+        buf[start:start + len(payload)] = payload
+        write_arrays(buf, arrays, index)
+
+        self.name = self._shm.name
+        self.digest = digest.hex()
+        self.size = self._shm.size
+
+    def retire(self) -> None:
+        """Mark the block stale so attached workers stop using it"""
+        struct.pack_into("<I", self._shm.buf, STATE_OFFSET, STATE_RETIRED)
+
+    def close(self) -> None:
+        """Retire, release and remove the block"""
+        if self._shm is None:
+            return
+        self.retire()
+        self._shm.close()
+        self._shm.unlink()
+        self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class AttachedConfig:
+    """Read-only, zero-copy view of a published configuration (use in workers)"""
+
+    def __init__(self, name: str, expected_digest: Optional[str] = None):
+        """
+        Attach to a published block
+
+        Args:
+            name: Shared memory block name (SharedConfig.name)
+            expected_digest: Digest the publisher announced; attaching fails if
+                the block holds a different configuration
+
+        Raises:
+            ConfigurationError: On an invalid, retired or mismatched block
+        """
+        try:
+            self._shm = shared_memory.SharedMemory(name=name)
+        except FileNotFoundError:
+            raise ConfigurationError(f"Shared configuration block not found: {name}")
+
+        buf = self._shm.buf
+        magic, version, state, digest, index_len, config_len = PREAMBLE.unpack_from(buf)
+        if magic != MAGIC:
+            self._shm.close()
+            raise ConfigurationError(f"Not a shared configuration block: {name}")
+        if version != LAYOUT_VERSION:
+            self._shm.close()
+            raise ConfigurationError(
+                f"Unsupported shared configuration layout {version} (expected {LAYOUT_VERSION})"
+            )
+
+        self.name = name
+        self.digest = digest.hex()
+        if expected_digest is not None and self.digest != expected_digest:
+            self._shm.close()
+            raise ConfigurationError(f"Shared configuration {name} holds a different configuration")
+        if state != STATE_LIVE:
+            self._shm.close()
+            raise ConfigurationError(f"Shared configuration {name} has been retired")
+
+        start = PREAMBLE.size
+        index = json.loads(bytes(buf[start:start + index_len]).decode('utf-8'))
+        start += index_len
+        data = json.loads(bytes(buf[start:start + config_len]).decode('utf-8'))
+        self.config = Configuration.from_dict(data, config_path=f"shm://{name}").snapshot()
+
+        self.tables = CompiledConfig(self.config, arrays=map_arrays(buf, index))
+
+    def check(self) -> None:
+        """
+        Verify the block is still live and unchanged
+
+        Raises:
+            ConfigurationError: If the publisher retired or replaced the configuration
+        """
+        _, _, state, digest, _, _ = PREAMBLE.unpack_from(self._shm.buf)
+        if state != STATE_LIVE or digest.hex() != self.digest:
+            raise ConfigurationError(
+                f"Shared configuration {self.name} changed; re-attach to the current block"
+            )
+
+    def close(self) -> None:
+        """Detach (callers must drop scorers or arrays built on the tables first)"""
+        if self._shm is None:
+            return
+        self.tables = None
+        self._shm.close()
+        self._shm = None
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for budget-constrained intervention allocation
+"""
+
+import pytest
+
+from lai_prep_decision_tool_v2_1 import LAIPrEPDecisionTool, ConfigurationError
+from cohort_scoring import CohortScorer
+from allocation import BudgetAllocator, resolve_unit_costs
+from test_cohort_scoring import random_cohort
+
+
+class TestUnitCosts:
+    """Unit cost resolution"""
+
+    def test_cost_level_and_explicit_overrides(self):
+        """Levels map through COST_WEIGHTS; intervention keys take precedence"""
+        config = LAIPrEPDecisionTool().config
+        costs = resolve_unit_costs(config, {'high': 10, 'PATIENT_NAVIGATION': 7.5})
+
+        assert costs['ACCELERATED_TESTING'] == 10       # high
+        assert costs['PATIENT_NAVIGATION'] == 7.5       # explicit
+        assert costs['TEXT_MESSAGE_NAVIGATION'] == 1    # low default
+
+    def test_unknown_key_rejected(self):
+        """Typos in cost files raise ConfigurationError"""
+        with pytest.raises(ConfigurationError):
+            resolve_unit_costs(LAIPrEPDecisionTool().config, {'NAVIGATOR': 3})
+
+
+class TestBudgetAllocator:
+    """Greedy allocation over patient groups"""
+
+    def setup_method(self):
+        """Shared scorer and cohort"""
+        self.tool = LAIPrEPDecisionTool()
+        self.scorer = CohortScorer(self.tool)
+        self.records = random_cohort(self.scorer.codec, 400, seed=9)
+
+    def solve(self, budget, capacities=None):
+        allocator = BudgetAllocator(self.scorer, budget, capacities=capacities)
+        allocator.add(self.records[:250])
+        allocator.add(self.records[250:])
+        allocator.solve()
+        return allocator
+
+    def test_value_function_matches_tool(self):
+        """Allocating every candidate reproduces the tool's estimated success"""
+        allocator = self.solve(0)
+        for profile, key in zip(self.scorer.codec.decode_many(self.records[:50]),
+                                self.scorer.recommendation_keys(self.records[:50]).tolist()):
+            everything = frozenset(c.intervention for c in allocator._key_candidates(key))
+            assert allocator.expected_success(key, everything) == pytest.approx(
+                self.tool.assess_patient(profile).estimated_success_with_interventions, abs=1e-12)
+
+    def test_zero_budget_is_baseline(self):
+        """Nothing is allocated without budget"""
+        summary = self.solve(0).summary()
+
+        assert summary['patients'] == 400
+        assert summary['patients_allocated'] == 0
+        assert summary['expected_successes'] == summary['baseline_expected_successes']
+
+    def test_budget_and_capacity_respected(self):
+        """Spending stays within budget and capacities; more budget never hurts"""
+        small = self.solve(100, capacities={'SAME_DAY_SWITCHING': 10}).summary()
+        large = self.solve(1000, capacities={'SAME_DAY_SWITCHING': 10}).summary()
+
+        assert small['spent'] <= 100
+        assert large['spent'] <= 1000
+        for summary in (small, large):
+            used = summary['by_intervention'].get('SAME_DAY_SWITCHING', {'patients': 0})
+            assert used['patients'] <= 10, "Capacity exceeded"
+        assert 0 < small['successes_gained'] <= large['successes_gained']
+
+    def test_assignment_matches_summary(self):
+        """Per-patient allocations add up to the summary totals"""
+        allocator = self.solve(300)
+        summary = allocator.summary()
+
+        counts = {}
+        cost = 0.0
+        chunks = [(o, self.records[o:o + 128], [None] * 128) for o in range(0, 400, 128)]
+        for _, records, _, allocated_sets in allocator.assign(chunks):
+            assert len(allocated_sets) == len(records)
+            for allocated in allocated_sets:
+                for intervention in allocated:
+                    counts[intervention] = counts.get(intervention, 0) + 1
+                    cost += allocator.unit_costs[intervention]
+
+        assert counts == {k: v['patients'] for k, v in summary['by_intervention'].items()}
+        assert cost == pytest.approx(summary['spent'])
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for the persistent assessment cache
+"""
+
+import multiprocessing
+import os
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from lai_prep_decision_tool_v2_1 import Configuration, LAIPrEPDecisionTool, thaw
+import assessment_cache
+from assessment_cache import AssessmentCache, cache_key, cache_namespace
+from assessment_serializer import AssessmentSerializer
+from batch_processing import run_batch
+from test_cohort_scoring import random_cohort
+
+
+CONFIG_PATH = Path(__file__).parent.parent / "lai_prep_config.json"
+
+
+def _fill(args):
+    """Worker: store records for a range of synthetic keys"""
+    path, start, stop = args
+    with AssessmentCache(path) as cache:
+        for i in range(start, stop, 10):
+            cache.put_many(
+                (bytes([j % 256, j // 256]) * 16, b'{"x":%d}' % j, {'j': j})
+                for j in range(i, min(i + 10, stop))
+            )
+            cache.get_many([bytes([i % 256, i // 256]) * 16])
+
+
+class TestAssessmentCache:
+    """Cached batch runs write the same output as uncached runs"""
+
+    def setup_method(self):
+        """Tool and a small synthetic cohort"""
+        self.tool = LAIPrEPDecisionTool(str(CONFIG_PATH))
+        codec = self.tool._cohort_scorer().codec
+        self.patients = codec.to_dicts(random_cohort(codec, 300, seed=5))
+        self.profiles = codec.decode_many(random_cohort(codec, 40, seed=6))
+
+    def _run(self, output_dir, **kwargs):
+        output_dir.mkdir()
+        return [row for chunk in run_batch(self.tool, self.patients, str(output_dir),
+                                           timestamp="2026-01-01T00:00:00", chunk_size=64,
+                                           **kwargs)
+                for row in chunk]
+
+    def test_serializer_body_round_trip(self):
+        """dumps_body + finish reproduces dumps"""
+        serializer = AssessmentSerializer(self.tool.config)
+        for profile, assessment in zip(self.profiles, self.tool.assess_many(self.profiles)):
+            assert serializer.finish(serializer.dumps_body(assessment, profile), "T") == \
+                serializer.dumps(assessment, profile, "T"), "Record bytes should match"
+
+    def test_cached_batch_matches_uncached(self, tmp_path):
+        """Cold and warm cached runs write the same files and rows as no cache"""
+        cache_path = str(tmp_path / "cache.db")
+        plain = self._run(tmp_path / "plain")
+        cold = self._run(tmp_path / "cold", cache_path=cache_path)
+        warm = self._run(tmp_path / "warm", cache_path=cache_path)
+        assert plain == cold == warm, "Summary rows should match"
+
+        for name in os.listdir(tmp_path / "plain"):
+            expected = (tmp_path / "plain" / name).read_bytes()
+            assert (tmp_path / "warm" / name).read_bytes() == expected, \
+                f"{name} should be byte-identical"
+
+        with AssessmentCache(cache_path) as cache:
+            stats = cache.stats()
+        assert stats['hits'] == len(self.patients), "Warm run should only hit"
+        assert stats['entries'] <= len(self.patients), "One entry per distinct profile"
+
+    def test_worker_processes_share_cache(self, tmp_path):
+        """Workers read what an earlier in-process run stored"""
+        cache_path = str(tmp_path / "cache.db")
+        first = self._run(tmp_path / "first", cache_path=cache_path)
+        second = self._run(tmp_path / "second", cache_path=cache_path, workers=2)
+        assert first == second, "Rows should match across processes"
+        with AssessmentCache(cache_path) as cache:
+            assert cache.stats()['hits'] == len(self.patients), "Workers should hit"
+
+    def test_keys_separate_method_and_config(self, tmp_path):
+        """Another method or configuration never sees the same entries"""
+        serializer = AssessmentSerializer(self.tool.config)
+        logit = LAIPrEPDecisionTool(str(CONFIG_PATH), use_logit=True)
+        profile = self.profiles[0]
+        linear_key = cache_key(cache_namespace(self.tool, serializer), profile)
+        logit_key = cache_key(cache_namespace(logit, serializer), profile)
+        assert linear_key != logit_key, "Methods should not share keys"
+
+        changed = thaw(self.tool.config.config)
+        changed['version'] = 'other'
+        other = LAIPrEPDecisionTool(config=Configuration.from_dict(changed))
+        assert cache_key(cache_namespace(other, serializer), profile) != linear_key, \
+            "Configuration content should be part of the key"
+
+    def test_keys_separate_code_versions(self, monkeypatch):
+        """Edited scoring or serialization code never sees the same entries"""
+        serializer = AssessmentSerializer(self.tool.config)
+        key = cache_key(cache_namespace(self.tool, serializer), self.profiles[0])
+        monkeypatch.setattr(assessment_cache, 'code_version', lambda: 'edited')
+        assert cache_key(cache_namespace(self.tool, serializer), self.profiles[0]) != key, \
+            "Code version should be part of the key"
+
+    def test_lookups_do_not_write(self, tmp_path):
+        """Reads succeed while another process holds the write lock; counts land on close"""
+        path = str(tmp_path / "cache.db")
+        with AssessmentCache(path) as cache:
+            cache.put_many([(b'k' * 32, b'{}', {})])
+        with AssessmentCache(path) as cache:
+            cache._conn.execute("PRAGMA busy_timeout=100")
+            writer = sqlite3.connect(path, isolation_level=None)
+            writer.execute("BEGIN IMMEDIATE")
+            try:
+                assert cache.get_many([b'k' * 32, b'm' * 32]) == [(b'{}', {}), None], \
+                    "Lookup should not wait for the write lock"
+                assert (cache.stats()['hits'], cache.stats()['misses']) == (1, 1), \
+                    "Pending lookups should be counted"
+                writer.execute("COMMIT")
+            finally:
+                writer.close()
+        with AssessmentCache(path) as cache:
+            assert (cache.stats()['hits'], cache.stats()['misses']) == (1, 1), \
+                "Lookups should be written on close"
+
+    def test_lru_eviction_bounds_size(self, tmp_path):
+        """Least recently used entries go first and the bound holds"""
+        with AssessmentCache(str(tmp_path / "cache.db"), max_bytes=2000) as cache:
+            keys = [bytes([i]) * 32 for i in range(25)]
+            cache.put_many((key, b'x' * 90, {}) for key in keys[:10])
+            cache.get_many(keys[:2])
+            for start in range(10, 25, 5):
+                cache.put_many((key, b'x' * 90, {}) for key in keys[start:start + 5])
+
+            stats = cache.stats()
+            assert stats['bytes'] <= 2000, "Stored bytes should respect the bound"
+            assert stats['evictions'] > 0, "Entries should have been evicted"
+            survivors = cache.get_many(keys)
+            assert survivors[0] is not None and survivors[1] is not None, \
+                "Recently used entries should survive"
+            assert survivors[2] is None, "Least recently used entries should be evicted"
+
+    def test_concurrent_writers(self, tmp_path):
+        """Processes writing overlapping entries at once all succeed"""
+        path = str(tmp_path / "cache.db")
+        AssessmentCache(path).close()
+        jobs = [(path, 0, 300), (path, 100, 400), (path, 200, 500)]
+        with multiprocessing.Pool(3) as pool:
+            pool.map(_fill, jobs)
+        with AssessmentCache(path) as cache:
+            stats = cache.stats()
+            assert stats['entries'] == 500, "Each distinct key stored once"
+            assert cache.get_many([bytes([7, 1]) * 16])[0] == (b'{"x":263}', {'j': 263}), \
+                "Stored record should round-trip"
+
+    def test_clear(self, tmp_path):
+        """clear removes entries and resets counters"""
+        with AssessmentCache(str(tmp_path / "cache.db")) as cache:
+            cache.put_many([(b'k' * 32, b'{}', {})])
+            assert cache.clear() == 1, "One entry removed"
+            assert cache.stats()['entries'] == 0 and cache.get_many([b'k' * 32]) == [None], \
+                "Cache should be empty"
+
+    def test_other_schema_rejected(self, tmp_path):
+        """A database from another schema version is not reused"""
+        path = str(tmp_path / "cache.db")
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA user_version=99")
+        conn.close()
+        with pytest.raises(ValueError):
+            AssessmentCache(path)
+
+    def test_pretty_rejected(self, tmp_path):
+        """Pretty output is not cached"""
+        with pytest.raises(ValueError):
+            self._run(tmp_path / "out", cache_path=str(tmp_path / "cache.db"), pretty=True)
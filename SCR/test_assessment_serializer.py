@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for template-based assessment JSON serialization
+"""
+
+import json
+
+import pytest
+
+from lai_prep_decision_tool_v2_1 import LAIPrEPDecisionTool, PatientProfile
+from assessment_serializer import AssessmentSerializer, available_backends
+
+
+TIMESTAMP = "2025-10-17T00:00:00"
+
+PROFILES = [
+    PatientProfile(
+        population="PWID",
+        age=35,
+        current_prep_status="naive",
+        barriers=["HOUSING_INSTABILITY", "TRANSPORTATION", "LEGAL_CONCERNS",
+                  "SUBSTANCE_USE", "MEDICAL_MISTRUST", "CHILDCARE"],
+        healthcare_setting="COMMUNITY_HEALTH_CENTER",
+        insurance_status="uninsured",
+        transportation_access=False
+    ),
+    PatientProfile(
+        population="MSM",
+        age=28,
+        current_prep_status="oral_prep",
+        barriers=[],
+        recent_hiv_test=True,
+        healthcare_setting="LGBTQ_CENTER"
+    ),
+]
+
+
+class TestAssessmentSerializer:
+    """Serializer output must match BridgePeriodAssessment.to_json"""
+
+    @pytest.mark.parametrize("use_logit", [False, True])
+    @pytest.mark.parametrize("backend", available_backends())
+    def test_matches_to_json(self, use_logit, backend):
+        """Parsed output equals the to_json document"""
+        tool = LAIPrEPDecisionTool(use_logit=use_logit)
+        serializer = AssessmentSerializer(tool.config, backend=backend)
+
+        for profile in PROFILES:
+            assessment = tool.assess_patient(profile)
+            expected = assessment.to_json(profile, timestamp=TIMESTAMP)
+            actual = json.loads(serializer.dumps(assessment, profile, TIMESTAMP))
+            assert actual == expected, f"Mismatch for {profile.population} ({backend})"
+
+    def test_stdlib_bytes_match_compact_dumps(self):
+        """Standard library backend is byte-identical to compact json.dumps"""
+        tool = LAIPrEPDecisionTool()
+        serializer = AssessmentSerializer(tool.config, backend="json")
+
+        for profile in PROFILES:
+            assessment = tool.assess_patient(profile)
+            expected = json.dumps(
+                assessment.to_json(profile, timestamp=TIMESTAMP),
+                ensure_ascii=False, separators=(',', ':')
+            ).encode('utf-8')
+            assert serializer.dumps(assessment, profile, TIMESTAMP) == expected
+
+    def test_output_is_stable(self):
+        """Identical inputs produce identical bytes across fresh assessments"""
+        first_tool = LAIPrEPDecisionTool()
+        second_tool = LAIPrEPDecisionTool()
+        first = AssessmentSerializer(first_tool.config)
+        second = AssessmentSerializer(second_tool.config)
+
+        profile = PROFILES[0]
+        assert first.dumps(first_tool.assess_patient(profile), profile, TIMESTAMP) == \
+            second.dumps(second_tool.assess_patient(profile), profile, TIMESTAMP)
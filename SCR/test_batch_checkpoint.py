@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for batch checkpoints and resume
+"""
+
+import csv
+import json
+from pathlib import Path
+
+import pytest
+
+from lai_prep_decision_tool_v2_1 import LAIPrEPDecisionTool
+from batch_checkpoint import CHECKPOINT_NAME, SUMMARY_NAME, ResumableBatch
+from batch_processing import run_batch
+from test_cohort_scoring import random_cohort
+
+
+CONFIG_PATH = Path(__file__).parent.parent / "lai_prep_config.json"
+
+SETTINGS = {
+    'input': 'patients.csv', 'input_size': 1, 'input_mtime_ns': 1, 'config_digest': 'd',
+    'method': 'linear', 'pretty': False, 'summary': True, 'timestamp': '2026-01-01T00:00:00',
+}
+
+
+class Interrupted(Exception):
+    """Simulated crash"""
+
+
+def _failing(patients, after):
+    """Yield patients, then crash after `after` of them"""
+    for i, patient in enumerate(patients):
+        if i == after:
+            raise Interrupted()
+        yield patient
+
+
+class TestBatchCheckpoint:
+    """Interrupted and resumed runs write what an uninterrupted run writes"""
+
+    def setup_method(self):
+        """Tool and a cohort with one invalid patient"""
+        self.tool = LAIPrEPDecisionTool(str(CONFIG_PATH))
+        codec = self.tool._cohort_scorer().codec
+        self.patients = codec.to_dicts(random_cohort(codec, 200, seed=11))
+        self.patients[57] = dict(self.patients[57], population='UNKNOWN')
+
+    def _run(self, output_dir, resume=False, fail_after=None, settings=SETTINGS, workers=1):
+        """Drive a batch run the way cli.py batch does"""
+        output_dir.mkdir(exist_ok=True)
+        with ResumableBatch(str(output_dir), settings, resume=resume, checkpoint_rows=40) as job:
+            start = job.rows_done
+            patients = self.patients[start:]
+            if fail_after is not None:
+                patients = _failing(patients, fail_after)
+            for results in run_batch(self.tool, patients, str(output_dir), workers=workers,
+                                     timestamp=job.settings['timestamp'], chunk_size=16,
+                                     start=start):
+                job.record(results)
+        job.finish()
+        return job
+
+    def _files(self, output_dir):
+        return {p.name: p.read_bytes() for p in output_dir.iterdir()}
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_resume_matches_uninterrupted(self, tmp_path, workers):
+        """Crash, resume: same assessment files, summary rows and totals"""
+        reference = self._run(tmp_path / "reference")
+
+        with pytest.raises(Interrupted):
+            self._run(tmp_path / "resumed", fail_after=130, workers=workers)
+        state = json.loads((tmp_path / "resumed" / CHECKPOINT_NAME).read_text())
+        assert state['rows_done'] % 16 == 0 and state['rows_done'] <= 130, \
+            "Checkpoint should cover whole finished chunks only"
+
+        resumed = self._run(tmp_path / "resumed", resume=True, workers=workers)
+        assert self._files(tmp_path / "resumed") == self._files(tmp_path / "reference"), \
+            "Output directory should match an uninterrupted run"
+        assert resumed.aggregates.to_dict() == reference.aggregates.to_dict(), \
+            "Totals should match"
+        assert resumed.aggregates.errors == 1, "Invalid patient counted once"
+
+    def test_resume_after_hard_kill(self, tmp_path, monkeypatch):
+        """Without the exit checkpoint, rows after the last periodic one are redone once"""
+        self._run(tmp_path / "reference")
+        out = tmp_path / "killed"
+        with monkeypatch.context() as patch:
+            # A killed process never runs its exit handler
+            patch.setattr(ResumableBatch, '__exit__', lambda self, *exc: self.close())
+            with pytest.raises(Interrupted):
+                self._run(out, fail_after=120)
+        state = json.loads((out / CHECKPOINT_NAME).read_text())
+        assert state['rows_done'] == 96, "Last periodic checkpoint should be at 96 rows"
+        assert (out / SUMMARY_NAME).stat().st_size > state['summary_bytes'], \
+            "Summary should hold rows written after the checkpoint"
+
+        resumed = self._run(out, resume=True)
+        assert (out / SUMMARY_NAME).read_bytes() == \
+            (tmp_path / "reference" / SUMMARY_NAME).read_bytes(), \
+            "Summary should have each row exactly once"
+        assert resumed.aggregates.total == 199, "Totals should count each row once"
+
+    def test_interrupt_mid_chunk(self, tmp_path, monkeypatch):
+        """An interrupt while a chunk is being recorded checkpoints the chunk before it"""
+        self._run(tmp_path / "reference")
+        out = tmp_path / "interrupted"
+        written = []
+        writerow = csv.DictWriter.writerow
+
+        def interrupted_writerow(writer, row):
+            if len(written) == 21:
+                raise KeyboardInterrupt()
+            written.append(row)
+            return writerow(writer, row)
+
+        with monkeypatch.context() as patch:
+            patch.setattr(csv.DictWriter, 'writerow', interrupted_writerow)
+            with pytest.raises(KeyboardInterrupt):
+                self._run(out)
+        state = json.loads((out / CHECKPOINT_NAME).read_text())
+        assert state['rows_done'] == 16 and state['aggregates']['total'] == 16, \
+            "Checkpoint should stop at the last whole chunk"
+
+        resumed = self._run(out, resume=True)
+        assert (out / SUMMARY_NAME).read_bytes() == \
+            (tmp_path / "reference" / SUMMARY_NAME).read_bytes(), \
+            "Summary should have each row exactly once"
+        assert resumed.aggregates.total == 199, "Totals should count each row once"
+
+    def test_completed_run_removes_checkpoint(self, tmp_path):
+        """A finished run leaves no checkpoint and cannot be resumed"""
+        self._run(tmp_path / "out")
+        assert not (tmp_path / "out" / CHECKPOINT_NAME).exists(), "Checkpoint should be removed"
+        with pytest.raises(ValueError):
+            ResumableBatch(str(tmp_path / "out"), SETTINGS, resume=True)
+
+    def test_changed_run_rejected(self, tmp_path):
+        """Resuming with another input, configuration or timestamp is refused"""
+        with pytest.raises(Interrupted):
+            self._run(tmp_path / "out", fail_after=50)
+        for key, value in (('input_size', 2), ('config_digest', 'e'), ('timestamp', 'other')):
+            with pytest.raises(ValueError):
+                ResumableBatch(str(tmp_path / "out"), {**SETTINGS, key: value}, resume=True)
+        job = ResumableBatch(str(tmp_path / "out"), {**SETTINGS, 'timestamp': None}, resume=True)
+        assert job.settings['timestamp'] == SETTINGS['timestamp'], \
+            "Resume should keep the recorded timestamp"
+        job.close()
+
+    def test_truncated_summary_rejected(self, tmp_path):
+        """A summary shorter than checkpointed cannot be resumed safely"""
+        with pytest.raises(Interrupted):
+            self._run(tmp_path / "out", fail_after=50)
+        summary = tmp_path / "out" / SUMMARY_NAME
+        summary.write_bytes(summary.read_bytes()[:10])
+        with pytest.raises(ValueError):
+            ResumableBatch(str(tmp_path / "out"), SETTINGS, resume=True)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for sharded batch runs and merging
+"""
+
+import csv
+import json
+from pathlib import Path
+
+import pytest
+
+from lai_prep_decision_tool_v2_1 import LAIPrEPDecisionTool
+from batch_checkpoint import CHECKPOINT_NAME, ResumableBatch, shard_name
+from batch_processing import run_batch
+from batch_shards import MANIFEST_NAME, merge_shards, parse_shard, shard_span, write_manifest
+from csv_reader import count_records, iter_raw_chunks, read_header, shard_range
+from input_validation import REJECTS_NAME, ValidatedCSV
+from test_cohort_scoring import random_cohort
+
+
+CONFIG_PATH = Path(__file__).parent.parent / "lai_prep_config.json"
+
+SETTINGS = {
+    'input': 'patients.csv', 'input_size': 1, 'input_mtime_ns': 1, 'config_digest': 'd',
+    'method': 'linear', 'pretty': False, 'summary': True, 'timestamp': '2026-01-01T00:00:00',
+}
+
+
+class TestShardRanges:
+    """Byte-range shards cover every row exactly once"""
+
+    @pytest.mark.parametrize("count", [1, 2, 5, 40])
+    def test_shards_partition_rows(self, tmp_path, count):
+        """Shards, including empty ones, concatenate to the whole file"""
+        path = tmp_path / "in.csv"
+        lines = [b'h1,h2\n'] + [
+            b'%d,"quoted\nbreak, %d"\n' % (i, i) if i % 2 else b'%d,plain\n' % i
+            for i in range(25)
+        ]
+        path.write_bytes(b''.join(lines))
+        _, start = read_header(str(path))
+
+        rows, expected_first = [], 0
+        for index in range(count):
+            begin, end = shard_range(str(path), index, count, start)
+            assert count_records(str(path), start, begin) == expected_first, \
+                "Rows before a shard should be counted"
+            shard_rows = [cell for raw in iter_raw_chunks(str(path), 2, begin, end)
+                          for cell in raw.columns[0]]
+            expected_first += len(shard_rows)
+            rows += shard_rows
+        assert rows == [str(i) for i in range(25)], "Every row should be in exactly one shard"
+
+    def test_more_shards_than_rows(self, tmp_path):
+        """Equal-length rows split over as many or more shards lose no row"""
+        path = tmp_path / "in.csv"
+        path.write_bytes(b'h1,h2\n' + b''.join(b'%d,abc\n' % i for i in range(3)))
+        for count in (3, 4, 7):
+            spans = [shard_span(str(path), (index, count)) for index in range(count)]
+            assert sum(span['rows'] for span in spans) == 3, \
+                f"{count} shards should cover all 3 rows"
+            assert [span['first_row'] for span in spans] == \
+                [sum(s['rows'] for s in spans[:k]) for k in range(count)], \
+                "Each shard should start where the previous one ended"
+
+    def test_parse_shard(self):
+        """i/n specs are 0-based and validated"""
+        assert parse_shard('3/8') == (3, 8), "Spec should parse"
+        for spec in ('8/8', '1', 'a/b', '0/0'):
+            with pytest.raises(ValueError):
+                parse_shard(spec)
+
+
+class TestMergeShards:
+    """Merged shards reproduce a single-node run"""
+
+    def setup_method(self):
+        """Tool and a batch CSV with quoted barrier lists and two bad rows"""
+        self.tool = LAIPrEPDecisionTool(str(CONFIG_PATH))
+        self.codec = self.tool._cohort_scorer().codec
+        rows = self.codec.to_csv_rows(random_cohort(self.codec, 150, seed=21))
+        for i, row in enumerate(rows):
+            row['patient_id'] = f'pt{i}' if i % 4 else ''
+        rows[33]['age'] = 'unknown'
+        rows[120]['population'] = 'NOT_A_POPULATION'
+        self.rows = rows
+
+    def _write(self, path):
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(self.rows[0]))
+            writer.writeheader()
+            writer.writerows(self.rows)
+        return str(path)
+
+    def _run(self, input_path, output_dir, shard=None):
+        """Drive a (sharded) batch run the way cli.py batch does"""
+        output_dir.mkdir(exist_ok=True)
+        byte_range, first_row, span = None, 0, None
+        if shard is not None:
+            span = shard_span(input_path, shard)
+            byte_range, first_row = tuple(span['range']), span['first_row']
+        rejects_path = shard_name(str(output_dir / REJECTS_NAME), shard)
+        source = ValidatedCSV(input_path, self.codec, rejects_path, chunk_size=32,
+                              byte_range=byte_range, first_row=first_row)
+        settings = dict(SETTINGS, shard=list(shard) if shard else None)
+        with ResumableBatch(str(output_dir), settings, shard=shard) as job:
+            for results in run_batch(self.tool, source.patient_dicts(), str(output_dir),
+                                     timestamp=job.settings['timestamp'], chunk_size=16):
+                job.record(results)
+        job.finish()
+        report = source.report()
+        if shard is not None:
+            write_manifest(str(output_dir), shard, span, job.settings, job.aggregates, report,
+                           rejects_path if report['rejected'] else None)
+        return job
+
+    def _files(self, output_dir):
+        return {p.name: p.read_bytes() for p in output_dir.iterdir()}
+
+    def test_shared_directory_merge(self, tmp_path):
+        """Shards in one directory merge into the single-node files"""
+        input_path = self._write(tmp_path / "in.csv")
+        single = self._run(input_path, tmp_path / "single")
+        for index in range(4):
+            self._run(input_path, tmp_path / "sharded", shard=(index, 4))
+        merged = merge_shards(str(tmp_path / "sharded"))
+
+        assert self._files(tmp_path / "sharded") == self._files(tmp_path / "single"), \
+            "Merged output should equal the single-node output"
+        totals, expected = merged['aggregates'].to_dict(), single.aggregates.to_dict()
+        sums, expected_sums = totals.pop('sums'), expected.pop('sums')
+        assert totals == expected, "Counts should add up to the single-node counts"
+        assert sums == pytest.approx(expected_sums), "Sums should match up to rounding"
+        assert (merged['rows'], merged['rejected']) == (150, 2), "Rows and rejects should add up"
+
+    def test_separate_directories_merge(self, tmp_path):
+        """Per-shard directories are moved into the output directory"""
+        input_path = self._write(tmp_path / "in.csv")
+        self._run(input_path, tmp_path / "single")
+        for index in range(3):
+            self._run(input_path, tmp_path / f"shard{index}", shard=(index, 3))
+        merge_shards(str(tmp_path / "merged"), [str(tmp_path / f"shard{i}") for i in range(3)])
+        assert self._files(tmp_path / "merged") == self._files(tmp_path / "single"), \
+            "Merged output should equal the single-node output"
+
+    def test_incomplete_shards_rejected(self, tmp_path):
+        """A missing or unfinished shard stops the merge"""
+        input_path = self._write(tmp_path / "in.csv")
+        out = tmp_path / "sharded"
+        self._run(input_path, out, shard=(0, 2))
+        with pytest.raises(ValueError, match="Missing shards"):
+            merge_shards(str(out))
+
+        self._run(input_path, out, shard=(1, 2))
+        (out / shard_name(CHECKPOINT_NAME, (1, 2))).write_text('{}')
+        with pytest.raises(ValueError, match="did not finish"):
+            merge_shards(str(out))
+
+    def test_untiled_shards_rejected(self, tmp_path):
+        """Shards whose ranges leave a gap stop the merge"""
+        input_path = self._write(tmp_path / "in.csv")
+        out = tmp_path / "sharded"
+        for index in range(2):
+            self._run(input_path, out, shard=(index, 2))
+        manifest = out / shard_name(MANIFEST_NAME, (1, 2))
+        state = json.loads(manifest.read_text())
+        state['span']['range'][0] += 1
+        manifest.write_text(json.dumps(state))
+        with pytest.raises(ValueError, match="do not tile"):
+            merge_shards(str(out))
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for the clinic capacity discrete-event simulation
+"""
+
+import pytest
+
+from lai_prep_decision_tool_v2_1 import LAIPrEPDecisionTool, ConfigurationError
+from cohort_scoring import CohortScorer
+from clinic_simulation import SimulationParameters, simulate_clinics, EventScheduler, DAY_START, ARRIVAL
+from test_cohort_scoring import random_cohort
+
+
+class TestEventScheduler:
+    """Event ordering"""
+
+    def test_time_then_kind_then_insertion(self):
+        """Events run by time; same-time events by kind, then FIFO"""
+        scheduler = EventScheduler()
+        seen = []
+        scheduler.schedule(2.0, ARRIVAL, 1)
+        scheduler.schedule(1.0, ARRIVAL, 2)
+        scheduler.schedule(1.0, ARRIVAL, 3)
+        scheduler.schedule(1.0, DAY_START, 4)
+        scheduler.schedule(5.0, ARRIVAL, 5)
+
+        handler = lambda payload: seen.append(payload)
+        scheduler.run({ARRIVAL: handler, DAY_START: handler}, until=5.0)
+
+        assert seen == [4, 2, 3, 1]
+
+
+class TestClinicSimulation:
+    """Simulation invariants"""
+
+    def setup_method(self):
+        """Shared scorer and cohort"""
+        self.scorer = CohortScorer(LAIPrEPDecisionTool())
+        self.records = random_cohort(self.scorer.codec, 3000, seed=2)
+
+    def test_patients_conserved(self):
+        """Every arrival completes, drops out or is still in the bridge"""
+        report = simulate_clinics(self.scorer, self.records, SimulationParameters(days=120))
+
+        assert report['patients'] == 3000
+        assert report['completed'] + report['dropped'] + report['in_bridge_at_end'] == 3000
+        assert sum(day['arrivals'] for day in report['daily']) == 3000
+        assert sum(day['completions'] for day in report['daily']) == report['completed']
+        assert len(report['daily']) == 120
+
+    def test_slots_cap_daily_completions(self):
+        """No setting serves more patients per day than its slots"""
+        params = SimulationParameters(days=60, default_daily_slots=2,
+                                      daily_slots={'PHARMACY': 0})
+        report = simulate_clinics(self.scorer, self.records, params)
+
+        n_settings = len(self.scorer.codec.settings)
+        for day in report['daily']:
+            assert day['completions'] <= 2 * (n_settings - 1)
+        assert report['by_setting']['PHARMACY']['completed'] == 0
+        assert report['peak_queue_length'] > 0
+
+    def test_ample_capacity_means_short_waits(self):
+        """With unlimited slots nobody waits more than a day for an appointment"""
+        params = SimulationParameters(days=90, default_daily_slots=10_000)
+        report = simulate_clinics(self.scorer, self.records, params)
+
+        assert report['wait_days']['max'] <= 1.0
+        assert report['bridge_days']['max'] <= (
+            params.test_turnaround_days[1] + params.authorization_delay_days[1] + 1.0)
+
+    def test_deterministic_for_seed(self):
+        """Same seed, same report"""
+        params = SimulationParameters(days=30, seed=11)
+        assert simulate_clinics(self.scorer, self.records, params) == \
+            simulate_clinics(self.scorer, self.records, params)
+
+    def test_unknown_setting_rejected(self):
+        """Slot overrides must name configured settings"""
+        with pytest.raises(ConfigurationError):
+            simulate_clinics(self.scorer, self.records,
+                             SimulationParameters(daily_slots={'MOON_BASE': 3}))
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for memory-mapped binary cohort files
+"""
+
+import numpy as np
+import pytest
+
+from lai_prep_decision_tool_v2_1 import Configuration, ConfigurationError
+from patient_codec import PatientCodec
+from cohort_file import CohortWriter, encode_csv, open_cohort
+
+
+CSV_TEXT = """patient_id,population,age,current_prep_status,barriers,healthcare_setting,insurance_status,recent_hiv_test,transportation_access,childcare_needs
+patient_001,MSM,28,oral_prep,SCHEDULING_CONFLICTS,LGBTQ_CENTER,insured,true,true,false
+patient_002,CISGENDER_WOMEN,32,naive,"TRANSPORTATION,CHILDCARE,MEDICAL_MISTRUST",COMMUNITY_HEALTH_CENTER,insured,false,false,true
+patient_003,PWID,35,naive,"HOUSING_INSTABILITY,TRANSPORTATION",HARM_REDUCTION,uninsured,false,false,false
+"""
+
+
+class TestCohortFile:
+    """Round-trip tests for .lpc cohort files"""
+
+    def setup_method(self):
+        """Initialize codec before each test"""
+        self.codec = PatientCodec()
+
+    def test_encode_csv_and_memmap(self, tmp_path):
+        """CSV encodes to .lpc and maps back with ids and profiles intact"""
+        csv_path = tmp_path / "patients.csv"
+        csv_path.write_text(CSV_TEXT)
+        lpc_path = tmp_path / "patients.lpc"
+
+        count = encode_csv(str(csv_path), str(lpc_path), self.codec, chunk_size=2)
+        cohort = open_cohort(str(lpc_path), self.codec)
+
+        assert count == 3 and len(cohort) == 3
+        assert isinstance(cohort.records, np.memmap), "Records should be memory-mapped"
+        assert cohort.patient_ids(0, 3) == ["patient_001", "patient_002", "patient_003"]
+
+        patients = list(cohort.iter_patient_dicts(chunk_size=2))
+        assert patients[2]['population'] == "PWID"
+        assert patients[2]['barriers'] == ["TRANSPORTATION", "HOUSING_INSTABILITY"]
+        assert patients[0]['recent_hiv_test'] is True
+
+    def test_slice_is_zero_copy_view(self, tmp_path):
+        """Row-range slices share memory with the mapped file"""
+        records = self.codec.from_dicts([
+            {"population": "MSM", "age": 20 + i, "current_prep_status": "naive"}
+            for i in range(10)
+        ])
+        path = tmp_path / "cohort.lpc"
+        with CohortWriter(str(path), self.codec) as writer:
+            writer.write(records)
+
+        cohort = open_cohort(str(path), self.codec)
+        view = cohort.slice(4, 7)
+
+        assert np.shares_memory(view, cohort.records)
+        assert view['age'].tolist() == [24, 25, 26]
+        assert not cohort.has_patient_ids
+
+    def test_failed_encode_leaves_no_file(self, tmp_path):
+        """An invalid row or too-long id stops encode without a truncated cohort"""
+        csv_path = tmp_path / "patients.csv"
+        lpc_path = tmp_path / "patients.lpc"
+        csv_path.write_text(CSV_TEXT.replace("PWID,35", "PWID,old"))
+        with pytest.raises(ValueError):
+            encode_csv(str(csv_path), str(lpc_path), self.codec, chunk_size=2)
+        assert list(tmp_path.iterdir()) == [csv_path], "No cohort or temporary file left"
+
+        csv_path.write_text(CSV_TEXT)
+        encode_csv(str(csv_path), str(lpc_path), self.codec)
+        with pytest.raises(ValueError, match="longer than 4 bytes"):
+            encode_csv(str(csv_path), str(lpc_path), self.codec, id_width=4)
+        assert len(open_cohort(str(lpc_path), self.codec)) == 3, \
+            "A failed encode should leave the earlier cohort in place"
+        assert not (tmp_path / "patients.lpc.tmp").exists(), "Temporary file removed"
+
+    def test_config_mismatch_rejected(self, tmp_path):
+        """Files encoded with different code maps are refused"""
+        path = tmp_path / "cohort.lpc"
+        with CohortWriter(str(path), self.codec) as writer:
+            writer.write(self.codec.from_dicts([
+                {"population": "MSM", "age": 30, "current_prep_status": "naive"}
+            ]))
+
+        config = Configuration()
+        config.config['barriers'] = dict(
+            reversed(list(config.config['barriers'].items()))
+        )
+
+        with pytest.raises(ConfigurationError):
+            open_cohort(str(path), PatientCodec(config))
+
+    def test_npy_codes_range_checked(self, tmp_path):
+        """.npy files without code maps are refused if a code is out of range"""
+        records = self.codec.from_dicts([
+            {"population": "MSM", "age": 30, "current_prep_status": "naive",
+             "barriers": ["TRANSPORTATION"]}
+            for _ in range(5)
+        ])
+        path = tmp_path / "cohort.npy"
+        np.save(path, records)
+        assert len(open_cohort(str(path), self.codec)) == 5, "Valid codes should load"
+
+        bad = records.copy()
+        bad['insurance_status'][3] = len(self.codec.insurance_statuses)
+        np.save(path, bad)
+        with pytest.raises(ConfigurationError, match="row 3 has insurance_status"):
+            open_cohort(str(path), self.codec)
+
+        bad = records.copy()
+        bad['barriers'][4] = 1 << len(self.codec.barriers)
+        np.save(path, bad)
+        with pytest.raises(ConfigurationError, match="row 4 has barrier bits"):
+            open_cohort(str(path), self.codec)
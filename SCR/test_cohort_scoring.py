@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for vectorized cohort scoring and bulk risk stratification
+"""
+
+import bisect
+import copy
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from lai_prep_decision_tool_v2_1 import (
+    Configuration,
+    LAIPrEPDecisionTool,
+    compile_risk_thresholds
+)
+from cohort_scoring import CohortScorer
+
+
+CONFIG_PATH = Path(__file__).parent.parent / "lai_prep_config.json"
+
+
+def wide_tool(n_barriers, use_logit=False):
+    """Tool on the shipped config padded with small extra barriers up to n_barriers"""
+    data = json.loads(CONFIG_PATH.read_text())
+    barriers, interventions = data['barriers'], list(data['interventions'].values())
+    for j in range(len(barriers), n_barriers):
+        barriers[f'EXTRA_{j}'] = {
+            'name': f'Extra barrier {j}', 'impact': 0.005, 'evidence_level': 'moderate',
+            'affected_populations': [], 'description': 'Synthetic barrier for wide configs'
+        }
+        intervention = interventions[j % len(interventions)]
+        intervention.setdefault('addresses_barriers', []).append(f'EXTRA_{j}')
+    return LAIPrEPDecisionTool(config=Configuration.from_dict(data), use_logit=use_logit)
+
+
+def random_cohort(codec, n, seed=7):
+    """Random encoded cohort covering all codes and barrier combinations"""
+    rng = np.random.default_rng(seed)
+    records = codec.empty(n)
+    records['population'] = rng.integers(0, len(codec.populations), n)
+    records['prep_status'] = rng.integers(0, len(codec.prep_statuses), n)
+    records['healthcare_setting'] = rng.integers(0, len(codec.settings), n)
+    records['insurance_status'] = rng.integers(0, len(codec.insurance_statuses), n)
+    dtype = records.dtype['barriers']
+    mask = np.zeros(n, dtype=dtype)
+    for j in range(len(codec.barriers)):
+        mask |= (rng.random(n) < 0.15).astype(dtype) << dtype.type(j)
+    records['barriers'] = mask
+    records['flags'] = rng.integers(0, 8, n)
+    records['age'] = rng.integers(16, 66, n)
+    return records
+
+
+class TestCohortScorer:
+    """Vectorized scoring must agree with assess_patient"""
+
+    @pytest.mark.parametrize("use_logit", [False, True])
+    def test_matches_assess_patient(self, use_logit):
+        """Adjusted/estimated success, risk and bridge duration match per patient"""
+        tool = LAIPrEPDecisionTool(use_logit=use_logit)
+        scorer = CohortScorer(tool)
+        records = random_cohort(scorer.codec, 400)
+
+        results = scorer.score(records)
+
+        for i, profile in enumerate(scorer.codec.decode_many(records)):
+            assessment = tool.assess_patient(profile)
+            assert results['adjusted_success'][i] == pytest.approx(
+                assessment.adjusted_success_rate, abs=1e-12)
+            assert results['estimated_success'][i] == pytest.approx(
+                assessment.estimated_success_with_interventions, abs=1e-12)
+            assert scorer.tables.risk_labels[results['risk'][i]] == assessment.attrition_risk
+            assert (results['bridge_min_days'][i], results['bridge_max_days'][i]) == \
+                tuple(assessment.estimated_bridge_duration_days)
+
+    def test_recommendations_computed_once_per_key(self):
+        """Duplicate patients share one recommendation computation"""
+        scorer = CohortScorer(LAIPrEPDecisionTool())
+        records = np.tile(random_cohort(scorer.codec, 20), 50)
+
+        scorer.score(records)
+
+        assert len(scorer._recommendation_cache) <= 20
+
+    def test_gain_shared_across_barrier_signatures(self):
+        """Masks triggering the same interventions share a gain equal to the per-key gain"""
+        scorer = CohortScorer(LAIPrEPDecisionTool())
+        records = random_cohort(scorer.codec, 3000, seed=11)
+
+        gains = scorer.intervention_gain(records)
+
+        for i, key in enumerate(scorer.recommendation_keys(records).tolist()):
+            expected = sum(rec.expected_improvement / 100
+                           for rec in scorer.recommendations_for_key(key)[:3])
+            assert gains[i] == pytest.approx(expected, abs=1e-12), f"gain mismatch at row {i}"
+        assert len(scorer._gain_cache) < len(np.unique(scorer.recommendation_keys(records)))
+
+    @pytest.mark.parametrize("use_logit", [False, True])
+    def test_attrition_factors_once_per_population_mask(self, use_logit):
+        """Explanation factors come from one scalar calculation per (population, mask)"""
+        tool = LAIPrEPDecisionTool(use_logit=use_logit)
+        scorer = CohortScorer(tool)
+        records = np.tile(random_cohort(scorer.codec, 30, seed=8), 20)
+        profiles = scorer.codec.decode_many(records)
+
+        assessments = scorer.assess_profiles(profiles)
+
+        pairs = set(zip(records['population'].tolist(), records['barriers'].tolist()))
+        assert len(scorer._factors_cache) == len(pairs), "One calculation per pair"
+        for profile, assessment in zip(profiles[:30], assessments):
+            assert assessment.attrition_factors == \
+                tool.assess_patient(profile).attrition_factors, "Factors should match"
+
+    def test_gain_on_wide_config(self):
+        """Signature lookups scale with the masks seen, not with 2**barriers"""
+        tool = wide_tool(40)
+        scorer = CohortScorer(tool)
+        records = random_cohort(scorer.codec, 300, seed=5)
+
+        gains = scorer.intervention_gain(records)
+
+        for i, profile in enumerate(scorer.codec.decode_many(records)):
+            expected = sum(rec.expected_improvement / 100
+                           for rec in tool._generate_recommendations_with_mechanisms(profile)[:3])
+            assert gains[i] == pytest.approx(expected, abs=1e-12), f"gain mismatch at row {i}"
+        assert len(scorer._signature_cache) <= len(records), "One entry per mask seen"
+
+    @pytest.mark.parametrize("n_barriers", [40, 60])
+    def test_keys_exact_on_wide_config(self, n_barriers):
+        """Keys past 32 barriers (and past int64) decode to their own patient"""
+        tool = wide_tool(n_barriers)
+        scorer = CohortScorer(tool)
+        records = random_cohort(scorer.codec, 200, seed=9)
+        records['barriers'][0] = records['barriers'].dtype.type(2**n_barriers - 1)
+
+        keys = scorer.recommendation_keys(records).tolist()
+        results = scorer.score(records)
+
+        for i, profile in enumerate(scorer.codec.decode_many(records)):
+            decoded = scorer._key_profile(keys[i])
+            assert decoded.population == profile.population and \
+                decoded.barriers == profile.barriers, f"Key at row {i} should keep every bit"
+            assessment = tool.assess_patient(profile)
+            assert [rec.intervention for rec in scorer.recommendations_for_key(keys[i])] == \
+                [rec.intervention for rec in assessment.recommended_interventions], \
+                f"Recommendations mismatch at row {i}"
+            assert results['estimated_success'][i] == pytest.approx(
+                assessment.estimated_success_with_interventions, abs=1e-12)
+
+
+class TestBulkRiskStratification:
+    """categorize_risk_many must agree with _categorize_risk"""
+
+    def test_matches_scalar_including_boundaries(self):
+        """Thresholds, values between them and out-of-range rates agree"""
+        tool = LAIPrEPDecisionTool()
+        rates = [-0.1, 0.0, 0.2, 0.4, 0.3999, 0.55, 0.7, 0.95, 1.0, 1.5, float('nan')]
+
+        codes = tool.categorize_risk_many(rates)
+
+        for rate, code in zip(rates, codes):
+            label, _ = tool._categorize_risk(rate)
+            assert tool.risk_categories[tool.risk_category_keys[code]]['label'] == label, \
+                f"Category mismatch at attrition {rate}"
+
+    def test_threshold_gaps_fall_back_to_very_high(self):
+        """Rates in a gap between categories keep the VERY_HIGH default"""
+        categories = copy.deepcopy(LAIPrEPDecisionTool().risk_categories)
+        categories['MODERATE']['threshold_max'] = 0.5
+
+        edges, lookup = compile_risk_thresholds(categories)
+
+        assert lookup[bisect.bisect_right(edges, 0.52)] == 'VERY_HIGH', \
+            "Gap 0.50-0.55 should default to VERY_HIGH"
+        assert lookup[bisect.bisect_right(edges, 0.45)] == 'MODERATE'
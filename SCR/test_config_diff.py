@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for configuration change impact analysis
+"""
+
+import copy
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from lai_prep_decision_tool_v2_1 import (
+    Configuration,
+    ConfigurationError,
+    LAIPrEPDecisionTool
+)
+from config_diff import ConfigImpact, diff_configs, rescore_cohort
+from test_cohort_scoring import random_cohort
+
+
+CONFIG_PATH = Path(__file__).parent.parent / "lai_prep_config.json"
+
+
+def _chunks(records, size=700):
+    """(offset, records, patient_ids) chunks like iter_cohort_chunks"""
+    for offset in range(0, len(records), size):
+        yield offset, records[offset:offset + size], [None] * len(records[offset:offset + size])
+
+
+class TestConfigDiff:
+    """Selective re-scoring matches a full re-run under the new configuration"""
+
+    def setup_method(self):
+        """Load the shipped configuration"""
+        with open(CONFIG_PATH) as f:
+            self.data = json.load(f)
+
+    def _tool(self, data, use_logit=False):
+        return LAIPrEPDecisionTool(config=Configuration.from_dict(data), use_logit=use_logit)
+
+    def _check(self, new_data, use_logit=False):
+        """Re-score a stored result set and compare with full scoring"""
+        old_tool = self._tool(self.data, use_logit)
+        new_tool = self._tool(new_data, use_logit)
+        records = random_cohort(old_tool._cohort_scorer().codec, 3000)
+        stored = old_tool._cohort_scorer().score(records)
+
+        impact = ConfigImpact(old_tool, new_tool)
+        updated, report = rescore_cohort(impact, _chunks(records), stored)
+        expected = new_tool._cohort_scorer().score(records)
+        for name in expected.dtype.names:
+            assert np.array_equal(updated[name], expected[name]), \
+                f"{name} should match a full re-run"
+        return impact, report
+
+    def test_diff_lists_changes(self):
+        """Entries, nested parameters and other sections are reported"""
+        new = copy.deepcopy(self.data)
+        new['barriers']['TRANSPORTATION']['impact'] += 0.02
+        new['interventions']['PATIENT_NAVIGATION']['improvement'] += 0.01
+        new['algorithm_parameters']['barrier_count_adjustment_factor']['2_barriers'] += 0.01
+        new['version'] = '2.2.0'
+
+        diff = diff_configs(Configuration.from_dict(self.data), Configuration.from_dict(new))
+        assert diff.entries['barriers']['changed'] == ['TRANSPORTATION'], "Barrier change"
+        assert diff.entries['interventions']['changed'] == ['PATIENT_NAVIGATION'], \
+            "Intervention change"
+        assert diff.parameters == ['barrier_count_adjustment_factor.2_barriers'], \
+            "Nested parameter change"
+        assert diff.other_sections == ['version'], "Other section change"
+        assert not diff.structural, "No code map change"
+
+    @pytest.mark.parametrize("use_logit", [False, True])
+    def test_barrier_impact_rescores_only_its_rows(self, use_logit):
+        """Moving one barrier impact re-scores only patients with that barrier"""
+        new = copy.deepcopy(self.data)
+        new['barriers']['TRANSPORTATION']['impact'] += 0.03
+        impact, report = self._check(new, use_logit)
+        assert 0 < report['rescored'] < report['total'] / 2, \
+            "Only patients with the barrier should be re-scored"
+        assert report['strata'] == {'barrier TRANSPORTATION': report['rescored']}, \
+            "Strata should name the change"
+
+    def test_intervention_and_parameter_changes(self):
+        """Intervention and parameter changes re-score exactly enough"""
+        new = copy.deepcopy(self.data)
+        new['interventions']['PATIENT_NAVIGATION']['improvement'] += 0.02
+        new['algorithm_parameters']['bridge_duration_naive_recent_test'] = [7, 21]
+        new['algorithm_parameters']['best_case_success_floor'] = 0.9
+        new['algorithm_parameters']['barrier_count_adjustment_factor']['1_barrier'] += 0.01
+        _, report = self._check(new)
+        assert report['changed'] > 0, "Results should change"
+        assert report['rescored'] < report['total'], "Not every row should be re-scored"
+
+    def test_risk_categories_rederived(self):
+        """Risk thresholds are re-applied to stored success without re-scoring"""
+        new = copy.deepcopy(self.data)
+        first = next(iter(new['risk_categories']))
+        new['risk_categories'][first]['threshold_max'] += 0.05
+        _, report = self._check(new)
+        assert report['rescored'] == 0, "Risk-only changes re-score nothing"
+        assert report['risk_transitions'], "Risk transitions should be reported"
+
+    def test_unrelated_change_rescores_nothing(self):
+        """Metadata edits leave stored results untouched"""
+        new = copy.deepcopy(self.data)
+        new['version'] = '9.9.9'
+        _, report = self._check(new)
+        assert report['rescored'] == 0 and report['changed'] == 0, "Nothing should change"
+
+    def test_structural_change_rejected(self):
+        """Reordering barriers changes codes, so the cohort cannot be reused"""
+        new = copy.deepcopy(self.data)
+        new['barriers'] = dict(reversed(list(new['barriers'].items())))
+        with pytest.raises(ConfigurationError):
+            ConfigImpact(self._tool(self.data), self._tool(new))
+
+    def test_row_count_mismatch_rejected(self):
+        """Stored results must cover the cohort row for row"""
+        tool = self._tool(self.data)
+        records = random_cohort(tool._cohort_scorer().codec, 100)
+        stored = tool._cohort_scorer().score(records[:90])
+        with pytest.raises(ValueError):
+            rescore_cohort(ConfigImpact(tool, tool), _chunks(records, 50), stored)
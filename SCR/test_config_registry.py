@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for the multi-tenant configuration registry
+"""
+
+import copy
+import json
+from pathlib import Path
+
+import pytest
+
+from lai_prep_decision_tool_v2_1 import (
+    Configuration,
+    ConfigurationError,
+    LAIPrEPDecisionTool,
+    PatientProfile,
+    thaw
+)
+from config_registry import ConfigRegistry
+
+
+CONFIG_PATH = Path(__file__).parent.parent / "lai_prep_config.json"
+
+
+class TestConfigRegistry:
+    """Tenants share unchanged content and match standalone tools"""
+
+    def setup_method(self):
+        """Register the shipped configuration as the base tenant"""
+        with open(CONFIG_PATH) as f:
+            self.data = json.load(f)
+        self.registry = ConfigRegistry()
+        self.registry.register('base', str(CONFIG_PATH))
+        self.setting = list(self.data['healthcare_settings'])[1]
+        self.intervention = 'PATIENT_NAVIGATION'
+        self.profile = PatientProfile(
+            population='PWID',
+            current_prep_status='naive',
+            barriers=['HOUSING_INSTABILITY', 'TRANSPORTATION'],
+            healthcare_setting=self.setting,
+            insurance_status='uninsured',
+            age=35
+        )
+
+    def _site(self, i):
+        """Overlay for site i: a setting name and one intervention parameter"""
+        return {
+            'healthcare_settings': {self.setting: {'name': f"Site {i}"}},
+            'interventions': {self.intervention: {'improvement': 0.10 + i / 1000}},
+        }
+
+    def test_derived_tenant_matches_standalone_tool(self):
+        """A derived tenant assesses like a tool built from the merged file"""
+        tool = self.registry.derive('site_7', 'base', self._site(7))
+
+        merged = copy.deepcopy(self.data)
+        merged['healthcare_settings'][self.setting]['name'] = "Site 7"
+        merged['interventions'][self.intervention]['improvement'] = 0.10 + 7 / 1000
+        expected = LAIPrEPDecisionTool(config=Configuration.from_dict(merged))
+
+        assert thaw(tool.config.config) == merged, "Merged configuration should match"
+        assert tool.assess_patient(self.profile) == expected.assess_patient(self.profile), \
+            "Assessment should match a standalone tool"
+        assert tool.assess_many([self.profile])[0] == expected.assess_patient(self.profile), \
+            "Scorer on shared tables should match a standalone tool"
+
+    def test_unchanged_content_is_shared(self):
+        """Sections and entries outside the overlay are the same objects"""
+        base = self.registry.config('base').config
+        for i in range(20):
+            self.registry.derive(f"site_{i}", 'base', self._site(i))
+        site = self.registry.config('site_3').config
+
+        assert site['populations'] is base['populations'], "Untouched sections are shared"
+        assert site['interventions']['ORAL_TO_INJECTABLE'] is \
+            base['interventions']['ORAL_TO_INJECTABLE'], "Untouched entries are shared"
+        assert site['interventions'][self.intervention] is not \
+            base['interventions'][self.intervention], "Overridden entries are not"
+
+        stats = self.registry.stats()
+        assert stats['compiled_array_sets'] == 1, "Array tables should be compiled once"
+        assert stats['codecs'] == 1, "Codec should be built once"
+        per_tenant = (stats['interned_objects'] - len(base) - 1) / 20
+        assert per_tenant < 10, "Interned objects should grow with the overlay size"
+
+    def test_identical_configs_share_tool(self):
+        """Registering equal content again reuses the tool and its caches"""
+        tool = self.registry.register('copy', copy.deepcopy(self.data))
+        assert tool is self.registry.tool('base'), "Equal configurations share one tool"
+
+    def test_key_order_is_content(self):
+        """Reordered populations are a different configuration"""
+        data = copy.deepcopy(self.data)
+        data['populations'] = dict(reversed(list(data['populations'].items())))
+        tool = self.registry.register('reordered', data)
+        assert tool.config.config['populations'] is not \
+            self.registry.config('base').config['populations'], \
+            "Order changes codec codes, so it must not be shared"
+        assert tool._cohort_scorer().codec.populations == tuple(data['populations']), \
+            "Codec should follow the tenant's order"
+
+    def test_snapshots_are_read_only(self):
+        """Shared content cannot be edited through one tenant"""
+        self.registry.derive('site_1', 'base', self._site(1))
+        with pytest.raises(TypeError):
+            self.registry.config('site_1').config['populations']['PWID']['baseline_attrition'] = 0
+
+    def test_remove_releases_unshared_content(self):
+        """Removing a tenant drops only what no other tenant uses"""
+        before = self.registry.stats()['interned_objects']
+        self.registry.derive('site_1', 'base', self._site(1))
+        self.registry.remove('site_1')
+        assert self.registry.stats()['interned_objects'] == before, \
+            "Overlay objects should be released"
+        assert 'site_1' not in self.registry, "Tenant should be gone"
+        with pytest.raises(ConfigurationError):
+            self.registry.tool('site_1')
+
+    def test_invalid_tenant_rejected(self):
+        """A configuration missing required sections is not registered"""
+        before = self.registry.stats()
+        with pytest.raises(ConfigurationError):
+            self.registry.derive('broken', 'base', {'interventions': None})
+        assert 'broken' not in self.registry, "Invalid tenant should not be registered"
+        assert self.registry.stats() == before, "Rejected content should be released"
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for configuration hot reload
+"""
+
+import copy
+import json
+import os
+import threading
+from pathlib import Path
+
+import pytest
+
+from lai_prep_decision_tool_v2_1 import ConfigurationError, PatientProfile
+from config_reload import ConfigWatcher
+
+
+CONFIG_PATH = Path(__file__).parent.parent / "lai_prep_config.json"
+
+
+class TestConfigWatcher:
+    """Reloads swap snapshots atomically and keep unaffected caches"""
+
+    def setup_method(self):
+        """Load the shipped configuration and a sample patient"""
+        with open(CONFIG_PATH) as f:
+            self.data = json.load(f)
+        self.profile = PatientProfile(
+            population='PWID',
+            current_prep_status='naive',
+            barriers=['HOUSING_INSTABILITY', 'TRANSPORTATION'],
+            healthcare_setting='COMMUNITY_HEALTH_CENTER',
+            insurance_status='uninsured',
+            age=35
+        )
+
+    def _write(self, path, data, mtime_step=1):
+        """Write a configuration and move its mtime forward"""
+        path.write_text(json.dumps(data))
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + mtime_step * 10**9))
+
+    def _watcher(self, tmp_path, **kwargs):
+        path = tmp_path / "config.json"
+        self._write(path, self.data)
+        return path, ConfigWatcher(str(path), **kwargs)
+
+    def test_unchanged_file_not_reloaded(self, tmp_path):
+        """Polling an unchanged file (or a touched one) keeps the same tool"""
+        path, watcher = self._watcher(tmp_path)
+        tool = watcher.tool
+        assert not watcher.poll(), "Unchanged file should not reload"
+        self._write(path, self.data)
+        assert not watcher.poll(), "Same content should not reload"
+        assert watcher.tool is tool, "Active tool should be unchanged"
+
+    def test_reload_swaps_tool(self, tmp_path):
+        """A changed baseline is picked up; the old tool keeps its snapshot"""
+        path, watcher = self._watcher(tmp_path)
+        old_tool = watcher.tool
+        before = old_tool.assess_patient(self.profile)
+
+        data = copy.deepcopy(self.data)
+        data['populations']['PWID']['baseline_attrition'] -= 0.05
+        self._write(path, data)
+        assert watcher.poll(), "Changed file should reload"
+        assert watcher.generation == 1, "Generation should advance"
+
+        after = watcher.assess_patient(self.profile)
+        assert after.baseline_success_rate > before.baseline_success_rate, \
+            "New baseline should be used"
+        again = old_tool.assess_patient(self.profile)
+        assert again.baseline_success_rate == before.baseline_success_rate, \
+            "In-flight users of the old tool keep the old snapshot"
+
+    def test_invalid_change_keeps_active_tool(self, tmp_path):
+        """Broken JSON or a failing validation leaves the tool in place"""
+        errors = []
+        path, watcher = self._watcher(tmp_path, on_error=errors.append)
+        tool = watcher.tool
+
+        path.write_text('{"populations": ')
+        os.utime(path, ns=(0, 10**18))
+        assert not watcher.poll(), "Invalid JSON should not reload"
+
+        data = copy.deepcopy(self.data)
+        del data['interventions']
+        self._write(path, data, mtime_step=2)
+        assert not watcher.poll(), "Invalid configuration should not reload"
+
+        assert watcher.tool is tool, "Active tool should be kept"
+        assert len(errors) == 2, "Each rejected change should be reported"
+        assert all(isinstance(e, ConfigurationError) for e in errors), \
+            "Rejections should be ConfigurationError"
+
+    def test_initial_invalid_config_raises(self, tmp_path):
+        """A bad file at startup fails immediately"""
+        path = tmp_path / "config.json"
+        path.write_text('not json')
+        with pytest.raises(ConfigurationError):
+            ConfigWatcher(str(path))
+
+    def test_selective_cache_invalidation(self, tmp_path):
+        """Edits keep the caches their sections cannot affect"""
+        reloads = []
+        path, watcher = self._watcher(tmp_path, on_reload=lambda t, s: reloads.append(s))
+        scorer = watcher.tool._cohort_scorer()
+        watcher.tool.assess_many([self.profile] * 3)
+
+        data = copy.deepcopy(self.data)
+        data['version'] = 'reloaded'
+        self._write(path, data)
+        watcher.poll()
+        kept = watcher.tool._cohort_scorer()
+        assert kept.tables is scorer.tables, "Compiled tables should be kept"
+        assert kept._recommendation_cache is scorer._recommendation_cache, \
+            "Recommendation cache should be kept for a non-scoring edit"
+        assert kept.tool is watcher.tool, "Kept caches should serve the new tool"
+
+        data['interventions']['PATIENT_NAVIGATION']['improvement'] += 0.01
+        self._write(path, data, mtime_step=2)
+        watcher.poll()
+        rebuilt = watcher.tool._cohort_scorer()
+        assert rebuilt.tables is scorer.tables, "Intervention edits keep compiled tables"
+        assert rebuilt._recommendation_cache is not scorer._recommendation_cache, \
+            "Intervention edits drop the recommendation cache"
+
+        data['barriers']['TRANSPORTATION']['impact'] += 0.01
+        self._write(path, data, mtime_step=3)
+        watcher.poll()
+        assert watcher.tool._cohort_scorer().tables is not scorer.tables, \
+            "Barrier edits recompile the tables"
+        assert reloads == [{'version'}, {'interventions'}, {'barriers'}], \
+            "Reload callback should report changed sections"
+
+    def test_background_reload_matches_fresh_tool(self, tmp_path):
+        """Assessments keep running while the background thread reloads"""
+        path, watcher = self._watcher(tmp_path, interval=0.01)
+        reloaded = threading.Event()
+        watcher.on_reload = lambda tool, sections: reloaded.set()
+
+        data = copy.deepcopy(self.data)
+        data['interventions']['PATIENT_NAVIGATION']['improvement'] += 0.02
+        with watcher:
+            self._write(path, data)
+            for _ in range(1000):
+                watcher.assess_patient(self.profile)
+                if reloaded.is_set():
+                    break
+            assert reloaded.wait(10), "Background thread should reload"
+
+        fresh = ConfigWatcher(str(path)).tool.assess_patient(self.profile)
+        result = watcher.assess_patient(self.profile)
+        assert result.estimated_success_with_interventions == \
+            fresh.estimated_success_with_interventions, \
+            "Reloaded tool should match one built from the file"
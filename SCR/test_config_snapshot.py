@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for precompiled configuration snapshots
+"""
+
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from lai_prep_decision_tool_v2_1 import (
+    Configuration,
+    ConfigurationError,
+    LAIPrEPDecisionTool,
+    thaw
+)
+from compiled_config import CompiledConfig
+from config_snapshot import read_snapshot, snapshot_path, write_snapshot
+from test_cohort_scoring import random_cohort
+
+
+CONFIG_PATH = Path(__file__).parent.parent / "lai_prep_config.json"
+
+
+class TestConfigSnapshot:
+    """Snapshot-backed configurations match configurations read from JSON"""
+
+    def _compiled(self, tmp_path):
+        """Copy of the shipped configuration with a snapshot next to it"""
+        path = tmp_path / "lai_prep_config.json"
+        shutil.copy(CONFIG_PATH, path)
+        write_snapshot(Configuration(str(path), use_snapshot=False))
+        return path
+
+    def test_snapshot_loaded_when_current(self, tmp_path):
+        """Configuration maps the snapshot and keeps its JSON content"""
+        path = self._compiled(tmp_path)
+        config = Configuration(str(path), use_snapshot=True)
+        source = Configuration(str(path), use_snapshot=False)
+
+        assert config.frozen and config.compiled_arrays is not None, \
+            "Current snapshot should be used"
+        assert thaw(config.config) == source.config, "Content should match the JSON"
+        assert list(config.config['barriers']) == list(source.config['barriers']), \
+            "Key order should be kept"
+        expected = CompiledConfig.compile_arrays(source)
+        for name, array in config.compiled_arrays.items():
+            assert np.array_equal(array, expected[name]), f"{name} should match"
+            assert not array.flags.writeable, f"{name} should be read-only"
+
+    @pytest.mark.parametrize("use_logit", [False, True])
+    def test_assessments_match_json(self, tmp_path, use_logit):
+        """Tools on snapshot tables assess like tools built from JSON"""
+        path = self._compiled(tmp_path)
+        tool = LAIPrEPDecisionTool(
+            config=Configuration(str(path), use_snapshot=True), use_logit=use_logit
+        )
+        reference = LAIPrEPDecisionTool(
+            config=Configuration(str(path), use_snapshot=False), use_logit=use_logit
+        )
+        assert tool._cohort_scorer().tables.barrier_impact is \
+            tool.config.compiled_arrays['barrier_impact'], "Scorer should use mapped tables"
+
+        codec = reference._cohort_scorer().codec
+        profiles = codec.decode_many(random_cohort(codec, 200))
+        assert tool.assess_many(profiles) == reference.assess_many(profiles), \
+            "Assessments should match"
+
+    def test_stale_snapshot_ignored(self, tmp_path):
+        """Editing the JSON after compiling falls back to the JSON"""
+        path = self._compiled(tmp_path)
+        data = json.loads(path.read_text())
+        data['barriers']['TRANSPORTATION']['impact'] = 0.2
+        path.write_text(json.dumps(data))
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        config = Configuration(str(path), use_snapshot=True)
+        assert not config.frozen and config.compiled_arrays is None, \
+            "Stale snapshot should not be used"
+        assert config.config['barriers']['TRANSPORTATION']['impact'] == 0.2, \
+            "Edited JSON should be loaded"
+        with pytest.raises(ConfigurationError):
+            read_snapshot(snapshot_path(str(path)), str(path))
+
+    def test_invalid_snapshot_ignored(self, tmp_path):
+        """A foreign or corrupt snapshot file falls back to the JSON"""
+        path = self._compiled(tmp_path)
+        snapshot = Path(snapshot_path(str(path)))
+        content = bytearray(snapshot.read_bytes())
+        content[200] ^= 0xFF
+        snapshot.write_bytes(bytes(content))
+
+        with pytest.raises(ConfigurationError):
+            read_snapshot(str(snapshot))
+        assert Configuration(str(path), use_snapshot=True).compiled_arrays is None, \
+            "Corrupt snapshot should not be used"
+
+        snapshot.write_bytes(b"not a snapshot")
+        assert Configuration(str(path), use_snapshot=True).compiled_arrays is None, \
+            "Foreign file should not be used"
+
+    def test_opt_in(self, tmp_path):
+        """Without use_snapshot the JSON is read and the configuration stays editable"""
+        path = self._compiled(tmp_path)
+        config = Configuration(str(path))
+        assert not config.frozen and config.compiled_arrays is None, \
+            "Snapshot should be ignored"
+        config.config['version'] = 'edited'
+        assert config.config['version'] == 'edited', "Configuration should be editable"
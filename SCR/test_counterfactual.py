@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for counterfactual barrier-removal analysis
+"""
+
+import dataclasses
+
+import numpy as np
+import pytest
+
+from lai_prep_decision_tool_v2_1 import LAIPrEPDecisionTool
+from cohort_scoring import CohortScorer
+from counterfactual import barrier_removal_effects, what_if_cohort
+from test_cohort_scoring import random_cohort
+
+
+class TestBarrierRemovalEffects:
+    """Marginal effects must agree with re-assessing the patient without the barrier"""
+
+    @pytest.mark.parametrize("use_logit", [False, True])
+    def test_matches_assess_patient(self, use_logit):
+        """Each effect equals the adjusted success change from assess_patient"""
+        tool = LAIPrEPDecisionTool(use_logit=use_logit)
+        scorer = CohortScorer(tool)
+        records = random_cohort(scorer.codec, 300, seed=11)
+
+        effects = barrier_removal_effects(scorer, records)
+
+        for i, profile in enumerate(scorer.codec.decode_many(records)):
+            current = tool.assess_patient(profile).adjusted_success_rate
+            for j, barrier in enumerate(scorer.codec.barriers):
+                if barrier not in profile.barriers:
+                    assert effects[i, j] == 0.0, "Absent barrier must have no effect"
+                    continue
+                without = dataclasses.replace(
+                    profile, barriers=[b for b in profile.barriers if b != barrier]
+                )
+                expected = tool.assess_patient(without).adjusted_success_rate - current
+                assert effects[i, j] == pytest.approx(expected, abs=1e-12), \
+                    f"Effect mismatch for patient {i}, barrier {barrier}"
+
+    def test_empty_chunk(self):
+        """An empty chunk yields an empty matrix"""
+        scorer = CohortScorer(LAIPrEPDecisionTool())
+        effects = barrier_removal_effects(scorer, scorer.codec.empty(0))
+        assert effects.shape == (0, scorer.tables.n_barriers)
+
+
+class TestWhatIfReport:
+    """Aggregation over chunks"""
+
+    def test_chunking_and_matrix(self):
+        """Report is independent of chunking and matrix rows line up"""
+        scorer = CohortScorer(LAIPrEPDecisionTool())
+        records = random_cohort(scorer.codec, 500, seed=3)
+        matrix = np.zeros((500, scorer.tables.n_barriers))
+
+        whole = what_if_cohort(scorer, [(0, records, [None] * 500)])
+        chunked = what_if_cohort(
+            scorer,
+            [(o, records[o:o + 128], [None] * len(records[o:o + 128]))
+             for o in range(0, 500, 128)],
+            matrix
+        )
+
+        assert whole == chunked
+        assert np.array_equal(matrix, barrier_removal_effects(scorer, records))
+        assert whole['overall']['patients'] == 500
+        assert sum(g['patients'] for g in whole['by_population'].values()) == 500
+
+        overall = whole['overall']
+        best = overall['best_barrier_removal']
+        assert best == next(iter(overall['barriers'])), "Barriers sorted by total gain"
+        assert overall['barriers'][best]['total_success_gain'] == pytest.approx(
+            matrix[:, scorer.codec.barriers.index(best)].sum(), abs=1e-3)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for the chunked column reader and CSV encoding
+"""
+
+import csv
+import io
+from pathlib import Path
+
+import pytest
+
+from csv_reader import count_records, iter_raw_chunks, parse_block, read_header, split_ranges
+from input_validation import iter_encoded_chunks
+from lai_prep_decision_tool_v2_1 import LAIPrEPDecisionTool
+from test_cohort_scoring import random_cohort
+
+
+CONFIG_PATH = Path(__file__).parent.parent / "lai_prep_config.json"
+
+WIDTH = 4
+
+# Blocks the bulk path must split exactly as csv.reader does
+BLOCKS = {
+    'plain': b'a,b,c,d\n1,2,3,4\n',
+    'quoted': b'"x,y",b,"",d\na,"1,2,3",c,"d"\n',
+    'crlf': b'a,"b,c",c,d\r\n1,2,3,4\r\n',
+    'doubled quotes': b'a,"say ""hi""",c,d\n',
+    'quoted newline': b'a,"two\nlines",c,d\n1,2,3,4\n',
+    'quote inside cell': b'a,b"c,c,d\n',
+    'blank line': b'a,b,c,d\n\n1,2,3,4\n',
+    'short row': b'a,b,c\n1,2,3,4\n',
+}
+
+
+def reference_columns(block):
+    """Columns as csv.reader reads them (blank rows skipped)"""
+    rows = [row for row in csv.reader(io.StringIO(block.decode(), newline='')) if row]
+    return [list(column) for column in zip(*[(row + [''] * WIDTH)[:WIDTH] for row in rows])]
+
+
+class TestCSVReader:
+    """Block parsing and safe line boundaries"""
+
+    @pytest.mark.parametrize('name', list(BLOCKS))
+    def test_parse_block_matches_csv_reader(self, name):
+        """Bulk and fallback parsing agree with csv.reader"""
+        raw = parse_block(BLOCKS[name], WIDTH)
+        assert [list(column) for column in raw.columns] == reference_columns(BLOCKS[name]), \
+            f"{name} block should parse like csv.reader"
+        if name == 'short row':
+            assert raw.malformed.tolist() == [True, False], "Short row should be marked"
+            assert raw.row(0) == ['a', 'b', 'c'], "Original cells should be kept"
+
+    def test_ranges_split_outside_quotes(self, tmp_path):
+        """Range boundaries never fall inside a quoted cell"""
+        path = tmp_path / "in.csv"
+        lines = [b'h1,h2,h3,h4\n'] + [
+            b'%d,"multi\nline, %d",x,y\n' % (i, i) if i % 3 else b'%d,b,c,d\n' % i
+            for i in range(500)
+        ]
+        path.write_bytes(b''.join(lines))
+        header, start = read_header(str(path))
+        assert header == ['h1', 'h2', 'h3', 'h4'], "Header should be read"
+
+        whole = [list(raw.columns[0]) for raw in iter_raw_chunks(str(path), WIDTH, start)]
+        ranges = split_ranges(str(path), 7, start, block_bytes=64)
+        assert len(ranges) == 7, "File should split into the requested parts"
+        pieces = [list(raw.columns[0]) for begin, end in ranges
+                  for raw in iter_raw_chunks(str(path), WIDTH, begin, end, block_bytes=50)]
+        assert sum(pieces, []) == sum(whole, []) == [str(i) for i in range(500)], \
+            "Ranges should cover every row exactly once"
+        assert count_records(str(path)) == 500, "Quoted line breaks should not count as rows"
+
+
+class TestEncodedChunks:
+    """Column-wise CSV encoding"""
+
+    def setup_method(self):
+        """Codec and a cohort CSV with quoted barrier lists"""
+        self.codec = LAIPrEPDecisionTool(str(CONFIG_PATH))._cohort_scorer().codec
+        self.records = random_cohort(self.codec, 1000, seed=4)
+        self.rows = self.codec.to_csv_rows(self.records)
+        for i, row in enumerate(self.rows):
+            row['patient_id'] = f'pt{i}'
+
+    def _write(self, path, line_terminator='\r\n'):
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(self.rows[0]),
+                                    lineterminator=line_terminator)
+            writer.writeheader()
+            writer.writerows(self.rows)
+        return str(path)
+
+    @pytest.mark.parametrize('workers', [1, 2])
+    def test_matches_codec(self, tmp_path, workers):
+        """Records, ids and chunk offsets match the per-row codec"""
+        path = self._write(tmp_path / "in.csv")
+        chunks = list(iter_encoded_chunks(path, self.codec, chunk_size=300,
+                                          workers=workers, range_bytes=20000))
+        assert [offset for offset, _, _ in chunks] == [0, 300, 600, 900], \
+            "Chunks should be exactly chunk_size rows"
+        records = [r for _, chunk, _ in chunks for r in chunk.tolist()]
+        assert records == self.records.tolist(), "Records should match the codec"
+        assert [i for _, _, ids in chunks for i in ids] == [r['patient_id'] for r in self.rows], \
+            "Patient ids should be passed through"
+
+    def test_invalid_row_stops(self, tmp_path):
+        """The first invalid row raises with its row number"""
+        self.rows[450]['population'] = 'NOT_A_POPULATION'
+        path = self._write(tmp_path / "in.csv", '\n')
+        chunks = iter_encoded_chunks(path, self.codec, chunk_size=300)
+        assert next(chunks)[0] == 0, "Rows before the invalid chunk should be yielded"
+        with pytest.raises(ValueError, match=r"row 451 .*UNKNOWN_POPULATION"):
+            next(chunks)
@@ -515,6 +515,110 @@ class TestErrorHandling:
             tool.assess_patient(profile)
 
 
+class TestConcurrency:
+    """One tool instance shared across threads"""
+
+    TIMESTAMP = "2025-01-01T00:00:00"
+
+    def _profiles(self, tool, n, seed=3):
+        """Random profiles, including reordered and duplicated barriers"""
+        import random
+        rng = random.Random(seed)
+        config = tool.config.config
+        barriers = list(config['barriers'])
+        profiles = []
+        for i in range(n):
+            chosen = rng.sample(barriers, rng.randint(0, 5))
+            if i % 7 == 0:
+                chosen = chosen + chosen[:1]  # Duplicate
+            elif i % 2 == 0:
+                chosen.sort()  # Often not configuration order
+            profiles.append(PatientProfile(
+                population=rng.choice(list(config['populations'])),
+                age=rng.randint(16, 70),
+                current_prep_status=rng.choice(["naive", "oral_prep", "discontinued_oral"]),
+                barriers=chosen,
+                healthcare_setting=rng.choice(list(config['healthcare_settings'])),
+                insurance_status=rng.choice(["insured", "uninsured", "underinsured", "parental"]),
+                recent_hiv_test=rng.random() < 0.5,
+                transportation_access=rng.random() < 0.7,
+                childcare_needs=rng.random() < 0.3
+            ))
+        return profiles
+
+    def test_config_snapshot_is_read_only(self):
+        """The tool's configuration cannot be edited, in place or through the source"""
+        config = Configuration()
+        tool = LAIPrEPDecisionTool(config=config)
+
+        with pytest.raises(TypeError):
+            tool.config.config['populations']['MSM']['baseline_attrition'] = 0.9
+        with pytest.raises(TypeError):
+            tool.params.update({'max_attrition_ceiling': 0.5})
+
+        config.config['populations']['MSM']['baseline_attrition'] = 0.9
+        assert tool.config.get_population_config('MSM')['baseline_attrition'] != 0.9, \
+            "Edits to the source Configuration must not reach the tool"
+        json.dumps(tool.config.config)  # Snapshot still serializes as JSON
+
+    @pytest.mark.parametrize("use_logit", [False, True])
+    def test_assess_many_matches_assess_patient(self, use_logit):
+        """Threaded, chunked assessment equals per-patient assessment, in order"""
+        tool = LAIPrEPDecisionTool(use_logit=use_logit)
+        profiles = self._profiles(tool, 300)
+
+        results = tool.assess_many(profiles, max_workers=4, chunk_size=32)
+
+        assert len(results) == len(profiles)
+        for i, (profile, assessment) in enumerate(zip(profiles, results)):
+            expected = tool.assess_patient(profile)
+            assert assessment.to_json(profile, timestamp=self.TIMESTAMP) == \
+                expected.to_json(profile, timestamp=self.TIMESTAMP), \
+                f"assess_many differs from assess_patient for profile {i}"
+            assert assessment.estimated_bridge_duration_days == \
+                tuple(expected.estimated_bridge_duration_days)
+
+    def test_assess_many_results_are_independent(self):
+        """Editing one result's recommendations leaves others untouched"""
+        tool = LAIPrEPDecisionTool()
+        profile = self._profiles(tool, 1)[0]
+        first, second = tool.assess_many([profile, profile])
+
+        first.recommended_interventions[0].mechanisms.append('edited')
+        first.recommended_interventions[0].expected_improvement = -1.0
+
+        assert 'edited' not in second.recommended_interventions[0].mechanisms
+        assert second.recommended_interventions[0].expected_improvement != -1.0
+
+        first.attrition_factors['barrier_impacts']['edited'] = 1.0
+        assert 'edited' not in second.attrition_factors['barrier_impacts'], \
+            "Attrition factors should not be shared between results"
+
+    def test_assess_many_propagates_errors(self):
+        """Invalid profiles raise as assess_patient does"""
+        tool = LAIPrEPDecisionTool()
+        profiles = self._profiles(tool, 3)
+        profiles.append(PatientProfile(population="INVALID_POP", age=30,
+                                       current_prep_status="naive"))
+        with pytest.raises(ConfigurationError):
+            tool.assess_many(profiles)
+
+    def test_shared_tool_across_threads(self):
+        """Concurrent assess_patient calls on one tool match serial results"""
+        from concurrent.futures import ThreadPoolExecutor
+        tool = LAIPrEPDecisionTool()
+        profiles = self._profiles(tool, 200, seed=9)
+        serial = [tool.assess_patient(p).to_json(p, timestamp=self.TIMESTAMP) for p in profiles]
+
+        def assess(profile):
+            return tool.assess_patient(profile).to_json(profile, timestamp=self.TIMESTAMP)
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            concurrent = list(pool.map(assess, profiles))
+
+        assert concurrent == serial
+
+
 def run_tests():
     """Run all tests"""
     pytest.main([__file__, '-v', '--tb=short'])
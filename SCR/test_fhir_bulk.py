@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for FHIR Bulk Data input
+"""
+
+import gzip
+import json
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+import fhir_bulk
+from fhir_bulk import (
+    ICD10CM,
+    LOINC,
+    SNOMED,
+    FHIRBulkSource,
+    export_date,
+    fhir_preflight,
+    load_fhir_map
+)
+from lai_prep_decision_tool_v2_1 import LAIPrEPDecisionTool
+from batch_processing import run_batch
+
+
+CONFIG_PATH = Path(__file__).parent.parent / "lai_prep_config.json"
+
+AS_OF = date(2026, 6, 30)
+
+
+def patient(pid, gender, birth_date, **extra):
+    return {'resourceType': 'Patient', 'id': pid, 'gender': gender, 'birthDate': birth_date,
+            **extra}
+
+
+def condition(pid, system, code, status='active'):
+    return {'resourceType': 'Condition', 'subject': {'reference': f'Patient/{pid}'},
+            'clinicalStatus': {'coding': [{'code': status}]},
+            'code': {'coding': [{'system': system, 'code': code}]}}
+
+
+def observation(pid, code, answer=None, when=None):
+    resource = {'resourceType': 'Observation', 'status': 'final',
+                'subject': {'reference': f'https://ehr.example/fhir/Patient/{pid}'},
+                'code': {'coding': [{'system': LOINC, 'code': code}]}}
+    if answer is not None:
+        resource['valueCodeableConcept'] = {'coding': [{'system': SNOMED, 'code': answer}]}
+    if when is not None:
+        resource['effectiveDateTime'] = when
+    return resource
+
+
+def screening(pid, link_id, answer_code):
+    return {'resourceType': 'QuestionnaireResponse', 'status': 'completed',
+            'subject': {'reference': f'Patient/{pid}'},
+            'item': [{'linkId': '/sdoh', 'item': [{
+                'linkId': link_id,
+                'answer': [{'valueCoding': {'system': LOINC, 'code': answer_code}}]}]}]}
+
+
+# Expected (population, prep status, barriers, recent test) per patient
+EXPECTED = {
+    'a1': ('PWID', 'oral_prep', ['SUBSTANCE_USE', 'HOUSING_INSTABILITY'], True),
+    'a2': ('MSM', 'discontinued_oral', ['TRANSPORTATION'], False),
+    'a3': ('ADOLESCENT', 'naive', [], False),
+    'a4': ('CISGENDER_WOMEN', 'naive', [], False),
+    'a5': ('GENERAL', 'naive', [], False),
+    'a6': ('TRANSGENDER_WOMEN', 'naive', [], True),
+}
+
+
+def write_export(directory, copies=1):
+    """NDJSON files covering the default rules (Patient ids a1.. a6, plus edge cases)"""
+    directory.mkdir(exist_ok=True)
+    patients, conditions, observations, responses = [], [], [], []
+    for k in range(copies):
+        s = f'-{k}' if k else ''
+        patients += [
+            patient(f'a1{s}', 'male', '1990-03-01'),
+            patient(f'a2{s}', 'male', '1985-07-15'),
+            patient(f'a3{s}', 'male', '2008-01-01'),
+            patient(f'a4{s}', 'female', '1980'),
+            patient(f'a5{s}', 'male', '1970-06-30'),
+            patient(f'a6{s}', 'female', '1995-12-31'),
+            patient(f'gone{s}', 'male', '1950-01-01', deceasedBoolean=True),
+            patient(f'nodob{s}', 'female', ''),
+        ]
+        conditions += [
+            condition(f'a1{s}', ICD10CM, 'F11.20'),
+            condition(f'a1{s}', ICD10CM, 'Z29.81'),
+            condition(f'a1{s}', ICD10CM, 'Z59.0'),
+            condition(f'a2{s}', ICD10CM, 'Z29.81', status='resolved'),
+            condition(f'a4{s}', ICD10CM, 'F11.20', status='resolved'),
+            condition(f'orphan{s}', ICD10CM, 'F11.20'),
+        ]
+        observations += [
+            observation(f'a1{s}', '75622-1', when='2026-06-27T09:30:00Z'),
+            observation(f'a2{s}', '75622-1', when='2026-05-01'),
+            observation(f'a2{s}', '76690-7', answer='38628009'),
+            observation(f'a4{s}', '76690-7', answer='38628009'),
+            observation(f'a6{s}', '76691-5', answer='407376001'),
+            observation(f'a6{s}', '56888-1', when='2026-06-30'),
+            dict(observation(f'a5{s}', '75622-1', when='2026-06-29'), status='entered-in-error'),
+        ]
+        responses += [screening(f'a2{s}', '/sdoh/93030-5', 'LA30133-9'),
+                      screening(f'a3{s}', '/sdoh/93030-5', 'LA32-8')]
+    for name, resources in (('Patient', patients), ('Condition', conditions),
+                            ('Observation', observations)):
+        with open(directory / f'{name}.ndjson', 'w') as f:
+            f.writelines(json.dumps(r) + '\n' for r in resources)
+    with gzip.open(directory / 'QuestionnaireResponse.ndjson.gz', 'wt') as f:
+        f.writelines(json.dumps(r) + '\n' for r in responses)
+    (directory / 'Encounter.txt').write_text('not part of the export\n')
+    return str(directory)
+
+
+class TestFHIRBulkSource:
+    """Joining and mapping bulk export resources"""
+
+    def setup_method(self):
+        """Tool and codec"""
+        self.tool = LAIPrEPDecisionTool(str(CONFIG_PATH))
+        self.codec = self.tool._cohort_scorer().codec
+
+    def _dicts(self, path, **kwargs):
+        source = FHIRBulkSource(path, self.codec, as_of=AS_OF, **kwargs)
+        return source, list(source.patient_dicts())
+
+    def test_profiles_mapped(self, tmp_path):
+        """Codes from all four resource types map to profile fields"""
+        source, dicts = self._dicts(write_export(tmp_path / "export"),
+                                    rejects_path=str(tmp_path / "rejects.csv"))
+        by_id = {d['patient_id']: d for d in dicts}
+        assert [d['patient_id'] for d in dicts] == sorted(EXPECTED), \
+            "Living patients should come out sorted by id"
+        for pid, (population, status, barriers, recent) in EXPECTED.items():
+            data = by_id[pid]
+            assert (data['population'], data['current_prep_status'], data['barriers'],
+                    data['recent_hiv_test']) == (population, status, barriers, recent), \
+                f"Patient {pid} should map to {population}/{status}/{barriers}/{recent}"
+        assert by_id['a1']['age'] == 36 and by_id['a5']['age'] == 56, "Age at as_of"
+        assert by_id['a4']['age'] == 46, "Year-only birth dates should give an age"
+        assert by_id['a2']['transportation_access'] is False, "Screening should set access"
+
+        report = source.report()
+        assert (report['rows'], report['rejected'], report['deceased'], report['orphans']) == \
+            (7, 1, 1, 1), "Counts should cover rejects, deceased and orphan patients"
+        assert report['reasons'] == {'MISSING_AGE': 1}, "Missing birth date should be rejected"
+        assert 'nodob' in (tmp_path / "rejects.csv").read_text(), "Reject should be written"
+
+    def test_external_sort_matches(self, tmp_path):
+        """Tiny runs, several merge passes and parallel parsing give the same patients"""
+        path = write_export(tmp_path / "export", copies=30)
+        _, expected = self._dicts(path)
+        original = fhir_bulk.MERGE_FAN_IN
+        fhir_bulk.MERGE_FAN_IN = 3
+        try:
+            source, dicts = self._dicts(path, run_facts=4, range_bytes=700, workers=2,
+                                        chunk_size=17)
+        finally:
+            fhir_bulk.MERGE_FAN_IN = original
+        assert dicts == expected, "Spilled and merged runs should join identically"
+        assert len(dicts) == 180, "Every copy should be read"
+        assert list(source.patient_dicts(skip=100)) == expected[100:], "Skip should resume"
+
+    def test_custom_map(self, tmp_path):
+        """Map file rules apply before the defaults and are checked against the config"""
+        path = write_export(tmp_path / "export")
+        map_path = tmp_path / "map.json"
+        map_path.write_text(json.dumps({
+            'defaults': {'healthcare_setting': 'LGBTQ_CENTER'},
+            'rules': [{'resource': 'Condition', 'field': 'population', 'value': 'GENERAL',
+                       'codes': ['Z59.0']}],
+        }))
+        _, dicts = self._dicts(path, mapping=load_fhir_map(str(map_path)))
+        by_id = {d['patient_id']: d for d in dicts}
+        assert by_id['a1']['population'] == 'GENERAL', "Earlier rule should win"
+        assert by_id['a1']['barriers'] == ['SUBSTANCE_USE', 'HOUSING_INSTABILITY'], \
+            "Default rules should still apply"
+        assert {d['healthcare_setting'] for d in dicts} == {'LGBTQ_CENTER'}, "Defaults override"
+
+        map_path.write_text(json.dumps({'rules': [
+            {'resource': 'Condition', 'field': 'barriers', 'value': 'NO_SUCH', 'codes': ['X']}]}))
+        with pytest.raises(ValueError, match="unknown barriers 'NO_SUCH'"):
+            FHIRBulkSource(path, self.codec, mapping=load_fhir_map(str(map_path)))
+
+    def test_manifest_and_batch(self, tmp_path):
+        """A saved $export manifest is read, dated by transactionTime and fed to the batch"""
+        write_export(tmp_path / "export")
+        manifest = tmp_path / "export" / "manifest.json"
+        manifest.write_text(json.dumps({
+            'transactionTime': '2026-06-30T12:00:00Z',
+            'output': [{'type': t, 'url': f'https://ehr.example/bulk/{t}.ndjson'}
+                       for t in ('Patient', 'Condition', 'Observation', 'Encounter')],
+        }))
+        assert export_date(str(manifest)) == AS_OF, "as_of should come from the manifest"
+
+        source = FHIRBulkSource(str(manifest), self.codec)
+        output_dir = tmp_path / "results"
+        output_dir.mkdir()
+        results = [r for chunk in run_batch(self.tool, source.patient_dicts(), str(output_dir),
+                                            timestamp='2026-07-01T00:00:00')
+                   for r in chunk]
+        assert [error for _, _, error in results] == [None] * 6, "Patients should assess"
+        assert (output_dir / 'a1_assessment.json').exists(), "Files are named by FHIR id"
+
+        report = fhir_preflight(FHIRBulkSource(str(manifest), self.codec))
+        assert report['as_of'] == '2026-06-30', "Report should record the as_of date"
+        assert 'QuestionnaireResponse' not in report['resources'], \
+            "Only manifest files should be read"
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for batch input pre-validation
+"""
+
+import csv
+import json
+from pathlib import Path
+
+from cohort_file import default_patient_id
+from lai_prep_decision_tool_v2_1 import LAIPrEPDecisionTool
+from patient_codec import parse_csv_row
+from input_validation import (
+    INVALID_AGE,
+    INVALID_BOOLEAN,
+    MALFORMED_ROW,
+    MISSING_POPULATION,
+    UNKNOWN_BARRIER,
+    UNKNOWN_INSURANCE,
+    UNKNOWN_POPULATION,
+    UNKNOWN_SETTING,
+    ValidatedCSV,
+    count_lines,
+    preflight
+)
+from test_cohort_scoring import random_cohort
+
+
+CONFIG_PATH = Path(__file__).parent.parent / "lai_prep_config.json"
+
+# Row index -> (column, bad value, expected reason)
+BAD_CELLS = {
+    3: ('population', 'UNKNOWN_POP', UNKNOWN_POPULATION),
+    8: ('population', '', MISSING_POPULATION),
+    11: ('barriers', 'TRANSPORTATION,NOT_A_BARRIER', UNKNOWN_BARRIER),
+    20: ('age', 'thirty', INVALID_AGE),
+    21: ('healthcare_setting', 'SPACESHIP', UNKNOWN_SETTING),
+    30: ('insurance_status', 'medicaid', UNKNOWN_INSURANCE),
+    41: ('recent_hiv_test', 'maybe', INVALID_BOOLEAN),
+}
+
+
+class TestInputValidation:
+    """Pre-validation splits input into clean encoded rows and coded rejects"""
+
+    def setup_method(self):
+        """Codec and a cohort CSV with known bad rows and an extra column"""
+        self.codec = LAIPrEPDecisionTool(str(CONFIG_PATH))._cohort_scorer().codec
+        self.rows = self.codec.to_csv_rows(random_cohort(self.codec, 120, seed=2))
+        for i, row in enumerate(self.rows):
+            row['patient_id'] = f'pt{i:03d}' if i % 7 else ''
+            row['site_code'] = 'A1'
+        self.rows[5]['barriers'] = 'SUBSTANCE_USE, TRANSPORTATION'  # 5th clean row
+        for i, (column, value, _) in BAD_CELLS.items():
+            self.rows[i][column] = value
+
+    def _write(self, path, extra_lines=()):
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(self.rows[0]))
+            writer.writeheader()
+            writer.writerows(self.rows)
+            for line in extra_lines:
+                f.write(line)
+        return str(path)
+
+    def test_clean_rows_match_parse_csv_row(self, tmp_path):
+        """Clean rows equal the old per-row parse, minus unknown columns"""
+        source = ValidatedCSV(self._write(tmp_path / "in.csv"), self.codec, chunk_size=32)
+        dicts = list(source.patient_dicts())
+
+        expected = []
+        for i, row in enumerate(self.rows):
+            if i in BAD_CELLS:
+                continue
+            data = parse_csv_row({k: v for k, v in row.items() if k != 'site_code'})
+            data['patient_id'] = data['patient_id'] or default_patient_id(i)
+            expected.append(data)
+        assert dicts == expected, "Typed dictionaries should match parse_csv_row"
+        assert dicts[4]['barriers'] == ['SUBSTANCE_USE', 'TRANSPORTATION'], \
+            "Barrier order from the input should be kept"
+
+        encoded = [r for chunk in source.chunks() for r in chunk.records.tolist()]
+        assert encoded == self.codec.from_dicts(expected).tolist(), \
+            "Records should match PatientCodec encoding"
+
+    def test_rejects_file_has_reason_codes(self, tmp_path):
+        """Every bad row is written once with its reason code and original cells"""
+        path = self._write(tmp_path / "in.csv", ['MSM,30\n'])
+        rejects = tmp_path / "rejects.csv"
+        report = preflight(path, self.codec, str(rejects), chunk_size=50)
+
+        with open(rejects, newline='') as f:
+            rejected = list(csv.DictReader(f))
+        expected = {i + 1: reason for i, (_, _, reason) in BAD_CELLS.items()}
+        expected[len(self.rows) + 1] = MALFORMED_ROW
+        assert {int(r['row_number']): r['reject_reasons'].split(';')[0] for r in rejected} == \
+            expected, "Each bad row should be rejected with its reason"
+        assert rejected[0]['population'] == 'UNKNOWN_POP', "Original cells should be kept"
+
+        assert report['rows'] == len(self.rows) + 1, "All rows should be counted"
+        assert report['rejected'] == len(BAD_CELLS) + 1, "Rejects should be counted"
+        assert report['ignored_columns'] == ['site_code'], "Unknown column should be reported"
+        assert report['unknown_values']['barriers'] == {'NOT_A_BARRIER': 1}, \
+            "Unknown barrier should be reported"
+        assert sum(report['distributions']['population'].values()) == report['valid'], \
+            "Distributions should cover clean rows"
+        json.dumps(report)
+
+    def test_missing_required_column_rejects_all(self, tmp_path):
+        """Without a population column every row is rejected"""
+        for row in self.rows:
+            del row['population']
+        report = preflight(self._write(tmp_path / "in.csv"), self.codec)
+        assert report['missing_columns'] == ['population'], "Missing column should be reported"
+        assert report['valid'] == 0, "No row should pass"
+
+    def test_skip_resumes_clean_stream(self, tmp_path):
+        """skip drops the first clean rows across chunk boundaries"""
+        source = ValidatedCSV(self._write(tmp_path / "in.csv"), self.codec, chunk_size=16)
+        everything = list(source.patient_dicts())
+        assert list(source.patient_dicts(skip=37)) == everything[37:], \
+            "Skipped stream should continue where the full one was"
+
+    def test_no_stale_rejects(self, tmp_path):
+        """A clean run removes an earlier rejects file"""
+        rejects = tmp_path / "rejects.csv"
+        preflight(self._write(tmp_path / "bad.csv"), self.codec, str(rejects))
+        assert rejects.exists(), "Rejects should be written"
+        self.rows = [r for i, r in enumerate(self.rows) if i not in BAD_CELLS]
+        preflight(self._write(tmp_path / "good.csv"), self.codec, str(rejects))
+        assert not rejects.exists(), "Stale rejects should be removed"
+
+    def test_count_lines(self, tmp_path):
+        """Line count with and without a trailing newline"""
+        (tmp_path / "a").write_bytes(b"h\n1\n2\n")
+        (tmp_path / "b").write_bytes(b"h\n1\n2")
+        assert count_lines(str(tmp_path / "a")) == count_lines(str(tmp_path / "b")) == 3, \
+            "Both files have three lines"
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for program-level intervention value ranking
+"""
+
+import pytest
+
+from lai_prep_decision_tool_v2_1 import LAIPrEPDecisionTool
+from cohort_scoring import CohortScorer
+from intervention_ranking import InterventionRanking, rank_interventions
+from test_cohort_scoring import random_cohort
+
+
+def brute_force_successes(tool, profiles, disabled=None):
+    """Summed estimated success from assess_patient with one intervention removed"""
+    generate = tool._generate_candidate_recommendations
+    if disabled is not None:
+        tool._generate_candidate_recommendations = lambda profile: [
+            rec for rec in generate(profile) if rec.intervention != disabled
+        ]
+    try:
+        return sum(tool.assess_patient(p).estimated_success_with_interventions for p in profiles)
+    finally:
+        tool._generate_candidate_recommendations = generate
+
+
+class TestInterventionRanking:
+    """Recombined scenarios must agree with re-running the pipeline"""
+
+    def setup_method(self):
+        """Shared tool, scorer and cohort"""
+        self.tool = LAIPrEPDecisionTool()
+        self.scorer = CohortScorer(self.tool)
+        self.records = random_cohort(self.scorer.codec, 300, seed=5)
+        self.profiles = self.scorer.codec.decode_many(self.records)
+
+    def test_baseline_matches_assess_patient(self):
+        """Baseline expected successes equal summed estimated success"""
+        report = rank_interventions(self.scorer, [(0, self.records, None)])
+
+        assert report['patients'] == 300
+        assert report['baseline_expected_successes'] == pytest.approx(
+            brute_force_successes(self.tool, self.profiles), abs=1e-3)
+
+    @pytest.mark.parametrize("intervention", [
+        'TEXT_MESSAGE_NAVIGATION', 'ACCELERATED_TESTING', 'HARM_REDUCTION_INTEGRATION'
+    ])
+    def test_disabled_matches_rerun(self, intervention):
+        """Disabling an intervention matches assessing without that candidate"""
+        report = rank_interventions(self.scorer, [(0, self.records, None)])
+        row = next(r for r in report['interventions'] if r['intervention'] == intervention)
+
+        expected = (brute_force_successes(self.tool, self.profiles, disabled=intervention)
+                    - brute_force_successes(self.tool, self.profiles))
+        assert row['disabled']['expected_successes_change'] == pytest.approx(expected, abs=1e-3)
+        assert row['disabled']['expected_successes_change'] <= 0
+
+    def test_forced_on_reaches_applicable_population(self):
+        """Forcing an intervention puts it in the top recommendations of applicable patients"""
+        ranking = InterventionRanking(self.scorer)
+        ranking.add(self.records)
+        i = ranking.interventions.index('PEER_NAVIGATION')
+        applicable = self.tool.config.get_intervention_config('PEER_NAVIGATION')['applicable_populations']
+
+        expected = sum(
+            1 for p in self.profiles
+            if p.population in applicable
+            or 'PEER_NAVIGATION' in [r.intervention for r in
+                                     self.tool._generate_recommendations_with_mechanisms(p)[:3]]
+        )
+        assert ranking.forced_reach[i] == expected
+
+    def test_chunking_independent(self):
+        """Chunked accumulation gives the same report"""
+        whole = rank_interventions(self.scorer, [(0, self.records, None)])
+        chunked = rank_interventions(
+            self.scorer, [(o, self.records[o:o + 64], None) for o in range(0, 300, 64)]
+        )
+        assert whole['interventions'] == chunked['interventions']
+        assert whole['baseline_expected_successes'] == pytest.approx(
+            chunked['baseline_expected_successes'])
+        assert [r['rank'] for r in whole['interventions']] == \
+            list(range(1, len(whole['interventions']) + 1))
+
+    def test_candidates_not_mutated(self):
+        """Re-selection leaves candidate improvements untouched"""
+        profile = self.profiles[0]
+        candidates = self.tool._prioritize_candidates(
+            self.tool._generate_candidate_recommendations(profile))
+        before = [c.expected_improvement for c in candidates]
+
+        self.tool._select_with_mechanism_diversity(candidates)
+        self.tool._select_with_mechanism_diversity(candidates[1:])
+
+        assert [c.expected_improvement for c in candidates] == before
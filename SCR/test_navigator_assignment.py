@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for navigator-to-patient assignment
+"""
+
+import itertools
+import json
+
+import pytest
+
+from lai_prep_decision_tool_v2_1 import (
+    LAIPrEPDecisionTool, Configuration, ConfigurationError, PatientProfile
+)
+from navigator_assignment import (
+    Navigator, NavigationCandidate, NavigatorAssignment, MinCostFlow,
+    candidates_from_batch_dir, load_roster
+)
+
+
+def candidate(pid, population='PWID', setting='HARM_REDUCTION',
+              program='PEER_NAVIGATION', improvement=12.0, language=None):
+    return NavigationCandidate(pid, population, setting, program, improvement, language)
+
+
+class TestMinCostFlow:
+    """Solver correctness on small graphs"""
+
+    def test_stops_when_paths_unprofitable(self):
+        """Only negative-cost augmentations are taken"""
+        network = MinCostFlow(4)
+        network.add_edge(0, 1, 2, 0)
+        network.add_edge(1, 2, 2, -5)
+        network.add_edge(2, 3, 1, 0)
+        network.add_edge(1, 3, 5, 3)  # positive: never worth using
+
+        assert network.min_cost_flow(0, 3) == (1, -5)
+
+
+class TestNavigatorAssignment:
+    """Capacitated matching"""
+
+    def setup_method(self):
+        """Shared configuration"""
+        self.config = Configuration()
+
+    def brute_force(self, engine, candidates, navigators):
+        """Best total gain over all feasible assignments"""
+        options = [None] + navigators
+        best = 0.0
+        for choice in itertools.product(options, repeat=len(candidates)):
+            load = {}
+            gain = 0.0
+            feasible = True
+            for c, n in zip(candidates, choice):
+                if n is None:
+                    continue
+                effectiveness = engine.effectiveness(c, n)
+                load[n.navigator_id] = load.get(n.navigator_id, 0) + 1
+                if effectiveness == 0 or load[n.navigator_id] > n.weekly_capacity:
+                    feasible = False
+                    break
+                gain += engine.base_gain(c) * effectiveness
+            if feasible:
+                best = max(best, gain)
+        return best
+
+    def test_matches_brute_force(self):
+        """Assignment gain equals the exhaustive optimum"""
+        navigators = [
+            Navigator('peer_es', 2, settings=['HARM_REDUCTION'], populations=['PWID'],
+                      languages=['es'], programs=['PEER_NAVIGATION']),
+            Navigator('general', 1, languages=['en']),
+            Navigator('chc', 2, settings=['COMMUNITY_HEALTH_CENTER']),
+        ]
+        candidates = [
+            candidate('a', language='es'),
+            candidate('b', language='en'),
+            candidate('c', improvement=8.0),
+            candidate('d', population='CISGENDER_WOMEN', setting='COMMUNITY_HEALTH_CENTER',
+                      program='PATIENT_NAVIGATION', improvement=15.0),
+            candidate('e', population='ADOLESCENT', setting='SCHOOL_BASED',
+                      program='PATIENT_NAVIGATION', improvement=15.0, language='en'),
+        ]
+        engine = NavigatorAssignment(self.config, navigators)
+
+        assigned = engine.solve(candidates)
+        summary = engine.summary(candidates, assigned)
+
+        assert summary['expected_success_gain'] == pytest.approx(
+            self.brute_force(engine, candidates, navigators), abs=1e-4)
+        for entry in summary['navigators'].values():
+            assert entry['assigned'] <= entry['weekly_capacity'], "Caseload cap exceeded"
+
+    def test_identical_navigators_share_load(self):
+        """Merged navigator groups are split back within each cap"""
+        navigators = [Navigator(f'n{i}', 3) for i in range(3)]
+        candidates = [candidate(f'p{i}') for i in range(20)]
+        engine = NavigatorAssignment(self.config, navigators)
+
+        assigned = engine.solve(candidates)
+
+        assert sum(a is not None for a in assigned) == 9
+        assert sorted(assigned.count(f'n{i}') for i in range(3)) == [3, 3, 3]
+
+    def test_duplicate_navigator_ids_rejected(self):
+        """A roster reusing a navigator_id is refused, naming the id"""
+        navigators = [Navigator('n0', 3), Navigator('n1', 2), Navigator('n1', 4)]
+        with pytest.raises(ValueError, match="Duplicate navigator_id in roster: n1"):
+            NavigatorAssignment(self.config, navigators)
+
+    def test_batch_dir_and_roster(self, tmp_path):
+        """Candidates come from batch JSON; roster values are validated"""
+        tool = LAIPrEPDecisionTool()
+        profile = PatientProfile(population='PWID', age=30, current_prep_status='naive',
+                                 barriers=['HOUSING_INSTABILITY'],
+                                 healthcare_setting='COMMUNITY_HEALTH_CENTER')
+        (tmp_path / 'pt001_assessment.json').write_text(json.dumps(
+            tool.assess_patient(profile).to_json(profile, timestamp='t')))
+
+        candidates = candidates_from_batch_dir(str(tmp_path), {'pt001': 'es'})
+
+        assert len(candidates) == 1
+        assert candidates[0].patient_id == 'pt001'
+        assert candidates[0].program in ('PEER_NAVIGATION', 'HARM_REDUCTION_INTEGRATION')
+        assert candidates[0].language == 'es'
+
+        roster = tmp_path / 'roster.csv'
+        roster.write_text('navigator_id,weekly_capacity,settings\nx,5,NOT_A_SETTING\n')
+        with pytest.raises(ConfigurationError):
+            load_roster(str(roster), self.config)
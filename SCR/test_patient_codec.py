@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for the compact binary patient codec
+"""
+
+import csv
+import io
+
+import pytest
+
+from lai_prep_decision_tool_v2_1 import PatientProfile, ConfigurationError
+from patient_codec import PatientCodec
+
+
+CSV_TEXT = """patient_id,population,age,current_prep_status,barriers,healthcare_setting,insurance_status,recent_hiv_test,transportation_access,childcare_needs
+patient_001,MSM,28,oral_prep,SCHEDULING_CONFLICTS,LGBTQ_CENTER,insured,true,true,false
+patient_002,CISGENDER_WOMEN,32,naive,"TRANSPORTATION,CHILDCARE,MEDICAL_MISTRUST",COMMUNITY_HEALTH_CENTER,insured,false,false,true
+patient_006,MSM,45,oral_prep,,PRIVATE_PRACTICE,insured,true,true,false
+"""
+
+
+class TestPatientCodec:
+    """Round-trip and validation tests for PatientCodec"""
+
+    def setup_method(self):
+        """Initialize codec before each test"""
+        self.codec = PatientCodec()
+
+    def test_record_is_fixed_width(self):
+        """Record layout is 8 bytes for the shipped configuration"""
+        assert self.codec.dtype.itemsize == 8, \
+            "13 barriers should fit a uint16 mask in an 8-byte record"
+
+    def test_profile_round_trip(self):
+        """Encoding then decoding reproduces a canonical profile"""
+        profile = PatientProfile(
+            population="PWID",
+            age=35,
+            current_prep_status="naive",
+            barriers=["TRANSPORTATION", "HOUSING_INSTABILITY", "LEGAL_CONCERNS"],
+            healthcare_setting="HARM_REDUCTION",
+            insurance_status="uninsured",
+            transportation_access=False,
+            childcare_needs=True
+        )
+
+        decoded = self.codec.decode(self.codec.encode(profile))
+
+        # Barriers come back in configuration order
+        assert decoded.barriers == ["TRANSPORTATION", "HOUSING_INSTABILITY", "LEGAL_CONCERNS"]
+        assert decoded.to_dict() == profile.to_dict()
+
+    def test_csv_rows_round_trip(self):
+        """Raw CSV rows encode in bulk and decode back to CSV form"""
+        rows = list(csv.DictReader(io.StringIO(CSV_TEXT)))
+        records = self.codec.from_csv_rows(rows)
+
+        assert len(records) == 3
+        assert records['age'].tolist() == [28, 32, 45]
+
+        for original, decoded in zip(rows, self.codec.to_csv_rows(records)):
+            for key, value in decoded.items():
+                assert original[key] == value, f"Column {key} should round-trip"
+
+    def test_dicts_apply_profile_defaults(self):
+        """Missing optional fields take PatientProfile defaults"""
+        records = self.codec.from_dicts([{
+            "patient_id": "pt001",
+            "population": "MSM",
+            "age": 30,
+            "current_prep_status": "naive"
+        }])
+
+        assert self.codec.to_dicts(records)[0] == PatientProfile(
+            population="MSM", age=30, current_prep_status="naive"
+        ).to_dict()
+
+    def test_unknown_values_rejected(self):
+        """Unknown categorical values raise ConfigurationError"""
+        with pytest.raises(ConfigurationError):
+            self.codec.from_dicts([{
+                "population": "MSM",
+                "age": 30,
+                "current_prep_status": "naive",
+                "barriers": ["INVALID_BARRIER"]
+            }])
+
+        with pytest.raises(ValueError):
+            self.codec.from_dicts([{
+                "population": "MSM",
+                "age": 300,
+                "current_prep_status": "naive"
+            }])
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for incremental patient sessions
+"""
+
+import numpy as np
+import pytest
+
+from lai_prep_decision_tool_v2_1 import LAIPrEPDecisionTool, ConfigurationError
+from cohort_scoring import CohortScorer
+from patient_session import PatientSession, EVENT_NAMES
+from test_cohort_scoring import random_cohort
+
+
+FIXED_TIMESTAMP = "2025-01-01T00:00:00"
+
+
+def assert_matches_assessment(session, tool, context):
+    """Session state equals a fresh assess_patient of its current profile"""
+    profile = session.profile
+    expected = tool.assess_patient(profile)
+    assert session.adjusted_success == pytest.approx(
+        expected.adjusted_success_rate, abs=1e-12), f"Adjusted success mismatch {context}"
+    assert session.estimated_success == pytest.approx(
+        expected.estimated_success_with_interventions, abs=1e-12), \
+        f"Estimated success mismatch {context}"
+    assert session.attrition_risk == expected.attrition_risk, f"Risk mismatch {context}"
+    assert [r.intervention for r in session.recommendations] == \
+        [r.intervention for r in expected.recommended_interventions], \
+        f"Recommendations mismatch {context}"
+    assert session.bridge_duration == tuple(expected.estimated_bridge_duration_days), \
+        f"Bridge duration mismatch {context}"
+
+
+class TestIncrementalUpdates:
+    """Deltas must leave the session where a full re-assessment would"""
+
+    @pytest.mark.parametrize("use_logit", [False, True])
+    def test_random_deltas_match_assess_patient(self, use_logit):
+        """Random add/resolve/test/oral PrEP sequences agree with assess_patient"""
+        tool = LAIPrEPDecisionTool(use_logit=use_logit)
+        scorer = CohortScorer(tool)
+        rng = np.random.default_rng(5)
+        barriers = scorer.codec.barriers
+
+        for i, record in enumerate(random_cohort(scorer.codec, 40, seed=21)):
+            session = PatientSession.from_record(scorer, record)
+            assert_matches_assessment(session, tool, f"at start of patient {i}")
+            for step in range(12):
+                action = rng.integers(0, 10)
+                if action < 4:
+                    session.add_barrier(barriers[rng.integers(len(barriers))])
+                elif action < 8:
+                    session.resolve_barrier(barriers[rng.integers(len(barriers))])
+                elif action == 8:
+                    session.record_hiv_test()
+                else:
+                    session.start_oral_prep()
+                assert_matches_assessment(session, tool, f"for patient {i}, step {step}")
+
+    def test_long_barrier_sequences_match_exactly(self):
+        """Many add/resolve steps leave adjusted success bit-identical to assess_patient"""
+        tool = LAIPrEPDecisionTool()
+        scorer = CohortScorer(tool)
+        rng = np.random.default_rng(17)
+        barriers = scorer.codec.barriers
+        session = PatientSession.from_record(scorer, random_cohort(scorer.codec, 1, seed=3)[0])
+
+        for step in range(2000):
+            barrier = barriers[rng.integers(len(barriers))]
+            if rng.random() < 0.5:
+                session.add_barrier(barrier)
+            else:
+                session.resolve_barrier(barrier)
+            assert session.adjusted_success == \
+                tool.assess_patient(session.profile).adjusted_success_rate, \
+                f"Adjusted success drifted at step {step}"
+
+    def test_assessment_json_matches(self):
+        """On-demand assessment exports the same JSON as assess_patient"""
+        tool = LAIPrEPDecisionTool()
+        scorer = CohortScorer(tool)
+        session = PatientSession.from_record(scorer, random_cohort(scorer.codec, 1, seed=2)[0])
+        session.add_barrier(scorer.codec.barriers[0])
+        session.record_hiv_test()
+
+        profile = session.profile
+        assert session.assessment().to_json(profile, timestamp=FIXED_TIMESTAMP) == \
+            tool.assess_patient(profile).to_json(profile, timestamp=FIXED_TIMESTAMP)
+
+    def test_sessions_share_recommendations(self):
+        """Identical sessions reuse the scorer's recommendation results"""
+        scorer = CohortScorer(LAIPrEPDecisionTool())
+        record = random_cohort(scorer.codec, 1, seed=4)[0]
+        sessions = [PatientSession.from_record(scorer, record) for _ in range(50)]
+        for session in sessions:
+            session.record_hiv_test()
+        assert len(scorer._recommendation_cache) <= 2
+        assert sessions[0].recommendations is sessions[-1].recommendations
+
+    def test_assessment_edits_stay_local(self):
+        """Editing one session's assessment does not reach other sessions or the scorer"""
+        tool = LAIPrEPDecisionTool()
+        scorer = CohortScorer(tool)
+        record = random_cohort(scorer.codec, 1, seed=4)[0]
+        record['barriers'] = scorer.codec.barrier_mask(scorer.codec.barriers[:2])
+        first, second = (PatientSession.from_record(scorer, record) for _ in range(2))
+
+        edited = first.assessment().recommended_interventions[0]
+        edited.priority, edited.rationale = -99, 'x'
+
+        recommendation = second.assessment().recommended_interventions[0]
+        assert (recommendation.priority, recommendation.rationale) != (-99, 'x'), \
+            "Another session should not see the edit"
+        expected = tool.assess_patient(second.profile).recommended_interventions[0]
+        assert scorer.recommendations_for_key(
+            scorer.recommendation_keys(record[None])[0])[0].to_dict() == expected.to_dict(), \
+            "The scorer cache should not see the edit"
+
+
+class TestEventLog:
+    """Applied deltas are logged compactly; no-ops are not"""
+
+    def setup_method(self):
+        """Session with no barriers, PrEP-naive, no recent test"""
+        self.tool = LAIPrEPDecisionTool()
+        self.scorer = CohortScorer(self.tool)
+        record = self.scorer.codec.empty(1)[0]
+        record['prep_status'] = self.scorer.codec.prep_status_code('naive')
+        self.session = PatientSession.from_record(self.scorer, record, patient_id="P1")
+        self.barrier = self.scorer.codec.barriers[1]
+
+    def test_log_records_applied_deltas(self):
+        """Each applied delta is logged with its barrier and resulting risk"""
+        assert self.session.add_barrier(self.barrier, timestamp=100.0)
+        assert not self.session.add_barrier(self.barrier), "Duplicate add is a no-op"
+        assert self.session.record_hiv_test(timestamp=200.0)
+        assert not self.session.record_hiv_test(), "Repeat test is a no-op"
+        assert self.session.resolve_barrier(self.barrier, timestamp=300.0)
+        assert not self.session.resolve_barrier(self.barrier), "Absent barrier is a no-op"
+        assert self.session.start_oral_prep(timestamp=400.0)
+
+        log = self.session.event_log()
+        assert log.dtype.itemsize <= 12
+        assert log['timestamp'].tolist() == [100.0, 200.0, 300.0, 400.0]
+        assert [EVENT_NAMES[e] for e in log['event']] == [
+            'add_barrier', 'record_hiv_test', 'resolve_barrier', 'start_oral_prep'
+        ]
+        assert log['barrier'].tolist() == [1, -1, 1, -1]
+
+        events = self.session.to_dict()['events']
+        assert events[0]['barrier'] == self.barrier
+        assert events[-1]['risk'] == self.session.attrition_risk
+        assert self.session.attrition_risk == self.tool.assess_patient(
+            self.session.profile).attrition_risk
+
+    def test_unknown_barrier(self):
+        """Unknown barrier keys raise ConfigurationError and log nothing"""
+        with pytest.raises(ConfigurationError):
+            self.session.add_barrier("NOT_A_BARRIER")
+        assert len(self.session.event_log()) == 0
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for the content-addressed run cache
+"""
+
+import os
+
+import numpy as np
+
+from run_cache import RunCache, content_key
+
+
+class TestRunCache:
+    """Entries round-trip through the manifest and gc removes what it should"""
+
+    def _filled(self, tmp_path):
+        cache = RunCache(str(tmp_path / "runs"))
+        for i in range(4):
+            cache.put_chunk(content_key('chunk', i), {'counts': np.arange(1000) + i},
+                            {'code_version': 'old' if i == 0 else 'new'})
+        cache.put_run(content_key('run'), {'total': 4}, {'code_version': 'new'})
+        return cache
+
+    def test_round_trip_across_instances(self, tmp_path):
+        """Stored partials and reports are found by a new instance"""
+        self._filled(tmp_path)
+        cache = RunCache(str(tmp_path / "runs"))
+        assert np.array_equal(cache.get_chunk(content_key('chunk', 2))['counts'],
+                              np.arange(1000) + 2), "Chunk arrays should round-trip"
+        assert cache.get_run(content_key('run')) == {'total': 4}, "Report should round-trip"
+        assert cache.get_chunk(content_key('run')) is None, "Kinds should not mix"
+        assert cache.get_run(content_key('missing')) is None, "Unknown key should miss"
+
+    def test_content_key_is_order_independent(self):
+        """Dict key order does not change keys, values do"""
+        assert content_key({'a': 1, 'b': 2}, 3) == content_key({'b': 2, 'a': 1}, 3), \
+            "Key order should not matter"
+        assert content_key({'a': 1}, 3) != content_key({'a': 1}, 4), "Values should matter"
+
+    def test_gc_lru_and_stale(self, tmp_path):
+        """Size bound evicts least recently used; stale removes other code versions"""
+        cache = self._filled(tmp_path)
+        cache.get_chunk(content_key('chunk', 1))
+        chunk_bytes = cache.entries[content_key('chunk', 1)]['bytes']
+        run_bytes = cache.entries[content_key('run')]['bytes']
+
+        result = cache.gc(keep_code_versions=['new'])
+        assert result['removed'] == 1, "Entry of the old code version should go"
+        result = cache.gc(max_bytes=chunk_bytes + run_bytes)
+        assert result['removed'] == 2, "Two least recently used entries should go"
+        assert set(RunCache(str(tmp_path / "runs")).entries) == \
+            {content_key('chunk', 1), content_key('run')}, "Manifest should be saved"
+
+    def test_gc_orphans_and_missing_files(self, tmp_path):
+        """Files without entries and entries without files are removed"""
+        cache = self._filled(tmp_path)
+        orphan = tmp_path / "runs" / "objects" / "ab" / "leftover.npz.tmp"
+        orphan.parent.mkdir(parents=True, exist_ok=True)
+        orphan.write_bytes(b"partial")
+        os.remove(tmp_path / "runs" / cache.entries[content_key('chunk', 3)]['file'])
+
+        result = cache.gc()
+        assert result['orphans'] == 1 and not orphan.exists(), "Orphan file should go"
+        assert result['removed'] == 1 and content_key('chunk', 3) not in cache.entries, \
+            "Entry without a file should go"
+
+    def test_unreadable_manifest_starts_empty(self, tmp_path):
+        """A corrupt manifest is ignored rather than failing"""
+        (tmp_path / "runs").mkdir()
+        (tmp_path / "runs" / "manifest.json").write_text("{not json")
+        assert RunCache(str(tmp_path / "runs")).stats()['entries'] == 0, "Should start empty"
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for the shared-memory compiled configuration and batch workers
+"""
+
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from lai_prep_decision_tool_v2_1 import LAIPrEPDecisionTool, ConfigurationError
+from compiled_config import CompiledConfig
+from cohort_scoring import CohortScorer
+from shared_config import AttachedConfig, SharedConfig, config_digest
+from batch_processing import run_batch
+from test_cohort_scoring import random_cohort
+
+
+def _attach_and_score(name, digest, queue):
+    """Child process: attach and report table contents and a configuration value"""
+    try:
+        attached = AttachedConfig(name, expected_digest=digest)
+        attached.check()
+        queue.put((attached.tables.baseline_attrition.tolist(),
+                   attached.config.config.get('version')))
+        attached.close()
+    except Exception as e:
+        queue.put(repr(e))
+
+
+class TestSharedConfig:
+    """Published blocks round-trip the configuration and its tables"""
+
+    def setup_method(self):
+        """Initialize tool before each test"""
+        self.tool = LAIPrEPDecisionTool()
+
+    def test_round_trip(self):
+        """Attached tables equal the compiled ones and cannot be written"""
+        with SharedConfig(self.tool.config) as shared:
+            attached = AttachedConfig(shared.name, expected_digest=shared.digest)
+            try:
+                assert attached.config.config == self.tool.config.config, \
+                    "Attached configuration should equal the published one"
+                compiled = CompiledConfig(self.tool.config).arrays()
+                for key, array in attached.tables.arrays().items():
+                    assert np.array_equal(array, compiled[key]), f"{key} should round-trip"
+                    assert not array.flags.writeable, f"{key} should be read-only"
+                assert attached.digest == config_digest(self.tool.config), \
+                    "Digest should identify the configuration"
+            finally:
+                attached.close()
+
+    def test_digest_mismatch_rejected(self):
+        """Attaching with another configuration's digest fails"""
+        with SharedConfig(self.tool.config) as shared:
+            with pytest.raises(ConfigurationError):
+                AttachedConfig(shared.name, expected_digest='0' * 64)
+
+    def test_retired_block(self):
+        """Retiring makes check() fail and refuses new attachments"""
+        with SharedConfig(self.tool.config) as shared:
+            attached = AttachedConfig(shared.name)
+            attached.check()
+            shared.retire()
+            with pytest.raises(ConfigurationError):
+                attached.check()
+            with pytest.raises(ConfigurationError):
+                AttachedConfig(shared.name)
+            attached.close()
+
+    def test_scorer_on_attached_tables(self):
+        """A scorer built on shared tables matches one built from the file"""
+        records = random_cohort(self.tool._cohort_scorer().codec, 500)
+        expected = self.tool._cohort_scorer().score(records)
+        with SharedConfig(self.tool.config) as shared:
+            attached = AttachedConfig(shared.name, expected_digest=shared.digest)
+            worker_tool = LAIPrEPDecisionTool(config=attached.config)
+            scores = CohortScorer(worker_tool, tables=attached.tables).score(records)
+            for key in expected.dtype.names:
+                assert np.array_equal(scores[key], expected[key]), f"{key} should match"
+            del scores, worker_tool
+            attached.close()
+
+    def test_worker_process_attaches(self):
+        """A child process reads the published block"""
+        with SharedConfig(self.tool.config) as shared:
+            queue = multiprocessing.Queue()
+            process = multiprocessing.Process(
+                target=_attach_and_score, args=(shared.name, shared.digest, queue)
+            )
+            process.start()
+            result = queue.get(timeout=60)
+            process.join(timeout=60)
+        assert isinstance(result, tuple), f"Worker failed: {result}"
+        baseline, version = result
+        assert np.allclose(baseline, self.tool._cohort_scorer().tables.baseline_attrition), \
+            "Worker should see the published tables"
+        assert version == self.tool.config.config.get('version'), \
+            "Worker should see the published configuration"
+
+
+class TestBatchWorkers:
+    """Batch output does not depend on the number of workers"""
+
+    def test_workers_match_serial(self, tmp_path):
+        """Files and summary rows are identical with 1 and 2 workers"""
+        tool = LAIPrEPDecisionTool()
+        codec = tool._cohort_scorer().codec
+        patients = codec.to_dicts(random_cohort(codec, 60))
+        patients.append({'population': 'UNKNOWN', 'age': 30, 'current_prep_status': 'naive',
+                         'barriers': [], 'healthcare_setting': 'X', 'insurance_status': 'x'})
+
+        runs = {}
+        for workers in (1, 2):
+            out = tmp_path / f"w{workers}"
+            out.mkdir()
+            results = [r for chunk in run_batch(tool, patients, out, workers=workers,
+                                                timestamp='2025-01-01T00:00:00',
+                                                chunk_size=16)
+                       for r in chunk]
+            files = {p.name: p.read_bytes() for p in out.iterdir()}
+            runs[workers] = (results, files)
+
+        serial, parallel = runs[1], runs[2]
+        assert [r[0] for r in parallel[0]] == list(range(len(patients))), \
+            "Results should stay in input order"
+        assert serial[0] == parallel[0], "Summary rows and errors should match"
+        assert serial[1] == parallel[1], "Assessment files should be identical"
+        assert serial[0][-1][2] is not None, "Invalid patient should be reported"
+        assert len(serial[1]) == len(patients) - 1, "Valid patients should each get a file"
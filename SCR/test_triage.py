@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for the streaming high-risk triage queue
+"""
+
+import numpy as np
+
+from lai_prep_decision_tool_v2_1 import LAIPrEPDecisionTool
+from cohort_scoring import CohortScorer
+from triage import TriageQueue, triage_cohort
+from test_cohort_scoring import random_cohort
+
+
+class TestTriageQueue:
+    """Bounded heap behaviour"""
+
+    def test_keeps_top_k_across_chunks(self):
+        """Chunked pushes keep exactly the global top k, earliest row on ties"""
+        rng = np.random.default_rng(3)
+        scores = np.round(rng.random(5000), 2)  # plenty of ties
+        queue = TriageQueue(25)
+
+        for offset in range(0, len(scores), 700):
+            chunk = scores[offset:offset + 700]
+            queue.push_many(chunk, offset, lambda i, offset=offset: offset + i)
+
+        expected = sorted(range(len(scores)), key=lambda r: (-scores[r], r))[:25]
+        assert [row for _, row, _ in queue.results()] == expected
+
+
+class TestTriageCohort:
+    """Worklists from scored cohorts"""
+
+    def test_worklist_ranks_by_attrition(self):
+        """Worklist is ordered by attrition and matches a full sort"""
+        scorer = CohortScorer(LAIPrEPDecisionTool())
+        records = random_cohort(scorer.codec, 1000)
+        chunks = [
+            (offset, records[offset:offset + 300], [None] * len(records[offset:offset + 300]))
+            for offset in range(0, len(records), 300)
+        ]
+
+        worklist = triage_cohort(scorer, chunks, k=10, by='attrition')
+
+        attrition = 1 - scorer.score(records)['adjusted_success']
+        assert len(worklist) == 10
+        assert [row['rank'] for row in worklist] == list(range(1, 11))
+        assert worklist[0]['attrition'] == round(float(attrition.max()), 4)
+        assert worklist[0]['patient_id'] == f"patient_{int(np.argmax(attrition)) + 1:04d}"
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for configuration validation library mode
+"""
+
+import copy
+import json
+from pathlib import Path
+
+from validate_config import (
+    ConfigValidator,
+    ValidationCache,
+    validate_content,
+    validate_file,
+    validate_paths
+)
+
+
+CONFIG_PATH = Path(__file__).parent.parent / "lai_prep_config.json"
+
+
+class TestValidationLibrary:
+    """Structured, cached and multi-config validation"""
+
+    def setup_method(self):
+        """Load the shipped configuration"""
+        with open(CONFIG_PATH) as f:
+            self.data = json.load(f)
+
+    def _write_sites(self, directory, count=4):
+        """Site configs differing in a setting name"""
+        setting = next(iter(self.data['healthcare_settings']))
+        for i in range(count):
+            data = copy.deepcopy(self.data)
+            data['healthcare_settings'][setting]['name'] = f"Site {i}"
+            (directory / f"site_{i:02d}.json").write_text(json.dumps(data))
+
+    def test_validate_file_is_silent(self, capsys):
+        """Library mode returns results without printing"""
+        result = validate_file(str(CONFIG_PATH))
+        assert result.valid, f"Shipped configuration should be valid: {result.errors}"
+        assert result.digest, "Result should carry the content digest"
+        assert capsys.readouterr().out == "", "Library mode should not print"
+
+    def test_matches_printing_validator(self, capsys):
+        """Library mode finds the same problems as the script"""
+        data = copy.deepcopy(self.data)
+        del data['version']
+        data['barriers']['TRANSPORTATION']['impact'] = 0.9
+        validator = ConfigValidator("x.json", config=data)
+        validator.validate(report=False)
+
+        result = validate_content("x.json", json.dumps(data).encode('utf-8'))
+        assert result.errors == validator.errors, "Errors should match"
+        assert result.warnings == validator.warnings, "Warnings should match"
+        assert not result.valid, "Missing section should fail"
+
+    def test_invalid_json_reported(self, tmp_path):
+        """Unparseable files are errors, not exceptions"""
+        path = tmp_path / "broken.json"
+        path.write_text("{")
+        report = validate_paths([str(tmp_path)], workers=1)
+        assert not report.valid, "Broken file should fail"
+        assert "Invalid JSON" in report.results[0].errors[0], "Error should say why"
+
+    def test_directory_in_pool(self, tmp_path):
+        """A directory validates in a process pool, in file order"""
+        self._write_sites(tmp_path)
+        report = validate_paths([str(tmp_path)], workers=2)
+        assert report.valid, "All sites should be valid"
+        assert [Path(r.path).name for r in report.results] == \
+            [f"site_{i:02d}.json" for i in range(4)], "Results should follow file order"
+
+    def test_cache_skips_unchanged(self, tmp_path):
+        """Unchanged content is served from the cache; edits are re-validated"""
+        sites = tmp_path / "sites"
+        sites.mkdir()
+        self._write_sites(sites)
+        cache_path = str(tmp_path / "cache.json")
+
+        first = validate_paths([str(sites)], workers=1, cache_path=cache_path)
+        assert not any(r.cached for r in first.results), "First run validates everything"
+
+        data = json.loads((sites / "site_01.json").read_text())
+        del data['interventions']
+        (sites / "site_01.json").write_text(json.dumps(data))
+
+        second = validate_paths([str(sites)], workers=1, cache_path=cache_path)
+        assert [r.cached for r in second.results] == [True, False, True, True], \
+            "Only the edited config should be re-validated"
+        assert not second.results[1].valid, "Edited config should fail"
+        assert [r.errors for r in second.results if r.cached] == \
+            [r.errors for r in first.results if r.path != second.results[1].path], \
+            "Cached results should match the originals"
+
+    def test_stale_cache_ignored(self, tmp_path):
+        """A cache from another validator version is not used"""
+        cache_path = tmp_path / "cache.json"
+        cache_path.write_text(json.dumps({'validator_version': -1, 'results': {'x': {}}}))
+        assert ValidationCache(str(cache_path)).get("a.json", 'x') is None, \
+            "Stale cache should be ignored"
+
+    def test_cross_config_evidence_divergence(self, tmp_path):
+        """The same intervention with different evidence levels is flagged"""
+        self._write_sites(tmp_path, count=3)
+        data = json.loads((tmp_path / "site_02.json").read_text())
+        data['interventions']['PATIENT_NAVIGATION']['evidence_level'] = 'emerging'
+        (tmp_path / "site_02.json").write_text(json.dumps(data))
+
+        report = validate_paths([str(tmp_path)], workers=1)
+        flagged = [w for w in report.cross_config_warnings if 'PATIENT_NAVIGATION' in w]
+        assert len(flagged) == 1 and 'evidence_level' in flagged[0], \
+            "Diverging evidence level should be reported once"
+        assert report.valid, "Cross-config findings are warnings, not errors"
+
+    def test_cross_config_order_divergence(self, tmp_path):
+        """Differently ordered barriers are flagged"""
+        self._write_sites(tmp_path, count=2)
+        data = json.loads((tmp_path / "site_01.json").read_text())
+        data['barriers'] = dict(reversed(list(data['barriers'].items())))
+        (tmp_path / "site_01.json").write_text(json.dumps(data))
+
+        report = validate_paths([str(tmp_path)], workers=1)
+        assert any("'barriers'" in w for w in report.cross_config_warnings), \
+            "Order divergence should be reported"
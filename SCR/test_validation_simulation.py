@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for cached synthetic validation runs
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from lai_prep_decision_tool_v2_1 import ConfigurationError, LAIPrEPDecisionTool
+from cohort_scoring import CohortScorer
+from run_cache import RunCache
+from validation_simulation import generate_chunk, normalize_spec, run_validation
+
+
+CONFIG_PATH = Path(__file__).parent.parent / "lai_prep_config.json"
+
+
+def _strip(report):
+    """Report without the run date"""
+    return {k: v for k, v in report.items() if k != 'test_date'}
+
+
+class TestValidationSimulation:
+    """Cached and extended runs reproduce fresh runs"""
+
+    def setup_method(self):
+        """Scorer for the shipped configuration"""
+        self.scorer = CohortScorer(LAIPrEPDecisionTool(str(CONFIG_PATH)))
+        self.codec = self.scorer.codec
+
+    def test_report_matches_per_patient_assessment(self):
+        """Aggregates agree with assess_patient on the generated cohort"""
+        report, _ = run_validation(self.scorer, 500, seed=3, chunk_size=200)
+        spec = normalize_spec(None, self.codec)
+        records = np.concatenate([
+            generate_chunk(self.codec, spec, 3, i, 200, min(200, 500 - 200 * i))
+            for i in range(3)
+        ])
+        assessments = [self.scorer.tool.assess_patient(p) for p in self.codec.decode_many(records)]
+
+        assert report['total'] == 500, "All patients should be counted"
+        expected = sum(a.adjusted_success_rate for a in assessments) / 500
+        assert report['avg_success_rate'] == pytest.approx(expected), "Mean success should match"
+        expected = sum(a.estimated_success_with_interventions - a.adjusted_success_rate
+                       for a in assessments) / 500
+        assert report['avg_improvement'] == pytest.approx(expected), "Mean improvement should match"
+        assert sum(report['by_risk_level'].values()) == 500, "Risk levels should cover everyone"
+        name = self.scorer.tool.config.config['interventions']['TEXT_MESSAGE_NAVIGATION']['name']
+        expected = sum(any(r.intervention == 'TEXT_MESSAGE_NAVIGATION' for r in a.recommended_interventions)
+                       for a in assessments)
+        assert report['interventions'].get(name, 0) == expected, "Intervention counts should match"
+
+    def test_extended_run_reuses_chunks(self, tmp_path):
+        """Growing N computes only new chunks and matches a fresh run"""
+        cache = RunCache(str(tmp_path / "runs"))
+        run_validation(self.scorer, 2500, chunk_size=1000, cache=cache)
+        extended, stats = run_validation(self.scorer, 4200, chunk_size=1000, cache=cache)
+        assert (stats['computed'], stats['reused']) == (3, 2), \
+            "Only the partial last chunk and new chunks should be computed"
+
+        fresh, _ = run_validation(self.scorer, 4200, chunk_size=1000)
+        assert _strip(extended) == _strip(fresh), "Extended run should equal a fresh run"
+
+        again, stats = run_validation(self.scorer, 4200, chunk_size=1000, cache=cache)
+        assert stats['cached_report'] and again == extended, "Repeat should reuse the report"
+
+    def test_key_separates_inputs(self, tmp_path):
+        """Seed, spec and method changes never reuse chunks"""
+        cache = RunCache(str(tmp_path / "runs"))
+        base, _ = run_validation(self.scorer, 1000, chunk_size=500, cache=cache)
+        _, stats = run_validation(self.scorer, 1000, seed=1, chunk_size=500, cache=cache)
+        assert stats['reused'] == 0, "Another seed should not reuse chunks"
+        spec = {'populations': {self.codec.populations[0]: 1.0}}
+        report, stats = run_validation(self.scorer, 1000, spec=spec, chunk_size=500, cache=cache)
+        assert stats['reused'] == 0 and len(report['by_population']) == 1, \
+            "Another spec should not reuse chunks"
+        logit = CohortScorer(LAIPrEPDecisionTool(str(CONFIG_PATH), use_logit=True))
+        other, stats = run_validation(logit, 1000, chunk_size=500, cache=cache)
+        assert stats['reused'] == 0 and other['run']['method'] == 'logit', \
+            "Another method should not reuse chunks"
+
+    def test_prefix_stable_generation(self):
+        """A partial chunk is the prefix of the full chunk"""
+        spec = normalize_spec(None, self.codec)
+        full = generate_chunk(self.codec, spec, 0, 2, 300, 300)
+        assert np.array_equal(generate_chunk(self.codec, spec, 0, 2, 300, 120), full[:120]), \
+            "Partial chunk should be a prefix"
+        counts = self.scorer.barrier_count(full)
+        assert counts.max() <= 5, "Barrier counts should follow the spec"
+
+    def test_invalid_spec(self):
+        """Unknown values and sections are configuration errors"""
+        with pytest.raises(ConfigurationError):
+            normalize_spec({'populations': {'NOT_A_POPULATION': 1}}, self.codec)
+        with pytest.raises(ConfigurationError):
+            normalize_spec({'colour': {}}, self.codec)
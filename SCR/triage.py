@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+High-Risk Triage Queue for LAI-PrEP Bridge Decision Support Tool
+
+Streams an encoded cohort through the vectorized scorer and keeps only the
+top-k patients by attrition risk or by expected improvement from the
+recommended interventions, so outreach worklists come out of a multi-million
+row pass in memory bounded by k and the chunk size.
+"""
+
+import heapq
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+from cohort_file import default_patient_id
+from cohort_scoring import CohortScorer
+
+
+TRIAGE_KEYS = ('attrition', 'improvement')
+
+
+class TriageQueue:
+    """Bounded min-heap keeping the k highest-scoring items seen so far"""
+
+    def __init__(self, k: int):
+        """
+        Args:
+            k: Number of items to keep
+        """
+        if k < 1:
+            raise ValueError(f"Triage queue size must be positive, got {k}")
+        self.k = k
+        self._heap = []  # (score, -row, item); earlier rows win ties
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    @property
+    def threshold(self) -> float:
+        """Score an item must beat to enter a full queue"""
+        return self._heap[0][0] if len(self._heap) >= self.k else -np.inf
+
+    def push(self, score: float, row: int, item) -> None:
+        """Offer one item; kept only if it ranks in the current top k"""
+        entry = (score, -row, item)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif entry[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+
+    def push_many(self, scores: np.ndarray, offset: int, make_item) -> None:
+        """
+        Offer a chunk of scores, materializing items only for contenders
+
+        Args:
+            scores: Score per row in the chunk
+            offset: Global row index of the chunk's first row
+            make_item: Callable(local_index) -> item, called for contenders only
+        """
+        if len(scores) == 0:
+            return
+
+        # Only the chunk's own top k (plus ties) can enter the queue
+        candidates = np.flatnonzero(scores >= self.threshold)
+        if len(candidates) > self.k:
+            candidate_scores = scores[candidates]
+            kth = len(candidates) - self.k
+            cutoff = np.partition(candidate_scores, kth)[kth]
+            candidates = candidates[candidate_scores >= cutoff]
+
+        for i in sorted(candidates.tolist()):
+            self.push(float(scores[i]), offset + i, make_item(i))
+
+    def results(self) -> List[tuple]:
+        """(score, row, item) tuples, highest score first"""
+        ordered = sorted(self._heap, key=lambda e: (e[0], e[1]), reverse=True)
+        return [(score, -neg_row, item) for score, neg_row, item in ordered]
+
+
+def triage_cohort(
+    scorer: CohortScorer,
+    chunks: Iterable[tuple],
+    k: int,
+    by: str = 'attrition'
+) -> List[Dict]:
+    """
+    Build a top-k outreach worklist from a chunked cohort
+
+    Args:
+        scorer: CohortScorer for the active configuration and method
+        chunks: Iterable of (offset, records, patient_ids) as yielded by
+            cohort_file.iter_cohort_chunks
+        k: Worklist size
+        by: 'attrition' (1 - adjusted success) or 'improvement'
+            (estimated success with interventions - adjusted success)
+
+    Returns:
+        Worklist rows, highest priority first
+    """
+    if by not in TRIAGE_KEYS:
+        raise ValueError(f"Unknown triage key: {by} (expected one of {TRIAGE_KEYS})")
+
+    codec = scorer.codec
+    labels = scorer.tables.risk_labels
+    queue = TriageQueue(k)
+
+    for offset, records, patient_ids in chunks:
+        results = scorer.score(records)
+        attrition = 1 - results['adjusted_success']
+        improvement = results['estimated_success'] - results['adjusted_success']
+        scores = attrition if by == 'attrition' else improvement
+
+        def make_item(i, records=records, results=results, patient_ids=patient_ids,
+                      offset=offset, attrition=attrition, improvement=improvement):
+            record = records[i]
+            return {
+                'patient_id': patient_ids[i] or default_patient_id(offset + i),
+                'population': codec.populations[record['population']],
+                'healthcare_setting': codec.settings[record['healthcare_setting']],
+                'barrier_count': bin(int(record['barriers'])).count('1'),
+                'risk_level': labels[results['risk'][i]],
+                'attrition': round(float(attrition[i]), 4),
+                'adjusted_success': round(float(results['adjusted_success'][i]), 4),
+                'estimated_success': round(float(results['estimated_success'][i]), 4),
+                'improvement': round(float(improvement[i]), 4),
+            }
+
+        queue.push_many(scores, offset, make_item)
+
+    return [
+        dict(rank=rank, **item)
+        for rank, (_, _, item) in enumerate(queue.results(), 1)
+    ]
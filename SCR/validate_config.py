@@ -8,10 +8,30 @@ This script validates the configuration JSON file to ensure:
 3. Valid parameter ranges
 4. Consistent cross-references
 5. Evidence documentation complete
+
+Library mode: validate_file() returns a ValidationResult instead of printing,
+and validate_paths() validates many files (or directories of site configs)
+in a process pool, skipping files whose content hash is in a ValidationCache,
+then adds cross-config consistency checks to the combined ValidationReport.
 """
 
+import argparse
+import hashlib
 import json
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+# Bump when validation rules change so cached results are recomputed
+VALIDATOR_VERSION = 1
+
+# Sections whose entries are compared across configurations
+CONSISTENCY_SECTIONS = ('populations', 'barriers', 'interventions')
+CONSISTENCY_FIELDS = ('name', 'evidence_level')
 
 
 class ConfigValidator:
@@ -39,26 +59,36 @@ class ConfigValidator:
     VALID_COST_LEVELS = ['low', 'medium', 'high']
     VALID_COMPLEXITY_LEVELS = ['low', 'medium', 'high']
     
-    def __init__(self, config_path: str):
-        """Initialize validator with configuration file path"""
+    def __init__(self, config_path: str, config: Optional[Dict] = None):
+        """
+        Initialize validator with configuration file path
+        
+        Args:
+            config_path: Path to configuration JSON file
+            config: Already-parsed configuration (the file is not read if given)
+        """
         self.config_path = config_path
-        self.config = None
+        self.config = config
         self.errors = []
         self.warnings = []
         self.info = []
     
-    def validate(self) -> bool:
+    def validate(self, report: bool = True) -> bool:
         """
         Validate configuration file
         
+        Args:
+            report: Print the results (False leaves them in errors/warnings/info)
+        
         Returns:
             bool: True if valid, False if errors found
         """
-        print(f"Validating configuration: {self.config_path}")
-        print("=" * 80)
+        if report:
+            print(f"Validating configuration: {self.config_path}")
+            print("=" * 80)
         
         # Load and parse JSON
-        if not self._load_json():
+        if self.config is None and not self._load_json():
             return False
         
         # Validate structure
@@ -77,7 +107,8 @@ class ConfigValidator:
         self._validate_ranges()
         
         # Report results
-        self._print_results()
+        if report:
+            self._print_results()
         
         return len(self.errors) == 0
     
@@ -398,24 +429,346 @@ class ConfigValidator:
         print("=" * 80)
 
 
+@dataclass
+class ValidationResult:
+    """Outcome of validating one configuration file"""
+    path: str
+    digest: Optional[str]
+    errors: List[str]
+    warnings: List[str]
+    info: List[str]
+    summary: Dict = field(default_factory=dict)
+    cached: bool = False
+    
+    @property
+    def valid(self) -> bool:
+        """True if no errors were found"""
+        return not self.errors
+    
+    def to_dict(self) -> Dict:
+        """Convert to dictionary for JSON export"""
+        return {
+            'path': self.path,
+            'digest': self.digest,
+            'valid': self.valid,
+            'errors': self.errors,
+            'warnings': self.warnings,
+            'info': self.info,
+            'cached': self.cached,
+        }
+
+
+def consistency_summary(config: Dict) -> Dict:
+    """Fields compared across configurations, plus code map order"""
+    summary = {'order': {}}
+    for section in CONSISTENCY_SECTIONS:
+        entries = config.get(section)
+        if not isinstance(entries, dict):
+            continue
+        summary[section] = {
+            key: {f: entry.get(f) for f in CONSISTENCY_FIELDS}
+            for key, entry in entries.items() if isinstance(entry, dict)
+        }
+        summary['order'][section] = list(entries)
+    return summary
+
+
+def validate_content(path: str, content: bytes) -> ValidationResult:
+    """
+    Validate configuration file content without printing
+    
+    Args:
+        path: File path (used in messages only)
+        content: Raw file content
+    
+    Returns:
+        ValidationResult
+    """
+    digest = hashlib.sha256(content).hexdigest()
+    try:
+        config = json.loads(content.decode('utf-8'))
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        return ValidationResult(path, digest, [f"Invalid JSON syntax: {e}"], [], [])
+    if not isinstance(config, dict):
+        return ValidationResult(path, digest, ["Configuration must be a JSON object"], [], [])
+    
+    validator = ConfigValidator(path, config=config)
+    validator.info.append("✓ JSON syntax valid")
+    try:
+        validator.validate(report=False)
+    except Exception as e:
+        validator.errors.append(f"Error validating configuration: {e}")
+    return ValidationResult(
+        path, digest, validator.errors, validator.warnings, validator.info,
+        consistency_summary(config)
+    )
+
+
+def validate_file(path: str) -> ValidationResult:
+    """Validate one configuration file without printing"""
+    try:
+        with open(path, 'rb') as f:
+            content = f.read()
+    except OSError as e:
+        return ValidationResult(str(path), None, [f"Cannot read configuration: {e}"], [], [])
+    return validate_content(str(path), content)
+
+
+def _validate_content_job(job: Tuple[str, bytes]) -> ValidationResult:
+    """Process pool entry point"""
+    return validate_content(*job)
+
+
+class ValidationCache:
+    """Validation results by content hash, persisted as JSON"""
+    
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Cache file (created on save; ignored if unreadable or stale)
+        """
+        self.path = path
+        self._results: Dict[str, Dict] = {}
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            if data.get('validator_version') == VALIDATOR_VERSION:
+                self._results = data.get('results', {})
+        except (OSError, ValueError, AttributeError):
+            pass
+    
+    def get(self, path: str, digest: str) -> Optional[ValidationResult]:
+        """Cached result for content, reported under the given path"""
+        entry = self._results.get(digest)
+        if entry is None:
+            return None
+        return ValidationResult(
+            path, digest, list(entry['errors']), list(entry['warnings']),
+            list(entry['info']), entry['summary'], cached=True
+        )
+    
+    def put(self, result: ValidationResult) -> None:
+        """Store a result (results without content are not cached)"""
+        if result.digest is not None:
+            self._results[result.digest] = {
+                'errors': result.errors,
+                'warnings': result.warnings,
+                'info': result.info,
+                'summary': result.summary,
+            }
+    
+    def save(self, live_digests: Optional[Iterable[str]] = None) -> None:
+        """Write the cache atomically, keeping only live_digests if given"""
+        results = self._results
+        if live_digests is not None:
+            live = set(live_digests)
+            results = {d: r for d, r in results.items() if d in live}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'validator_version': VALIDATOR_VERSION, 'results': results}, f)
+        os.replace(tmp_path, self.path)
+
+
+def cross_config_checks(results: List[ValidationResult]) -> List[str]:
+    """
+    Consistency warnings across configurations
+    
+    Flags the same population, barrier or intervention key with diverging
+    names or evidence levels, and differing key order (which prevents sharing
+    encoded cohorts between sites).
+    """
+    warnings = []
+    parsed = [r for r in results if r.summary]
+    
+    for section in CONSISTENCY_SECTIONS:
+        seen: Dict[Tuple[str, str], Dict] = {}
+        for result in parsed:
+            for key, fields in result.summary.get(section, {}).items():
+                for name, value in fields.items():
+                    seen.setdefault((key, name), {}).setdefault(
+                        json.dumps(value), []
+                    ).append(result.path)
+        for (key, name), values in seen.items():
+            if len(values) > 1:
+                detail = '; '.join(
+                    f"{json.loads(value)!r} in {len(paths)} config(s) (e.g. {paths[0]})"
+                    for value, paths in values.items()
+                )
+                warnings.append(f"{section[:-1].capitalize()} '{key}' has diverging {name}: {detail}")
+    
+    for section in CONSISTENCY_SECTIONS:
+        orders = {}
+        for result in parsed:
+            order = result.summary['order'].get(section)
+            if order is not None:
+                orders.setdefault(tuple(order), []).append(result.path)
+        if len(orders) > 1:
+            warnings.append(
+                f"'{section}' keys differ or are ordered differently across "
+                f"{len(orders)} groups of configs; encoded cohorts cannot be shared between them"
+            )
+    return warnings
+
+
+@dataclass
+class ValidationReport:
+    """Combined results of validating many configuration files"""
+    results: List[ValidationResult]
+    cross_config_warnings: List[str]
+    
+    @property
+    def valid(self) -> bool:
+        """True if every configuration is valid"""
+        return all(result.valid for result in self.results)
+    
+    def to_dict(self) -> Dict:
+        """Convert to dictionary for JSON export"""
+        return {
+            'valid': self.valid,
+            'configs': len(self.results),
+            'failed': sum(not r.valid for r in self.results),
+            'cached': sum(r.cached for r in self.results),
+            'results': [r.to_dict() for r in self.results],
+            'cross_config_warnings': self.cross_config_warnings,
+        }
+    
+    def print_summary(self) -> None:
+        """Print a one-line-per-config summary and cross-config warnings"""
+        for result in self.results:
+            status = "❌" if result.errors else ("⚠️ " if result.warnings else "✅")
+            suffix = " (cached)" if result.cached else ""
+            print(f"{status} {result.path}: {len(result.errors)} error(s), "
+                  f"{len(result.warnings)} warning(s){suffix}")
+            for msg in result.errors:
+                print(f"    ❌ {msg}")
+        if self.cross_config_warnings:
+            print()
+            print("CROSS-CONFIG WARNINGS:")
+            print("-" * 80)
+            for msg in self.cross_config_warnings:
+                print(f"  ⚠️  {msg}")
+        print("=" * 80)
+        failed = sum(not r.valid for r in self.results)
+        if failed:
+            print(f"❌ VALIDATION FAILED: {failed} of {len(self.results)} config(s)")
+        else:
+            print(f"✅ VALIDATION PASSED: {len(self.results)} config(s)")
+        print("=" * 80)
+
+
+def collect_config_paths(paths: Iterable[str], pattern: str = "*.json") -> List[str]:
+    """Expand directories into their matching files (sorted), keeping files as given"""
+    collected = []
+    for path in paths:
+        if Path(path).is_dir():
+            collected.extend(str(p) for p in sorted(Path(path).glob(pattern)) if p.is_file())
+        else:
+            collected.append(str(path))
+    return collected
+
+
+def validate_paths(
+    paths: Iterable[str],
+    workers: Optional[int] = None,
+    cache_path: Optional[str] = None,
+    pattern: str = "*.json"
+) -> ValidationReport:
+    """
+    Validate configuration files and directories of them
+    
+    Args:
+        paths: Files and/or directories (directories are searched with pattern)
+        workers: Worker processes for uncached files (default: CPU count; 1 = in-process)
+        cache_path: ValidationCache file; unchanged content is not re-validated
+        pattern: Glob for files inside directories
+    
+    Returns:
+        ValidationReport with per-file results in input order
+    """
+    files = collect_config_paths(paths, pattern)
+    cache = ValidationCache(cache_path) if cache_path else None
+    
+    results: List[Optional[ValidationResult]] = [None] * len(files)
+    jobs, positions = [], []
+    for i, path in enumerate(files):
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+        except OSError as e:
+            results[i] = ValidationResult(path, None, [f"Cannot read configuration: {e}"], [], [])
+            continue
+        digest = hashlib.sha256(content).hexdigest()
+        cached = cache.get(path, digest) if cache else None
+        if cached is not None:
+            results[i] = cached
+        else:
+            jobs.append((path, content))
+            positions.append(i)
+    
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(jobs))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            fresh = list(pool.map(
+                _validate_content_job, jobs, chunksize=max(1, len(jobs) // (workers * 4))
+            ))
+    else:
+        fresh = [_validate_content_job(job) for job in jobs]
+    
+    for i, result in zip(positions, fresh):
+        results[i] = result
+        if cache:
+            cache.put(result)
+    if cache:
+        cache.save(r.digest for r in results if r.digest)
+    
+    return ValidationReport(results, cross_config_checks(results))
+
+
 def main():
     """Main validation function"""
     # Check command line arguments
     if len(sys.argv) < 2:
         print("Usage: python validate_config.py <config_file.json>")
+        print("       python validate_config.py <config_dir|file>... [--workers N] "
+              "[--cache FILE] [--json FILE]")
         print()
         print("Example:")
         print("  python validate_config.py lai_prep_config.json")
+        print("  python validate_config.py sites/ --cache .validation_cache.json")
         sys.exit(1)
     
-    config_path = sys.argv[1]
+    # Single file: full report, as before
+    if len(sys.argv) == 2 and not Path(sys.argv[1]).is_dir():
+        config_path = sys.argv[1]
+        
+        # Validate
+        validator = ConfigValidator(config_path)
+        is_valid = validator.validate()
+        
+        # Exit with appropriate code
+        sys.exit(0 if is_valid else 1)
+    
+    parser = argparse.ArgumentParser(description="Validate LAI-PrEP configuration files")
+    parser.add_argument("paths", nargs="+", help="Configuration files or directories")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes (default: CPU count)")
+    parser.add_argument("--cache", default=None,
+                        help="Cache file; configs with unchanged content are skipped")
+    parser.add_argument("--pattern", default="*.json", help="Glob for files in directories")
+    parser.add_argument("--json", dest="json_path", default=None,
+                        help="Write the combined report as JSON")
+    args = parser.parse_args()
     
-    # Validate
-    validator = ConfigValidator(config_path)
-    is_valid = validator.validate()
+    report = validate_paths(args.paths, workers=args.workers, cache_path=args.cache,
+                            pattern=args.pattern)
+    report.print_summary()
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(report.to_dict(), f, indent=2)
     
-    # Exit with appropriate code
-    sys.exit(0 if is_valid else 1)
+    sys.exit(0 if report.valid else 1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Synthetic Validation Runs for LAI-PrEP Bridge Decision Support Tool
+
+Scores a synthetic cohort of N patients drawn from a cohort spec and reports
+the aggregates of the Validation_progressive/*.json results: success and
+improvement by population, PrEP status and barrier count, risk level counts
+and how often each intervention is recommended.
+
+The cohort is generated in fixed-size chunks, chunk i from its own random
+stream seeded by (seed, i), so the first N patients are the same for every
+run length. Each chunk's partial sums are stored in a RunCache under a key of
+(configuration digest, code version, method, cohort-spec hash, seed, chunk
+size, chunk index, chunk length); the finished report is stored under the
+run key (the same fields plus N). Re-running returns the stored report, and
+growing a run from 10M to 21.2M patients scores only the remaining 11.2M
+(plus the formerly partial last chunk). Partials are summed in chunk order,
+so a run assembled from cached chunks is identical to a fresh one.
+"""
+
+import hashlib
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from cohort_scoring import CohortScorer
+from lai_prep_decision_tool_v2_1 import ConfigurationError
+from patient_codec import BOOLEAN_FIELDS
+from run_cache import RunCache, content_key
+from shared_config import config_digest
+
+
+# Bump when the aggregates change meaning; scoring code changes are picked up
+# from the source digest in code_version()
+SIMULATION_VERSION = 1
+
+# Modules whose source determines the aggregates
+SOURCE_MODULES = (
+    'validation_simulation.py', 'cohort_scoring.py', 'compiled_config.py',
+    'patient_codec.py', 'lai_prep_decision_tool_v2_1.py',
+)
+
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+# Distribution of the published validation runs; sections left out of a
+# spec file keep these, categorical sections not listed here are uniform
+DEFAULT_SPEC = {
+    'prep_statuses': {'naive': 0.75, 'oral_prep': 0.15, 'discontinued_oral': 0.10},
+    'barrier_count': {'0': 0.20, '1': 0.30, '2': 0.25, '3': 0.15, '4': 0.07, '5': 0.03},
+    'flags': {'recent_hiv_test': 0.5, 'transportation_access': 0.7, 'childcare_needs': 0.2},
+    'age': [16, 65],
+}
+
+# Spec section -> (record field, codec attribute)
+CATEGORICAL = (
+    ('populations', 'population', 'populations'),
+    ('prep_statuses', 'prep_status', 'prep_statuses'),
+    ('healthcare_settings', 'healthcare_setting', 'settings'),
+    ('insurance_statuses', 'insurance_status', 'insurance_statuses'),
+)
+
+
+def code_version() -> str:
+    """SIMULATION_VERSION plus a digest of the scoring sources"""
+    digest = hashlib.sha256()
+    here = Path(__file__).parent
+    for name in SOURCE_MODULES:
+        digest.update((here / name).read_bytes())
+    return f"{SIMULATION_VERSION}-{digest.hexdigest()[:16]}"
+
+
+def _weights(section: str, weights: Dict[str, float], values: Tuple[str, ...]) -> List[float]:
+    """Normalized weights in code order"""
+    unknown = set(weights) - set(values)
+    if unknown:
+        raise ConfigurationError(f"Unknown {section} in cohort spec: {sorted(unknown)}")
+    probabilities = [float(weights.get(value, 0.0)) for value in values]
+    if any(p < 0 for p in probabilities) or sum(probabilities) <= 0:
+        raise ConfigurationError(f"Cohort spec {section} weights must be non-negative, not all 0")
+    total = sum(probabilities)
+    return [p / total for p in probabilities]
+
+
+def normalize_spec(spec: Optional[Dict], codec) -> Dict:
+    """
+    Complete a cohort spec with defaults and normalize its weights
+
+    Args:
+        spec: Partial spec (sections of DEFAULT_SPEC and CATEGORICAL), or None
+        codec: PatientCodec of the configuration
+
+    Returns:
+        Canonical spec: every section present, weights as probabilities in code order
+
+    Raises:
+        ConfigurationError: If the spec names unknown values or invalid weights
+    """
+    spec = dict(spec or {})
+    unknown = set(spec) - set(DEFAULT_SPEC) - {section for section, _, _ in CATEGORICAL}
+    if unknown:
+        raise ConfigurationError(f"Unknown cohort spec sections: {sorted(unknown)}")
+
+    normalized = {}
+    for section, _, attribute in CATEGORICAL:
+        values = tuple(getattr(codec, attribute))
+        weights = spec.get(section, DEFAULT_SPEC.get(section, dict.fromkeys(values, 1.0)))
+        normalized[section] = _weights(section, weights, values)
+
+    counts = tuple(str(k) for k in range(len(codec.barriers) + 1))
+    normalized['barrier_count'] = _weights(
+        'barrier_count', spec.get('barrier_count', DEFAULT_SPEC['barrier_count']), counts
+    )
+
+    flags = {**DEFAULT_SPEC['flags'], **spec.get('flags', {})}
+    if set(flags) - set(BOOLEAN_FIELDS) or not all(0 <= p <= 1 for p in flags.values()):
+        raise ConfigurationError(f"Cohort spec flags must be {sorted(BOOLEAN_FIELDS)} in [0, 1]")
+    normalized['flags'] = {name: float(flags[name]) for name in BOOLEAN_FIELDS}
+
+    low, high = spec.get('age', DEFAULT_SPEC['age'])
+    if not 0 <= low <= high <= 255:
+        raise ConfigurationError("Cohort spec age range must satisfy 0 <= low <= high <= 255")
+    normalized['age'] = [int(low), int(high)]
+    return normalized
+
+
+def spec_hash(spec: Dict) -> str:
+    """Hex digest of a normalized cohort spec"""
+    return content_key(spec)
+
+
+def generate_chunk(codec, spec: Dict, seed: int, index: int, size: int, length: int) -> np.ndarray:
+    """
+    Patients of one chunk
+
+    The chunk is drawn at full size from the (seed, index) stream and cut to
+    length, so a partial chunk is a prefix of the full one.
+    """
+    rng = np.random.default_rng([seed, index])
+    records = codec.empty(size)
+    for section, field_name, _ in CATEGORICAL:
+        probabilities = spec[section]
+        records[field_name] = rng.choice(len(probabilities), size=size, p=probabilities)
+
+    # k distinct barriers per patient: the k lowest of random keys
+    counts = rng.choice(len(spec['barrier_count']), size=size, p=spec['barrier_count'])
+    ranks = rng.random((size, len(codec.barriers))).argsort(axis=1).argsort(axis=1)
+    bits = (ranks < counts[:, None]).astype(np.uint64) << np.arange(len(codec.barriers), dtype=np.uint64)
+    records['barriers'] = bits.sum(axis=1)
+
+    flags = np.zeros(size, dtype=np.uint8)
+    for name, bit in BOOLEAN_FIELDS.items():
+        flags |= np.where(rng.random(size) < spec['flags'][name], bit, 0).astype(np.uint8)
+    records['flags'] = flags
+    low, high = spec['age']
+    records['age'] = rng.integers(low, high + 1, size)
+    return records[:length]
+
+
+class ValidationAggregator:
+    """Partial sums of one chunk, and the report built from summed partials"""
+
+    def __init__(self, scorer: CohortScorer):
+        """
+        Args:
+            scorer: CohortScorer for the active configuration and method
+        """
+        self.scorer = scorer
+        self.codec = scorer.codec
+        tables = scorer.tables
+        config = tables.config.config
+        self.intervention_keys = list(config['interventions'])
+        self.intervention_names = [
+            config['interventions'][key]['name'] for key in self.intervention_keys
+        ]
+        self._intervention_index = {key: i for i, key in enumerate(self.intervention_keys)}
+
+        self.strata: List[Tuple[str, List[str]]] = [
+            ('by_population', [config['populations'][p]['name'] for p in self.codec.populations]),
+            ('by_prep_status', list(self.codec.prep_statuses)),
+            ('by_risk_level', list(tables.risk_labels)),
+            ('by_barrier_count', [str(k) for k in range(tables.n_barriers + 1)]),
+        ]
+        self._offsets = np.cumsum([0] + [len(labels) for _, labels in self.strata])
+        self.n_rows = 1 + int(self._offsets[-1])  # Row 0 is the whole cohort
+
+    def empty(self) -> Dict[str, np.ndarray]:
+        """Zero partial"""
+        return {
+            'counts': np.zeros(self.n_rows, dtype=np.int64),
+            'success': np.zeros(self.n_rows),
+            'improvement': np.zeros(self.n_rows),
+            'interventions': np.zeros(len(self.intervention_keys), dtype=np.int64),
+        }
+
+    def partial(self, records: np.ndarray) -> Dict[str, np.ndarray]:
+        """Partial sums for a chunk of encoded patients"""
+        scorer = self.scorer
+        adjusted = scorer.adjusted_success(records)
+        improvement = scorer.estimated_success(adjusted, scorer.intervention_gain(records)) - adjusted
+
+        codes = [
+            records['population'].astype(np.int64),
+            records['prep_status'].astype(np.int64),
+            scorer.risk_index(adjusted).astype(np.int64),
+            scorer.barrier_count(records).astype(np.int64),
+        ]
+        rows = np.concatenate(
+            [np.zeros(len(records), dtype=np.int64)]
+            + [1 + offset + c for offset, c in zip(self._offsets[:-1], codes)]
+        )
+        n_families = len(codes) + 1
+        partial = {
+            'counts': np.bincount(rows, minlength=self.n_rows).astype(np.int64),
+            'success': np.bincount(rows, np.tile(adjusted, n_families), self.n_rows),
+            'improvement': np.bincount(rows, np.tile(improvement, n_families), self.n_rows),
+        }
+
+        keys, inverse = scorer.unique_keys(records)
+        per_key = np.bincount(inverse.reshape(-1), minlength=len(keys))
+        interventions = np.zeros(len(self.intervention_keys), dtype=np.int64)
+        for key, count in zip(keys.tolist(), per_key.tolist()):
+            for rec in scorer.recommendations_for_key(key):
+                interventions[self._intervention_index[rec.intervention]] += count
+        partial['interventions'] = interventions
+        return partial
+
+    def report(self, totals: Dict[str, np.ndarray]) -> Dict:
+        """Validation results report from summed partials"""
+        counts, success, improvement = totals['counts'], totals['success'], totals['improvement']
+
+        def row(index: int, with_improvement: bool) -> Dict:
+            count = int(counts[index])
+            entry = {"count": count, "total_success": float(success[index])}
+            if with_improvement:
+                entry["total_improvement"] = float(improvement[index])
+            entry["avg_success"] = float(success[index]) / count
+            if with_improvement:
+                entry["avg_improvement"] = float(improvement[index]) / count
+            return entry
+
+        total = int(counts[0])
+        report = {
+            "total": total,
+            "avg_success_rate": float(success[0]) / total if total else 0.0,
+            "avg_improvement": float(improvement[0]) / total if total else 0.0,
+        }
+        for (family, labels), offset in zip(self.strata, self._offsets[:-1]):
+            if family == 'by_risk_level':
+                report[family] = {
+                    label: int(counts[1 + offset + k]) for k, label in enumerate(labels)
+                }
+                continue
+            report[family] = {
+                label: row(1 + offset + k, family == 'by_population')
+                for k, label in enumerate(labels) if counts[1 + offset + k]
+            }
+        report["interventions"] = {
+            name: int(count)
+            for name, count in zip(self.intervention_names, totals['interventions']) if count
+        }
+        return report
+
+
+def run_validation(
+    scorer: CohortScorer,
+    n: int,
+    spec: Optional[Dict] = None,
+    seed: int = 0,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    cache: Optional[RunCache] = None,
+    progress: Optional[Callable[[int, int, bool], None]] = None
+) -> Tuple[Dict, Dict[str, int]]:
+    """
+    Score a synthetic cohort and aggregate validation results
+
+    Args:
+        scorer: CohortScorer for the active configuration and method
+        n: Number of patients
+        spec: Cohort spec (see DEFAULT_SPEC); None for the defaults
+        seed: Base random seed
+        chunk_size: Patients per chunk (part of the cache key)
+        cache: RunCache for chunk partials and reports; None to compute everything
+        progress: Called as progress(chunk, n_chunks, reused) after each chunk
+
+    Returns:
+        (report, stats), stats counting chunks computed and reused and
+        whether the whole report came from the cache
+    """
+    if n < 1 or chunk_size < 1:
+        raise ValueError("Patient count and chunk size must be positive")
+
+    aggregator = ValidationAggregator(scorer)
+    spec = normalize_spec(spec, scorer.codec)
+    run = {
+        'config_digest': config_digest(scorer.tool.config),
+        'code_version': code_version(),
+        'method': 'logit' if scorer.use_logit else 'linear',
+        'spec_hash': spec_hash(spec),
+        'seed': seed,
+        'chunk_size': chunk_size,
+    }
+    run_key = content_key(run, n)
+    n_chunks = -(-n // chunk_size)
+    stats = {'chunks': n_chunks, 'computed': 0, 'reused': 0, 'cached_report': False}
+
+    if cache is not None:
+        report = cache.get_run(run_key)
+        if report is not None:
+            cache.save()
+            stats['cached_report'] = True
+            stats['reused'] = n_chunks
+            return report, stats
+
+    totals = aggregator.empty()
+    for index in range(n_chunks):
+        length = min(chunk_size, n - index * chunk_size)
+        key = content_key(run, index, length)
+        partial = cache.get_chunk(key) if cache is not None else None
+        reused = partial is not None
+        if partial is None:
+            records = generate_chunk(scorer.codec, spec, seed, index, chunk_size, length)
+            partial = aggregator.partial(records)
+            if cache is not None:
+                cache.put_chunk(key, partial, {**run, 'chunk': index, 'length': length})
+        for name in totals:
+            totals[name] += partial[name]
+        stats['reused' if reused else 'computed'] += 1
+        if progress is not None:
+            progress(index + 1, n_chunks, reused)
+
+    report = aggregator.report(totals)
+    report["run"] = {**run, "key": run_key, "n": n, "spec": spec}
+    report["test_date"] = datetime.now().isoformat()
+    if cache is not None:
+        cache.put_run(run_key, report, {**run, 'n': n})
+    return report, stats